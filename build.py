@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 import logging
 from pathlib import Path
@@ -85,6 +86,122 @@ def run_command(cmd, logger, cwd=None):
         logger.error(f"Errore nell'esecuzione del comando: {e}")
         raise
 
+# Pagine dell'interfaccia da rendere autonome (CSS e script inclusi nella pagina)
+UI_PAGES = ['unified-list.html']
+
+# Nome di classe in un selettore CSS, con i caratteri escapati da Tailwind (es. hover\:bg-gray-100)
+CLASS_SELECTOR = re.compile(r'\.((?:\\.|[\w-])+)')
+# Parole che possono essere classi, nell'HTML e negli script della pagina
+CLASS_TOKEN = re.compile(r'[\w:/.\[\]-]+')
+
+
+def split_css_rules(css: str):
+    """
+    Divide un foglio di stile nelle regole di primo livello.
+
+    Returns:
+        list: Coppie (prelude, corpo); il corpo di @media contiene altre regole
+    """
+    rules = []
+    depth = 0
+    start = 0
+    body_start = None
+    quote = None
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = len(css) if end < 0 else end + 2
+            if depth == 0:
+                start = i
+            continue
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                body_start = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((css[start:body_start].strip(), css[body_start + 1:i]))
+                start = i + 1
+        i += 1
+    return rules
+
+
+def purge_css(css: str, used: set) -> str:
+    """
+    Rimuove le regole che riguardano solo classi non usate dalla pagina.
+
+    Le regole senza classi (reset, elementi, @keyframes, @font-face) sono mantenute.
+    """
+    output = []
+    for prelude, body in split_css_rules(css):
+        if prelude.startswith('@media') or prelude.startswith('@supports'):
+            inner = purge_css(body, used)
+            if inner:
+                output.append(f"{prelude}{{{inner}}}")
+            continue
+        if prelude.startswith('@'):
+            output.append(f"{prelude}{{{body}}}")
+            continue
+        selectors = [
+            selector for selector in prelude.split(',')
+            if all(re.sub(r'\\(.)', r'\1', name) in used for name in CLASS_SELECTOR.findall(selector))
+        ]
+        if selectors:
+            output.append(f"{','.join(selectors)}{{{body}}}")
+    return ''.join(output)
+
+
+def inline_page(html: str, assets_dir: Path, logger) -> str:
+    """Sostituisce i fogli di stile e gli script locali con il loro contenuto"""
+    used = set(CLASS_TOKEN.findall(html))
+
+    def inline_css(match):
+        path = assets_dir / match.group(1)
+        css = path.read_text(encoding='utf-8')
+        purged = purge_css(css, used)
+        logger.info(f"{path.name}: {len(css) // 1024} KB -> {len(purged) // 1024} KB")
+        return f"<style>{purged}</style>"
+
+    def inline_script(match):
+        path = assets_dir / match.group(1)
+        script = path.read_text(encoding='utf-8').replace('</script', '<\\/script')
+        return f"<script>{script}</script>"
+
+    # I riferimenti commentati (CDN) non sono toccati: hanno URL assoluti
+    html = re.sub(r'<link href="([\w.-]+\.css)" rel="stylesheet">', inline_css, html)
+    return re.sub(r'<script src="([\w.-]+\.js)"></script>', inline_script, html)
+
+
+def build_assets(project_root: Path, logger) -> bool:
+    """
+    Prepara le pagine dell'interfaccia in dist/assets.
+
+    Ogni pagina diventa un unico file con le sole classi Tailwind usate e
+    gli script inclusi, così la finestra non carica altri file all'avvio.
+    """
+    try:
+        assets_dir = project_root / 'assets'
+        output_dir = project_root / 'dist' / 'assets'
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for page in UI_PAGES:
+            html = (assets_dir / page).read_text(encoding='utf-8')
+            (output_dir / page).write_text(inline_page(html, assets_dir, logger), encoding='utf-8')
+            logger.info(f"Pagina {page} creata in {output_dir}")
+        return True
+    except Exception as e:
+        logger.error(f"Errore nella preparazione delle pagine: {e}")
+        return False
+
 def build_naiad(args, logger):
     """Esegue il processo di build"""
     try:
@@ -107,6 +224,10 @@ def build_naiad(args, logger):
         dist_dir = project_root / 'dist'
         spec_file = project_root / 'naiad.spec'
         
+        # Pagine dell'interfaccia autonome
+        if not build_assets(project_root, logger):
+            return False
+
         # Esegui PyInstaller
         logger.info("Avvio build con PyInstaller...")
         cmd = [
@@ -139,12 +260,16 @@ def main():
     parser = argparse.ArgumentParser(description='Build NAIAD')
     parser.add_argument('--version', default='1.0.0', help='Versione del build')
     parser.add_argument('--install-deps', action='store_true', help='Installa dipendenze')
+    parser.add_argument('--assets-only', action='store_true', help="Prepara solo le pagine dell'interfaccia")
     args = parser.parse_args()
     
     logger = setup_logging()
     
     try:
-        success = build_naiad(args, logger)
+        if args.assets_only:
+            success = build_assets(get_project_root(), logger)
+        else:
+            success = build_naiad(args, logger)
         sys.exit(0 if success else 1)
     except Exception as e:
         logger.error(f"Errore fatale durante la build: {e}")
@@ -0,0 +1,5 @@
+@echo off
+set "NAIAD_COMM_DIR=C:\ProgramData\NAIAD\comm"
+if not exist "%NAIAD_COMM_DIR%" mkdir "%NAIAD_COMM_DIR%"
+echo %DATE% %TIME% > "%NAIAD_COMM_DIR%\read_changes"
+exit /b 0
\ No newline at end of file
@@ -78,7 +78,7 @@ class AnthropicPromptBuilder:
         # Aggiunge gli esempi di traduzione se necessario
         if session_style == SessionStyle.TRANSLATION and translation_examples:
             prompt.append("\nEsempi di traduzione:")
-            for example in translation_examples[:3]:  # Limita a 3 esempi per non sovraccaricare
+            for example in translation_examples:  # Il numero è limitato dal profilo della modalità
                 prompt.append(
                     f"Input: {example['grid_content']}\n"
                     f"Traduzione: {example['italian_translation']}"
@@ -134,6 +134,8 @@ class AnthropicResponseParser:
 from typing import List, Dict, Any
 
 class AnthropicContextManager:
+    MAX_MESSAGES = 10  # Numero massimo di messaggi da mantenere
+
     def prepare_messages(self, history: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         """
         Prepara i messaggi per la chiamata API di Anthropic.
@@ -146,7 +148,7 @@ class AnthropicContextManager:
             List[Dict[str, Any]]: Lista di messaggi formattata per Anthropic
         """
         MAX_TOKENS_ESTIMATE = 4000  # Stima conservativa
-        MAX_MESSAGES = 10  # Numero massimo di messaggi da mantenere
+        MAX_MESSAGES = self.MAX_MESSAGES
 
         messages = []
         
@@ -3,10 +3,11 @@ import logging
 import json
 from datetime import datetime
 import anthropic
-from naiad.ai.base import AIProviderInterface, Response, ProviderException, ChatContext, SessionStyle
+from naiad.ai.base import AIProviderInterface, Response, ProviderException, ProviderOffline, ChatContext, SessionStyle
 from naiad.ai.anthropic_components import AnthropicPromptBuilder
 from naiad.ai.anthropic_components import AnthropicResponseParser
 from naiad.ai.anthropic_components import AnthropicContextManager
+from naiad.core.tracing import span
 
 class AnthropicProvider(AIProviderInterface):
      # Definizione dei modelli disponibili per ogni stile. Non più usato direttamente
@@ -48,7 +49,8 @@ class AnthropicProvider(AIProviderInterface):
         }
     }
 
-    def __init__(self, api_key: str, logger: logging.Logger): 
+    def __init__(self, api_key: str, logger: logging.Logger, base_url: Optional[str] = None,
+                 timeout: float = 60, connect_timeout: float = 3, max_retries: int = 1):
         #, model: str = "claude-3-5-haiku-20241022"):
         """
         Inizializza il provider Anthropic.
@@ -56,11 +58,19 @@ class AnthropicProvider(AIProviderInterface):
         Args:
             api_key: Chiave API di Anthropic
             logger: Logger per la registrazione degli eventi
-            model: Modello Claude da utilizzare
+            base_url: Indirizzo del servizio (None: quello ufficiale; es. il server finto dei test)
+            timeout: Secondi massimi di attesa della risposta
+            connect_timeout: Secondi massimi per la connessione: senza rete si fallisce subito
+            max_retries: Tentativi ripetuti dal client dopo un errore temporaneo
         """
         self.logger = logger
         #self.model = model
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = anthropic.Anthropic(
+            api_key=api_key,
+            base_url=base_url or None,
+            timeout=anthropic.Timeout(timeout, connect=connect_timeout),
+            max_retries=max_retries
+        )
         self.prompt_builder = AnthropicPromptBuilder()
         self.response_parser = AnthropicResponseParser()
         self.context_manager = AnthropicContextManager()
@@ -144,39 +154,43 @@ class AnthropicProvider(AIProviderInterface):
             Response: Oggetto contenente la risposta e i metadati
         """
         try:
-            # Ottieni lo stile della sessione e la configurazione personalizzata
             session_style = context.get('style')
-            custom_config = context.get('model_config')
-            # Ottieni la configurazione del modello
-            model_config = self._get_model_config(session_style, custom_config)
-            
-            # Costruisce il sistema prompt in base allo stile della sessione
-            system_prompt = self.prompt_builder.build_system_prompt(
-                session_style=session_style,
-                translation_examples=context.get('translation_examples', [])
-            )
+            profile = context.get('profile')
+            if profile is not None:
+                # Profilo precompilato della modalità: nessuna copia per richiesta
+                model = profile.model
+                params = profile.parameters
+                system_prompt = profile.system_prompt
+            else:
+                # Configurazione personalizzata passata nel contesto
+                model_config = self._get_model_config(session_style, context.get('model_config'))
+                model = model_config["model"]
+                params = model_config["parameters"]
+                system_prompt = self.prompt_builder.build_system_prompt(
+                    session_style=session_style,
+                    translation_examples=context.get('translation_examples', [])
+                )
 
             # Prepara la cronologia delle conversazioni
-            messages = self.context_manager.prepare_messages(
-                context.get('history', [])
-            )
+            with span("prompt"):
+                messages = self.context_manager.prepare_messages(
+                    context.get('history', [])
+                )
 
-            # Aggiunge il prompt corrente
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
+                # Aggiunge il prompt corrente
+                messages.append({
+                    "role": "user",
+                    "content": prompt
+                })
 
-            # Parametri specifici per lo stile della sessione
-            #params = self._get_style_specific_params(context.get('style'))
-            params = model_config["parameters"]
             # Effettua la chiamata API
-            response = self.client.messages.create(
-                model=model_config["model"],
-                messages=messages,
-                system=system_prompt,
-                **params
-            )
+            with span("anthropic"):
+                response = self.client.messages.create(
+                    model=model,
+                    messages=messages,
+                    system=system_prompt,
+                    **params
+                )
 
             # Parsing della risposta
             parsed_response = self.response_parser.parse(response)
@@ -188,14 +202,18 @@ class AnthropicProvider(AIProviderInterface):
             return Response(
                 content=parsed_response.content,
                 metadata={
-                    "model": model_config["model"],
+                    "model": model,
                     "finish_reason": response.stop_reason,
                     "usage": response.usage,
                     "style_specific": parsed_response.metadata,
-                    "configuration": model_config
+                    "configuration": {"model": model, "parameters": dict(params)}
                 }
             )
 
+        except anthropic.APIConnectionError as e:
+            # Comprende le connessioni scadute: la richiesta può essere ripetuta più tardi
+            self.logger.warning(f"Anthropic API unreachable: {str(e)}")
+            raise ProviderOffline(f"Anthropic API unreachable: {str(e)}")
         except anthropic.APIError as e:
             self.logger.error(f"Anthropic API error: {str(e)}")
             raise ProviderException(f"Error calling Anthropic API: {str(e)}")
@@ -35,6 +35,10 @@ class ProviderException(Exception):
     """Eccezione base per errori dei provider AI"""
     pass
 
+class ProviderOffline(ProviderException):
+    """Il servizio non è raggiungibile (rete assente o connessione scaduta)"""
+    pass
+
 class AIProviderInterface(ABC):
     """Interfaccia base per i provider AI"""
     @abstractmethod
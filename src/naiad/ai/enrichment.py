@@ -0,0 +1,294 @@
+# enrichment.py
+"""
+Arricchimento in background di chat e artefatti salvati.
+
+Per ogni elemento salvato viene generato, con un modello economico, un
+titolo breve e un riassunto di una frase da leggere ad alta voce. I lavori
+stanno nella coda persistente del catalogo e vengono eseguiti solo quando
+l'applicazione è inattiva; se i lavori sono abbastanza, vengono inviati in
+un unico batch con la Message Batches API.
+"""
+import json
+import re
+import time
+import threading
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from naiad.core.catalog import Catalog, EnrichmentJob
+from naiad.core.storage_events import StorageEvents, StorageEvent, ARTIFACT, CHAT, DELETE
+
+_SYSTEM_PROMPT = (
+    "Ricevi il testo di un elemento salvato da Nicola: una chat con l'assistente "
+    "oppure un artefatto (un testo scritto insieme). "
+    "Rispondi solo con un oggetto JSON con due chiavi: "
+    "\"titolo\", al massimo sei parole che permettano di riconoscere l'elemento; "
+    "\"riassunto\", una sola frase in italiano di al massimo venticinque parole, "
+    "adatta a essere letta ad alta voce."
+)
+
+_KIND_NAMES = {
+    ARTIFACT: "artefatto",
+    CHAT: "chat"
+}
+
+_JSON_OBJECT = re.compile(r'\{.*\}', re.DOTALL)
+
+
+def parse_enrichment(text: str) -> Tuple[str, str]:
+    """
+    Estrae titolo e riassunto dalla risposta del modello.
+
+    Args:
+        text: Testo della risposta
+
+    Returns:
+        Tuple[str, str]: (titolo, riassunto)
+
+    Raises:
+        ValueError: Se la risposta non contiene un titolo e un riassunto
+    """
+    match = _JSON_OBJECT.search(text)
+    if not match:
+        raise ValueError("Risposta senza JSON")
+    data = json.loads(match.group(0), strict=False)
+    title = ' '.join(str(data.get('titolo', '')).split()).strip(' "\'.')
+    recap = ' '.join(str(data.get('riassunto', '')).split())
+    if not title or not recap:
+        raise ValueError("Titolo o riassunto mancante")
+    return title[:80], recap[:300]
+
+
+class EnrichmentWorker(threading.Thread):
+    """
+    Thread che genera titoli e riassunti per gli elementi salvati.
+
+    Si iscrive agli eventi di archivio per accodare gli elementi nuovi o
+    modificati; all'avvio accoda quelli non ancora arricchiti.
+    """
+
+    # Secondi tra un controllo e l'altro dello stato di inattività
+    POLL_INTERVAL = 5.0
+    # Secondi tra un controllo e l'altro dei batch inviati
+    BATCH_POLL_INTERVAL = 60.0
+    # Lavori massimi per batch
+    MAX_BATCH_SIZE = 100
+    # Tentativi prima di rinunciare a un elemento
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, catalog: Catalog, artifact_manager, chat_manager, events: StorageEvents,
+                 client, config: dict, is_idle: Callable[[], bool],
+                 logger: Optional[logging.Logger] = None):
+        """
+        Inizializza il worker.
+
+        Args:
+            catalog: Catalogo con la coda dei lavori
+            artifact_manager: Gestore degli artefatti
+            chat_manager: Gestore delle chat
+            events: Bus degli eventi di archivio
+            client: Client Anthropic
+            config: Sezione 'enrichment' della configurazione
+            is_idle: Funzione che indica se l'applicazione è inattiva
+            logger: Logger per la registrazione degli eventi
+        """
+        super().__init__(daemon=True, name="EnrichmentWorker")
+        self.catalog = catalog
+        self.artifact_manager = artifact_manager
+        self.chat_manager = chat_manager
+        self.client = client
+        self.model = config.get('model', 'claude-3-5-haiku-20241022')
+        self.max_chars = int(config.get('max_chars', 12000))
+        self.use_batches = bool(config.get('use_batches', True))
+        self.batch_min_items = int(config.get('batch_min_items', 5))
+        self.is_idle = is_idle
+        self.logger = logger or logging.getLogger("enrichment")
+        self._stop_event = threading.Event()
+        self._last_batch_poll = 0.0
+        self._unsubscribe = events.subscribe(self._on_storage_event)
+
+    def _on_storage_event(self, event: StorageEvent):
+        """Accoda o rimuove l'elemento modificato"""
+        if event.kind not in _KIND_NAMES:
+            return
+        if event.action == DELETE:
+            self.catalog.remove(event.kind, event.name)
+        else:
+            self.catalog.enqueue(event.kind, event.name)
+
+    # Lettura degli elementi
+
+    def _source_mtime(self, kind: str, name: str) -> Optional[float]:
+        try:
+            if kind == ARTIFACT:
+                return (self.artifact_manager.artifacts_dir / name).stat().st_mtime
+            # Le chat archiviate conservano la data del file originale
+            return self.chat_manager.get_chat_mtime(name)
+        except FileNotFoundError:
+            return None
+
+    def _read_text(self, kind: str, name: str) -> str:
+        if kind == ARTIFACT:
+            text = self.artifact_manager.get_artifact_content(name)
+        else:
+            text = self.chat_manager.get_chat_text(name)
+        if len(text) > self.max_chars:
+            # Inizio e fine bastano per capire di cosa si tratta
+            head = self.max_chars * 2 // 3
+            tail = self.max_chars - head
+            text = f"{text[:head]}\n[...]\n{text[-tail:]}"
+        return text
+
+    def _request_params(self, job: EnrichmentJob) -> dict:
+        """Parametri della richiesta per un lavoro"""
+        text = self._read_text(job.kind, job.name)
+        return {
+            "model": self.model,
+            "max_tokens": 200,
+            "temperature": 0.2,
+            "system": _SYSTEM_PROMPT,
+            "messages": [{
+                "role": "user",
+                "content": f"Tipo: {_KIND_NAMES[job.kind]}\nNome: {job.name.rsplit('.', 1)[0]}\n\n{text}"
+            }]
+        }
+
+    # Allineamento
+
+    def _enqueue_missing(self):
+        """Accoda gli elementi mai arricchiti o modificati dopo l'arricchimento"""
+        documents = {ARTIFACT: [name for name, _ in self.artifact_manager.get_artifacts_list()],
+                     CHAT: [name for name, _, _ in self.chat_manager.get_chats_list()]}
+        queued = 0
+        for kind, names in documents.items():
+            enriched = self.catalog.source_mtimes(kind)
+            for name in set(enriched) - set(names):
+                self.catalog.remove(kind, name)
+            for name in names:
+                mtime = self._source_mtime(kind, name)
+                if mtime is not None and enriched.get(name) != mtime:
+                    # I lavori già in coda (o inviati in un batch) restano come sono
+                    self.catalog.enqueue(kind, name, replace=False)
+                    queued += 1
+        if queued:
+            self.logger.info(f"Accodati {queued} elementi da arricchire")
+
+    # Esecuzione
+
+    def _complete(self, job: EnrichmentJob, response_text: str):
+        try:
+            title, recap = parse_enrichment(response_text)
+        except ValueError as e:
+            self.logger.warning(f"Risposta non valida per {job.name}: {e}")
+            self.catalog.fail_job(job)
+            return
+        self.catalog.complete_job(job, title, recap, self._source_mtime(job.kind, job.name))
+        self.logger.info(f"Arricchito {job.kind} {job.name}: {title}")
+
+    def _prepare(self, jobs: List[EnrichmentJob]) -> List[Tuple[EnrichmentJob, dict]]:
+        """Prepara le richieste, scartando i lavori di elementi non più presenti"""
+        prepared = []
+        for job in jobs:
+            try:
+                prepared.append((job, self._request_params(job)))
+            except FileNotFoundError:
+                self.catalog.drop_job(job)
+            except Exception as e:
+                self.logger.error(f"Impossibile leggere {job.name}: {e}")
+                self.catalog.fail_job(job)
+        return prepared
+
+    def _run_direct(self, prepared: List[Tuple[EnrichmentJob, dict]]):
+        """Esegue i lavori uno alla volta, finché l'applicazione resta inattiva"""
+        for job, params in prepared:
+            if self._stop_event.is_set() or not self.is_idle():
+                return
+            try:
+                message = self.client.messages.create(**params)
+            except Exception as e:
+                self.logger.error(f"Errore arricchimento {job.name}: {e}")
+                self.catalog.fail_job(job)
+                continue
+            self._complete(job, message.content[0].text)
+
+    def _batches_api(self):
+        """Restituisce l'interfaccia dei batch se supportata dal client"""
+        messages = getattr(self.client, 'messages', None)
+        batches = getattr(messages, 'batches', None)
+        if batches is None:
+            beta = getattr(getattr(self.client, 'beta', None), 'messages', None)
+            batches = getattr(beta, 'batches', None)
+        return batches
+
+    def _submit_batch(self, batches, prepared: List[Tuple[EnrichmentJob, dict]]):
+        requests = [{"custom_id": f"job-{job.id}", "params": params} for job, params in prepared]
+        batch = batches.create(requests=requests)
+        self.catalog.mark_submitted([job for job, _ in prepared], batch.id)
+        self.logger.info(f"Inviato batch {batch.id} con {len(requests)} elementi")
+
+    def _poll_batches(self, batches):
+        """Raccoglie i risultati dei batch conclusi"""
+        now = time.monotonic()
+        if now - self._last_batch_poll < self.BATCH_POLL_INTERVAL:
+            return
+        self._last_batch_poll = now
+
+        for batch_id in self.catalog.submitted_batches():
+            if batches is None:
+                # Batch non più gestibili: i lavori tornano in coda
+                for job in self.catalog.jobs_in_batch(batch_id):
+                    self.catalog.fail_job(job)
+                continue
+
+            batch = batches.retrieve(batch_id)
+            if batch.processing_status != 'ended':
+                continue
+
+            jobs = {f"job-{job.id}": job for job in self.catalog.jobs_in_batch(batch_id)}
+            for entry in batches.results(batch_id):
+                job = jobs.pop(entry.custom_id, None)
+                if job is None:
+                    continue  # Elemento eliminato o accodato di nuovo nel frattempo
+                if entry.result.type == 'succeeded':
+                    self._complete(job, entry.result.message.content[0].text)
+                else:
+                    self.logger.warning(f"Batch {batch_id}: {job.name} {entry.result.type}")
+                    self.catalog.fail_job(job)
+            for job in jobs.values():
+                self.catalog.fail_job(job)
+
+    def _process(self):
+        batches = self._batches_api() if self.use_batches else None
+        self._poll_batches(batches)
+
+        jobs = self.catalog.next_jobs(self.MAX_BATCH_SIZE, self.MAX_ATTEMPTS)
+        if not jobs:
+            return
+        if batches is not None and len(jobs) >= self.batch_min_items:
+            prepared = self._prepare(jobs)
+            if prepared:
+                self._submit_batch(batches, prepared)
+        else:
+            # Pochi lavori: le richieste dirette danno il risultato subito
+            self._run_direct(self._prepare(jobs[:self.batch_min_items]))
+
+    def run(self):
+        try:
+            self._enqueue_missing()
+        except Exception as e:
+            self.logger.error(f"Errore allineamento catalogo: {e}")
+
+        while not self._stop_event.wait(self.POLL_INTERVAL):
+            if not self.is_idle():
+                continue
+            try:
+                self._process()
+            except Exception as e:
+                self.logger.error(f"Errore arricchimento: {e}")
+
+    def stop(self, timeout: Optional[float] = 5):
+        """Ferma il thread; i lavori non completati restano in coda"""
+        self._unsubscribe()
+        self._stop_event.set()
+        self.join(timeout)
+        self.logger.info("EnrichmentWorker fermato")
@@ -1,4 +1,5 @@
 # naiad/config/__init__.py
 from naiad.config.settings import Settings
+from naiad.config.profiles import ModeProfile
 
-__all__ = ['Settings']
\ No newline at end of file
+__all__ = ['Settings', 'ModeProfile']
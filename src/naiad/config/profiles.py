@@ -0,0 +1,86 @@
+# naiad/config/profiles.py
+"""
+Profili precompilati delle modalità.
+
+Per ogni SessionStyle la configurazione viene compilata una sola volta, al
+caricamento, in un ModeProfile immutabile con modello, parametri, prompt di
+sistema già costruito, esempi e opzioni TTS. Il cambio di modalità e il
+ricaricamento della configurazione sostituiscono il profilo in blocco,
+quindi le richieste non devono più copiare o ricostruire dizionari.
+"""
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Tuple
+
+from naiad.ai.base import SessionStyle
+from naiad.ai.anthropic_components import AnthropicPromptBuilder
+
+# Parametri usati quando una modalità non ha una configurazione del modello
+DEFAULT_PARAMETERS = {
+    "temperature": 0.7,
+    "max_tokens": 1000
+}
+
+
+def _freeze(value):
+    """Copia in profondità una struttura rendendola immutabile"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class ModeProfile:
+    """Configurazione compilata di una modalità"""
+    style: SessionStyle
+    model: str
+    parameters: Mapping[str, Any]
+    system_prompt: str
+    # Esempi inclusi nel prompt di sistema
+    examples: Tuple[Mapping[str, str], ...] = ()
+    # Opzioni TTS della modalità (quelle generali con le eventuali sostituzioni)
+    tts: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+
+    def describe(self) -> dict:
+        """Modello e parametri in forma di dizionario, per i metadati delle risposte"""
+        return {"model": self.model, "parameters": dict(self.parameters)}
+
+
+def compile_profiles(config: dict, logger=None) -> Dict[SessionStyle, ModeProfile]:
+    """
+    Compila i profili di tutte le modalità da una configurazione validata.
+
+    Args:
+        config: Configurazione completa
+        logger: Logger per segnalare le modalità senza modello configurato
+
+    Returns:
+        Dict[SessionStyle, ModeProfile]: Profilo per ogni modalità
+    """
+    anthropic = config.get('api', {}).get('anthropic', {})
+    models = anthropic.get('models', {})
+    default_model = anthropic.get('default_model', 'claude-3-5-haiku-20241022')
+    modes = config.get('modes', {})
+    tts = config.get('tts', {})
+    prompt_builder = AnthropicPromptBuilder()
+
+    profiles = {}
+    for style in SessionStyle:
+        model_config = models.get(style.value)
+        if not model_config:
+            if logger:
+                logger.warning(f"No configuration found for mode {style.value}")
+            model_config = {"model": default_model, "parameters": DEFAULT_PARAMETERS}
+        mode = modes.get(style.value, {})
+        examples = list(mode.get('examples', []))[:mode.get('max_examples', 3)]
+        profiles[style] = ModeProfile(
+            style=style,
+            model=model_config['model'],
+            parameters=_freeze(model_config.get('parameters', DEFAULT_PARAMETERS)),
+            system_prompt=prompt_builder.build_system_prompt(style, examples),
+            examples=_freeze(examples),
+            tts=_freeze({**tts, **mode.get('tts', {})})
+        )
+    return profiles
@@ -0,0 +1,178 @@
+# naiad/config/schema.py
+"""
+Validazione della configurazione.
+
+Controlla tipi e intervalli dei valori usati dall'applicazione, così un
+errore nel file config.yaml viene segnalato con il percorso della chiave
+invece di emergere più tardi durante una richiesta.
+"""
+import logging
+import re
+from numbers import Real
+from typing import Any, Callable, List, Tuple
+
+from naiad.ai.base import SessionStyle
+
+_STYLES = {style.value for style in SessionStyle}
+_MISSING = object()
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+# (chiave in notazione dot, controllo, descrizione del valore atteso)
+_RULES: List[Tuple[str, Callable[[Any], bool], str]] = [
+    ('api.anthropic.api_key', lambda v: isinstance(v, str), "una stringa"),
+    ('api.anthropic.default_model', lambda v: isinstance(v, str) and v, "il nome di un modello"),
+    ('api.anthropic.base_url', lambda v: isinstance(v, str) and (not v or v.startswith(('http://', 'https://'))),
+     "un indirizzo http(s) o una stringa vuota"),
+    ('api.anthropic.connect_timeout', lambda v: _is_number(v) and v > 0, "un numero maggiore di zero"),
+    ('api.anthropic.timeout', lambda v: _is_number(v) and v > 0, "un numero maggiore di zero"),
+    ('api.anthropic.max_retries', lambda v: _is_int(v) and v >= 0, "un intero non negativo"),
+    ('artifacts.snapshot_interval', lambda v: _is_int(v) and v >= 1, "un intero maggiore di zero"),
+    ('artifacts.reread', lambda v: v in ('changes', 'full'), "'changes' o 'full'"),
+    ('storage.chat_retention_days', lambda v: _is_int(v) and v >= 0, "un intero non negativo"),
+    ('enrichment.enabled', lambda v: isinstance(v, bool), "true o false"),
+    ('enrichment.model', lambda v: isinstance(v, str) and v, "il nome di un modello"),
+    ('enrichment.idle_seconds', lambda v: _is_number(v) and v >= 0, "un numero non negativo"),
+    ('enrichment.use_batches', lambda v: isinstance(v, bool), "true o false"),
+    ('enrichment.batch_min_items', lambda v: _is_int(v) and v >= 1, "un intero maggiore di zero"),
+    ('enrichment.max_chars', lambda v: _is_int(v) and v > 0, "un intero maggiore di zero"),
+    ('tts.provider', lambda v: isinstance(v, str) and v, "il nome di un provider"),
+    ('tts.language', lambda v: isinstance(v, str) and v, "un codice lingua"),
+    ('tts.rate', lambda v: _is_int(v) and v > 0, "un intero maggiore di zero"),
+    ('tts.earcon', lambda v: isinstance(v, bool), "true o false"),
+    ('tts.filler_after', lambda v: _is_number(v) and v >= 0, "un numero non negativo"),
+    ('tts.filler_text', lambda v: isinstance(v, str) and v, "una frase"),
+    ('ui.prelaunch_manager', lambda v: isinstance(v, bool), "true o false"),
+    ('outbox.retry_seconds', lambda v: _is_number(v) and v > 0, "un numero maggiore di zero"),
+    ('outbox.max_attempts', lambda v: _is_int(v) and v >= 1, "un intero maggiore di zero"),
+    ('outbox.offline_text', lambda v: isinstance(v, str) and v, "una frase"),
+    ('speculation.enabled', lambda v: isinstance(v, bool), "true o false"),
+    ('speculation.styles', lambda v: isinstance(v, list) and all(s in _STYLES for s in v),
+     "un elenco di modalità"),
+    ('speculation.max_branches', lambda v: _is_int(v) and v >= 1, "un intero maggiore di zero"),
+    ('speculation.session_token_budget', lambda v: _is_int(v) and v >= 0, "un intero non negativo"),
+    ('profiling.seconds', lambda v: _is_number(v) and v > 0, "un numero maggiore di zero"),
+    ('profiling.interval_ms', lambda v: _is_number(v) and v >= 1, "un numero non inferiore a 1"),
+    ('logging.level', lambda v: isinstance(v, str) and v.upper() in logging._nameToLevel, "un livello di log"),
+    ('logging.file', lambda v: isinstance(v, str) and v, "un nome di file"),
+    ('logging.retention_days', lambda v: _is_int(v) and v >= 1, "un intero maggiore di zero"),
+    ('logging.json', lambda v: isinstance(v, bool), "true o false"),
+]
+
+
+def _lookup(config: dict, key: str):
+    value = config
+    for part in key.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _validate_parameters(prefix: str, parameters, errors: List[str]):
+    if not isinstance(parameters, dict):
+        errors.append(f"{prefix}: deve essere una sezione")
+        return
+    temperature = parameters.get('temperature', 0)
+    if not _is_number(temperature) or not 0 <= temperature <= 1:
+        errors.append(f"{prefix}.temperature: deve essere un numero tra 0 e 1")
+    max_tokens = parameters.get('max_tokens', 1)
+    if not _is_int(max_tokens) or max_tokens <= 0:
+        errors.append(f"{prefix}.max_tokens: deve essere un intero maggiore di zero")
+
+
+def _validate_models(models, errors: List[str]):
+    if not isinstance(models, dict):
+        errors.append("api.anthropic.models: deve essere una sezione")
+        return
+    for style, model_config in models.items():
+        prefix = f"api.anthropic.models.{style}"
+        if style not in _STYLES:
+            errors.append(f"{prefix}: modalità sconosciuta")
+            continue
+        if not isinstance(model_config, dict):
+            errors.append(f"{prefix}: deve essere una sezione")
+            continue
+        if not isinstance(model_config.get('model'), str) or not model_config['model']:
+            errors.append(f"{prefix}.model: deve essere il nome di un modello")
+        _validate_parameters(f"{prefix}.parameters", model_config.get('parameters', {}), errors)
+
+
+def _validate_modes(modes, errors: List[str]):
+    if not isinstance(modes, dict):
+        errors.append("modes: deve essere una sezione")
+        return
+    for style, mode in modes.items():
+        prefix = f"modes.{style}"
+        if style not in _STYLES:
+            errors.append(f"{prefix}: modalità sconosciuta")
+            continue
+        if not isinstance(mode, dict):
+            errors.append(f"{prefix}: deve essere una sezione")
+            continue
+        examples = mode.get('examples', [])
+        if not isinstance(examples, list):
+            errors.append(f"{prefix}.examples: deve essere una lista")
+        else:
+            for position, example in enumerate(examples, 1):
+                if (not isinstance(example, dict)
+                        or not isinstance(example.get('grid_content'), str)
+                        or not isinstance(example.get('italian_translation'), str)):
+                    errors.append(f"{prefix}.examples[{position}]: servono grid_content e italian_translation")
+        max_examples = mode.get('max_examples', 0)
+        if not _is_int(max_examples) or max_examples < 0:
+            errors.append(f"{prefix}.max_examples: deve essere un intero non negativo")
+        tts = mode.get('tts', {})
+        if not isinstance(tts, dict):
+            errors.append(f"{prefix}.tts: deve essere una sezione")
+            continue
+        if 'rate' in tts and (not _is_int(tts['rate']) or tts['rate'] <= 0):
+            errors.append(f"{prefix}.tts.rate: deve essere un intero maggiore di zero")
+        if 'filler_after' in tts and (not _is_number(tts['filler_after']) or tts['filler_after'] < 0):
+            errors.append(f"{prefix}.tts.filler_after: deve essere un numero non negativo")
+
+
+def validate_config(config: dict) -> List[str]:
+    """
+    Valida una configurazione completa (già unita a quella predefinita).
+
+    Args:
+        config: Configurazione da validare
+
+    Returns:
+        List[str]: Errori trovati, vuota se la configurazione è valida
+    """
+    if not isinstance(config, dict):
+        return ["la configurazione deve essere una sezione"]
+
+    errors = []
+    for key, check, expected in _RULES:
+        value = _lookup(config, key)
+        if value is not _MISSING and not check(value):
+            errors.append(f"{key}: deve essere {expected} (trovato {value!r})")
+
+    models = _lookup(config, 'api.anthropic.models')
+    if models is not _MISSING:
+        _validate_models(models, errors)
+    modes = _lookup(config, 'modes')
+    if modes is not _MISSING:
+        _validate_modes(modes, errors)
+    return errors
+
+
+def error_key(error: str) -> str:
+    """
+    Chiave in notazione dot a cui si riferisce un errore di validate_config.
+
+    Gli errori hanno la forma "<chiave>: <messaggio>"; l'indice di un
+    elemento di lista (es. examples[2]) viene tolto, quindi la chiave
+    indica l'intera lista.
+    """
+    return re.sub(r'\[\d+\]$', '', error.split(':', 1)[0])
@@ -1,9 +1,100 @@
 # naiad/config/settings.py
 from pathlib import Path
+import copy
+import os
+import threading
+import time
 import yaml
 import logging
+from typing import Callable, Dict, List, Optional, Tuple
 from naiad.core.environment import env
 from naiad.utils.logger import setup_logger
+from naiad.ai.base import SessionStyle
+from naiad.config.schema import error_key, validate_config
+from naiad.config.profiles import ModeProfile, compile_profiles
+
+try:
+    import win32con
+    import win32event
+    import win32file
+except ImportError:
+    win32file = None
+
+
+class ConfigWatcher:
+    """
+    Sorveglia il file di configurazione e chiama una funzione quando cambia.
+
+    Su Windows usa le notifiche di modifica della directory; altrove controlla
+    periodicamente data e dimensione del file.
+    """
+
+    POLL_INTERVAL = 1.0
+    # Attesa dopo una modifica, perché gli editor scrivono il file in più passi
+    SETTLE_DELAY = 0.3
+
+    def __init__(self, path: Path, callback: Callable[[], None], logger: logging.Logger):
+        self.path = path
+        self.callback = callback
+        self.logger = logger
+        self._stop = threading.Event()
+        self._thread = None
+        self._state = self._file_state()
+
+    def _file_state(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _check(self):
+        state = self._file_state()
+        if state is None or state == self._state:
+            return
+        time.sleep(self.SETTLE_DELAY)
+        state = self._file_state()
+        if state is None:
+            return
+        self._state = state
+        try:
+            self.callback()
+        except Exception as e:
+            self.logger.error(f"Errore ricaricamento configurazione: {e}")
+
+    def _wait_for_change(self, handle) -> bool:
+        if handle is None:
+            return not self._stop.wait(self.POLL_INTERVAL)
+        result = win32event.WaitForSingleObject(handle, int(self.POLL_INTERVAL * 1000))
+        if result == win32con.WAIT_OBJECT_0:
+            win32file.FindNextChangeNotification(handle)
+        return not self._stop.is_set()
+
+    def _run(self):
+        handle = None
+        if win32file is not None:
+            try:
+                handle = win32file.FindFirstChangeNotification(
+                    str(self.path.parent), False,
+                    win32con.FILE_NOTIFY_CHANGE_LAST_WRITE | win32con.FILE_NOTIFY_CHANGE_FILE_NAME)
+            except Exception as e:
+                self.logger.warning(f"Notifiche di modifica non disponibili, uso il controllo periodico: {e}")
+        try:
+            while self._wait_for_change(handle):
+                self._check()
+        finally:
+            if handle is not None:
+                win32file.FindCloseChangeNotification(handle)
+
 
 class Settings:
     # Configurazione predefinita direttamente nel codice invece che in un file esterno
@@ -11,6 +102,15 @@ class Settings:
         "api": {
             "anthropic": {
                 "api_key": "",  # Sarà impostata tramite environment o file di configurazione
+                # Indirizzo del servizio, vuoto per quello ufficiale (es. http://127.0.0.1:8765
+                # con il server finto di tests/fake_api_server.py)
+                "base_url": "",
+                # Secondi per stabilire la connessione: senza rete la richiesta va subito in coda
+                "connect_timeout": 3,
+                # Secondi massimi di attesa della risposta
+                "timeout": 60,
+                # Tentativi ripetuti dal client dopo un errore temporaneo
+                "max_retries": 1,
                 "models":  {
                     "exploration": {
                        "model": "claude-3-5-sonnet-20241022",
@@ -56,58 +156,241 @@ class Settings:
                 "api_key": ""
             }
         },
+        "modes": {
+            # Esempi inclusi nel prompt di sistema (max_examples) e opzioni TTS per modalità
+            "translation": {
+                "max_examples": 3,
+                "examples": [
+                    {
+                        "grid_content": "IO OGGI FELICE PROVARE NUOVO PROGRAMMA CERVELLO AIUTARE SCRIVERE ITALIANO BELLO",
+                        "italian_translation": "Oggi sono felice perchè ho iniziato ad usare un nuovo programma di AI, che mi aiuta a scrivere in un italiano corretto"
+                    },
+                    {
+                        "grid_content": "QUANDO TU LIBERTA' GIORNO DOMANDA",
+                        "italian_translation": "Quando sei disponibile ?"
+                    },
+                    {
+                        "grid_content": "SABATO TU VENIRE ORE DOMANDA",
+                        "italian_translation": "A che ora puoi venire sabato ?"
+                    }
+                ],
+                "tts": {}
+            }
+        },
+        "artifacts": {
+            # Ogni quante versioni salvare una copia completa dell'artefatto
+            "snapshot_interval": 5,
+            # Dopo una revisione legge solo le modifiche ("changes") o tutto il testo ("full")
+            "reread": "changes"
+        },
+        "storage": {
+            # Giorni dopo cui le chat vengono spostate nell'archivio compresso (0 = mai)
+            "chat_retention_days": 180
+        },
+        "enrichment": {
+            # Titoli e riassunti generati in background per chat e artefatti
+            "enabled": True,
+            "model": "claude-3-5-haiku-20241022",
+            # Secondi senza comandi dopo cui si considera l'applicazione inattiva
+            "idle_seconds": 60,
+            # Usa la Message Batches API quando ci sono almeno batch_min_items elementi
+            "use_batches": True,
+            "batch_min_items": 5,
+            # Caratteri massimi del testo inviato per ogni elemento
+            "max_chars": 12000
+        },
         "tts": {
+            # gtts, local (pyttsx3) o none (nessun audio, per l'uso senza interfaccia)
             "provider": "gtts",
             "language": "it",
-            "rate": 140
+            "rate": 140,
+            # Segnale sonoro appena un comando di GRID3 viene ricevuto
+            "earcon": True,
+            # Secondi di attesa della risposta prima della frase di attesa (0 = mai);
+            # sostituibile per modalità in modes.<modalità>.tts
+            "filler_after": 2.5,
+            "filler_text": "Sto pensando..."
+        },
+        "ui": {
+            # Avvia la finestra di gestione nascosta insieme al backend, per aprirla subito
+            "prelaunch_manager": True
+        },
+        "outbox": {
+            # Secondi tra due tentativi di consegna delle richieste fatte senza rete
+            "retry_seconds": 10,
+            # Tentativi falliti per altri errori prima di abbandonare una richiesta
+            "max_attempts": 3,
+            # Avviso letto quando la domanda viene messa in coda (preparato all'avvio)
+            "offline_text": "Non c'è la rete. Ho messo la domanda in coda, ti rispondo appena torna."
+        },
+        "speculation": {
+            # Anticipa le risposte alle alternative numerate mentre il TTS legge
+            "enabled": True,
+            "styles": ["exploration"],
+            # Alternative anticipate per ogni risposta (le prime dell'elenco)
+            "max_branches": 2,
+            # Token (input + output) spendibili in anticipazioni per ogni sessione
+            "session_token_budget": 20000
+        },
+        "profiling": {
+            # Durata della cattura avviata dal trigger profile
+            "seconds": 30,
+            "interval_ms": 10
         },
         "logging": {
             "level": "INFO",
-            "file": "naiad.log"
+            "file": "naiad.log",
+            # Giorni di log compressi conservati dopo la rotazione giornaliera
+            "retention_days": 30,
+            # Scrive anche naiad.jsonl, un oggetto JSON per riga
+            "json": False
         }
     }
 
     def __init__(self):
         self.logger = setup_logger('naiad.config')
+        self.config_file = env.config_dir / 'config.yaml'
         self._config = {}
+        self._profiles: Dict[SessionStyle, ModeProfile] = {}
+        self._listeners: List[Callable[['Settings'], None]] = []
+        self._watcher = None
         self._load_config()
 
+    def _parse_config(self) -> dict:
+        """
+        Legge il file e lo unisce alla configurazione predefinita, senza validarlo.
+
+        Raises:
+            ValueError: Se il file non contiene una sezione di configurazione
+        """
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            user_config = yaml.safe_load(f)
+        if user_config is not None and not isinstance(user_config, dict):
+            raise ValueError("il file non contiene una sezione di configurazione")
+        # Unisce la configurazione utente con quella predefinita
+        return self._with_env_key(self._merge_configs(self.DEFAULT_CONFIG, user_config or {}))
+
+    @staticmethod
+    def _with_env_key(config: dict) -> dict:
+        """Carica API key da variabile d'ambiente se disponibile"""
+        env_api_key = os.environ.get('ANTHROPIC_API_KEY')
+        if env_api_key:
+            config['api']['anthropic']['api_key'] = env_api_key
+        return config
+
+    def _read_config(self) -> dict:
+        """
+        Legge e valida la configurazione dal file.
+
+        Raises:
+            ValueError: Se la configurazione non è valida
+        """
+        config = self._parse_config()
+        errors = validate_config(config)
+        if errors:
+            raise ValueError("; ".join(errors))
+        return config
+
+    def _reset_invalid(self, config: dict, errors: List[str]) -> dict:
+        """
+        Riporta ai valori predefiniti solo le chiavi non valide.
+
+        Le chiavi senza un valore predefinito (es. opzioni di una modalità)
+        vengono tolte.
+        """
+        config = copy.deepcopy(config)
+        for error in errors:
+            *parents, name = error_key(error).split('.')
+            section, default = config, self.DEFAULT_CONFIG
+            for part in parents:
+                section = section.get(part) if isinstance(section, dict) else None
+                default = default.get(part) if isinstance(default, dict) else None
+            if not isinstance(section, dict):
+                continue
+            if isinstance(default, dict) and name in default:
+                section[name] = copy.deepcopy(default[name])
+            else:
+                section.pop(name, None)
+        return config
+
+    def _apply(self, config: dict):
+        """Sostituisce in blocco configurazione e profili compilati"""
+        profiles = compile_profiles(config, self.logger)
+        self._config, self._profiles = config, profiles
+
     def _load_config(self):
         try:
-            # Percorso del file di configurazione
-            config_file = env.config_dir / 'config.yaml'
-            
-            if config_file.exists():
-                # Se esiste un file di configurazione, caricalo
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    user_config = yaml.safe_load(f)
-                    # Unisce la configurazione utente con quella predefinita
-                    self._config = self._merge_configs(self.DEFAULT_CONFIG, user_config or {})
-                self.logger.info(f"Configurazione caricata da {config_file}")
-            else:
+            if not self.config_file.exists():
                 # Se non esiste, usa la configurazione predefinita e salvala
-                self._config = self.DEFAULT_CONFIG.copy()
-                config_file.parent.mkdir(parents=True, exist_ok=True)
-                with open(config_file, 'w', encoding='utf-8') as f:
-                    yaml.dump(self._config, f, default_flow_style=False, allow_unicode=True)
-                self.logger.info(f"Creato nuovo file di configurazione in {config_file}")
-
-            # Carica API key da variabile d'ambiente se disponibile
-            import os
-            env_api_key = os.environ.get('ANTHROPIC_API_KEY')
-            if env_api_key:
-                self._config['api']['anthropic']['api_key'] = env_api_key
-                self.logger.info("API key Anthropic caricata da variabile d'ambiente")
-            
+                self.config_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.config_file, 'w', encoding='utf-8') as f:
+                    yaml.dump(self.DEFAULT_CONFIG, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+                self.logger.info(f"Creato nuovo file di configurazione in {self.config_file}")
+            config = self._parse_config()
         except Exception as e:
             self.logger.error(f"Errore caricamento configurazione: {e}")
-            # In caso di errore, usa la configurazione predefinita
-            self._config = self.DEFAULT_CONFIG.copy()
+            # File illeggibile: configurazione predefinita, con l'eventuale API key dell'ambiente
+            config = self._with_env_key(copy.deepcopy(self.DEFAULT_CONFIG))
             self.logger.info("Usando configurazione predefinita dopo errore")
 
+        errors = validate_config(config)
+        if errors:
+            # Un valore sbagliato non deve far perdere API key e impostazioni valide
+            for error in errors:
+                self.logger.error(f"Configurazione non valida, uso il valore predefinito: {error}")
+            config = self._reset_invalid(config, errors)
+            remaining = validate_config(config)
+            if remaining:
+                self.logger.error(f"Configurazione non correggibile, uso quella predefinita: {'; '.join(remaining)}")
+                config = self._with_env_key(copy.deepcopy(self.DEFAULT_CONFIG))
+        self._apply(config)
+        self.logger.info(f"Configurazione caricata da {self.config_file}")
+
+        if os.environ.get('ANTHROPIC_API_KEY'):
+            self.logger.info("API key Anthropic caricata da variabile d'ambiente")
+
+    def reload(self) -> bool:
+        """
+        Ricarica la configurazione dal file.
+
+        Se il file non è valido resta in uso la configurazione corrente.
+
+        Returns:
+            bool: True se la nuova configurazione è stata applicata
+        """
+        try:
+            config = self._read_config()
+        except Exception as e:
+            self.logger.error(f"Configurazione non ricaricata, resta in uso la precedente: {e}")
+            return False
+        self._apply(config)
+        self.logger.info(f"Configurazione ricaricata da {self.config_file}")
+        for listener in list(self._listeners):
+            try:
+                listener(self)
+            except Exception as e:
+                self.logger.error(f"Errore notifica ricaricamento configurazione: {e}")
+        return True
+
+    def add_listener(self, callback: Callable[['Settings'], None]):
+        """Registra una funzione chiamata dopo ogni ricaricamento riuscito"""
+        self._listeners.append(callback)
+
+    def start_watching(self):
+        """Avvia il ricaricamento automatico quando il file cambia"""
+        if self._watcher is None:
+            self._watcher = ConfigWatcher(self.config_file, self.reload, self.logger)
+            self._watcher.start()
+
+    def stop_watching(self):
+        """Ferma il ricaricamento automatico"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
     def _merge_configs(self, default: dict, user: dict) -> dict:
         """Unisce ricorsivamente la configurazione utente con quella predefinita"""
-        result = default.copy()
+        result = copy.deepcopy(default)
         for key, value in user.items():
             if key in result and isinstance(result[key], dict) and isinstance(value, dict):
                 result[key] = self._merge_configs(result[key], value)
@@ -125,6 +408,10 @@ class Settings:
         except (KeyError, TypeError):
             return default
 
+    def profile(self, style: SessionStyle) -> ModeProfile:
+        """Restituisce il profilo compilato di una modalità"""
+        return self._profiles[style]
+
     @property
     def model_configs(self) -> dict:
         """Ottiene le configurazioni dei modelli dalla configurazione corrente"""
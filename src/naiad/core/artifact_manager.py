@@ -1,22 +1,57 @@
 from pathlib import Path
 import os
 import logging
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple, List, Union
+from naiad.core.storage_writer import StorageWriter, atomic_write
+from naiad.core.artifact_versions import ArtifactVersionStore, ArtifactVersion
+from naiad.core.text_diff import ChangedPassage, diff_passages
+from naiad.core.listing_cache import ListingCache
+from naiad.core.storage_events import StorageEvents, StorageEvent, ARTIFACT, INSERT, UPDATE, DELETE
+from naiad.core.catalog import Catalog
 
 class ArtifactManager:
-    def __init__(self, base_dir: Path, logger: logging.Logger):
+    def __init__(self, base_dir: Path, logger: logging.Logger, writer: Optional[StorageWriter] = None,
+                 snapshot_interval: int = 5, events: Optional[StorageEvents] = None,
+                 catalog: Optional[Catalog] = None):
         """
         Inizializza il gestore degli artefatti.
         
         Args:
             base_dir: Directory base per il salvataggio degli artefatti
             logger: Logger per la registrazione degli eventi
+            writer: Writer in background; se assente le scritture sono sincrone
+            snapshot_interval: Ogni quante versioni salvare una copia completa
+            events: Bus degli eventi di archivio condiviso con gli altri componenti
+            catalog: Catalogo con i titoli generati; se assente si usano i nomi dei file
         """
         self.base_dir = base_dir
         self.logger = logger
         self.artifacts_dir = base_dir / "artifacts"
+        self.writer = writer
         self._ensure_directory()
+        self.versions = ArtifactVersionStore(
+            self.artifacts_dir / ".versions",
+            logger,
+            write=self._write,
+            snapshot_interval=snapshot_interval
+        )
+        # Elenco degli artefatti in memoria, aggiornato dagli eventi di archivio
+        self.listing = ListingCache(
+            self.artifacts_dir,
+            '.txt',
+            load_entry=lambda path: (path.name, datetime.fromtimestamp(path.stat().st_mtime)),
+            sort_keys={
+                'date': lambda entry: entry[1],
+                'name': lambda entry: entry[0].lower()
+            },
+            default_sort='date',
+            logger=logger
+        )
+        self.events = events or StorageEvents(logger)
+        self.events.subscribe(self._on_storage_event)
+        self.catalog = catalog
 
     def _extract_title_from_content(self, content: str, max_words: int = 5) -> str:
         """
@@ -74,7 +109,7 @@ class ArtifactManager:
         
     def save_artifact(self, content: str, filename: Optional[str] = None) -> Path:
         """
-        Salva un artefatto su file.
+        Salva un artefatto su file attendendo che sia persistito su disco.
         
         Args:
             content: Contenuto dell'artefatto
@@ -86,6 +121,27 @@ class ArtifactManager:
         Raises:
             IOError: Se si verifica un errore durante il salvataggio
         """
+        file_path, future = self.save_artifact_async(content, filename)
+        try:
+            future.result()
+        except Exception as e:
+            raise IOError(f"Impossibile salvare l'artefatto: {str(e)}")
+        return file_path
+
+    def save_artifact_async(self, content: str, filename: Optional[str] = None) -> Tuple[Path, Future]:
+        """
+        Salva un artefatto su file senza attendere la scrittura su disco.
+        
+        Args:
+            content: Contenuto dell'artefatto
+            filename: Nome del file (opzionale)
+            
+        Returns:
+            Tuple[Path, Future]: Percorso del file e future completato a scrittura avvenuta
+            
+        Raises:
+            IOError: Se si verifica un errore durante la preparazione del salvataggio
+        """
         try:
             # Se non è specificato un filename, usa un timestamp
             if not filename or len(filename.split()) > 5:
@@ -101,22 +157,162 @@ class ArtifactManager:
             # Costruisce il path completo
             file_path = self.artifacts_dir / safe_filename
             
-            # Se il file esiste, aggiunge un numero progressivo
+            # Se il file esiste (o è in coda di scrittura), aggiunge un numero progressivo
             counter = 1
-            while file_path.exists():
+            while self._exists(file_path):
                 base_name = safe_filename.rsplit('.', 1)[0]
                 file_path = self.artifacts_dir / f"{base_name}_{counter}.txt"
                 counter += 1
             
-            # Salva il contenuto
-            file_path.write_text(content, encoding='utf-8')
-            
-            self.logger.info(f"Artefatto salvato in: {file_path}")
-            return file_path
+            future = self._write(file_path, content)
+            future.add_done_callback(self._log_saved)
+            self._publish_when_done(future, INSERT, file_path.name)
+            return file_path, future
             
         except Exception as e:
             self.logger.error(f"Errore durante il salvataggio dell'artefatto: {e}")
             raise IOError(f"Impossibile salvare l'artefatto: {str(e)}")
+
+    def save_artifact_version_async(self, filename: str, content: str) -> Tuple[Path, Future]:
+        """
+        Salva il contenuto come nuova versione di un artefatto esistente.
+        
+        Il file dell'artefatto viene aggiornato con l'ultima versione, mentre la
+        catena in .versions conserva la storia in forma compatta. Alla prima
+        modifica la versione corrente diventa la versione 1 della catena.
+        
+        Args:
+            filename: Nome del file dell'artefatto da aggiornare
+            content: Contenuto della nuova versione
+            
+        Returns:
+            Tuple[Path, Future]: Percorso del file e future completato a scrittura avvenuta
+            
+        Raises:
+            IOError: Se si verifica un errore durante la preparazione del salvataggio
+        """
+        try:
+            self._wait_pending_writes()
+            file_path = self.artifacts_dir / filename
+            if not file_path.exists():
+                # L'artefatto originale non c'è più: ne crea uno nuovo
+                return self.save_artifact_async(content, filename.rsplit('.', 1)[0])
+
+            previous = file_path.read_text(encoding='utf-8')
+            if previous == content:
+                self.logger.info(f"Artefatto {filename} invariato, nessuna nuova versione")
+                future: Future = Future()
+                future.set_result(file_path)
+                return file_path, future
+
+            if not self.versions.has_chain(filename):
+                self.versions.add_version(filename, previous)
+            self.versions.add_version(filename, content, previous=previous)
+
+            future = self._write(file_path, content)
+            future.add_done_callback(self._log_saved)
+            self._publish_when_done(future, UPDATE, filename)
+            return file_path, future
+
+        except Exception as e:
+            self.logger.error(f"Errore durante il salvataggio della versione dell'artefatto: {e}")
+            raise IOError(f"Impossibile salvare la versione dell'artefatto: {str(e)}")
+
+    def list_versions(self, filename: str) -> List[ArtifactVersion]:
+        """
+        Elenca le versioni di un artefatto.
+        
+        Args:
+            filename: Nome del file dell'artefatto
+            
+        Returns:
+            List[ArtifactVersion]: Versioni dalla più vecchia alla più recente;
+            lista vuota se l'artefatto non è mai stato modificato
+        """
+        return self.versions.list_versions(filename)
+
+    def get_artifact_version(self, filename: str, version: int) -> str:
+        """
+        Ricostruisce il contenuto di una versione specifica di un artefatto.
+        
+        Args:
+            filename: Nome del file dell'artefatto
+            version: Numero della versione (1-based)
+            
+        Returns:
+            str: Contenuto della versione
+            
+        Raises:
+            IndexError: Se la versione non esiste
+        """
+        self._wait_pending_writes()
+        return self.versions.materialize(filename, version)
+
+    def get_artifact_changes(self, filename: str) -> List[ChangedPassage]:
+        """
+        Calcola le modifiche dell'ultima versione di un artefatto rispetto alla precedente.
+        
+        Args:
+            filename: Nome del file dell'artefatto
+            
+        Returns:
+            List[ChangedPassage]: Passaggi inseriti, modificati ed eliminati
+            
+        Raises:
+            IndexError: Se l'artefatto non ha una versione precedente
+        """
+        versions = self.versions.list_versions(filename)
+        if len(versions) < 2:
+            raise IndexError("L'artefatto non ha versioni precedenti.")
+        self._wait_pending_writes()
+        previous = self.versions.materialize(filename, versions[-2].version)
+        current = self.versions.materialize(filename, versions[-1].version)
+        return diff_passages(previous, current)
+
+    def _exists(self, file_path: Path) -> bool:
+        """Verifica se un file esiste su disco o è in attesa di scrittura"""
+        return file_path.exists() or bool(self.writer and self.writer.is_pending(file_path))
+
+    def _write(self, file_path: Path, data: Union[str, bytes]) -> Future:
+        """Scrive un file tramite il writer in background o in modo sincrono"""
+        if self.writer:
+            return self.writer.submit(file_path, data)
+
+        future: Future = Future()
+        try:
+            atomic_write(file_path, data)
+            future.set_result(file_path)
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _log_saved(self, future: Future):
+        """Registra l'esito di una scrittura"""
+        if future.exception():
+            self.logger.error(f"Errore durante il salvataggio dell'artefatto: {future.exception()}")
+        else:
+            self.logger.info(f"Artefatto salvato in: {future.result()}")
+
+    def _wait_pending_writes(self):
+        """Attende le scritture in coda per leggere dati aggiornati"""
+        if self.writer and not self.writer.flush(timeout=5):
+            self.logger.warning("Scritture artefatti ancora in coda durante la lettura")
+
+    def _publish_when_done(self, future: Future, action: str, filename: str):
+        """Pubblica l'evento di archivio quando la scrittura è completata"""
+        def publish(done: Future):
+            if not done.exception():
+                self.events.publish(ARTIFACT, action, filename)
+        future.add_done_callback(publish)
+
+    def _on_storage_event(self, event: StorageEvent):
+        """Aggiorna l'elenco in memoria dopo una modifica"""
+        if event.kind != ARTIFACT:
+            return
+        if event.action == DELETE:
+            self.listing.discard(event.name)
+        else:
+            self.listing.refresh(event.name)
             
     
     def get_artifacts_list(self) -> list[tuple[str, datetime]]:
@@ -126,15 +322,36 @@ class ArtifactManager:
         Returns:
             list[tuple[str, datetime]]: Lista di tuple (nome_file, data_modifica)
         """
-        files = list(self.artifacts_dir.glob('*.txt'))
-        result = []
+        self._wait_pending_writes()
+        return self.listing.entries()
+
+    def query_artifacts(self, offset: int = 0, limit: Optional[int] = None, sort: str = 'date',
+                        descending: bool = True, text: Optional[str] = None
+                        ) -> Tuple[int, List[Tuple[int, str, datetime]]]:
+        """
+        Restituisce una pagina dell'elenco degli artefatti.
         
-        for file in files:
-            mod_time = datetime.fromtimestamp(file.stat().st_mtime)
-            result.append((file.name, mod_time))
+        Args:
+            offset: Indice del primo artefatto da restituire
+            limit: Numero massimo di artefatti; None per tutti
+            sort: Ordinamento, 'date' o 'name'
+            descending: Se True ordina in modo decrescente
+            text: Filtro opzionale sul nome (senza distinzione maiuscole/minuscole)
             
-        # Ordina per data più recente
-        return sorted(result, key=lambda x: x[1], reverse=True)
+        Returns:
+            Tuple[int, list]: Totale degli artefatti filtrati e lista di
+            (numero, nome_file, data_modifica); il numero è quello usato dai comandi
+            
+        Raises:
+            ValueError: Se l'ordinamento non è valido
+        """
+        self._wait_pending_writes()
+        predicate = None
+        if text:
+            needle = text.lower()
+            predicate = lambda entry: needle in entry[0].lower()
+        total, page = self.listing.query(offset, limit, sort, descending, predicate)
+        return total, [(number, name, date) for number, (name, date) in page]
         
     def get_artifact_content(self, filename: str) -> str:
         """
@@ -149,6 +366,7 @@ class ArtifactManager:
         Raises:
             FileNotFoundError: Se il file non esiste
         """
+        self._wait_pending_writes()
         file_path = self.artifacts_dir / filename
         if not file_path.exists():
             raise FileNotFoundError(f"Artefatto non trovato: {filename}")
@@ -167,10 +385,13 @@ class ArtifactManager:
         if not artifacts:
             return "Non ci sono artefatti salvati."
             
+        enriched = self.catalog.get_many(ARTIFACT, [name for name, _ in artifacts]) if self.catalog else {}
+
         # Crea una lista numerata per facile riferimento
         lines = ["Ecco gli artefatti salvati, dal più recente:"]
         for i, (name, date) in enumerate(artifacts, 1):
-            pure_name = name.rsplit('.', 1)[0]
+            entry = enriched.get(name)
+            pure_name = entry.title if entry and entry.title else name.rsplit('.', 1)[0]
             date_str = date.strftime("%d/%m/%Y alle %H:%M")
             lines.append(f"Numero {i}: {pure_name}, salvato il {date_str}")
             
@@ -209,9 +430,12 @@ class ArtifactManager:
             bool: True se la cancellazione è avvenuta con successo
         """
         try:
+            self._wait_pending_writes()
             file_path = self.artifacts_dir / filename
             if file_path.exists():
                 file_path.unlink()
+                self.versions.delete_chain(filename)
+                self.events.publish(ARTIFACT, DELETE, filename)
                 self.logger.info(f"Artefatto {filename} cancellato con successo")
                 return True
             else:
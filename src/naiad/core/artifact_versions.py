@@ -0,0 +1,211 @@
+# artifact_versions.py
+"""
+Catene di versioni per gli artefatti.
+
+Ogni artefatto modificato più volte (ripresa creativa/articolo seguita da
+STAMPA) mantiene la sua storia in artifacts/.versions/<nome>/: una copia
+completa ogni K versioni e, in mezzo, solo le differenze per righe rispetto
+alla versione precedente. Il file .txt dell'artefatto contiene sempre
+l'ultima versione, così l'elenco mostra un solo artefatto logico.
+"""
+import difflib
+import json
+import shutil
+import zlib
+import logging
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class ArtifactVersion:
+    """Metadati di una versione di un artefatto"""
+    version: int
+    saved_at: str
+    kind: str  # 'snapshot' o 'delta'
+    size: int  # Dimensione del testo completo in caratteri
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def make_delta(old: str, new: str) -> list:
+    """
+    Calcola le differenze per righe tra due testi.
+
+    Returns:
+        list: Operazioni ["=", n] (mantieni), ["-", n] (elimina), ["+", righe] (inserisci)
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(['=', i2 - i1])
+        else:
+            if i2 > i1:
+                ops.append(['-', i2 - i1])
+            if j2 > j1:
+                ops.append(['+', new_lines[j1:j2]])
+    return ops
+
+
+def apply_delta(old: str, ops: list) -> str:
+    """Applica a un testo le differenze calcolate da make_delta"""
+    old_lines = old.splitlines(keepends=True)
+    result = []
+    pos = 0
+    for op, arg in ops:
+        if op == '=':
+            result.extend(old_lines[pos:pos + arg])
+            pos += arg
+        elif op == '-':
+            pos += arg
+        elif op == '+':
+            result.extend(arg)
+        else:
+            raise ValueError(f"Operazione delta non valida: {op}")
+    return ''.join(result)
+
+
+class ArtifactVersionStore:
+    """Gestisce le catene di versioni degli artefatti"""
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, versions_dir: Path, logger: logging.Logger,
+                 write: Callable[[Path, bytes], object], snapshot_interval: int = 5):
+        """
+        Inizializza l'archivio delle versioni.
+
+        Args:
+            versions_dir: Directory che contiene le catene di versioni
+            logger: Logger per la registrazione degli eventi
+            write: Funzione usata per scrivere i file (atomica, eventualmente in background)
+            snapshot_interval: Ogni quante versioni salvare una copia completa
+        """
+        self.versions_dir = versions_dir
+        self.logger = logger
+        self._write = write
+        self.snapshot_interval = max(1, snapshot_interval)
+        # Cache dei manifest già letti: nome artefatto -> lista versioni
+        self._manifests: Dict[str, List[ArtifactVersion]] = {}
+
+    def _chain_dir(self, filename: str) -> Path:
+        return self.versions_dir / filename.rsplit('.', 1)[0]
+
+    def _version_file(self, filename: str, version: ArtifactVersion) -> Path:
+        suffix = 'snap' if version.kind == 'snapshot' else 'delta'
+        return self._chain_dir(filename) / f"v{version.version:04d}.{suffix}.z"
+
+    def has_chain(self, filename: str) -> bool:
+        """Verifica se per l'artefatto esiste una catena di versioni"""
+        return bool(self.list_versions(filename))
+
+    def list_versions(self, filename: str) -> List[ArtifactVersion]:
+        """
+        Elenca le versioni di un artefatto leggendo solo il manifest.
+
+        Args:
+            filename: Nome del file dell'artefatto
+
+        Returns:
+            List[ArtifactVersion]: Versioni dalla più vecchia alla più recente
+        """
+        if filename in self._manifests:
+            return list(self._manifests[filename])
+
+        manifest_path = self._chain_dir(filename) / self.MANIFEST
+        versions = []
+        if manifest_path.exists():
+            try:
+                data = json.loads(manifest_path.read_text(encoding='utf-8'))
+                versions = [ArtifactVersion(**v) for v in data['versions']]
+            except Exception as e:
+                self.logger.error(f"Manifest versioni non valido per {filename}: {e}")
+        self._manifests[filename] = versions
+        return list(versions)
+
+    def add_version(self, filename: str, content: str, previous: Optional[str] = None) -> ArtifactVersion:
+        """
+        Aggiunge una nuova versione alla catena di un artefatto.
+
+        Args:
+            filename: Nome del file dell'artefatto
+            content: Testo completo della nuova versione
+            previous: Testo della versione precedente, se già noto al chiamante
+
+        Returns:
+            ArtifactVersion: Metadati della versione aggiunta
+        """
+        versions = self.list_versions(filename)
+        number = versions[-1].version + 1 if versions else 1
+
+        if (number - 1) % self.snapshot_interval == 0:
+            version = ArtifactVersion(number, datetime.now().isoformat(), 'snapshot', len(content))
+            payload = content
+        else:
+            if previous is None:
+                previous = self.materialize(filename, versions[-1].version)
+            version = ArtifactVersion(number, datetime.now().isoformat(), 'delta', len(content))
+            payload = json.dumps(make_delta(previous, content), ensure_ascii=False)
+
+        self._write(self._version_file(filename, version), zlib.compress(payload.encode('utf-8')))
+
+        versions.append(version)
+        manifest = {
+            'artifact': filename,
+            'snapshot_interval': self.snapshot_interval,
+            'versions': [v.to_dict() for v in versions]
+        }
+        self._write(self._chain_dir(filename) / self.MANIFEST,
+                    json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+        self._manifests[filename] = versions
+
+        self.logger.info(f"Aggiunta versione {number} ({version.kind}) all'artefatto {filename}")
+        return version
+
+    def materialize(self, filename: str, version: int) -> str:
+        """
+        Ricostruisce il testo completo di una versione.
+
+        Parte dall'ultima copia completa precedente e applica le differenze,
+        quindi al massimo snapshot_interval - 1 delta.
+
+        Args:
+            filename: Nome del file dell'artefatto
+            version: Numero della versione (1-based)
+
+        Returns:
+            str: Testo della versione
+
+        Raises:
+            IndexError: Se la versione non esiste
+        """
+        versions = {v.version: v for v in self.list_versions(filename)}
+        if version not in versions:
+            raise IndexError(f"Versione {version} non trovata. Ci sono {len(versions)} versioni.")
+
+        base = version
+        while versions[base].kind != 'snapshot':
+            base -= 1
+
+        text = self._read_payload(filename, versions[base])
+        for number in range(base + 1, version + 1):
+            text = apply_delta(text, json.loads(self._read_payload(filename, versions[number])))
+        return text
+
+    def _read_payload(self, filename: str, version: ArtifactVersion) -> str:
+        data = self._version_file(filename, version).read_bytes()
+        return zlib.decompress(data).decode('utf-8')
+
+    def delete_chain(self, filename: str):
+        """Elimina la catena di versioni di un artefatto"""
+        self._manifests.pop(filename, None)
+        chain_dir = self._chain_dir(filename)
+        if chain_dir.exists():
+            shutil.rmtree(chain_dir, ignore_errors=True)
+            self.logger.info(f"Catena di versioni eliminata per {filename}")
@@ -0,0 +1,494 @@
+# backup.py
+"""
+Esportazione e importazione dell'intero archivio NAIAD.
+
+L'esportazione produce un unico file zip con configurazione, chat,
+artefatti e (opzionalmente) cache, più un manifest.json con dimensione,
+data di modifica e sha256 di ogni file. I file vengono letti e hashati da
+thread in anticipo rispetto alla compressione, a blocchi, quindi la memoria
+usata non dipende dalla dimensione dell'archivio.
+
+L'importazione estrae i file in parallelo verificando lo sha256 di ognuno,
+li sostituisce in modo atomico e registra i file completati in un journal:
+se viene interrotta, rilanciandola riprende da dove si era fermata.
+
+Uso:
+    naiad export [archivio.zip] [--no-cache]
+    naiad import archivio.zip [--workers N] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, List, Optional
+
+from naiad.core.environment import env
+from naiad.core.storage_writer import _fsync_directory
+
+FORMAT = 'naiad-backup'
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+JOURNAL = '.import-journal'
+
+CHUNK_SIZE = 1 << 20
+# File letti in anticipo durante l'esportazione e blocchi in coda per file
+READ_AHEAD_FILES = 4
+QUEUE_CHUNKS = 8
+
+# Directory esportate, relative alla radice dei dati
+SECTIONS = ('config', 'db', 'artifacts')
+CACHE_SECTION = 'cache'
+
+# File già compressi: vengono memorizzati senza ricomprimerli
+_STORED_SUFFIXES = {'.pack', '.mp3', '.zip', '.gz', '.png', '.jpg'}
+# File temporanei o legati al processo in esecuzione
+_SKIPPED_SUFFIXES = ('.tmp', '.lock', '-wal', '-shm', '-journal')
+
+logger = logging.getLogger("backup")
+
+
+class BackupError(Exception):
+    """Errore di esportazione o importazione"""
+    pass
+
+
+@dataclass
+class ImportReport:
+    """Esito di un'importazione"""
+    imported: int = 0
+    skipped: int = 0  # Già importati in un tentativo precedente
+    failed: Dict[str, str] = field(default_factory=dict)  # percorso -> errore
+
+
+class _Progress:
+    """Stampa l'avanzamento su una sola riga, al massimo cinque volte al secondo"""
+
+    def __init__(self, label: str, total_files: int, stream=sys.stdout):
+        self.label = label
+        self.total_files = total_files
+        self.stream = stream
+        self.files = 0
+        self.bytes = 0
+        self._last = 0.0
+
+    def update(self, size: int):
+        self.files += 1
+        self.bytes += size
+        now = time.monotonic()
+        if now - self._last >= 0.2 or self.files == self.total_files:
+            self._last = now
+            self.stream.write(f"\r{self.label}: {self.files}/{self.total_files} file, "
+                              f"{self.bytes / (1 << 20):.1f} MB")
+            self.stream.flush()
+
+    def done(self):
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+def _is_skipped(name: str) -> bool:
+    return name.endswith(_SKIPPED_SUFFIXES) or (name.startswith('.') and '.tmp' in name)
+
+
+def collect_files(data_root: Path, include_cache: bool = True) -> List[PurePosixPath]:
+    """
+    Elenca i file da esportare, come percorsi relativi alla radice dei dati.
+
+    Args:
+        data_root: Radice dei dati di NAIAD
+        include_cache: Se True include la cache (audio TTS e indice di ricerca)
+
+    Returns:
+        List[PurePosixPath]: Percorsi ordinati
+    """
+    sections = SECTIONS + ((CACHE_SECTION,) if include_cache else ())
+    files = []
+    for section in sections:
+        directory = data_root / section
+        if not directory.is_dir():
+            continue
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            relative = Path(dirpath).relative_to(data_root)
+            for name in sorted(filenames):
+                if not _is_skipped(name):
+                    files.append(PurePosixPath(*relative.parts, name))
+    return files
+
+
+class _FileReader(threading.Thread):
+    """Legge un file a blocchi calcolandone lo sha256, in anticipo rispetto alla scrittura"""
+
+    def __init__(self, path: Path, cancelled: threading.Event):
+        super().__init__(daemon=True, name=f"BackupReader-{path.name}")
+        self.path = path
+        self.cancelled = cancelled
+        self.chunks: "queue.Queue[Optional[bytes]]" = queue.Queue(QUEUE_CHUNKS)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.error: Optional[BaseException] = None
+
+    def _put(self, item: Optional[bytes]) -> bool:
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _open(self, snapshot_dir: Path):
+        if self.path.suffix == '.sqlite':
+            # Copia coerente anche con l'applicazione in esecuzione (WAL)
+            snapshot = snapshot_dir / self.path.name
+            source = sqlite3.connect(str(self.path))
+            try:
+                target = sqlite3.connect(str(snapshot))
+                with target:
+                    source.backup(target)
+                target.close()
+            finally:
+                source.close()
+            return open(snapshot, 'rb')
+        return open(self.path, 'rb')
+
+    def run(self):
+        try:
+            with tempfile.TemporaryDirectory(prefix="naiad-export-") as snapshot_dir:
+                with self._open(Path(snapshot_dir)) as f:
+                    while True:
+                        chunk = f.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        self.sha256.update(chunk)
+                        self.size += len(chunk)
+                        if not self._put(chunk):
+                            return
+        except BaseException as e:
+            self.error = e
+        self._put(None)
+
+    def read_chunks(self):
+        """Restituisce i blocchi letti; solleva l'eventuale errore di lettura"""
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+        if self.error:
+            raise self.error
+
+
+def _zip_info(path: PurePosixPath, mtime: float) -> zipfile.ZipInfo:
+    date_time = time.localtime(max(mtime, 315532800))[:6]  # lo zip non gestisce date prima del 1980
+    info = zipfile.ZipInfo(str(path), date_time)
+    info.compress_type = zipfile.ZIP_STORED if path.suffix in _STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def export_archive(target: Path, data_root: Path, include_cache: bool = True,
+                   progress: Optional[Callable[[int], None]] = None) -> dict:
+    """
+    Esporta i dati in un archivio zip con manifest.
+
+    L'archivio viene scritto in un file temporaneo e rinominato solo a
+    esportazione completata.
+
+    Args:
+        target: File zip da creare
+        data_root: Radice dei dati di NAIAD
+        include_cache: Se True include la cache
+        progress: Funzione chiamata con la dimensione di ogni file esportato
+
+    Returns:
+        dict: Manifest scritto nell'archivio
+    """
+    files = collect_files(data_root, include_cache)
+    partial = target.with_name(target.name + '.partial')
+    cancelled = threading.Event()
+    readers: deque = deque()
+    entries = []
+    position = 0
+
+    def start_readers():
+        nonlocal position
+        while position < len(files) and len(readers) < READ_AHEAD_FILES:
+            reader = _FileReader(data_root.joinpath(*files[position].parts), cancelled)
+            reader.start()
+            readers.append((files[position], reader))
+            position += 1
+
+    try:
+        with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            start_readers()
+            while readers:
+                relative, reader = readers.popleft()
+                start_readers()
+                try:
+                    mtime = reader.path.stat().st_mtime
+                except FileNotFoundError:
+                    mtime = time.time()
+                chunks = reader.read_chunks()
+                try:
+                    # Il primo blocco rivela subito un file eliminato nel frattempo,
+                    # prima di aggiungere la voce allo zip
+                    first = next(chunks, b'')
+                except FileNotFoundError:
+                    logger.warning(f"File non più presente, escluso: {relative}")
+                    continue
+                with zf.open(_zip_info(relative, mtime), 'w', force_zip64=True) as member:
+                    member.write(first)
+                    for chunk in chunks:
+                        member.write(chunk)
+                entries.append({
+                    'path': str(relative),
+                    'size': reader.size,
+                    'mtime': mtime,
+                    'sha256': reader.sha256.hexdigest()
+                })
+                if progress:
+                    progress(reader.size)
+
+            manifest = {
+                'format': FORMAT,
+                'version': FORMAT_VERSION,
+                'id': uuid.uuid4().hex,
+                'created_at': datetime.now().isoformat(),
+                'sections': list(SECTIONS + ((CACHE_SECTION,) if include_cache else ())),
+                'total_bytes': sum(entry['size'] for entry in entries),
+                'files': entries
+            }
+            zf.writestr(MANIFEST, json.dumps(manifest, indent=1, ensure_ascii=False))
+        os.replace(partial, target)
+        return manifest
+    except BaseException:
+        cancelled.set()
+        partial.unlink(missing_ok=True)
+        raise
+
+
+def read_manifest(zf: zipfile.ZipFile) -> dict:
+    """
+    Legge e valida il manifest di un archivio.
+
+    Raises:
+        BackupError: Se l'archivio non è un backup NAIAD valido
+    """
+    try:
+        manifest = json.loads(zf.read(MANIFEST).decode('utf-8'))
+    except KeyError:
+        raise BackupError("L'archivio non contiene un manifest: non è un backup NAIAD")
+    except ValueError as e:
+        raise BackupError(f"Manifest non valido: {e}")
+    if manifest.get('format') != FORMAT:
+        raise BackupError("L'archivio non è un backup NAIAD")
+    if manifest.get('version', 0) > FORMAT_VERSION:
+        raise BackupError(f"Backup creato da una versione più recente di NAIAD ({manifest['version']})")
+
+    allowed = set(SECTIONS) | {CACHE_SECTION}
+    for entry in manifest['files']:
+        path = PurePosixPath(entry['path'])
+        if path.is_absolute() or '..' in path.parts or not path.parts or path.parts[0] not in allowed:
+            raise BackupError(f"Percorso non ammesso nel manifest: {entry['path']}")
+    return manifest
+
+
+def _read_journal(journal_path: Path, manifest_id: str) -> set:
+    """File già importati da un tentativo precedente dello stesso archivio"""
+    try:
+        lines = journal_path.read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        return set()
+    if not lines or json.loads(lines[0]).get('id') != manifest_id:
+        return set()
+    return set(lines[1:])
+
+
+def import_archive(source: Path, data_root: Path, workers: int = 4,
+                   progress: Optional[Callable[[int], None]] = None) -> ImportReport:
+    """
+    Importa un archivio esportato, verificando ogni file.
+
+    I file con lo stesso percorso vengono sostituiti; quelli non presenti
+    nell'archivio restano invariati.
+
+    Args:
+        source: File zip da importare
+        data_root: Radice dei dati di NAIAD
+        workers: Thread di estrazione
+        progress: Funzione chiamata con la dimensione di ogni file importato
+
+    Returns:
+        ImportReport: Esito dell'importazione
+
+    Raises:
+        BackupError: Se l'archivio non è valido
+    """
+    with zipfile.ZipFile(source) as zf:
+        manifest = read_manifest(zf)
+
+    journal_path = data_root / JOURNAL
+    done = _read_journal(journal_path, manifest['id'])
+    report = ImportReport(skipped=len(done))
+    if not done:
+        data_root.mkdir(parents=True, exist_ok=True)
+        journal_path.write_text(json.dumps({'id': manifest['id']}) + '\n', encoding='utf-8')
+
+    pending = [entry for entry in manifest['files'] if entry['path'] not in done]
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def archive() -> zipfile.ZipFile:
+        # Un handle per thread: le letture dallo zip non si serializzano
+        if not hasattr(local, 'zf'):
+            local.zf = zipfile.ZipFile(source)
+            with handles_lock:
+                handles.append(local.zf)
+        return local.zf
+
+    def extract(entry: dict) -> dict:
+        destination = data_root.joinpath(*PurePosixPath(entry['path']).parts)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{destination.name}.", suffix=".tmp",
+                                        dir=str(destination.parent))
+        try:
+            sha256 = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, 'wb') as out, archive().open(entry['path']) as member:
+                while True:
+                    chunk = member.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            if size != entry['size'] or sha256.hexdigest() != entry['sha256']:
+                raise BackupError("checksum non corrispondente")
+            os.chmod(tmp_name, 0o644)
+            if destination.suffix == '.sqlite':
+                # Il WAL del database sostituito non vale per quello importato
+                for suffix in ('-wal', '-shm'):
+                    Path(str(destination) + suffix).unlink(missing_ok=True)
+            os.replace(tmp_name, destination)
+            # Conserva le date di modifica: indici e catalogo le usano per
+            # capire se un file è cambiato
+            os.utime(destination, (entry['mtime'], entry['mtime']))
+            _fsync_directory(destination.parent)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return entry
+
+    try:
+        with open(journal_path, 'a', encoding='utf-8') as journal, \
+                ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="BackupImport") as pool:
+            futures = {pool.submit(extract, entry): entry for entry in pending}
+            for future in as_completed(futures):
+                entry = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    report.failed[entry['path']] = str(e)
+                    continue
+                journal.write(entry['path'] + '\n')
+                journal.flush()
+                report.imported += 1
+                if progress:
+                    progress(entry['size'])
+    finally:
+        for handle in handles:
+            handle.close()
+
+    if not report.failed:
+        journal_path.unlink(missing_ok=True)
+    return report
+
+
+def backend_running(data_root: Path) -> bool:
+    """Indica se il backend NAIAD è in esecuzione (file di lock presente)"""
+    return (data_root / "naiad.lock").exists()
+
+
+def cli(argv: List[str]) -> int:
+    """
+    Esegue i comandi export e import.
+
+    Args:
+        argv: Argomenti a partire dal nome del comando
+
+    Returns:
+        int: Codice di uscita
+    """
+    parser = argparse.ArgumentParser(prog='naiad', description="Backup dell'archivio NAIAD")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="Esporta chat, artefatti, configurazione e cache")
+    export_parser.add_argument('archive', nargs='?', type=Path,
+                               help="File zip da creare (predefinito: naiad-backup-<data>.zip)")
+    export_parser.add_argument('--no-cache', action='store_true',
+                               help="Esclude la cache (audio e indice di ricerca vengono rigenerati)")
+
+    import_parser = commands.add_parser('import', help="Importa un archivio esportato")
+    import_parser.add_argument('archive', type=Path, help="File zip da importare")
+    import_parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 2),
+                               help="Thread di estrazione")
+    import_parser.add_argument('--force', action='store_true',
+                               help="Importa anche se NAIAD sembra in esecuzione")
+
+    args = parser.parse_args(argv)
+    data_root = env.data_root
+
+    try:
+        if args.command == 'export':
+            target = args.archive or Path(f"naiad-backup-{datetime.now():%Y%m%d-%H%M}.zip")
+            if target.is_dir():
+                target = target / f"naiad-backup-{datetime.now():%Y%m%d-%H%M}.zip"
+            files = collect_files(data_root, not args.no_cache)
+            bar = _Progress("Esportazione", len(files))
+            started = time.monotonic()
+            manifest = export_archive(target, data_root, not args.no_cache, bar.update)
+            bar.done()
+            print(f"Esportati {len(manifest['files'])} file in {target} "
+                  f"({time.monotonic() - started:.1f} s)")
+            return 0
+
+        if backend_running(data_root) and not args.force:
+            print("NAIAD è in esecuzione: chiudilo prima di importare, oppure usa --force")
+            return 2
+        with zipfile.ZipFile(args.archive) as zf:
+            total = len(read_manifest(zf)['files'])
+        bar = _Progress("Importazione", total)
+        started = time.monotonic()
+        report = import_archive(args.archive, data_root, args.workers, bar.update)
+        bar.done()
+        print(f"Importati {report.imported} file ({report.skipped} già importati in precedenza) "
+              f"in {time.monotonic() - started:.1f} s")
+        if report.failed:
+            print(f"{len(report.failed)} file non importati:")
+            for path, error in sorted(report.failed.items()):
+                print(f"  {path}: {error}")
+            print("Rilancia il comando per riprovare: i file già importati non vengono riestratti")
+            return 1
+        return 0
+
+    except (BackupError, zipfile.BadZipFile, OSError) as e:
+        print(f"Errore: {e}")
+        return 1
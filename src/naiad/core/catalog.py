@@ -0,0 +1,321 @@
+# catalog.py
+"""
+Catalogo SQLite dei contenuti salvati.
+
+Conserva per ogni chat e artefatto i metadati che non stanno nel file:
+titolo generato dall'AI e riassunto di una frase. Contiene anche la coda
+persistente dei lavori di arricchimento, così i lavori non completati
+sopravvivono a un riavvio, e la tabella documents con i metadati dei file
+importati dal comando di migrazione.
+"""
+import sqlite3
+import threading
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA_VERSION = 2
+
+# Istruzioni da applicare per passare a ogni versione dello schema
+_MIGRATIONS = {
+    1: [
+        """
+        CREATE TABLE IF NOT EXISTS items (
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            title TEXT,
+            recap TEXT,
+            source_mtime REAL,
+            enriched_at TEXT,
+            PRIMARY KEY (kind, name)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS enrichment_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            queued_at TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            batch_id TEXT,
+            UNIQUE (kind, name)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS enrichment_jobs_batch ON enrichment_jobs (batch_id)"
+    ],
+    2: [
+        """
+        CREATE TABLE IF NOT EXISTS documents (
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            title TEXT,
+            style TEXT,
+            saved_at TEXT,
+            message_count INTEGER,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            migrated_at TEXT NOT NULL,
+            PRIMARY KEY (kind, name)
+        )
+        """
+    ]
+}
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """Metadati di un elemento salvato"""
+    kind: str
+    name: str
+    title: Optional[str]
+    recap: Optional[str]
+    source_mtime: Optional[float]
+    enriched_at: Optional[str]
+
+
+@dataclass(frozen=True)
+class DocumentRecord:
+    """Metadati di un file importato dalla migrazione"""
+    kind: str
+    name: str
+    title: Optional[str]
+    style: Optional[str]
+    saved_at: Optional[str]
+    message_count: Optional[int]
+    size: int
+    mtime_ns: int
+
+
+@dataclass(frozen=True)
+class EnrichmentJob:
+    """Lavoro di arricchimento in coda"""
+    id: int
+    kind: str
+    name: str
+    queued_at: str
+    attempts: int
+    batch_id: Optional[str]
+
+
+class Catalog:
+    """Accesso thread-safe al catalogo"""
+
+    def __init__(self, db_path: Path, logger: Optional[logging.Logger] = None):
+        """
+        Apre (o crea) il catalogo.
+
+        Args:
+            db_path: Percorso del file SQLite
+            logger: Logger per la registrazione degli eventi
+        """
+        self.db_path = db_path
+        self.logger = logger or logging.getLogger("catalog")
+        self._lock = threading.Lock()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self):
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                self.logger.warning(f"Catalogo creato da una versione più recente ({version})")
+                return
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                for statement in _MIGRATIONS[target]:
+                    self._conn.execute(statement)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        """Chiude la connessione"""
+        with self._lock:
+            self._conn.close()
+
+    # Elementi
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> CatalogEntry:
+        return CatalogEntry(row['kind'], row['name'], row['title'], row['recap'],
+                            row['source_mtime'], row['enriched_at'])
+
+    def get(self, kind: str, name: str) -> Optional[CatalogEntry]:
+        """Restituisce i metadati di un elemento, se presenti"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM items WHERE kind = ? AND name = ?", (kind, name)
+            ).fetchone()
+        return self._entry(row) if row else None
+
+    def get_many(self, kind: str, names: Iterable[str]) -> Dict[str, CatalogEntry]:
+        """Restituisce i metadati di più elementi con una sola query"""
+        names = list(names)
+        if not names:
+            return {}
+        placeholders = ','.join('?' * len(names))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM items WHERE kind = ? AND name IN ({placeholders})", [kind] + names
+            ).fetchall()
+        return {row['name']: self._entry(row) for row in rows}
+
+    def source_mtimes(self, kind: str) -> Dict[str, Optional[float]]:
+        """Data di modifica dei file al momento dell'arricchimento, per tipo"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, source_mtime FROM items WHERE kind = ?", (kind,)
+            ).fetchall()
+        return {row['name']: row['source_mtime'] for row in rows}
+
+    def remove(self, kind: str, name: str):
+        """Elimina un elemento e i suoi lavori in coda"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM items WHERE kind = ? AND name = ?", (kind, name))
+            self._conn.execute("DELETE FROM enrichment_jobs WHERE kind = ? AND name = ?", (kind, name))
+
+    # Documenti importati
+
+    def document_states(self, kind: str) -> Dict[str, tuple]:
+        """Stato (mtime_ns, dimensione) dei file già importati, per tipo"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, mtime_ns, size FROM documents WHERE kind = ?", (kind,)
+            ).fetchall()
+        return {row['name']: (row['mtime_ns'], row['size']) for row in rows}
+
+    def upsert_documents(self, records: List[DocumentRecord]):
+        """Inserisce o aggiorna più documenti in un'unica transazione"""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO documents (kind, name, title, style, saved_at, message_count,
+                                       size, mtime_ns, migrated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, name) DO UPDATE SET
+                    title = excluded.title, style = excluded.style, saved_at = excluded.saved_at,
+                    message_count = excluded.message_count, size = excluded.size,
+                    mtime_ns = excluded.mtime_ns, migrated_at = excluded.migrated_at
+                """,
+                [(r.kind, r.name, r.title, r.style, r.saved_at, r.message_count,
+                  r.size, r.mtime_ns, now) for r in records]
+            )
+
+    def remove_documents(self, kind: str, names: Iterable[str]):
+        """Elimina i documenti di file non più presenti"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM documents WHERE kind = ? AND name = ?",
+                [(kind, name) for name in names]
+            )
+
+    # Coda di arricchimento
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> EnrichmentJob:
+        return EnrichmentJob(row['id'], row['kind'], row['name'], row['queued_at'],
+                             row['attempts'], row['batch_id'])
+
+    def enqueue(self, kind: str, name: str, replace: bool = True):
+        """
+        Accoda un elemento da arricchire.
+
+        Args:
+            kind: Tipo di elemento
+            name: Nome del file
+            replace: Se True un lavoro già in coda viene ripianificato da capo;
+                altrimenti viene lasciato com'è
+        """
+        on_conflict = ("DO UPDATE SET queued_at = excluded.queued_at, attempts = 0, batch_id = NULL"
+                       if replace else "DO NOTHING")
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""
+                INSERT INTO enrichment_jobs (kind, name, queued_at) VALUES (?, ?, ?)
+                ON CONFLICT (kind, name) {on_conflict}
+                """,
+                (kind, name, datetime.now().isoformat())
+            )
+
+    def pending_count(self) -> int:
+        """Numero di lavori in attesa di essere inviati"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM enrichment_jobs WHERE batch_id IS NULL"
+            ).fetchone()[0]
+
+    def next_jobs(self, limit: int, max_attempts: int = 3) -> List[EnrichmentJob]:
+        """Restituisce i lavori più vecchi non ancora inviati"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT * FROM enrichment_jobs
+                WHERE batch_id IS NULL AND attempts < ?
+                ORDER BY queued_at LIMIT ?
+                """,
+                (max_attempts, limit)
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def mark_submitted(self, jobs: List[EnrichmentJob], batch_id: str):
+        """Associa i lavori a un batch inviato"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE enrichment_jobs SET batch_id = ? WHERE id = ? AND queued_at = ?",
+                [(batch_id, job.id, job.queued_at) for job in jobs]
+            )
+
+    def submitted_batches(self) -> List[str]:
+        """Batch inviati di cui si attendono i risultati"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT batch_id FROM enrichment_jobs WHERE batch_id IS NOT NULL"
+            ).fetchall()
+        return [row['batch_id'] for row in rows]
+
+    def jobs_in_batch(self, batch_id: str) -> List[EnrichmentJob]:
+        """Lavori ancora associati a un batch"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM enrichment_jobs WHERE batch_id = ?", (batch_id,)
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def complete_job(self, job: EnrichmentJob, title: str, recap: str, source_mtime: Optional[float]):
+        """
+        Salva il risultato di un lavoro e lo toglie dalla coda.
+
+        Se nel frattempo l'elemento è stato accodato di nuovo (è cambiato),
+        il nuovo lavoro resta in coda.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO items (kind, name, title, recap, source_mtime, enriched_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, name) DO UPDATE SET
+                    title = excluded.title, recap = excluded.recap,
+                    source_mtime = excluded.source_mtime, enriched_at = excluded.enriched_at
+                """,
+                (job.kind, job.name, title, recap, source_mtime, datetime.now().isoformat())
+            )
+            self._conn.execute(
+                "DELETE FROM enrichment_jobs WHERE id = ? AND queued_at = ?", (job.id, job.queued_at)
+            )
+
+    def fail_job(self, job: EnrichmentJob):
+        """Registra un tentativo fallito; il lavoro verrà ritentato"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE enrichment_jobs SET attempts = attempts + 1, batch_id = NULL WHERE id = ?",
+                (job.id,)
+            )
+
+    def drop_job(self, job: EnrichmentJob):
+        """Toglie un lavoro dalla coda senza risultato (es. file eliminato)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM enrichment_jobs WHERE id = ?", (job.id,))
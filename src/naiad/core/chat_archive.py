@@ -0,0 +1,321 @@
+# chat_archive.py
+"""
+Archivio a segmenti per le chat meno recenti.
+
+Le chat più vecchie del periodo di conservazione vengono spostate dalla
+directory delle chat in file segmento compressi, così la directory resta
+piccola anche con anni di conversazioni.
+
+I segmenti sono file in sola aggiunta; ogni record è:
+    MAGIC (4 byte) | lunghezza meta (uint32) | lunghezza dati (uint32) |
+    crc32 di meta+dati (uint32) | meta JSON | chat JSON compressa con zlib
+I metadati (nome, stile, titolo, data) permettono di elencare le chat senza
+decomprimerle. L'indice index.json con gli offset è solo una cache: se manca
+o non corrisponde ai segmenti viene ricostruito leggendo gli header dei record.
+L'eliminazione di una chat riscrive il suo segmento senza il record, così i
+dati eliminati non restano su disco.
+"""
+import json
+import os
+import struct
+import threading
+import zlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from naiad.core.storage_writer import atomic_write
+
+MAGIC = b'NCA1'
+_RECORD_HEADER = struct.Struct('<4sIII')
+
+# Dimensione oltre la quale si apre un nuovo segmento
+SEGMENT_MAX_BYTES = 32 * 1024 * 1024
+
+_INDEX_VERSION = 1
+
+
+class ChatArchiveError(Exception):
+    """Errore nella lettura o scrittura dell'archivio"""
+    pass
+
+
+class ArchivedChat:
+    """
+    Chat letta dall'archivio.
+
+    Espone la stessa interfaccia di lettura di ChatIndex, così il resto del
+    codice non distingue tra chat archiviate e chat nella directory.
+    """
+
+    def __init__(self, header: dict, history: list):
+        self.header = header
+        self.history = history
+
+    @property
+    def count(self) -> int:
+        """Numero di messaggi nella history"""
+        return len(self.history)
+
+    def iter_messages(self, start: int = 0, stop: Optional[int] = None, page_size: int = 50) -> Iterator[dict]:
+        """Itera i messaggi della history nell'intervallo [start, stop)"""
+        yield from self.history[max(0, start):stop]
+
+    def tail(self, count: int) -> List[dict]:
+        """Restituisce gli ultimi count messaggi della history"""
+        return self.history[max(0, len(self.history) - count):]
+
+    def last_message(self, role: str) -> Optional[str]:
+        """Restituisce il contenuto dell'ultimo messaggio con il ruolo indicato"""
+        for message in reversed(self.history):
+            if message.get('role') == role:
+                return message.get('content')
+        return None
+
+
+class ChatArchive:
+    """Archivio thread-safe delle chat compattate"""
+
+    def __init__(self, directory: Path, logger: Optional[logging.Logger] = None):
+        """
+        Apre (o crea) l'archivio.
+
+        Args:
+            directory: Directory dei segmenti
+            logger: Logger per la registrazione degli eventi
+        """
+        self.directory = directory
+        self.logger = logger or logging.getLogger("chat_archive")
+        self.index_path = directory / "index.json"
+        self._lock = threading.Lock()
+        # nome chat -> posizione e metadati del record
+        self._chats: Dict[str, dict] = {}
+        # nome segmento -> [dimensione, mtime_ns] al momento dell'indicizzazione
+        self._segments: Dict[str, List[int]] = {}
+        directory.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    # Indice
+
+    def _segment_files(self) -> List[Path]:
+        return sorted(self.directory.glob("segment-*.pack"))
+
+    def _load(self):
+        """Carica l'indice, riesaminando i segmenti che non corrispondono"""
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+            if data.get('version') != _INDEX_VERSION:
+                raise ValueError(f"versione {data.get('version')}")
+            indexed_segments = data['segments']
+            indexed_chats = data['chats']
+        except FileNotFoundError:
+            indexed_segments, indexed_chats = {}, {}
+        except (ValueError, KeyError) as e:
+            self.logger.warning(f"Indice archivio non valido, ricostruzione: {e}")
+            indexed_segments, indexed_chats = {}, {}
+
+        changed = False
+        for path in self._segment_files():
+            stat = path.stat()
+            state = [stat.st_size, stat.st_mtime_ns]
+            if indexed_segments.get(path.name) == state:
+                self._segments[path.name] = state
+                continue
+            # Segmento nuovo o modificato dopo l'ultima scrittura dell'indice
+            indexed_chats = {name: entry for name, entry in indexed_chats.items()
+                             if entry['segment'] != path.name}
+            indexed_chats.update(self._scan_segment(path))
+            stat = path.stat()
+            self._segments[path.name] = [stat.st_size, stat.st_mtime_ns]
+            changed = True
+
+        self._chats = {name: entry for name, entry in indexed_chats.items()
+                       if entry['segment'] in self._segments}
+        if changed or set(indexed_segments) != set(self._segments):
+            self._save_index()
+
+    def _scan_segment(self, path: Path) -> Dict[str, dict]:
+        """
+        Legge gli header dei record di un segmento.
+
+        Un record incompleto in coda (scrittura interrotta) viene eliminato
+        troncando il file, così le aggiunte successive restano leggibili.
+        """
+        chats = {}
+        valid_end = 0
+        with open(path, 'r+b') as f:
+            size = os.fstat(f.fileno()).st_size
+            while valid_end + _RECORD_HEADER.size <= size:
+                f.seek(valid_end)
+                magic, meta_len, data_len, crc = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+                end = valid_end + _RECORD_HEADER.size + meta_len + data_len
+                if magic != MAGIC or end > size:
+                    break
+                try:
+                    meta = json.loads(f.read(meta_len).decode('utf-8'))
+                except ValueError:
+                    break
+                chats[meta['name']] = dict(meta, segment=path.name, offset=valid_end,
+                                           meta_length=meta_len, length=data_len, crc=crc)
+                valid_end = end
+            if valid_end < size:
+                self.logger.warning(f"Record incompleto in {path.name}, troncato a {valid_end} byte")
+                f.truncate(valid_end)
+        return chats
+
+    def _save_index(self):
+        atomic_write(self.index_path, json.dumps({
+            'version': _INDEX_VERSION,
+            'segments': self._segments,
+            'chats': self._chats
+        }, ensure_ascii=False))
+
+    def _refresh_segment_state(self, name: str):
+        stat = (self.directory / name).stat()
+        self._segments[name] = [stat.st_size, stat.st_mtime_ns]
+
+    # Lettura
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._chats
+
+    def entries(self) -> Dict[str, dict]:
+        """Metadati delle chat archiviate (nome, style, title, saved_at, mtime)"""
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._chats.items()}
+
+    def mtime(self, name: str) -> float:
+        """
+        Data di modifica del file originale della chat.
+
+        Raises:
+            FileNotFoundError: Se la chat non è archiviata
+        """
+        with self._lock:
+            entry = self._chats.get(name)
+            if entry is None:
+                raise FileNotFoundError(f"Chat non archiviata: {name}")
+            return entry['mtime']
+
+    def _read_record(self, entry: dict) -> bytes:
+        with open(self.directory / entry['segment'], 'rb') as f:
+            f.seek(entry['offset'] + _RECORD_HEADER.size)
+            meta = f.read(entry['meta_length'])
+            data = f.read(entry['length'])
+        if zlib.crc32(meta + data) != entry['crc']:
+            raise ChatArchiveError(f"Record danneggiato per la chat {entry['name']}")
+        return data
+
+    def read_bytes(self, name: str) -> bytes:
+        """
+        Restituisce il file JSON originale di una chat archiviata.
+
+        Raises:
+            FileNotFoundError: Se la chat non è archiviata
+            ChatArchiveError: Se il record è danneggiato
+        """
+        with self._lock:
+            entry = self._chats.get(name)
+            if entry is None:
+                raise FileNotFoundError(f"Chat non archiviata: {name}")
+            data = self._read_record(entry)
+        return zlib.decompress(data)
+
+    def open(self, name: str) -> ArchivedChat:
+        """
+        Apre una chat archiviata per la lettura dei messaggi.
+
+        Raises:
+            FileNotFoundError: Se la chat non è archiviata
+            ChatArchiveError: Se il record è danneggiato
+        """
+        document = json.loads(self.read_bytes(name).decode('utf-8'))
+        with self._lock:
+            entry = self._chats[name]
+        header = {'style': entry['style'], 'title': entry['title'], 'saved_at': entry['saved_at']}
+        return ArchivedChat(header, document.get('history', []))
+
+    # Scrittura
+
+    def _active_segment(self, incoming: int) -> Path:
+        """Segmento a cui aggiungere un record, aprendone uno nuovo se pieno"""
+        segments = self._segment_files()
+        if segments and segments[-1].stat().st_size + incoming <= SEGMENT_MAX_BYTES:
+            return segments[-1]
+        number = int(segments[-1].stem.split('-')[1]) + 1 if segments else 1
+        return self.directory / f"segment-{number:06d}.pack"
+
+    @staticmethod
+    def _encode(meta: dict, data: bytes) -> Tuple[bytes, int, int, int]:
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        compressed = zlib.compress(data, 6)
+        crc = zlib.crc32(meta_bytes + compressed)
+        record = _RECORD_HEADER.pack(MAGIC, len(meta_bytes), len(compressed), crc) + meta_bytes + compressed
+        return record, len(meta_bytes), len(compressed), crc
+
+    def add_many(self, chats: List[Tuple[dict, bytes]]):
+        """
+        Aggiunge più chat all'archivio con un solo aggiornamento dell'indice.
+
+        I record vengono resi persistenti (fsync) prima di scrivere l'indice,
+        quindi i file originali possono essere eliminati al ritorno.
+
+        Args:
+            chats: Lista di (metadati, contenuto JSON); i metadati devono
+                contenere name, style, title, saved_at e mtime
+        """
+        if not chats:
+            return
+        with self._lock:
+            touched = set()
+            for meta, data in chats:
+                record, meta_len, data_len, crc = self._encode(meta, data)
+                path = self._active_segment(len(record))
+                with open(path, 'ab') as f:
+                    offset = f.tell()
+                    f.write(record)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._chats[meta['name']] = dict(meta, segment=path.name, offset=offset,
+                                                 meta_length=meta_len, length=data_len, crc=crc)
+                touched.add(path.name)
+            for name in touched:
+                self._refresh_segment_state(name)
+            self._save_index()
+
+    def remove(self, name: str) -> bool:
+        """
+        Elimina una chat riscrivendo il suo segmento senza il record.
+
+        Returns:
+            bool: True se la chat era archiviata
+        """
+        with self._lock:
+            entry = self._chats.pop(name, None)
+            if entry is None:
+                return False
+            segment = entry['segment']
+            survivors = sorted((e for e in self._chats.values() if e['segment'] == segment),
+                               key=lambda e: e['offset'])
+            path = self.directory / segment
+            if not survivors:
+                path.unlink(missing_ok=True)
+                del self._segments[segment]
+            else:
+                parts = []
+                offsets = []
+                offset = 0
+                with open(path, 'rb') as f:
+                    for survivor in survivors:
+                        f.seek(survivor['offset'])
+                        size = _RECORD_HEADER.size + survivor['meta_length'] + survivor['length']
+                        parts.append(f.read(size))
+                        offsets.append(offset)
+                        offset += size
+                atomic_write(path, b''.join(parts))
+                for survivor, new_offset in zip(survivors, offsets):
+                    survivor['offset'] = new_offset
+                self._refresh_segment_state(segment)
+            self._save_index()
+            return True
@@ -0,0 +1,261 @@
+# chat_index.py
+"""
+Indice sidecar per le chat salvate.
+
+Per ogni file JSON di chat viene mantenuto un file .idx con i metadati della
+chat e, per ogni messaggio della history, offset e lunghezza in byte
+all'interno del JSON. Questo consente di leggere l'ultima risposta o le
+ultime N battute senza decodificare l'intero documento.
+
+Formato del file .idx:
+    MAGIC (4 byte) | lunghezza header (uint32) | header JSON | record...
+Ogni record è (offset uint64, lunghezza uint32, ruolo uint8) su 16 byte.
+"""
+import json
+import os
+import re
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+MAGIC = b'NCX1'
+_PREFIX = struct.Struct('<4sI')
+_RECORD = struct.Struct('<QIB3x')
+
+# Byte finali del file chat usati per rilevare indici non aggiornati
+_TAIL_CHECK_SIZE = 64
+
+ROLE_CODES = {'user': 0, 'assistant': 1, 'other': 2}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class ChatIndexError(Exception):
+    """Errore nella lettura o costruzione dell'indice di una chat"""
+    pass
+
+
+def index_path_for(chat_path: Path) -> Path:
+    """Restituisce il percorso del file indice associato a una chat"""
+    return chat_path.parent / '.index' / f"{chat_path.name}.idx"
+
+
+def _tail_crc(data: bytes) -> int:
+    return zlib.crc32(data[-_TAIL_CHECK_SIZE:])
+
+
+def scan_chat_document(data: bytes) -> Tuple[dict, List[Tuple[int, int, int]]]:
+    """
+    Analizza un documento JSON di chat individuando la posizione dei messaggi.
+
+    Args:
+        data: Contenuto del file JSON codificato in UTF-8
+
+    Returns:
+        Tuple[dict, list]: Campi di primo livello (esclusa la history) e
+        lista di record (offset, lunghezza, ruolo) in byte
+
+    Raises:
+        ChatIndexError: Se il documento non è una chat valida
+    """
+    text = data.decode('utf-8')
+    decoder = json.JSONDecoder()
+    meta = {}
+    records = []
+
+    # Conversione incrementale da indice di carattere a offset in byte
+    last_char, last_byte = 0, 0
+
+    def byte_offset(pos: int) -> int:
+        nonlocal last_char, last_byte
+        last_byte += len(text[last_char:pos].encode('utf-8'))
+        last_char = pos
+        return last_byte
+
+    def skip(pos: int) -> int:
+        return _WHITESPACE.match(text, pos).end()
+
+    try:
+        pos = skip(0)
+        if text[pos] != '{':
+            raise ChatIndexError("Il documento non è un oggetto JSON")
+        pos = skip(pos + 1)
+
+        while text[pos] != '}':
+            key, pos = decoder.raw_decode(text, pos)
+            pos = skip(pos)
+            if text[pos] != ':':
+                raise ChatIndexError(f"Separatore mancante dopo la chiave {key}")
+            pos = skip(pos + 1)
+
+            if key == 'history':
+                if text[pos] != '[':
+                    raise ChatIndexError("La history non è una lista")
+                pos = skip(pos + 1)
+                while text[pos] != ']':
+                    start = pos
+                    message, pos = decoder.raw_decode(text, pos)
+                    start_byte = byte_offset(start)
+                    end_byte = byte_offset(pos)
+                    role = ROLE_CODES.get(message.get('role'), ROLE_CODES['other'])
+                    records.append((start_byte, end_byte - start_byte, role))
+                    pos = skip(pos)
+                    if text[pos] == ',':
+                        pos = skip(pos + 1)
+                pos += 1
+            else:
+                meta[key], pos = decoder.raw_decode(text, pos)
+
+            pos = skip(pos)
+            if text[pos] == ',':
+                pos = skip(pos + 1)
+    except (IndexError, ValueError, AttributeError) as e:
+        raise ChatIndexError(f"Documento chat non valido: {e}")
+
+    return meta, records
+
+
+def build_index(data: bytes, header: dict) -> bytes:
+    """
+    Costruisce il contenuto del file indice per un documento di chat.
+
+    Args:
+        data: Contenuto del file JSON della chat
+        header: Metadati della chat da memorizzare nell'indice
+
+    Returns:
+        bytes: Contenuto del file .idx
+    """
+    _, records = scan_chat_document(data)
+    header = dict(header)
+    header.update({
+        'count': len(records),
+        'size': len(data),
+        'tail_crc': _tail_crc(data)
+    })
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    parts = [_PREFIX.pack(MAGIC, len(header_bytes)), header_bytes]
+    parts.extend(_RECORD.pack(*record) for record in records)
+    return b''.join(parts)
+
+
+class ChatIndex:
+    """Accesso in lettura all'indice di una chat"""
+
+    # Record letti per blocco durante la scansione a ritroso
+    BLOCK_RECORDS = 32
+
+    def __init__(self, chat_path: Path, index_path: Path, header: dict, records_offset: int):
+        self.chat_path = chat_path
+        self.index_path = index_path
+        self.header = header
+        self.records_offset = records_offset
+
+    @classmethod
+    def open(cls, chat_path: Path) -> 'ChatIndex':
+        """
+        Apre l'indice di una chat verificando che sia allineato al file.
+
+        Args:
+            chat_path: Percorso del file JSON della chat
+
+        Returns:
+            ChatIndex: Indice valido per la chat
+
+        Raises:
+            FileNotFoundError: Se la chat o l'indice non esistono
+            ChatIndexError: Se l'indice è corrotto o non aggiornato
+        """
+        index_path = index_path_for(chat_path)
+        with open(index_path, 'rb') as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                raise ChatIndexError(f"Indice troncato: {index_path}")
+            magic, header_len = _PREFIX.unpack(prefix)
+            if magic != MAGIC:
+                raise ChatIndexError(f"Formato indice non riconosciuto: {index_path}")
+            try:
+                header = json.loads(f.read(header_len).decode('utf-8'))
+            except ValueError as e:
+                raise ChatIndexError(f"Header indice non valido: {e}")
+
+        records_offset = _PREFIX.size + header_len
+        expected_size = records_offset + header['count'] * _RECORD.size
+        if os.path.getsize(index_path) != expected_size:
+            raise ChatIndexError(f"Indice troncato: {index_path}")
+
+        # Verifica che la chat non sia cambiata dopo la scrittura dell'indice
+        size = os.path.getsize(chat_path)
+        if size != header['size']:
+            raise ChatIndexError(f"Indice non aggiornato: {index_path}")
+        with open(chat_path, 'rb') as f:
+            f.seek(max(0, size - _TAIL_CHECK_SIZE))
+            if zlib.crc32(f.read()) != header['tail_crc']:
+                raise ChatIndexError(f"Indice non aggiornato: {index_path}")
+
+        return cls(chat_path, index_path, header, records_offset)
+
+    @property
+    def count(self) -> int:
+        """Numero di messaggi nella history"""
+        return self.header['count']
+
+    def _read_records(self, start: int, stop: int) -> List[Tuple[int, int, int]]:
+        """Legge i record nell'intervallo [start, stop)"""
+        if start >= stop:
+            return []
+        with open(self.index_path, 'rb') as f:
+            f.seek(self.records_offset + start * _RECORD.size)
+            data = f.read((stop - start) * _RECORD.size)
+        return [_RECORD.unpack_from(data, i * _RECORD.size) for i in range(stop - start)]
+
+    def _read_messages(self, records: List[Tuple[int, int, int]]) -> List[dict]:
+        """Legge e decodifica i messaggi indicati dai record"""
+        messages = []
+        with open(self.chat_path, 'rb') as f:
+            for offset, length, _ in records:
+                f.seek(offset)
+                messages.append(json.loads(f.read(length).decode('utf-8')))
+        return messages
+
+    def iter_messages(self, start: int = 0, stop: Optional[int] = None, page_size: int = 50) -> Iterator[dict]:
+        """
+        Itera i messaggi della history a pagine, senza caricare tutta la chat.
+
+        Args:
+            start: Indice del primo messaggio (0-based)
+            stop: Indice di fine (escluso); None per arrivare alla fine
+            page_size: Numero di messaggi letti per pagina
+
+        Yields:
+            dict: Messaggi nell'ordine della history
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        for page_start in range(max(0, start), stop, page_size):
+            page_stop = min(page_start + page_size, stop)
+            yield from self._read_messages(self._read_records(page_start, page_stop))
+
+    def tail(self, count: int) -> List[dict]:
+        """Restituisce gli ultimi count messaggi della history"""
+        start = max(0, self.count - count)
+        return self._read_messages(self._read_records(start, self.count))
+
+    def last_message(self, role: str) -> Optional[str]:
+        """
+        Restituisce il contenuto dell'ultimo messaggio con il ruolo indicato.
+
+        La ricerca procede a ritroso a blocchi, quindi il costo non dipende
+        dalla lunghezza della chat ma solo da quanti messaggi vanno saltati.
+        """
+        code = ROLE_CODES.get(role, ROLE_CODES['other'])
+        stop = self.count
+        while stop > 0:
+            start = max(0, stop - self.BLOCK_RECORDS)
+            records = self._read_records(start, stop)
+            for record in reversed(records):
+                if record[2] == code:
+                    return self._read_messages([record])[0].get('content')
+            stop = start
+        return None
@@ -1,12 +1,19 @@
 # chat_manager.py
 from dataclasses import dataclass, asdict
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
-from typing import Optional, List, Tuple, Dict
+from typing import Optional, List, Tuple, Dict, Iterator, Union
 from pathlib import Path
+from concurrent.futures import Future
 import logging
 from naiad.ai.base import SessionStyle
 from naiad.core.environment import env
+from naiad.core.storage_writer import StorageWriter, atomic_write
+from naiad.core.chat_index import ChatIndex, ChatIndexError, build_index, index_path_for, scan_chat_document
+from naiad.core.listing_cache import ListingCache
+from naiad.core.storage_events import StorageEvents, StorageEvent, CHAT, INSERT, UPDATE, DELETE
+from naiad.core.catalog import Catalog
+from naiad.core.chat_archive import ChatArchive, ArchivedChat
 
 @dataclass
 class SuspendedChat:
@@ -64,12 +71,34 @@ class SavedChat:
         }
 
 class ChatManager:
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self, logger: Optional[logging.Logger] = None, writer: Optional[StorageWriter] = None,
+                 events: Optional[StorageEvents] = None, catalog: Optional[Catalog] = None):
         self.logger = logger or logging.getLogger("chat_manager")
         # Dizionario che mappa SessionStyle -> SuspendedChat
         self.current_style: Optional[SessionStyle] = None
         self._ensure_db_dir()
         self.chats_dir = env.db_dir 
+        # Writer in background; se assente le scritture sono sincrone
+        self.writer = writer
+        # Elenco delle chat in memoria, costruito dagli header degli indici
+        self.listing = ListingCache(
+            self.chats_dir,
+            '.json',
+            load_entry=self._load_listing_entry,
+            sort_keys={
+                'date': lambda entry: entry[2],
+                'name': lambda entry: entry[0].lower()
+            },
+            default_sort='date',
+            logger=self.logger
+        )
+        # Chat meno recenti compattate in segmenti, elencate insieme alle altre
+        self.archive = ChatArchive(self.chats_dir / '.archive', self.logger)
+        self.listing.set_external(self._archived_entries())
+        self.events = events or StorageEvents(self.logger)
+        self.events.subscribe(self._on_storage_event)
+        # Catalogo con titoli e riassunti generati; se assente si usano i nomi dei file
+        self.catalog = catalog
         
 
     def _ensure_db_dir(self):
@@ -133,14 +162,16 @@ class ChatManager:
                 
         return "Chat senza titolo"
     
-    def save_chat(self, style: SessionStyle, history: list, title: Optional[str] = None) -> Path:
+    def save_chat(self, style: SessionStyle, history: list, title: Optional[str] = None,
+                  resumed_from: Optional[Tuple[str, int]] = None) -> Path:
         """
-        Salva una chat su file.
+        Salva una chat su file attendendo che sia persistita su disco.
         
         Args:
             style: Stile della sessione
             history: Cronologia dei messaggi
             title: Titolo opzionale per la chat
+            resumed_from: (nome_file, messaggi_omessi) se la history è la coda di una chat ripresa
             
         Returns:
             Path: Percorso del file salvato
@@ -148,6 +179,34 @@ class ChatManager:
         Raises:
             IOError: Se si verifica un errore durante il salvataggio
         """
+        file_path, future = self.save_chat_async(style, history, title, resumed_from)
+        try:
+            future.result()
+        except Exception as e:
+            raise IOError(f"Impossibile salvare la chat: {str(e)}")
+        return file_path
+
+    def save_chat_async(self, style: SessionStyle, history: list, title: Optional[str] = None,
+                        resumed_from: Optional[Tuple[str, int]] = None) -> Tuple[Path, Future]:
+        """
+        Salva una chat su file senza attendere la scrittura su disco.
+        
+        Il contenuto viene serializzato subito, quindi modifiche successive
+        alla history non influenzano il salvataggio.
+        
+        Args:
+            style: Stile della sessione
+            history: Cronologia dei messaggi
+            title: Titolo opzionale per la chat
+            resumed_from: (nome_file, messaggi_omessi) se la history è la coda di
+                una chat ripresa: i messaggi omessi vengono riletti dal file originale
+            
+        Returns:
+            Tuple[Path, Future]: Percorso del file e future completato a scrittura avvenuta
+            
+        Raises:
+            IOError: Se si verifica un errore durante la preparazione del salvataggio
+        """
         try:
             if not history:  # Non salvare chat vuote
                 raise ValueError("La chat è vuota")
@@ -173,6 +232,14 @@ class ChatManager:
             #    file_path = self.chats_dir / f"{base_name}_{counter}.json"
             #    counter += 1
             
+            # Reintegra la parte iniziale di una chat ripresa solo in coda
+            if resumed_from:
+                resumed_file, skipped = resumed_from
+                try:
+                    history = list(self.iter_history(resumed_file, 0, skipped)) + list(history)
+                except FileNotFoundError:
+                    self.logger.warning(f"Chat ripresa {resumed_file} non più disponibile, salvo solo la parte recente")
+
             # Prepara i dati da salvare
             chat_data = {
                 'style': style.value,
@@ -181,16 +248,221 @@ class ChatManager:
                 'saved_at': datetime.now().isoformat()
             }
             
-            # Salva il contenuto
-            file_path.write_text(json.dumps(chat_data, indent=2, ensure_ascii=False), encoding='utf-8')
-            
-            self.logger.info(f"Chat salvata in: {file_path}")
-            return file_path
+            data = json.dumps(chat_data, indent=2, ensure_ascii=False).encode('utf-8')
+            index_data = build_index(data, self._index_header(chat_data, file_path.name))
+
+            action = UPDATE if self._exists(file_path) else INSERT
+            future = self._write(file_path, data)
+            future.add_done_callback(self._log_saved)
+            index_future = self._write(index_path_for(file_path), index_data)
+            self._publish_when_done([future, index_future], action, file_path.name)
+            return file_path, future
             
         except Exception as e:
             self.logger.error(f"Errore durante il salvataggio della chat: {e}")
             raise IOError(f"Impossibile salvare la chat: {str(e)}")
 
+    def _write(self, file_path: Path, data: Union[str, bytes]) -> Future:
+        """Scrive un file tramite il writer in background o in modo sincrono"""
+        if self.writer:
+            return self.writer.submit(file_path, data)
+
+        future: Future = Future()
+        try:
+            atomic_write(file_path, data)
+            future.set_result(file_path)
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _log_saved(self, future: Future):
+        """Registra l'esito di una scrittura"""
+        if future.exception():
+            self.logger.error(f"Errore durante il salvataggio della chat: {future.exception()}")
+        else:
+            self.logger.info(f"Chat salvata in: {future.result()}")
+
+    def _wait_pending_writes(self):
+        """Attende le scritture in coda per leggere dati aggiornati"""
+        if self.writer and not self.writer.flush(timeout=5):
+            self.logger.warning("Scritture chat ancora in coda durante la lettura")
+
+    def _exists(self, file_path: Path) -> bool:
+        """Verifica se una chat esiste su disco, in archivio o è in attesa di scrittura"""
+        return (file_path.exists() or file_path.name in self.archive
+                or bool(self.writer and self.writer.is_pending(file_path)))
+
+    def _publish_when_done(self, futures: List[Future], action: str, filename: str):
+        """Pubblica l'evento di archivio quando la chat e il suo indice sono scritti"""
+        def publish(_):
+            if all(f.done() and not f.exception() for f in futures):
+                self.events.publish(CHAT, action, filename)
+        for future in futures:
+            future.add_done_callback(publish)
+
+    def _index_header(self, data: dict, filename: str) -> dict:
+        """
+        Estrae i metadati di una chat da memorizzare nell'indice.
+        
+        Raises:
+            ValueError: Se mancano i campi obbligatori
+        """
+        if 'style' not in data or 'saved_at' not in data:
+            raise ValueError(f"Chat {filename} senza stile o data di salvataggio")
+        return {
+            'style': data['style'],
+            'title': data.get('title', filename.rsplit('.', 1)[0]),
+            'saved_at': data['saved_at']
+        }
+
+    def _open_index(self, filename: str) -> Union[ChatIndex, ArchivedChat]:
+        """
+        Apre l'indice di una chat, ricostruendolo se mancante o non aggiornato.
+        
+        Le chat archiviate vengono lette dall'archivio con la stessa interfaccia.
+        
+        Args:
+            filename: Nome del file della chat
+            
+        Returns:
+            Union[ChatIndex, ArchivedChat]: Indice della chat
+            
+        Raises:
+            FileNotFoundError: Se la chat non esiste
+        """
+        file_path = self.chats_dir / filename
+        if not file_path.exists():
+            if filename in self.archive:
+                return self.archive.open(filename)
+            raise FileNotFoundError(f"Chat non trovata: {filename}")
+
+        try:
+            return ChatIndex.open(file_path)
+        except (FileNotFoundError, ChatIndexError, KeyError) as e:
+            self.logger.info(f"Ricostruzione indice per la chat {filename}: {e}")
+
+        data = file_path.read_bytes()
+        meta, _ = scan_chat_document(data)
+        atomic_write(index_path_for(file_path), build_index(data, self._index_header(meta, filename)))
+        return ChatIndex.open(file_path)
+
+    def _load_listing_entry(self, file_path: Path) -> tuple[str, SessionStyle, datetime]:
+        """Costruisce la voce di elenco leggendo solo l'header dell'indice"""
+        header = self._open_index(file_path.name).header
+        return file_path.name, SessionStyle(header['style']), datetime.fromisoformat(header['saved_at'])
+
+    def _on_storage_event(self, event: StorageEvent):
+        """Aggiorna l'elenco in memoria dopo una modifica"""
+        if event.kind != CHAT:
+            return
+        if event.action == DELETE:
+            self.listing.discard(event.name)
+        else:
+            # Una chat archiviata salvata di nuovo torna nella directory
+            if self.archive.remove(event.name):
+                self.listing.set_external(self._archived_entries())
+            self.listing.refresh(event.name)
+
+    def _archived_entries(self) -> list[tuple[str, SessionStyle, datetime]]:
+        """Voci di elenco delle chat archiviate"""
+        return [(name, SessionStyle(entry['style']), datetime.fromisoformat(entry['saved_at']))
+                for name, entry in self.archive.entries().items()]
+
+    def _read_document(self, filename: str) -> dict:
+        """
+        Legge il documento JSON di una chat, dalla directory o dall'archivio.
+        
+        Raises:
+            FileNotFoundError: Se la chat non esiste
+        """
+        self._wait_pending_writes()
+        file_path = self.chats_dir / filename
+        try:
+            return json.loads(file_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            if filename not in self.archive:
+                raise FileNotFoundError(f"Chat non trovata: {filename}")
+        return json.loads(self.archive.read_bytes(filename).decode('utf-8'))
+
+    def get_chat_mtime(self, filename: str) -> float:
+        """
+        Data di modifica di una chat; per le chat archiviate è quella del file originale.
+        
+        Raises:
+            FileNotFoundError: Se la chat non esiste
+        """
+        try:
+            return (self.chats_dir / filename).stat().st_mtime
+        except FileNotFoundError:
+            return self.archive.mtime(filename)
+
+    def archive_old_chats(self, max_age_days: int) -> int:
+        """
+        Sposta nell'archivio le chat salvate da più di max_age_days giorni.
+        
+        Le chat restano elencate, leggibili, riprendibili e cercabili come
+        prima; cambia solo dove sono conservate.
+        
+        Args:
+            max_age_days: Età minima in giorni delle chat da archiviare
+            
+        Returns:
+            int: Numero di chat archiviate
+        """
+        self._wait_pending_writes()
+        cutoff = datetime.now() - timedelta(days=max_age_days)
+        archived = 0
+        batch = []
+
+        def flush():
+            nonlocal archived
+            self.archive.add_many([(meta, data) for meta, data, _ in batch])
+            for meta, _, stat in batch:
+                file_path = self.chats_dir / meta['name']
+                try:
+                    current = file_path.stat()
+                except FileNotFoundError:
+                    continue
+                if (current.st_mtime_ns, current.st_size) != (stat.st_mtime_ns, stat.st_size):
+                    # Salvata di nuovo nel frattempo: resta nella directory
+                    self.archive.remove(meta['name'])
+                    continue
+                file_path.unlink()
+                index_path_for(file_path).unlink(missing_ok=True)
+                archived += 1
+            batch.clear()
+
+        for name, _, saved_at in self.listing.entries():
+            file_path = self.chats_dir / name
+            if saved_at >= cutoff or not file_path.exists():
+                continue
+            if self.writer and self.writer.is_pending(file_path):
+                continue
+            try:
+                stat = file_path.stat()
+                data = file_path.read_bytes()
+                header = self._open_index(name).header
+            except Exception as e:
+                self.logger.error(f"Impossibile archiviare la chat {name}: {e}")
+                continue
+            meta = {
+                'name': name,
+                'style': header['style'],
+                'title': header['title'],
+                'saved_at': header['saved_at'],
+                'mtime': stat.st_mtime
+            }
+            batch.append((meta, data, stat))
+            if len(batch) >= 100:
+                flush()
+        if batch:
+            flush()
+
+        if archived:
+            self.listing.set_external(self._archived_entries())
+            self.logger.info(f"Archiviate {archived} chat più vecchie di {max_age_days} giorni")
+        return archived
+
     def get_chats_list(self) -> list[tuple[str, SessionStyle, datetime]]:
         """
         Ottiene la lista delle chat salvate ordinate per data.
@@ -199,24 +471,47 @@ class ChatManager:
             list[tuple[str, SessionStyle, datetime]]: Lista di tuple (nome_file, stile, data_modifica)
         """
         try:
-            result = []
-            for file in self.chats_dir.glob('*.json'):
-                try:
-                    data = json.loads(file.read_text(encoding='utf-8'))
-                    style = SessionStyle(data['style'])
-                    saved_at = datetime.fromisoformat(data['saved_at'])
-                    result.append((file.name, style, saved_at))
-                except Exception as e:
-                    self.logger.error(f"Errore lettura chat {file}: {e}")
-                    continue
-                    
-            # Ordina per data più recente
-            return sorted(result, key=lambda x: x[2], reverse=True)
+            self._wait_pending_writes()
+            return self.listing.entries()
             
         except Exception as e:
             self.logger.error(f"Errore recupero lista chat: {e}")
             return []
 
+    def query_chats(self, offset: int = 0, limit: Optional[int] = None, sort: str = 'date',
+                    descending: bool = True, text: Optional[str] = None,
+                    style: Optional[SessionStyle] = None
+                    ) -> Tuple[int, List[Tuple[int, str, SessionStyle, datetime]]]:
+        """
+        Restituisce una pagina dell'elenco delle chat.
+        
+        Args:
+            offset: Indice della prima chat da restituire
+            limit: Numero massimo di chat; None per tutte
+            sort: Ordinamento, 'date' o 'name'
+            descending: Se True ordina in modo decrescente
+            text: Filtro opzionale sul nome (senza distinzione maiuscole/minuscole)
+            style: Filtro opzionale sullo stile della sessione
+            
+        Returns:
+            Tuple[int, list]: Totale delle chat filtrate e lista di
+            (numero, nome_file, stile, data); il numero è quello usato dai comandi
+            
+        Raises:
+            ValueError: Se l'ordinamento non è valido
+        """
+        self._wait_pending_writes()
+        needle = text.lower() if text else None
+
+        def predicate(entry):
+            if needle and needle not in entry[0].lower():
+                return False
+            return style is None or entry[1] == style
+
+        total, page = self.listing.query(offset, limit, sort, descending,
+                                         predicate if needle or style else None)
+        return total, [(number, name, chat_style, date) for number, (name, chat_style, date) in page]
+
     def get_chat_content(self, filename: str) -> tuple[SessionStyle, list]:
         """
         Legge il contenuto di una chat.
@@ -230,13 +525,76 @@ class ChatManager:
         Raises:
             FileNotFoundError: Se il file non esiste
         """
-        file_path = self.chats_dir / filename
-        if not file_path.exists():
-            raise FileNotFoundError(f"Chat non trovata: {filename}")
-            
-        data = json.loads(file_path.read_text(encoding='utf-8'))
+        data = self._read_document(filename)
         return SessionStyle(data['style']), data['history']
 
+    def iter_history(self, filename: str, start: int = 0, stop: Optional[int] = None) -> Iterator[dict]:
+        """
+        Itera a pagine i messaggi di una chat senza decodificare l'intero file.
+        
+        Args:
+            filename: Nome del file della chat
+            start: Indice del primo messaggio (0-based)
+            stop: Indice di fine (escluso); None per arrivare alla fine
+            
+        Yields:
+            dict: Messaggi della history in ordine
+            
+        Raises:
+            FileNotFoundError: Se il file non esiste
+        """
+        self._wait_pending_writes()
+        yield from self._open_index(filename).iter_messages(start, stop)
+
+    def get_chat_text(self, filename: str) -> str:
+        """
+        Restituisce il testo di una chat: titolo e contenuto dei messaggi.
+
+        Usato da indicizzazione e arricchimento, che trattano la chat come
+        un unico documento.
+
+        Raises:
+            FileNotFoundError: Se il file non esiste
+        """
+        title = filename.rsplit('.', 1)[0]
+        return '\n'.join([title] + [m.get('content', '') for m in self.iter_history(filename)
+                                    if isinstance(m.get('content'), str)])
+
+    def get_history_tail(self, filename: str, count: int) -> Tuple[list, int]:
+        """
+        Legge solo gli ultimi messaggi di una chat.
+        
+        Args:
+            filename: Nome del file della chat
+            count: Numero di messaggi da leggere
+            
+        Returns:
+            Tuple[list, int]: Ultimi messaggi e numero di messaggi precedenti omessi
+            
+        Raises:
+            FileNotFoundError: Se il file non esiste
+        """
+        self._wait_pending_writes()
+        index = self._open_index(filename)
+        tail = index.tail(count)
+        return tail, index.count - len(tail)
+
+    def get_last_response(self, filename: str) -> Optional[str]:
+        """
+        Legge l'ultima risposta dell'assistente senza caricare l'intera chat.
+        
+        Args:
+            filename: Nome del file della chat
+            
+        Returns:
+            Optional[str]: Contenuto dell'ultima risposta o None se assente
+            
+        Raises:
+            FileNotFoundError: Se il file non esiste
+        """
+        self._wait_pending_writes()
+        return self._open_index(filename).last_message('assistant')
+
     def format_chats_list(self, filter_style: Optional[SessionStyle] = None) -> str:
         """
         Formatta la lista delle chat per la lettura vocale.
@@ -262,12 +620,15 @@ class ChatManager:
             SessionStyle.ARTICLE_WRITING: "scrittura articoli"
         }
         
+        enriched = self.catalog.get_many(CHAT, [name for name, _, _ in chats]) if self.catalog else {}
+
         # Crea una lista numerata per facile riferimento
         lines = ["Ecco le chat salvate, dalla più recente:"]
         for i, (name, style, date) in enumerate(chats, 1):
             style_name = style_names.get(style, str(style))
             date_str = date.strftime("%d/%m/%Y alle %H:%M")
-            name_without_ext = name.rsplit('.', 1)[0]
+            entry = enriched.get(name)
+            name_without_ext = entry.title if entry and entry.title else name.rsplit('.', 1)[0]
             lines.append(f"Numero {i}: {name_without_ext}, {style_name}, salvata il {date_str}")
             
         return " ... ".join(lines)
@@ -293,7 +654,7 @@ class ChatManager:
             raise IndexError(f"Numero non valido. Ci sono {len(chats)} chat.")
             
         filename = chats[number-1][0]
-        data = json.loads((self.chats_dir / filename).read_text(encoding='utf-8'))
+        data = self._read_document(filename)
         style = SessionStyle(data['style'])
         history = data['history']
         
@@ -303,6 +664,51 @@ class ChatManager:
             
         return filename, style, history
 
+    def get_last_response_by_number(self, number: int) -> Tuple[str, SessionStyle, Optional[str]]:
+        """
+        Recupera l'ultima risposta di una chat dal suo numero in lista.
+        
+        Args:
+            number: Numero della chat (1-based)
+            
+        Returns:
+            tuple: (filename, style, ultima_risposta)
+            
+        Raises:
+            IndexError: Se il numero non è valido
+        """
+        chats = self.get_chats_list()
+        
+        if not 1 <= number <= len(chats):
+            raise IndexError(f"Numero non valido. Ci sono {len(chats)} chat.")
+            
+        filename, style, _ = chats[number-1]
+        return filename, style, self.get_last_response(filename)
+
+    def get_chat_tail_by_number(self, number: int, count: int) -> Tuple[str, SessionStyle, list, str, int]:
+        """
+        Recupera le ultime battute di una chat dal suo numero in lista.
+        
+        Args:
+            number: Numero della chat (1-based)
+            count: Numero di messaggi da leggere
+            
+        Returns:
+            tuple: (filename, style, ultimi_messaggi, title, messaggi_omessi)
+            
+        Raises:
+            IndexError: Se il numero non è valido
+        """
+        chats = self.get_chats_list()
+        
+        if not 1 <= number <= len(chats):
+            raise IndexError(f"Numero non valido. Ci sono {len(chats)} chat.")
+            
+        filename, style, _ = chats[number-1]
+        index = self._open_index(filename)
+        tail = index.tail(count)
+        return filename, style, tail, index.header['title'], index.count - len(tail)
+
     def delete_chat(self, filename: str) -> bool:
         """
         Elimina una chat salvata.
@@ -314,11 +720,20 @@ class ChatManager:
             bool: True se la chat è stata eliminata con successo
         """
         try:
+            self._wait_pending_writes()
             file_path = self.chats_dir / filename
-            if not file_path.exists():
+            if file_path.exists():
+                file_path.unlink()
+                index_path_for(file_path).unlink(missing_ok=True)
+                # Anche un'eventuale copia archiviata rimasta da un'interruzione
+                if self.archive.remove(filename):
+                    self.listing.set_external(self._archived_entries())
+            elif self.archive.remove(filename):
+                self.listing.set_external(self._archived_entries())
+            else:
                 return False
                 
-            file_path.unlink()
+            self.events.publish(CHAT, DELETE, filename)
             self.logger.info(f"Chat eliminata: {filename}")
             return True
             
@@ -10,13 +10,17 @@ from pathlib import Path
 from typing import Union, Optional
 import logging
 
+from naiad.platform import get_platform
+
 class Environment:
     """Gestisce l'ambiente di esecuzione di NAIAD"""
     
     def __init__(self):
         self._is_frozen = getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS')
         self._app_root = Path(sys._MEIPASS) if self._is_frozen else Path(__file__).parent
-        self._data_root = Path(os.environ.get('PROGRAMDATA', 'C:/ProgramData')) / 'NAIAD'
+        # NAIAD_DATA_DIR permette di usare un archivio separato (test, misure)
+        data_dir = os.environ.get('NAIAD_DATA_DIR')
+        self._data_root = Path(data_dir) if data_dir else get_platform().data_root()
         
         # Inizializza le directory necessarie
         self._init_directories()
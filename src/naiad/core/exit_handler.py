@@ -1,5 +1,3 @@
-import win32api
-import win32con
 import signal
 import logging
 import sys
@@ -7,6 +5,13 @@ from pathlib import Path
 import threading
 import atexit
 
+try:
+    import win32api
+    import win32con
+except ImportError:
+    # Su sistemi diversi da Windows restano i segnali POSIX e atexit
+    win32api = None
+
 class ExitHandler:
     """Gestore avanzato per la chiusura pulita dell'applicazione"""
     
@@ -42,9 +47,10 @@ class ExitHandler:
             signal_names = {
                 signal.SIGINT: 'SIGINT',
                 signal.SIGTERM: 'SIGTERM',
-                signal.SIGABRT: 'SIGABRT',
-                signal.SIGBREAK: 'SIGBREAK'
+                signal.SIGABRT: 'SIGABRT'
             }
+            if hasattr(signal, 'SIGBREAK'):
+                signal_names[signal.SIGBREAK] = 'SIGBREAK'
             signal_name = signal_names.get(signum, f'Unknown({signum})')
             self.logger.info(f"Ricevuto segnale: {signal_name}")
             self.initiate_shutdown()
@@ -59,10 +65,11 @@ class ExitHandler:
             self.cleanup()
         
         # Registra handler per eventi Windows
-        try:
-            win32api.SetConsoleCtrlHandler(handle_windows_event, True)
-        except Exception as e:
-            self.logger.error(f"Errore registrazione handler Windows: {e}")
+        if win32api is not None:
+            try:
+                win32api.SetConsoleCtrlHandler(handle_windows_event, True)
+            except Exception as e:
+                self.logger.error(f"Errore registrazione handler Windows: {e}")
         
         # Registra handler per segnali POSIX
         for sig in [signal.SIGINT, signal.SIGTERM, signal.SIGABRT]:
@@ -0,0 +1,320 @@
+# ipc.py
+"""
+Canale locale tra il backend e la finestra di gestione.
+
+Il backend espone i metodi dell'Api su una porta di loopback con
+multiprocessing.connection; la finestra gira in un processo separato e li
+chiama tramite IpcClient. La connessione è autenticata con una chiave
+casuale generata a ogni avvio del backend e salvata, insieme alla porta,
+nella directory dei dati; il file della chiave è accessibile solo
+all'utente che esegue il backend (Platform.write_private).
+
+Messaggi:
+    richiesta  {'id': n, 'method': nome, 'args': [...], 'kwargs': {...}}
+    risposta   {'id': n, 'result': valore} oppure {'id': n, 'error': testo}
+    evento     {'event': nome, 'data': valore}
+
+Una connessione che invia la richiesta SUBSCRIBE non fa altre chiamate:
+da quel momento riceve solo gli eventi pubblicati dal backend.
+"""
+import json
+import os
+import queue
+import secrets
+import threading
+import logging
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional
+
+from naiad.core.storage_writer import atomic_write
+from naiad.platform import get_platform
+
+ENDPOINT_FILE = "ipc.json"
+KEY_FILE = "ipc.key"
+# Metodo riservato: trasforma la connessione in un canale di eventi
+SUBSCRIBE = "__subscribe__"
+# Eventi in attesa oltre i quali un processo in ascolto è considerato bloccato
+MAX_PENDING_EVENTS = 1000
+
+
+class IpcError(Exception):
+    """Errore di comunicazione con il backend o errore del metodo chiamato"""
+    pass
+
+
+class _Subscriber:
+    """
+    Processo in ascolto degli eventi.
+
+    I messaggi passano da una coda svuotata da un solo thread: chi pubblica
+    non attende la finestra e i messaggi non si mescolano sulla connessione.
+    """
+
+    def __init__(self, connection: Connection, on_error: Callable[['_Subscriber'], None]):
+        self.connection = connection
+        self._on_error = on_error
+        self._queue: queue.Queue = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+        self._thread = threading.Thread(target=self._send_loop, daemon=True, name="IpcSubscriber")
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, message: dict) -> bool:
+        """Accoda un messaggio; False se il processo non riceve più (coda piena)"""
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self):
+        """Chiude la connessione dopo l'invio dei messaggi già in coda"""
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            self.connection.close()
+
+    def _send_loop(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            try:
+                self.connection.send(message)
+            except (OSError, ValueError):
+                # Processo terminato: la connessione non serve più
+                self._on_error(self)
+                break
+        self.connection.close()
+
+
+class IpcServer:
+    """Server che esegue nel backend le chiamate della finestra di gestione"""
+
+    def __init__(self, target: Any, methods: Iterable[str], data_root: Path,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            target: Oggetto i cui metodi vengono esposti (l'Api)
+            methods: Nomi dei metodi che possono essere chiamati
+            data_root: Directory in cui pubblicare porta e chiave
+            logger: Logger per la registrazione degli eventi
+        """
+        self.target = target
+        self.methods = frozenset(methods)
+        self.endpoint_path = data_root / ENDPOINT_FILE
+        self.key_path = data_root / KEY_FILE
+        self.logger = logger or logging.getLogger("ipc")
+        self._listener: Optional[Listener] = None
+        self._running = False
+        self._subscribers: List[_Subscriber] = []
+        # Eventi da consegnare al primo processo che si mette in ascolto
+        self._retained: List[dict] = []
+        self._subscribers_lock = threading.Lock()
+
+    def start(self):
+        """Apre la porta e pubblica l'indirizzo per i client"""
+        authkey = secrets.token_bytes(32)
+        self._listener = Listener(('127.0.0.1', 0), authkey=authkey)
+        host, port = self._listener.address
+        try:
+            # Chiunque legga la chiave può inviare oggetti pickle al backend
+            get_platform().write_private(self.key_path, authkey)
+        except Exception:
+            self._listener.close()
+            raise
+        atomic_write(self.endpoint_path, json.dumps({'host': host, 'port': port, 'pid': os.getpid()}))
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True, name="IpcServer").start()
+        self.logger.info(f"Canale IPC in ascolto su {host}:{port}")
+
+    def stop(self):
+        """Chiude la porta e rimuove l'indirizzo pubblicato"""
+        self._running = False
+        for path in (self.endpoint_path, self.key_path):
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+        with self._subscribers_lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for subscriber in subscribers:
+            subscriber.close()
+        if self._listener:
+            try:
+                self._listener.close()
+            except OSError:
+                pass
+
+    def publish(self, event: str, data: Any = None, retain: bool = False) -> int:
+        """
+        Invia un evento a tutti i processi in ascolto.
+
+        Args:
+            event: Nome dell'evento
+            data: Dati dell'evento
+            retain: Se nessuno è in ascolto, consegna l'evento al prossimo
+                processo che si iscrive (es. finestra ancora in avvio)
+
+        Returns:
+            int: Numero di processi a cui l'evento è stato accodato
+        """
+        message = {'event': event, 'data': data}
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+            if retain and not subscribers:
+                self._retained.append(message)
+                return 0
+        delivered = 0
+        for subscriber in subscribers:
+            if subscriber.put(message):
+                delivered += 1
+            else:
+                self.logger.warning(f"Processo in ascolto bloccato: {MAX_PENDING_EVENTS} eventi in attesa")
+                self._drop(subscriber)
+                subscriber.connection.close()
+        return delivered
+
+    def _drop(self, subscriber: _Subscriber):
+        with self._subscribers_lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    @property
+    def has_subscribers(self) -> bool:
+        with self._subscribers_lock:
+            return bool(self._subscribers)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                connection = self._listener.accept()
+            except Exception as e:
+                if self._running:
+                    self.logger.warning(f"Connessione IPC rifiutata: {e}")
+                    continue
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True,
+                             name="IpcConnection").start()
+
+    def _serve(self, connection: Connection):
+        while self._running:
+            try:
+                request = connection.recv()
+            except (EOFError, OSError):
+                break
+            if request.get('method') == SUBSCRIBE:
+                # La connessione resta aperta e passa al canale degli eventi:
+                # da qui in poi scrive solo il thread del nuovo iscritto
+                subscriber = _Subscriber(connection, self._drop)
+                with self._subscribers_lock:
+                    subscriber.put({'id': request.get('id'), 'result': True})
+                    for message in self._retained:
+                        subscriber.put(message)
+                    self._retained.clear()
+                    self._subscribers.append(subscriber)
+                subscriber.start()
+                return
+            connection.send(self._dispatch(request))
+        connection.close()
+
+    def _dispatch(self, request: dict) -> dict:
+        request_id = request.get('id')
+        method = request.get('method')
+        if method not in self.methods:
+            return {'id': request_id, 'error': f"Metodo non disponibile: {method}"}
+        try:
+            result = getattr(self.target, method)(*request.get('args', ()), **request.get('kwargs', {}))
+            return {'id': request_id, 'result': result}
+        except Exception as e:
+            self.logger.error(f"Errore nella chiamata IPC {method}: {e}")
+            return {'id': request_id, 'error': str(e)}
+
+
+class IpcClient:
+    """Client del canale IPC, usato dal processo della finestra di gestione"""
+
+    def __init__(self, connection: Connection, address: tuple = None, authkey: bytes = None):
+        self._connection = connection
+        self._address = address
+        self._authkey = authkey
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    @classmethod
+    def connect(cls, data_root: Path) -> 'IpcClient':
+        """
+        Si collega al backend in esecuzione.
+
+        Raises:
+            IpcError: Se il backend non è in esecuzione o rifiuta la connessione
+        """
+        try:
+            endpoint = json.loads((data_root / ENDPOINT_FILE).read_text(encoding='utf-8'))
+            authkey = (data_root / KEY_FILE).read_bytes()
+            address = (endpoint['host'], endpoint['port'])
+            connection = Client(address, authkey=authkey)
+        except (OSError, ValueError, KeyError) as e:
+            raise IpcError(f"Backend NAIAD non raggiungibile: {e}")
+        return cls(connection, address, authkey)
+
+    def call(self, method: str, *args, **kwargs):
+        """
+        Esegue un metodo dell'Api nel backend.
+
+        Raises:
+            IpcError: Se la connessione si interrompe o il metodo fallisce
+        """
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            try:
+                self._connection.send({'id': request_id, 'method': method, 'args': args, 'kwargs': kwargs})
+                response = self._connection.recv()
+            except (EOFError, OSError) as e:
+                raise IpcError(f"Connessione con il backend interrotta: {e}")
+        if 'error' in response:
+            raise IpcError(response['error'])
+        return response.get('result')
+
+    def subscribe(self, callback: Callable[[str, Any], None],
+                  on_close: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """
+        Riceve gli eventi del backend su una connessione dedicata.
+
+        Args:
+            callback: Chiamata con (evento, dati) nel thread di ascolto
+            on_close: Chiamata quando il backend chiude il canale
+
+        Raises:
+            IpcError: Se il backend non è raggiungibile
+        """
+        try:
+            connection = Client(self._address, authkey=self._authkey)
+            connection.send({'id': 0, 'method': SUBSCRIBE})
+            connection.recv()
+        except (OSError, EOFError, TypeError) as e:
+            raise IpcError(f"Backend NAIAD non raggiungibile: {e}")
+
+        def listen():
+            with connection:
+                while True:
+                    try:
+                        message = connection.recv()
+                    except (EOFError, OSError):
+                        break
+                    try:
+                        callback(message.get('event'), message.get('data'))
+                    except Exception as e:
+                        logging.getLogger("ipc").error(f"Errore gestione evento {message.get('event')}: {e}")
+            if on_close:
+                on_close()
+
+        thread = threading.Thread(target=listen, daemon=True, name="IpcEvents")
+        thread.start()
+        return thread
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
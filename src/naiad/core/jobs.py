@@ -0,0 +1,162 @@
+# jobs.py
+"""
+Lavori in background avviati dalla finestra di gestione.
+
+I metodi lunghi dell'Api (sintesi vocale, risposte dell'AI) non bloccano
+la chiamata JavaScript: restituiscono subito l'id del lavoro, che viene
+eseguito nell'executor dell'applicazione. Stato e avanzamento arrivano
+alla pagina come eventi 'job':
+
+    {'job_id', 'name', 'state': 'running'|'progress'|'done'|'error'|'cancelled',
+     'stage', 'result', 'error'}
+
+I lavori dello stesso canale (es. 'voce') sono eseguiti uno alla volta e
+un lavoro nuovo annulla quelli precedenti ancora in corso: leggere un
+altro elemento sostituisce la lettura precedente invece di accodarsi.
+"""
+import itertools
+import logging
+import threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional
+
+# Canale dei lavori che parlano con la sintesi vocale
+SPEECH = "voce"
+
+
+class JobCancelled(Exception):
+    """Il lavoro è stato sostituito da uno più recente dello stesso canale"""
+    pass
+
+
+class Job:
+    """Lavoro in background, passato alla funzione che lo esegue"""
+
+    def __init__(self, job_id: int, name: str, channel: Optional[str], manager: 'JobManager'):
+        self.job_id = job_id
+        self.name = name
+        self.channel = channel
+        self._manager = manager
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """
+        Da chiamare prima di ogni effetto visibile (es. parlare).
+
+        Raises:
+            JobCancelled: Se il lavoro è stato annullato
+        """
+        if self.cancelled:
+            raise JobCancelled()
+
+    def progress(self, stage: str):
+        """Comunica alla pagina la fase in corso"""
+        self.check()
+        self._manager._emit(self, 'progress', stage=stage)
+
+
+class JobManager:
+    """Esegue i lavori nell'executor e ne pubblica lo stato"""
+
+    def __init__(self, executor: Executor, publish: Callable[[str, Any], Any],
+                 logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            executor: Executor dell'applicazione
+            publish: Funzione (evento, dati) che inoltra gli eventi alla finestra
+            logger: Logger per la registrazione degli eventi
+        """
+        self.executor = executor
+        self.publish = publish
+        self.logger = logger or logging.getLogger("jobs")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Ultimo lavoro di ogni canale e lock che ne serializza l'esecuzione
+        self._latest: Dict[str, Job] = {}
+        self._channel_locks: Dict[str, threading.Lock] = {}
+
+    def submit(self, name: str, func: Callable[..., Any], *args, channel: Optional[str] = None) -> dict:
+        """
+        Avvia un lavoro in background.
+
+        Args:
+            name: Nome del lavoro (il metodo dell'Api)
+            func: Funzione eseguita come func(job, *args); il risultato è
+                inviato alla pagina con l'evento 'done'
+            channel: Canale del lavoro; annulla i lavori precedenti dello stesso canale
+
+        Returns:
+            dict: Risposta per l'interfaccia JavaScript con l'id del lavoro
+        """
+        job = self._create(name, channel)
+        self.executor.submit(self._run, job, func, args)
+        return {'success': True, 'job_id': job.job_id}
+
+    def run(self, name: str, func: Callable[..., Any], *args, channel: Optional[str] = None):
+        """
+        Esegue un lavoro nel thread chiamante, con le stesse regole dei
+        lavori in background (usato dai comandi che arrivano dai trigger).
+
+        Returns:
+            Il risultato della funzione, o None se il lavoro è stato annullato
+
+        Raises:
+            Exception: L'errore sollevato dalla funzione
+        """
+        return self._run(self._create(name, channel), func, args, raise_errors=True)
+
+    def _create(self, name: str, channel: Optional[str]) -> Job:
+        with self._lock:
+            job = Job(next(self._ids), name, channel, self)
+            if channel:
+                previous = self._latest.get(channel)
+                if previous:
+                    previous.cancel()
+                self._latest[channel] = job
+                self._channel_locks.setdefault(channel, threading.Lock())
+        return job
+
+    def cancel_channel(self, channel: str):
+        """Annulla il lavoro in corso su un canale (es. stop della voce)"""
+        with self._lock:
+            job = self._latest.get(channel)
+        if job:
+            job.cancel()
+
+    def _run(self, job: Job, func: Callable[..., Any], args: tuple, raise_errors: bool = False):
+        lock = self._channel_locks.get(job.channel) if job.channel else None
+        if lock:
+            lock.acquire()
+        try:
+            job.check()
+            self._emit(job, 'running')
+            result = func(job, *args)
+            job.check()
+            self._emit(job, 'done', result=result)
+            return result
+        except JobCancelled:
+            self._emit(job, 'cancelled')
+        except Exception as e:
+            self.logger.error(f"Errore nel lavoro {job.name} ({job.job_id}): {e}")
+            self._emit(job, 'error', error=str(e))
+            if raise_errors:
+                raise
+        finally:
+            if lock:
+                lock.release()
+            with self._lock:
+                if job.channel and self._latest.get(job.channel) is job:
+                    del self._latest[job.channel]
+
+    def _emit(self, job: Job, state: str, **fields):
+        try:
+            self.publish('job', {'job_id': job.job_id, 'name': job.name, 'state': state, **fields})
+        except Exception as e:
+            self.logger.warning(f"Evento del lavoro {job.job_id} non inviato: {e}")
@@ -0,0 +1,189 @@
+# listing_cache.py
+"""
+Elenco in memoria dei file di una directory, aggiornato in modo incrementale.
+
+L'elenco viene costruito una volta sola; in seguito si rileggono solo i file
+indicati dagli eventi di archivio oppure, se la data di modifica della
+directory cambia per interventi esterni, solo i file nuovi o modificati.
+"""
+import os
+import threading
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+
+class ListingCache:
+    """Elenco ordinato e paginabile dei file di una directory"""
+
+    def __init__(self, directory: Path, suffix: str, load_entry: Callable[[Path], tuple],
+                 sort_keys: Dict[str, Callable[[tuple], Any]], default_sort: str,
+                 logger: logging.Logger):
+        """
+        Inizializza la cache.
+
+        Args:
+            directory: Directory da elencare
+            suffix: Estensione dei file da includere (es. '.txt')
+            load_entry: Funzione che costruisce la voce di un file; il primo
+                elemento della tupla deve essere il nome del file
+            sort_keys: Ordinamenti disponibili per nome
+            default_sort: Ordinamento predefinito, in ordine decrescente; su
+                questo si basa la numerazione usata dai comandi
+            logger: Logger per la registrazione degli eventi
+        """
+        self.directory = directory
+        self.suffix = suffix
+        self.load_entry = load_entry
+        self.sort_keys = sort_keys
+        self.default_sort = default_sort
+        self.logger = logger
+        self._lock = threading.RLock()
+        # nome file -> (mtime_ns del file, voce)
+        self._entries: Dict[str, Tuple[int, tuple]] = {}
+        self._dir_mtime: Optional[int] = None
+        # Voci che non corrispondono a file della directory (es. chat archiviate)
+        self._external: Dict[str, tuple] = {}
+        # Viste ordinate già calcolate: (ordinamento, decrescente) -> voci
+        self._views: Dict[Tuple[str, bool], List[tuple]] = {}
+        self._numbers: Dict[str, int] = {}
+
+    def _directory_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self, path: Path, mtime: int):
+        try:
+            self._entries[path.name] = (mtime, self.load_entry(path))
+        except Exception as e:
+            self.logger.error(f"Errore lettura {path}: {e}")
+            self._entries.pop(path.name, None)
+
+    def _sync(self):
+        """Riallinea la cache se la directory è cambiata dall'ultima lettura"""
+        dir_mtime = self._directory_mtime()
+        if dir_mtime == self._dir_mtime and dir_mtime is not None:
+            return
+
+        seen = set()
+        if dir_mtime is not None:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(self.suffix) or not entry.is_file():
+                        continue
+                    seen.add(entry.name)
+                    mtime = entry.stat().st_mtime_ns
+                    cached = self._entries.get(entry.name)
+                    if cached is None or cached[0] != mtime:
+                        self._load(Path(entry.path), mtime)
+
+        for name in set(self._entries) - seen:
+            del self._entries[name]
+
+        self._dir_mtime = dir_mtime
+        self._changed()
+
+    def _changed(self):
+        self._views.clear()
+        self._numbers.clear()
+
+    def refresh(self, name: str):
+        """Rilegge un singolo file dopo un inserimento o una modifica"""
+        with self._lock:
+            if self._dir_mtime is None:
+                return  # Cache non ancora costruita: verrà letto alla prima richiesta
+            path = self.directory / name
+            try:
+                self._load(path, path.stat().st_mtime_ns)
+            except FileNotFoundError:
+                self._entries.pop(name, None)
+            self._dir_mtime = self._directory_mtime()
+            self._changed()
+
+    def discard(self, name: str):
+        """Rimuove un file eliminato"""
+        with self._lock:
+            if self._entries.pop(name, None) is not None:
+                self._changed()
+            if self._dir_mtime is not None:
+                self._dir_mtime = self._directory_mtime()
+
+    def set_external(self, entries: List[tuple]):
+        """
+        Sostituisce le voci esterne alla directory.
+
+        Un file presente nella directory ha la precedenza su una voce esterna
+        con lo stesso nome.
+        """
+        with self._lock:
+            self._external = {entry[0]: entry for entry in entries}
+            self._changed()
+
+    def invalidate(self):
+        """Forza il riallineamento alla prossima richiesta"""
+        with self._lock:
+            self._dir_mtime = None
+
+    def entries(self, sort: Optional[str] = None, descending: bool = True) -> List[tuple]:
+        """
+        Restituisce le voci ordinate.
+
+        Args:
+            sort: Nome dell'ordinamento; None per quello predefinito
+            descending: Se True ordina in modo decrescente
+
+        Returns:
+            List[tuple]: Voci ordinate
+
+        Raises:
+            ValueError: Se l'ordinamento non esiste
+        """
+        sort = sort or self.default_sort
+        if sort not in self.sort_keys:
+            raise ValueError(f"Ordinamento non valido: {sort}")
+        with self._lock:
+            self._sync()
+            view = self._views.get((sort, descending))
+            if view is None:
+                merged = dict(self._external)
+                merged.update((name, entry) for name, (_, entry) in self._entries.items())
+                view = sorted(merged.values(), key=self.sort_keys[sort], reverse=descending)
+                self._views[(sort, descending)] = view
+            return list(view)
+
+    def number_of(self, filename: str) -> Optional[int]:
+        """Posizione (1-based) del file nell'ordinamento predefinito"""
+        with self._lock:
+            self._sync()
+            if not self._numbers:
+                self._numbers = {entry[0]: idx for idx, entry in enumerate(self.entries(), 1)}
+            return self._numbers.get(filename)
+
+    def query(self, offset: int = 0, limit: Optional[int] = None,
+              sort: Optional[str] = None, descending: bool = True,
+              predicate: Optional[Callable[[tuple], bool]] = None) -> Tuple[int, List[Tuple[int, tuple]]]:
+        """
+        Restituisce una pagina di voci.
+
+        Il numero associato a ogni voce è sempre la posizione nell'ordinamento
+        predefinito, così resta valido per i comandi che usano i numeri.
+
+        Args:
+            offset: Indice della prima voce da restituire
+            limit: Numero massimo di voci; None per tutte
+            sort: Nome dell'ordinamento; None per quello predefinito
+            descending: Se True ordina in modo decrescente
+            predicate: Filtro opzionale sulle voci
+
+        Returns:
+            Tuple[int, list]: Totale delle voci filtrate e lista di (numero, voce)
+        """
+        with self._lock:
+            view = self.entries(sort, descending)
+            if predicate:
+                view = [entry for entry in view if predicate(entry)]
+            offset = max(0, offset)
+            page = view[offset:offset + limit if limit is not None else None]
+            return len(view), [(self.number_of(entry[0]), entry) for entry in page]
@@ -3,41 +3,64 @@
 """Main application module for NAIAD"""
 import sys
 import time
+import threading
+import multiprocessing
 import logging
 import signal
-import os
-import ctypes
-import pyperclip
-import win32con
-import win32api
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Optional
 from pathlib import Path
-import yaml
-from typing import Optional, Dict, Any
-import asyncio
-from datetime import datetime
-import json
-import keyboard
-import webview
 
 # Move imports to avoid circularity
-from naiad.utils.logger import setup_logger
-from naiad.utils.tts_provider import GTTSProvider
-from naiad.utils.local_tts_provider import LocalTTSProvider
+# I provider pesanti (pygame, gtts, pyttsx3, anthropic, numpy, webview) sono
+# importati dai passi di avvio che li usano, vedi core/startup.py
+from naiad.core.startup import Startup, ImportTimer, Gated
 from naiad.core.environment import env
+from naiad.platform import get_platform
 from naiad.core.exit_handler import ExitHandler
 from naiad.config.settings import Settings
-from naiad.ai.base import ChatContext, SessionStyle
-from naiad.ai.anthropic_provider import AnthropicProvider
+from naiad.utils.logger import configure_logging, set_log_level, shutdown_logging
+from naiad.ai.base import ChatContext, ProviderOffline, SessionStyle
+from naiad.core.session import (AddExchange, ChangeMode, ClearHistory, ResumeChat, SessionActor,
+                                SessionSnapshot, SetArtifact, SetProfile, StaleSession, WorkOnArtifact)
 from naiad.core.chat_manager import ChatManager
 from naiad.core.artifact_manager import ArtifactManager
+from naiad.core.storage_writer import StorageWriter
+from naiad.core.storage_events import StorageEvents, StorageEvent, ARTIFACT, CHAT
+from naiad.core.catalog import Catalog
+from naiad.core.text_diff import changes_to_speech, split_sentences
 from naiad.core.trigger_processor import TriggerProcessor
-from naiad.ui.api import Api
+from naiad.core.ipc import IpcServer
+from naiad.core.jobs import JobManager
+from naiad.core.tracing import MetricsStore, Tracer, span
+from naiad.core.profiling import Profiler
+from naiad.core.speculation import Speculator
+from naiad.core.outbox import Outbox, PendingRequest
+from naiad.ui.api import Api, UI_METHODS, DIAGNOSTIC_METHODS
+from naiad.ui.manager_process import LOCAL_METHODS
 
 class NAIADApplication:
+    # Componenti inizializzati in parallelo: la lettura attende il passo di avvio
+    tts = Gated('tts')
+    ai = Gated('ai')
+    storage_writer = Gated('storage')
+    storage_events = Gated('storage')
+    catalog = Gated('storage')
+    chat_manager = Gated('storage')
+    artifact_manager = Gated('storage')
+    search_index = Gated('search')
+    search_indexer = Gated('search')
+    enrichment_worker = Gated('enrichment')
+
     def __init__(self):
         self.running = False
+        self.startup = None  # Inizializzato in setup
         self.logger = None
-        self.base_dir = Path("C:/ProgramData/NAIAD")
+        # Clipboard, notifica a GRID3 e lock dipendono dal sistema operativo
+        self.platform = get_platform()
+        self.base_dir = env.data_root
         # Carico la configurazione
         self.settings = Settings()
         
@@ -67,7 +90,13 @@ class NAIADApplication:
             'resume_article_artifact': self.comm_dir / "resume_article_artifact",
             'delete_artifact': self.comm_dir / "delete_artifact",    
             'read_artifact': self.comm_dir / "read_artifact",
-            'prepare_whatsapp': self.comm_dir / "prepare_whatsapp"
+            'read_changes': self.comm_dir / "read_changes",
+            'find_similar': self.comm_dir / "find_similar",
+            'prepare_whatsapp': self.comm_dir / "prepare_whatsapp",
+            # Finestra di gestione di chat e artefatti
+            'open_manager': self.comm_dir / "open_manager",
+            # Diagnostica: profilazione del backend
+            'profile': self.comm_dir / "profile"
 
         }
 
@@ -85,45 +114,29 @@ class NAIADApplication:
         self.lock_file = self.base_dir / "naiad.lock"
 
         # Inizializza TTS e Orchestrator
-        self.tts = None  # Inizializzato in setup
-        self.ai = None  # Inizializzato in setup
+        self.tts = None  # Inizializzato all'avvio
+        # Segnale di conferma e frase di attesa (assente senza audio)
+        self.feedback = None
+        self.ai = None  # Inizializzato all'avvio
+        # Richieste fatte senza rete, ripetute quando torna (inizializzata in setup)
+        self.outbox = None
         
         self.current_session = None
         
         self.API_KEY = self.settings.anthropic_api_key
         
-        # Stato applicazione
-        self.current_mode = SessionStyle.TRANSLATION
-        self.chat_context = ChatContext(
-            platform="direct",
-            participants=["Nicola", "Claude"],
-            tone="informal",
-            max_length=200
-        )
-
-        self.context = {
-            "style": self.current_mode,
-            "chat_context": self.chat_context,
-            
-            "translation_examples": [
-            {
-                "grid_content":"IO OGGI FELICE PROVARE NUOVO PROGRAMMA CERVELLO AIUTARE SCRIVERE ITALIANO BELLO",
-                "italian_translation":"Oggi sono felice perchè ho iniziato ad usare un nuovo programma di AI, che mi aiuta a scrivere in un italiano corretto"
-            },
-            {
-                "grid_content":"QUANDO TU LIBERTA' GIORNO DOMANDA",
-                "italian_translation":"Quando sei disponibile ?"
-            },
-            {
-                "grid_content":"SABATO TU VENIRE ORE DOMANDA",
-                "italian_translation":"A che ora puoi venire sabato ?"
-            }
-        ],
-            "history": [],
-            "model_config": {} # Configurazione modello per la sessione corrente
-        }
-
-        self.current_chat_title = None  # Nuovo attributo per il titolo della chat corrente
+        # Stato della sessione: modificato solo tramite comandi a self.session,
+        # letto come istantanea immutabile (self.session.snapshot)
+        self.session = SessionActor(SessionSnapshot(
+            style=SessionStyle.TRANSLATION,
+            chat_context=ChatContext(
+                platform="direct",
+                participants=["Nicola", "Claude"],
+                tone="informal",
+                max_length=200
+            )
+        ), logging.getLogger('NAIAD'))
+        self.session.start()
         
         # Registra handler per la chiusura pulita
         self.exit_handler = None # Inizializzato in setup
@@ -134,7 +147,30 @@ class NAIADApplication:
          # ArtifactManager per salvataggio artefatti
         self.artifact_manager = None
 
+        # Writer in background per il salvataggio di chat e artefatti
+        self.storage_writer = None
+
+        # Indice di ricerca semantica, aggiornato in background
+        self.search_index = None
+        self.search_indexer = None
+
+        # Catalogo con titoli e riassunti generati in background
+        self.catalog = None
+        self.enrichment_worker = None
+        # Sequenza della clipboard dopo l'ultima scrittura di NAIAD
+        self.own_clipboard_sequence = None
+        # Momento dell'ultimo comando eseguito (time.monotonic)
+        self.last_activity = time.monotonic()
+
         self.api = None
+        # Canale IPC e processo della finestra di gestione
+        self.ipc_server = None
+        self.manager_process = None
+        # Impostato all'arresto: sblocca il thread principale
+        self.stopped = threading.Event()
+        # Lavori in background avviati dalla finestra di gestione
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="naiad-job")
+        self.jobs = JobManager(self.executor, self.publish_ui_event, logging.getLogger('NAIAD'))
 
 
     def setup(self):
@@ -143,93 +179,220 @@ class NAIADApplication:
         self.base_dir.mkdir(parents=True, exist_ok=True)
         self.comm_dir.mkdir(parents=True, exist_ok=True)
         
-        # Setup logging
+        # Setup logging: i messaggi passano da una coda, il disco è gestito da un thread dedicato
         log_dir = self.base_dir / "logs"
-        log_dir.mkdir(exist_ok=True)
-        
-        # Configura il logger
+        configure_logging(
+            log_dir,
+            filename=self.settings.get('logging.file', 'naiad.log'),
+            level=self.settings.get('logging.level', 'INFO'),
+            retention_days=self.settings.get('logging.retention_days', 30),
+            json_lines=self.settings.get('logging.json', False)
+        )
         self.logger = logging.getLogger('NAIAD')
-        self.logger.setLevel(logging.INFO)
-        
-        # File handler con rotazione
-        handler = logging.FileHandler(log_dir / "naiad.log", encoding='utf-8')
-        handler.setFormatter(
-            logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+
+        # Tempi delle fasi dei comandi, consultabili con `naiad stats`
+        self.tracer = Tracer(MetricsStore(log_dir / "metrics.json", self.logger), self.logger)
+        # Profilazione su richiesta (trigger profile o `naiad profile`)
+        self.profiler = Profiler(log_dir / "profiles", self.logger)
+        # Risposte anticipate alle alternative numerate (sezione speculation)
+        self.speculator = Speculator(lambda prompt, context: self.ai.generate_response(prompt, context),
+                                     self.settings, self.logger)
+        # Coda su disco delle richieste fatte senza rete
+        self.outbox = Outbox(
+            self.base_dir / "outbox",
+            self._replay_request,
+            self._replay_failed,
+            retry_seconds=self.settings.get('outbox.retry_seconds', 10),
+            max_attempts=self.settings.get('outbox.max_attempts', 3),
+            logger=self.logger
         )
-        self.logger.addHandler(handler)
         
-        ## Inizializzo text to speech
+        # Passi di avvio eseguiti in parallelo dopo il controllo dell'istanza singola
+        self.startup = Startup(self.logger)
+        self.startup.add('tts', self._init_tts)
+        self.startup.add('ai', self._init_ai)
+        self.startup.add('storage', self._init_storage)
+        self.startup.add('search', self._init_search, after=('storage',))
+        self.startup.add('enrichment', self._init_enrichment, after=('storage', 'ai'))
+
+        # Profilo della modalità iniziale; i profili si aggiornano quando cambia config.yaml
+        self._use_profile(self.settings.profile)
+        self.settings.add_listener(self._on_settings_reloaded)
+        self.settings.start_watching()
+
+        self.exit_handler = ExitHandler("NAIAD", self.lock_file, self.logger)
+        self.api = Api(self)
+
+    def _init_tts(self):
+        """Passo di avvio: text to speech"""
+        from naiad.utils.null_tts_provider import NullTTSProvider
         tts_config = self.settings.get('tts', {})
         tts_provider = tts_config.get('provider', 'gtts')
         tts_rate = int(tts_config.get('rate', 140))
-        if tts_provider == 'gtts':
-            self.tts = GTTSProvider(self.logger)
+        if tts_provider == 'none' or (self.platform.name == 'fake' and not self.platform.audio):
+            # Nessun audio: esecuzione senza interfaccia e misure di prestazioni
+            tts = NullTTSProvider(self.logger)
+        elif tts_provider == 'gtts':
+            from naiad.utils.tts_provider import GTTSProvider
+            tts = GTTSProvider(self.logger)
         else:
-            self.tts = LocalTTSProvider(self.logger, rate = tts_rate)
-            
-
-        # Carica la configurazione iniziale del modello
-        initial_config = self.settings.model_configs.get(self.current_mode.value, {})
-        if not initial_config:
-            self.logger.warning(f"No configuration found for initial mode {self.current_mode.value}")
-            initial_config = {
-                "model": self.settings.anthropic_default_model,
-                "parameters": {
-                    "temperature": 0.7,
-                    "max_tokens": 1000
-                }
-            }
+            from naiad.utils.local_tts_provider import LocalTTSProvider
+            tts = LocalTTSProvider(self.logger, rate=tts_rate)
+        if not isinstance(tts, NullTTSProvider):
+            try:
+                from naiad.utils.audio_feedback import AudioFeedback
+                self.feedback = AudioFeedback(tts, self.logger,
+                                              tts_config.get('filler_text', "Sto pensando..."),
+                                              phrases={'offline': self.settings.get('outbox.offline_text')})
+            except Exception as e:
+                self.logger.warning(f"Riscontro sonoro non disponibile: {e}")
+        self._apply_tts_profile(tts, self.session.snapshot.profile)
+        self.tts = tts
+
+    def _init_ai(self):
+        """Passo di avvio: client Anthropic"""
+        from naiad.ai.anthropic_provider import AnthropicProvider
+        self.ai = AnthropicProvider(api_key=self.settings.anthropic_api_key,
+                                    logger=self.logger,
+                                    base_url=self.settings.get('api.anthropic.base_url'),
+                                    timeout=self.settings.get('api.anthropic.timeout', 60),
+                                    connect_timeout=self.settings.get('api.anthropic.connect_timeout', 3),
+                                    max_retries=self.settings.get('api.anthropic.max_retries', 1))
+
+    def _init_storage(self):
+        """Passo di avvio: archivio di chat e artefatti"""
+        # Variabili locali: gli attributi sono leggibili solo a passo completato
+        # Scritture atomiche su disco fuori dal thread dei trigger
+        writer = StorageWriter(self.logger)
+        writer.start()
+        # Eventi di archivio condivisi da elenchi e interfaccia
+        events = StorageEvents(self.logger)
+        catalog = Catalog(env.db_dir / "catalog.sqlite", self.logger)
+        self.storage_writer, self.storage_events, self.catalog = writer, events, catalog
+        # Chat manager per sospensione e ripresa
+        self.chat_manager = ChatManager(self.logger, writer=writer, events=events, catalog=catalog)
+        # Inizializza ArtifactManager
+        self.artifact_manager = ArtifactManager(
+            self.base_dir,
+            self.logger,
+            writer=writer,
+            snapshot_interval=int(self.settings.get('artifacts.snapshot_interval', 5)),
+            events=events,
+            catalog=catalog
+        )
+        # Iscritto dopo i gestori: la finestra rilegge elenchi già aggiornati
+        events.subscribe(self._forward_storage_event)
+        # Le chat più vecchie vengono spostate nell'archivio compresso
+        retention_days = int(self.settings.get('storage.chat_retention_days', 180))
+        if retention_days > 0:
+            threading.Thread(target=self._run_chat_retention, args=(retention_days,),
+                             daemon=True, name="ChatRetention").start()
+
+    def _init_search(self):
+        """Passo di avvio: ricerca per contenuto su chat e artefatti"""
+        from naiad.core.search_index import SearchIndex, SearchIndexer
+        search_index = SearchIndex(env.cache_dir / "search", self.logger)
+        search_indexer = SearchIndexer(
+            search_index,
+            self.artifact_manager,
+            self.chat_manager,
+            self.storage_events,
+            self.logger
+        )
+        search_indexer.start()
+        self.search_index, self.search_indexer = search_index, search_indexer
 
-        self.context["model_config"] = initial_config
+    def _init_enrichment(self):
+        """Passo di avvio: titoli e riassunti generati quando l'applicazione è inattiva"""
+        enrichment_config = self.settings.get('enrichment', {})
+        if not enrichment_config.get('enabled', True) or self.ai is None:
+            return
+        from naiad.ai.enrichment import EnrichmentWorker
+        idle_seconds = float(enrichment_config.get('idle_seconds', 60))
+        worker = EnrichmentWorker(
+            self.catalog,
+            self.artifact_manager,
+            self.chat_manager,
+            self.storage_events,
+            self.ai.client,
+            enrichment_config,
+            lambda: self.is_idle(idle_seconds),
+            self.logger
+        )
+        worker.start()
+        self.enrichment_worker = worker
 
-        self.ai  = AnthropicProvider(api_key=self.settings.anthropic_api_key, 
-                                    logger=self.logger)
-                                    #model = self.settings.anthropic_model)
+    def _run_chat_retention(self, retention_days: int):
+        """Archivia una volta al giorno le chat più vecchie del periodo di conservazione"""
+        while True:
+            try:
+                self.chat_manager.archive_old_chats(retention_days)
+            except Exception as e:
+                self.logger.error(f"Errore archiviazione chat: {e}")
+            time.sleep(24 * 3600)
 
-        self.exit_handler = ExitHandler("NAIAD", self.lock_file, self.logger)
-        # Chat manager per sospensione e ripresa
-        self.chat_manager = ChatManager(self.logger)
-         # Inizializza ArtifactManager
-        self.artifact_manager = ArtifactManager(self.base_dir, self.logger)
-        self.api = Api(self)
+    def is_idle(self, seconds: float) -> bool:
+        """Indica se non vengono eseguiti comandi da almeno `seconds` secondi"""
+        return time.monotonic() - self.last_activity >= seconds
+
+    def get_recap(self, kind: str, name: str) -> Optional[str]:
+        """Riassunto generato per un elemento salvato, se disponibile"""
+        if not self.catalog:
+            return None
+        entry = self.catalog.get(kind, name)
+        return entry.recap if entry else None
 
     def print_session_content(self):
         """Gestisce il comando STAMPA salvando l'artefatto della sessione"""
         try:
-            if not self.context["history"]:
+            session = self.session.snapshot
+            if not session.history:
                 response = "Nessun contenuto disponibile nella sessione corrente."
                 self.tts.speak(response)
                 return
                 
-            # Salva il contesto corrente
-            original_history = self.context["history"].copy()
-            
-            # Invia il comando STAMPA all'AI mantenendo il contesto originale
-            response = self.ai.generate_response("STAMPA", self.context)
-            
-            # Ripristina il contesto originale
-            self.context["history"] = original_history
+            # Invia il comando STAMPA all'AI: la cronologia della sessione non cambia
+            with self._waiting(session):
+                response = self.ai.generate_response("STAMPA", session.context())
             
             # Legge il contenuto della clipboard per il titolo
             clipboard_content = self.get_clipboard_content().strip()
             
             # Determina il titolo da usare
-            if 2 <= len(clipboard_content.split()) <= 5:
+            new_title = 2 <= len(clipboard_content.split()) <= 5
+            if new_title:
                 # Usa il contenuto della clipboard se ha lunghezza appropriata
                 title = clipboard_content
-            elif self.current_chat_title:
+            elif session.chat_title:
                 # Usa il titolo dell'artefatto precedente se disponibile
-                title = self.current_chat_title
+                title = session.chat_title
             else:
                 # Estrarrà il titolo dal contenuto
                 title = None
 
+            changes = None
             try:
-                # Salva l'artefatto
-                saved_path = self.artifact_manager.save_artifact(
-                    response.content, 
-                    filename = title if title else None)
-                success_msg = f"Ho salvato l'artefatto come {saved_path.name}"
+                # Salva l'artefatto: la scrittura prosegue in background
+                if session.artifact and not new_title:
+                    # Revisione dell'artefatto su cui si sta lavorando
+                    saved_path, written = self.artifact_manager.save_artifact_version_async(
+                        session.artifact, response.content)
+                    self._report_save_failure(
+                        written, f"Non sono riuscito a salvare la nuova versione di {saved_path.stem}")
+                    success_msg = f"Ho salvato una nuova versione dell'artefatto {saved_path.stem}"
+                    if self.settings.get('artifacts.reread', 'changes') == 'changes':
+                        changes = self._get_artifact_changes(saved_path.name)
+                else:
+                    saved_path, written = self.artifact_manager.save_artifact_async(
+                        response.content, 
+                        filename = title if title else None)
+                    self._report_save_failure(
+                        written, f"Non sono riuscito a salvare l'artefatto {saved_path.stem}")
+                    success_msg = f"Ho salvato l'artefatto come {saved_path.name}"
+                try:
+                    self.session.send(SetArtifact(saved_path.name, session.session_id))
+                except StaleSession:
+                    pass
             except IOError as e:
                 self.logger.error(f"Errore salvataggio artefatto: {e}")
                 success_msg = "Non sono riuscito a salvare l'artefatto, ma te lo mostro comunque"
@@ -239,8 +402,11 @@ class NAIADApplication:
             time.sleep(0.1)
             self.notify_grid3()
             
-            # Comunica vocalmente
-            self.tts.speak(f"{success_msg}... {response.content}")
+            # Comunica vocalmente: dopo una revisione solo le parti cambiate
+            if changes is not None:
+                self.tts.speak_segments([success_msg] + changes_to_speech(changes))
+            else:
+                self.tts.speak_segments([success_msg] + split_sentences(response.content))
             
         except Exception as e:
             self.logger.error(f"Errore durante la stampa del contenuto: {e}")
@@ -249,6 +415,37 @@ class NAIADApplication:
             self.notify_grid3()
             self.tts.speak(error_msg)
 
+    def find_similar(self):
+        """Cerca chat e artefatti simili alla frase nella clipboard"""
+        try:
+            phrase = self.get_clipboard_content().strip()
+            if not phrase:
+                self.tts.speak("Per favore, scrivi una frase da cercare.")
+                return
+            
+            results = self.search_index.search(phrase, limit=5)
+            if not results:
+                self.tts.speak("Non ho trovato niente di simile.")
+                return
+            
+            lines = ["Ecco cosa ho trovato, dal più simile:"]
+            for result in results:
+                entry = self.catalog.get(result.kind, result.name) if self.catalog else None
+                name = entry.title if entry and entry.title else result.name.rsplit('.', 1)[0]
+                if result.kind == ARTIFACT:
+                    number = self.artifact_manager.listing.number_of(result.name)
+                    lines.append(f"Artefatto numero {number}: {name}")
+                else:
+                    number = self.chat_manager.listing.number_of(result.name)
+                    lines.append(f"Chat numero {number}: {name}")
+            
+            self.tts.speak(" ... ".join(lines))
+            self.notify_grid3()
+            
+        except Exception as e:
+            self.logger.error(f"Errore durante la ricerca: {e}")
+            self.tts.speak("Si è verificato un errore durante la ricerca.")
+
     def list_artifact(self):
         """Elenca gli artefatti salvati"""
         try:
@@ -299,11 +496,46 @@ class NAIADApplication:
             error_msg = "Si è verificato un errore durante la lettura dell'artefatto."
             self.tts.speak(error_msg)       
 
+    def read_artifact_changes(self):
+        """Legge solo le modifiche dell'ultima versione di un artefatto"""
+        try:
+            # Numero dell'artefatto dalla clipboard, altrimenti quello in lavorazione
+            number_str = self.get_clipboard_content().strip()
+            
+            try:
+                if number_str.isdigit():
+                    filename, _ = self.artifact_manager.get_artifact_by_number(int(number_str))
+                elif self.session.snapshot.artifact:
+                    filename = self.session.snapshot.artifact
+                else:
+                    self.tts.speak("Per favore, specifica il numero dell'artefatto di cui leggere le modifiche.")
+                    return
+                
+                changes = self.artifact_manager.get_artifact_changes(filename)
+                self.tts.speak_segments(changes_to_speech(changes))
+                
+            except IndexError as e:
+                self.tts.speak(str(e))
+            except FileNotFoundError:
+                self.tts.speak("L'artefatto richiesto non è più disponibile.")
+                
+        except Exception as e:
+            self.logger.error(f"Errore durante la lettura delle modifiche: {e}")
+            self.tts.speak("Si è verificato un errore durante la lettura delle modifiche.")
+
+    def _get_artifact_changes(self, filename: str):
+        """Modifiche dell'ultima versione salvata, None se non disponibili"""
+        try:
+            return self.artifact_manager.get_artifact_changes(filename)
+        except Exception as e:
+            self.logger.warning(f"Impossibile calcolare le modifiche di {filename}: {e}")
+            return None
+
     def resume_creative_artifact(self):
         """Gestisce il comando di ripresa creativa"""
         try:
             number = int(self.get_clipboard_content().strip())
-            return self.api.resume_creative_artifact(number)
+            return self.api.run_now('resume_creative_artifact', number)
         except ValueError:
             self.tts.speak("Per favore, specifica il numero dell'artefatto da modificare")
         except Exception as e:
@@ -314,7 +546,7 @@ class NAIADApplication:
         """Gestisce il comando di ripresa articolo"""
         try:
             number = int(self.get_clipboard_content().strip())
-            return self.api.resume_article_artifact(number)
+            return self.api.run_now('resume_article_artifact', number)
         except ValueError:
             self.tts.speak("Per favore, specifica il numero dell'artefatto da modificare")
         except Exception as e:
@@ -325,7 +557,7 @@ class NAIADApplication:
         """Gestisce il comando di ripresa chat"""
         try:
             number = int(self.get_clipboard_content().strip())
-            return self.api.resume_chat(number)
+            return self.api.run_now('resume_chat', number)
         except ValueError:
             self.tts.speak("Per favore, specifica il numero della chat da riprendere")
         except Exception as e:
@@ -366,7 +598,8 @@ class NAIADApplication:
     def save_current_chat(self):
         """Salva la chat corrente con titolo opzionale"""
         try:
-            if not self.context["history"]:
+            session = self.session.snapshot
+            if not session.history:
                 self.tts.speak("Non c'è contenuto da salvare nella sessione corrente")
                 return
                 
@@ -377,20 +610,23 @@ class NAIADApplication:
             if 2 <= len(clipboard_content.split()) <= 5:
                 # Usa il contenuto della clipboard se ha lunghezza appropriata
                 title = clipboard_content
-            elif self.current_chat_title:
+            elif session.chat_title:
                 # Usa il titolo dell'artefatto precedente se disponibile
-                title = self.current_chat_title
+                title = session.chat_title
             else:
                 # Estrarrà il titolo dal contenuto
                 title = None
          
-            saved_path = self.chat_manager.save_chat(
-                style=self.current_mode,
-                history=self.context["history"],
-                title=title if title else None
+            # La scrittura su disco prosegue in background
+            saved_path, written = self.chat_manager.save_chat_async(
+                style=session.style,
+                history=session.history,
+                title=title if title else None,
+                resumed_from=session.resumed_chat
             )
+            self._report_save_failure(written, f"Non sono riuscito a salvare la sessione {saved_path.stem}")
             
-            style_name = self._get_style_name(self.current_mode)
+            style_name = self._get_style_name(session.style)
             success_msg = f"Ho salvato la sessione di {style_name} come {saved_path.stem}"
             self.tts.speak(success_msg)
              
@@ -398,6 +634,26 @@ class NAIADApplication:
             self.logger.error(f"Errore salvataggio chat: {e}")
             self.tts.speak("Si è verificato un errore durante il salvataggio della chat")
 
+    def _report_save_failure(self, written: Future, message: str):
+        """
+        Avvisa a voce se la scrittura in background di un salvataggio fallisce.
+
+        La conferma viene letta subito; se poi il file non arriva su disco
+        Nicola sente l'avviso invece di credere il salvataggio riuscito.
+
+        Args:
+            written: Future della scrittura restituito dallo StorageWriter
+            message: Frase letta in caso di errore
+        """
+        def done(future: Future):
+            if future.cancelled() or future.exception() is None:
+                return
+            self.logger.error(f"Salvataggio non riuscito: {future.exception()}")
+            # Fuori dal thread di scrittura, che non deve attendere la sintesi
+            self.jobs.submit('save_failed', lambda job: self.tts.speak(message))
+
+        written.add_done_callback(done)
+
     
     def list_saved_chats(self):
         """Elenca le chat salvate, opzionalmente filtrate per lo stile corrente"""
@@ -431,15 +687,8 @@ class NAIADApplication:
                 return
                 
             try:
-                # Recupera la chat
-                filename, style, history = self.chat_manager.get_chat_by_number(number)
-                
-                # Trova l'ultima risposta dell'assistente
-                last_response = None
-                for msg in reversed(history):
-                    if msg["role"] == "assistant":
-                        last_response = msg["content"]
-                        break
+                # Recupera solo l'ultima risposta dell'assistente
+                filename, style, last_response = self.chat_manager.get_last_response_by_number(number)
                 
                 if last_response:
                     # Non copia l'ultima risposta nella clipboard
@@ -448,7 +697,9 @@ class NAIADApplication:
                     
                     # Comunica vocalmente
                     style_name = self._get_style_name(style)
-                    response = f"Chat {filename.rsplit('.', 1)[0]} di tipo {style_name}. Ultima risposta: {last_response}"
+                    recap = self.get_recap(CHAT, filename)
+                    summary = f" {recap}" if recap else ""
+                    response = f"Chat {filename.rsplit('.', 1)[0]} di tipo {style_name}.{summary} Ultima risposta: {last_response}"
                     self.tts.speak(response)
                 else:
                     self.tts.speak("La chat non contiene risposte dell'assistente")
@@ -494,13 +745,11 @@ class NAIADApplication:
     def prepare_whatsapp_message(self):
         """Prepara un messaggio per WhatsApp basato sulla sessione corrente"""
         try:
-            if not self.context["history"]:
+            session = self.session.snapshot
+            if not session.history:
                 response = "Non c'è contenuto disponibile nella sessione corrente per preparare un messaggio."
                 self.tts.speak(response)
                 return
-                
-            # Salva il contesto corrente
-            original_history = self.context["history"].copy()
             
             # Invia un comando specifico all'AI
             prompt = (
@@ -509,11 +758,9 @@ class NAIADApplication:
                 "Puoi includere emoji ma non formattazioni speciali. Non suggerire estensioni o modifiche"
             )
             
-            # Genera la risposta mantenendo il contesto
-            response = self.ai.generate_response(prompt, self.context)
-            
-            # Ripristina il contesto originale
-            self.context["history"] = original_history
+            # Genera la risposta sul contesto della sessione, senza aggiungerla alla cronologia
+            with self._waiting(session):
+                response = self.ai.generate_response(prompt, session.context())
             
             # Legge vocalmente il messaggio preparato
             self.tts.speak("Ecco il messaggio pronto per WhatsApp: " + response.content)
@@ -544,25 +791,10 @@ class NAIADApplication:
     def _create_lock_file(self) -> bool:
         """Gestisce il file di lock per single instance"""
         try:
-            if self.lock_file.exists():
-                # Verifica se il processo è ancora attivo
-                pid = int(self.lock_file.read_text().strip())
-                try:
-                    # Su Windows, prova ad aprire il processo
-                    import ctypes
-                    kernel32 = ctypes.windll.kernel32
-                    handle = kernel32.OpenProcess(1, False, pid)
-                    if handle:
-                        kernel32.CloseHandle(handle)
-                        self.logger.warning("NAIAD è già in esecuzione")
-                        return False
-                except (ValueError, OSError):
-                    pass  # Il processo non esiste più
-                
-            # Crea nuovo file di lock
-            self.lock_file.write_text(str(os.getpid()))
+            if not self.platform.acquire_lock(self.lock_file):
+                self.logger.warning("NAIAD è già in esecuzione")
+                return False
             return True
-            
         except Exception as e:
             self.logger.error(f"Errore creazione lock file: {e}")
             return False
@@ -570,10 +802,7 @@ class NAIADApplication:
     def _cleanup(self):
         """Pulizia risorse"""
         try:
-            if self.lock_file.exists():
-                self.lock_file.unlink()
-            #if self.trigger_file.exists():
-            #    self.trigger_file.unlink()
+            self.platform.release_lock(self.lock_file)
         except Exception as e:
             self.logger.error(f"Errore pulizia: {e}")
 
@@ -581,84 +810,31 @@ class NAIADApplication:
         """Legge il contenuto della clipboard in modo silenzioso"""
         content = ""
         try:
-            # Apre la clipboard in modo silenzioso usando CF_CLIPBOARD
-            '''
-            win32clipboard.OpenClipboard()
-            try:
-                # Prima prova il formato Unicode
-                if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
-                    content = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
-                # Se non disponibile, prova il testo normale
-                elif win32clipboard.IsClipboardFormatAvailable(win32con.CF_TEXT):
-                    content = win32clipboard.GetClipboardData(win32con.CF_TEXT).decode('cp1252')
-            finally:
-                win32clipboard.CloseClipboard()
-            '''
-            content = pyperclip.paste()    
+            with span("clipboard"):
+                content = self.platform.get_clipboard()
         except Exception as e:
             self.logger.error(f"Errore lettura clipboard: {e}")
         
         return content.strip() if content else ""
 
-
-
     def set_clipboard_content(self, content: str):
         """Scrive sulla clipboard in modo silenzioso"""
         if not content:
             return
             
         try:
-            # Apre la clipboard in modo silenzioso
-            '''
-            if win32clipboard.OpenClipboard():
-                time.sleep(0.1)
-                try:
-                    # win32clipboard.EmptyClipboard()
-                    # Usa CF_UNICODETEXT per supportare tutti i caratteri
-                    win32clipboard.SetClipboardData(win32con.CF_UNICODETEXT, content)
-                    time.sleep(0.1)
-                finally:
-                    win32clipboard.CloseClipboard()
-            '''
-            pyperclip.copy(content)        
+            with span("clipboard"):
+                self.platform.set_clipboard(content)
+            # Numero di sequenza della clipboard con il nostro testo
+            self.own_clipboard_sequence = self.platform.clipboard_sequence()
         except Exception as e:
             self.logger.error(f"Errore scrittura clipboard: {e}")
 
     def notify_grid3(self):
-        """Notifica GRID3 simulando la pressione di F2 usando SendInput"""
+        """Notifica GRID3 simulando la pressione di F2"""
         try:
-            # Definizione delle strutture necessarie per SendInput
-            KEYEVENTF_KEYUP = 0x0002
-            INPUT_KEYBOARD = 1
-            
-            class KEYBDINPUT(ctypes.Structure):
-                _fields_ = [
-                    ("wVk", ctypes.c_ushort),
-                    ("wScan", ctypes.c_ushort),
-                    ("dwFlags", ctypes.c_ulong),
-                    ("time", ctypes.c_ulong),
-                    ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
-                ]
-
-            class INPUT_UNION(ctypes.Union):
-                _fields_ = [("ki", KEYBDINPUT)]
-
-            class INPUT(ctypes.Structure):
-                _fields_ = [
-                    ("type", ctypes.c_ulong),
-                    ("ii", INPUT_UNION)
-                ]
-
-            # Prepara l'input per F2 (VK_F2 = 0x71)
-            x = INPUT(INPUT_KEYBOARD, INPUT_UNION(ki=KEYBDINPUT(0x71, 0, 0, 0, None)))
-            x_up = INPUT(INPUT_KEYBOARD, INPUT_UNION(ki=KEYBDINPUT(0x71, 0, KEYEVENTF_KEYUP, 0, None)))
-            
-            # Invia l'input
-            inputs = (INPUT * 2)(x, x_up)
-            nInputs = len(inputs)
-            cbSize = ctypes.c_int(ctypes.sizeof(INPUT))
-            ctypes.windll.user32.SendInput(nInputs, ctypes.pointer(inputs), cbSize)
-            
+            with span("grid3"):
+                self.platform.notify_grid3()
         except Exception as e:
             self.logger.error(f"Errore invio F2: {e}")
 
@@ -666,6 +842,11 @@ class NAIADApplication:
     def process_clipboard(self):
         """Elabora il contenuto della clipboard"""
         try:
+            # La clipboard contiene ancora l'ultimo testo scritto da NAIAD
+            if self.platform.clipboard_sequence() == self.own_clipboard_sequence:
+                self.logger.info("Clipboard non modificata dall'ultima risposta - ignoro")
+                return
+
             # Leggi contenuto
             prompt = self.get_clipboard_content()
             if not prompt:
@@ -673,33 +854,48 @@ class NAIADApplication:
                 return
 
             # Controlli di sicurezza usando la history
-            if self.context["history"]:
+            session = self.session.snapshot
+            if session.history:
                 # Controlla se il prompt è uguale all'ultima risposta
-                last_message = self.context["history"][-1]
+                last_message = session.history[-1]
                 if last_message["role"] == "assistant" and prompt == last_message["content"]:
                     self.logger.info("Clipboard contiene l'ultima risposta - ignoro")
                     return
 
                 # Controlla se il prompt è uguale all'ultimo prompt
-                if len(self.context["history"]) >= 2:
-                    last_prompt = self.context["history"][-2]
+                if len(session.history) >= 2:
+                    last_prompt = session.history[-2]
                     if last_prompt["role"] == "user" and prompt == last_prompt["content"]:
                         if not prompt.isdigit():
                             self.logger.info("Prompt identico all'ultimo - ignoro")
                             return
 
 
-            self.logger.info(f"Elaboro contenuto in modalità {self.current_mode.value} History:{len(self.context['history'])}")
+            self.logger.info(f"Elaboro contenuto in modalità {session.style.value} History:{len(session.history)}")
 
             # Qui implementa la logica di elaborazione con AI
 
-            response = self.ai.generate_response(prompt, self.context)
+            # Con richieste in coda la rete è assente: la domanda si aggiunge in fondo
+            if self.outbox.pending:
+                self._queue_request(prompt, session)
+                return
+
+            # Una scelta numerica può avere la risposta già pronta
+            response = self.speculator.take(session, prompt)
+            if response is None:
+                try:
+                    with self._waiting(session):
+                        response = self.ai.generate_response(prompt, session.context())
+                except ProviderOffline as e:
+                    self.logger.warning(f"Rete non disponibile: {e}")
+                    self._queue_request(prompt, session)
+                    return
 
             # Inserisco nello storico
-            self.context["history"].extend([
-                {"role": "user", "content": prompt},
-                {"role": "assistant", "content": response.content}
-            ])
+            updated = self.record_exchange(session, prompt, response.content)
+            if updated:
+                # Mentre la risposta viene letta, anticipa quelle alle sue alternative
+                self.speculator.speculate(updated, response.content)
 
             # Leggo la risposta
             self.tts.speak(response.content)
@@ -718,23 +914,86 @@ class NAIADApplication:
             self.set_clipboard_content(error_msg)
             self.notify_grid3()
 
+    def _queue_request(self, prompt: str, session: SessionSnapshot):
+        """Mette la domanda in coda fino al ritorno della rete e avvisa Nicola"""
+        self.speculator.cancel()
+        self.outbox.put(prompt, session)
+        self.say_cached('offline', self.settings.get('outbox.offline_text'))
+
+    def say_cached(self, name: str, text: str):
+        """Legge una frase di servizio già sintetizzata, altrimenti con il TTS"""
+        if self.feedback and self.feedback.say(name):
+            return
+        self.tts.speak(text)
+
+    def _replay_request(self, request: PendingRequest):
+        """
+        Ripete una richiesta in coda e ne legge la risposta (thread della coda).
+
+        Ottenuta la risposta, la richiesta esce dalla coda: un errore di
+        lettura o di notifica viene solo registrato.
+
+        Raises:
+            ProviderOffline: Se la rete è ancora assente
+        """
+        session = self.session.snapshot
+        if request.boot == self.outbox.boot and request.session_id == session.session_id:
+            # Sessione invariata: il contesto comprende le risposte in coda già recuperate
+            context = session.context()
+        else:
+            style = SessionStyle(request.style)
+            session = None
+            context = SessionSnapshot(style, self.session.snapshot.chat_context,
+                                      self.settings.profile(style), tuple(request.history),
+                                      request.chat_title).context()
+
+        response = self.ai.generate_response(request.prompt, context)
+        self.logger.info(f"Risposta recuperata per la richiesta {request.id}")
+        # Da qui la richiesta non torna all'AI: lettura e notifica sono al meglio
+        self.outbox.delivered(request)
+        if session is not None:
+            self.record_exchange(session, request.prompt, response.content)
+
+        try:
+            # Le risposte in coda sono lette una dopo l'altra, senza interrompere la lettura in corso
+            self._wait_tts_idle()
+            self.tts.speak_segments([f"Ecco la risposta a: {request.prompt}."] + split_sentences(response.content))
+        except Exception as e:
+            self.logger.error(f"Lettura della risposta alla richiesta {request.id} fallita: {e}")
+        try:
+            self.set_clipboard_content(response.content)
+            time.sleep(0.1)
+            self.notify_grid3()
+        except Exception as e:
+            self.logger.error(f"Notifica della risposta alla richiesta {request.id} fallita: {e}")
+
+    def _replay_failed(self, request: PendingRequest, error: Exception):
+        """Avvisa che una richiesta in coda è stata abbandonata"""
+        self._wait_tts_idle()
+        self.tts.speak(f"Non sono riuscito a rispondere a: {request.prompt}")
+
+    def _wait_tts_idle(self, timeout: float = 300):
+        """Attende la fine della lettura in corso (is_playing resta vero a lettura finita)"""
+        deadline = time.monotonic() + timeout
+        while self.tts.is_busy() and time.monotonic() < deadline:
+            time.sleep(0.2)
+
     def retryTranslation(self):
         try:
-            self.logger.info(f"Riprova la risposta {self.current_mode.value}")
+            session = self.session.snapshot
+            self.logger.info(f"Riprova la risposta {session.style.value}")
 
             # Qui implementa la logica di elaborazione con AI
             prompt = "RIPROVA"
 
-            response = self.ai.generate_response(prompt, self.context)
+            with self._waiting(session):
+                response = self.ai.generate_response(prompt, session.context())
 
             # Leggo la risposta
             self.tts.speak(response.content)
 
             # Inserisco nello storico
-            self.context["history"].extend([
-                {"role": "user", "content": prompt},
-                {"role": "assistant", "content": response.content}
-            ])
+            self.record_exchange(session, prompt, response.content)
 
             # Scrivi risposta nella clipboard
             self.set_clipboard_content(response.content)
@@ -752,29 +1011,129 @@ class NAIADApplication:
 
 
 
+    def acknowledge(self):
+        """Conferma con un segnale sonoro che il comando è stato ricevuto"""
+        if self.feedback and self.settings.get('tts.earcon', True):
+            self.feedback.acknowledge()
+
+    def _waiting(self, session: SessionSnapshot):
+        """Attesa della risposta dell'AI, con la frase di attesa oltre la soglia della modalità"""
+        if not self.feedback or session.profile is None:
+            return nullcontext()
+        return self.feedback.waiting(session.profile.tts.get('filler_after'))
+
+    @property
+    def current_mode(self) -> SessionStyle:
+        """Modalità della sessione corrente"""
+        return self.session.snapshot.style
+
+    def record_exchange(self, session: SessionSnapshot, prompt: str,
+                        response: str) -> Optional[SessionSnapshot]:
+        """
+        Aggiunge domanda e risposta alla cronologia, se la sessione da cui è
+        partita la generazione è ancora quella corrente.
+
+        Args:
+            session: Istantanea usata per generare la risposta
+            prompt: Testo inviato all'AI
+            response: Risposta generata
+
+        Returns:
+            SessionSnapshot: La sessione aggiornata, o None se la risposta è stata scartata
+        """
+        try:
+            return self.session.send(AddExchange(prompt, response, session.session_id))
+        except StaleSession:
+            return None
+
+    def clean_history(self):
+        """Svuota la cronologia della sessione corrente"""
+        self.speculator.cancel()
+        self.session.send(ClearHistory())
+
+    def _use_profile(self, resolve):
+        """
+        Rende attivo il profilo compilato della modalità corrente.
+
+        Args:
+            resolve: Profilo di una modalità, chiamato dall'attore della sessione
+
+        Returns:
+            SessionSnapshot: La sessione con il nuovo profilo
+        """
+        state = self.session.send(SetProfile(resolve))
+        # L'istantanea più recente: un cambio di modalità successivo ha già il suo profilo
+        self._apply_profile_to_tts(self.session.snapshot.profile)
+        return state
+
+    def _apply_profile_to_tts(self, profile):
+        # Il TTS ancora in avvio applicherà il profilo al termine
+        if self.startup.is_done('tts'):
+            self._apply_tts_profile(self.tts, profile)
+
+    @staticmethod
+    def _apply_tts_profile(tts, profile):
+        rate = profile.tts.get('rate')
+        if tts is not None and rate and hasattr(tts, 'set_rate'):
+            tts.set_rate(int(rate))
+
+    def _on_settings_reloaded(self, settings: Settings):
+        """Applica la configurazione ricaricata alla modalità corrente"""
+        state = self._use_profile(settings.profile)
+        set_log_level(settings.get('logging.level', 'INFO'))
+        self.logger.info(f"Profilo aggiornato per la modalità {state.style.value}")
+
     def handle_mode(self, new_mode:SessionStyle):
         if self.current_mode != new_mode:
-            self.current_mode = new_mode
-            self.context["style"] = new_mode
-            self.context["history"]  = []
-            self.current_chat_title = None # Resetta il titolo della chat corrente
-
-            # Ottieni la configurazione del modello per il nuovo stile
-            model_config = self.settings.model_configs.get(new_mode.value, {})
-            if not model_config:
-                self.logger.warning(f"No configuration found for mode {new_mode.value}")
-                model_config = {
-                    "model": self.settings.anthropic_default_model,
-                    "parameters": {
-                        "temperature": 0.7,
-                        "max_tokens": 1000
-                    }
-                }
-            self.context["model_config"] = model_config
+            # Nuova chat: cronologia, titolo e artefatto vengono azzerati
+            profile = self.settings.profile(new_mode)
+            self.speculator.cancel()
+            self.session.send(ChangeMode(new_mode, profile))
+            self._apply_profile_to_tts(profile)
             self.logger.info(f"Nuova chat in modalità: {new_mode.value}")
         else:
             pass
 
+    def work_on_artifact(self, style: SessionStyle, filename: str) -> SessionSnapshot:
+        """
+        Riprende un artefatto: passa alla modalità indicata e registra
+        l'artefatto come quello su cui si sta lavorando.
+
+        Returns:
+            SessionSnapshot: La sessione risultante
+        """
+        changed = self.current_mode != style
+        profile = self.settings.profile(style)
+        self.speculator.cancel()
+        session = self.session.send(WorkOnArtifact(style, profile, filename))
+        if changed:
+            self._apply_profile_to_tts(profile)
+            self.logger.info(f"Nuova chat in modalità: {style.value}")
+        return session
+
+    def resume_session(self, style: SessionStyle, title: Optional[str], history: list,
+                       resumed_chat=None) -> SessionSnapshot:
+        """
+        Sostituisce la sessione con una chat salvata.
+
+        Args:
+            style: Modalità della chat
+            title: Titolo della chat
+            history: Messaggi da inviare all'AI
+            resumed_chat: (nome_file, messaggi_omessi) se history è solo la coda della chat
+
+        Returns:
+            SessionSnapshot: La sessione risultante
+        """
+        changed = self.current_mode != style
+        profile = self.settings.profile(style)
+        self.speculator.cancel()
+        session = self.session.send(ResumeChat(style, profile, title, tuple(history), resumed_chat))
+        if changed:
+            self._apply_profile_to_tts(profile)
+            self.logger.info(f"Nuova chat in modalità: {style.value}")
+        return session
+
     def cleanup_trigger_files(self):
         """Rimuove tutti i file di trigger"""
         try:
@@ -788,6 +1147,7 @@ class NAIADApplication:
 
     def run(self):
         """Loop principale dell'applicazione"""
+        trigger_processor = None
         try:
             # Inizializzazione
             self.setup()
@@ -796,70 +1156,103 @@ class NAIADApplication:
             if not self._create_lock_file():
                 sys.exit(1)
 
+            # I componenti si inizializzano in background
+            self.startup.start()
             self.running = True
+            # Dopo il lock: le richieste rimaste in coda sono di questa installazione
+            self.outbox.start()
 
             # Gestione segnali
             signal.signal(signal.SIGINT, lambda s, f: self.stop())
             signal.signal(signal.SIGTERM, lambda s, f: self.stop())
 
+            # Canale per la finestra di gestione, avviata su richiesta in un altro processo
+            self.ipc_server = IpcServer(self.api, [name for name in UI_METHODS if name not in LOCAL_METHODS]
+                                        + list(DIAGNOSTIC_METHODS),
+                                        env.data_root, self.logger)
+            self.ipc_server.start()
+
             # Avvia il thread di processamento trigger
             trigger_processor = TriggerProcessor(self)
             trigger_processor.start()
             self.logger.info("TriggerProcessor avviato")
-            
-            # Crea la finestra principale
-            try:
-                # Usa il file HTML unificato dall'assets_dir
-                html_path = str(env.assets_dir / "unified-list.html")
-                
-                # Crea la finestra principale
-                window = webview.create_window(
-                    'NAIAD Manager',
-                    html_path,
-                    width=800,
-                    height=800,
-                    resizable=True,
-                    text_select=False
-                )
-
-                # Espone tutte le API necessarie
-                window.expose(self.api.list_artifacts)
-                window.expose(self.api.read_artifact)
-                window.expose(self.api.resume_creative_artifact)
-                window.expose(self.api.resume_article_artifact)
-                window.expose(self.api.delete_artifact)
-                window.expose(self.api.read_artifacts_page)
-                window.expose(self.api.list_chats)
-                window.expose(self.api.read_chat)
-                window.expose(self.api.delete_chat)
-                window.expose(self.api.resume_chat)
-                window.expose(self.api.read_chats_page)
-                window.expose(self.api.tts_speak)
-                window.expose(self.api.tts_stop)
-                window.expose(self.api.tts_restart)
-                window.expose(self.api.tts_resume)
-                window.expose(self.api.tts_pause)
-                window.expose(self.api.close_window)
-                window.expose(self.api.get_asset_path)
-
-                self.logger.info("NAIAD avviato con interfaccia unificata")
-                
-                # Avvia il loop principale di webview
-                webview.start(debug=False)
-                
-            except Exception as e:
-                self.logger.error(f"Errore durante la creazione della finestra: {e}")
-                raise
-                
+
+            # Finestra di gestione caricata in anticipo, nascosta
+            if self.settings.get('ui.prelaunch_manager', True):
+                self.open_manager(visible=False)
+            self.logger.info("NAIAD avviato, finestra di gestione disponibile su richiesta")
+
+            # Il thread principale resta libero per i segnali fino all'arresto
+            while not self.stopped.wait(0.5):
+                pass
+
         except Exception as e:
             self.logger.error(f"Errore fatale: {e}", exc_info=True)
         finally:
             # Ferma il thread di processamento
             self.logger.info("Arresto NAIAD...")
-            trigger_processor.stop()
-            trigger_processor.join(timeout=5)
+            if trigger_processor:
+                trigger_processor.stop()
+                trigger_processor.join(timeout=5)
             self.stop()
 
+    def publish_ui_event(self, event: str, data: Any = None):
+        """Invia un evento alla finestra di gestione, se in esecuzione"""
+        if self.ipc_server:
+            self.ipc_server.publish(event, data)
+
+    def _forward_storage_event(self, event: StorageEvent):
+        """Inoltra alla finestra di gestione le modifiche all'archivio"""
+        self.publish_ui_event('storage', {'kind': event.kind, 'action': event.action, 'name': event.name})
+
+    def _manager_command(self) -> list:
+        """Riga di comando per avviare il processo della finestra di gestione"""
+        if env.is_frozen:
+            return [sys.executable, 'ui']
+        return [sys.executable, '-m', 'naiad.core.main', 'ui']
+
+    def open_manager(self, visible: bool = True):
+        """
+        Mostra la finestra di gestione, avviandone il processo se necessario.
+
+        Args:
+            visible: False per avviare il processo con la finestra nascosta
+        """
+        try:
+            if self.manager_process and self.manager_process.poll() is None:
+                if visible:
+                    # Finestra già caricata: riceve i dati aggiornati e viene solo mostrata
+                    self.ipc_server.publish('show', self.api.manager_snapshot(), retain=True)
+                return
+            command = self._manager_command() + ([] if visible else ['--hidden'])
+            self.manager_process = subprocess.Popen(command)
+            self.logger.info(f"Processo finestra di gestione avviato (pid {self.manager_process.pid})")
+        except Exception as e:
+            self.logger.error(f"Errore apertura finestra di gestione: {e}")
+            if visible:
+                self.tts.speak("Non sono riuscito ad aprire la finestra di gestione.")
+
+    def start_profile(self, seconds: Optional[float] = None, announce: bool = False) -> Optional[Path]:
+        """
+        Avvia la profilazione del backend in background.
+
+        Args:
+            seconds: Durata della cattura (predefinita: profiling.seconds)
+            announce: Se confermare l'avvio a voce (comando da GRID3)
+
+        Returns:
+            Path: File del rapporto, o None se una cattura è già in corso
+        """
+        seconds = seconds or self.settings.get('profiling.seconds', 30)
+        interval = self.settings.get('profiling.interval_ms', 10) / 1000
+        report = self.profiler.start(seconds, interval)
+        if report is None:
+            self.logger.warning("Profilazione già in corso")
+        if announce:
+            self.tts.speak("Registrazione diagnostica avviata." if report
+                           else "Una registrazione diagnostica è già in corso.")
+        return report
+
     def stop(self):
         """Ferma l'applicazione"""
         if not self.running:
@@ -867,14 +1260,70 @@ class NAIADApplication:
     
         self.logger.info("Arresto NAIAD...")
         self.running = False
+        self.stopped.set()
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # Una cattura in corso scrive il rapporto con i campioni raccolti
+        self.profiler.stop()
+        self.speculator.shutdown()
+        # Le richieste non ancora consegnate restano su disco per il prossimo avvio
+        self.outbox.stop()
+
+        # La chiusura del canale IPC fa terminare anche il processo della finestra
+        if self.ipc_server:
+            self.ipc_server.stop()
+        if self.manager_process and self.manager_process.poll() is None:
+            try:
+                self.manager_process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                self.manager_process.terminate()
+
+        # Lascia terminare i passi di avvio ancora in corso, senza bloccare l'uscita
+        self.startup.wait_all(timeout=10)
+        component = lambda name: getattr(NAIADApplication, name).peek(self)
     
         # Chiudi esplicitamente il provider TTS
-        if self.tts:
-            self.tts.shutdown()
+        if component('tts'):
+            component('tts').shutdown()
+
+        self.settings.stop_watching()
+        self.session.stop()
+
+        # Completa le scritture in coda prima di uscire
+        for name in ('storage_writer', 'search_indexer', 'enrichment_worker'):
+            if component(name):
+                component(name).stop()
+        if component('catalog'):
+            component('catalog').close()
         
         self._cleanup()
         self.logger.info("NAIAD arrestato")
+        shutdown_logging()
+
+    def profile_startup(self) -> int:
+        """
+        Esegue solo l'avvio e stampa i tempi di inizializzazione e di importazione.
 
+        Returns:
+            int: Codice di uscita
+        """
+        timer = ImportTimer()
+        timer.install()
+        try:
+            self.setup()
+            if not self._create_lock_file():
+                print("NAIAD è già in esecuzione: chiudilo prima di misurare l'avvio")
+                return 2
+            self.running = True
+            self.startup.start()
+            # La finestra gira in un altro processo: il core non importa pywebview
+            self.startup.wait_all()
+            self.startup.mark("avvio completato")
+        finally:
+            timer.uninstall()
+        print("\n".join(self.startup.report() + timer.report()))
+        self.stop()
+        return 0
 
 def launch_ui(mode: str):
     """
@@ -900,6 +1349,15 @@ def print_usage():
         backend    - Avvia NAIAD in modalità backend (default)
         artifacts  - Avvia l'interfaccia utente per la gestione degli artefatti
         chats      - Avvia l'interfaccia utente per la gestione delle chat
+        ui         - Apre la finestra di gestione collegata al backend in esecuzione
+
+        Comandi di manutenzione:
+        export [archivio.zip] [--no-cache]          - Esporta chat, artefatti e configurazione
+        import archivio.zip [--workers N] [--force] - Importa un archivio esportato
+        migrate [--workers N] [--force]             - Migra chat e artefatti nel formato indicizzato
+        stats [--reset]                             - Mostra i tempi di risposta per modalità e fase
+        profile [secondi]                           - Profila il backend in esecuzione (rapporto in logs/profiles)
+        --startup-profile                           - Misura i tempi di avvio e di importazione dei moduli
         """)
 
 def oldmain():
@@ -932,6 +1390,31 @@ def oldmain():
 
 def main():
     """Entry point modificato"""
+    # Necessario per il pool di processi nell'eseguibile congelato
+    multiprocessing.freeze_support()
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--startup-profile':
+        sys.exit(NAIADApplication().profile_startup())
+
+    # Finestra di gestione collegata al backend in esecuzione
+    if len(sys.argv) > 1 and sys.argv[1] == 'ui':
+        from naiad.ui.manager_process import main as manager_main
+        sys.exit(manager_main())
+
+    # Comandi di manutenzione: non avviano l'applicazione
+    if len(sys.argv) > 1 and sys.argv[1] in ('export', 'import'):
+        from naiad.core.backup import cli
+        sys.exit(cli(sys.argv[1:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'migrate':
+        from naiad.core.migration import cli
+        sys.exit(cli(sys.argv[1:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'stats':
+        from naiad.core.tracing import cli
+        sys.exit(cli(sys.argv[2:], env.logs_dir / "metrics.json"))
+    if len(sys.argv) > 1 and sys.argv[1] == 'profile':
+        from naiad.core.profiling import cli
+        sys.exit(cli(sys.argv[2:], env.data_root))
+
     # L'applicazione ora viene sempre avviata in modalità backend
     try:
         app = NAIADApplication()
@@ -0,0 +1,362 @@
+# migration.py
+"""
+Migrazione dei file di chat e artefatti nell'archivio indicizzato.
+
+Le chat salvate nel tempo hanno formati diversi: oltre a quello attuale
+(style, title, history, saved_at) ci sono le vecchie SuspendedChat, con
+suspended_at e description, e file senza titolo. Gli artefatti più vecchi
+possono essere in codifica Windows invece che UTF-8.
+
+Il comando analizza i file in un pool di processi, li valida e li
+normalizza, riscrive solo quelli da correggere (conservando l'originale in
+db/.legacy o artifacts/.legacy), costruisce gli indici sidecar mancanti e
+registra i metadati nella tabella documents del catalogo, a blocchi in
+un'unica transazione. I file già migrati e non modificati vengono saltati,
+quindi il comando si può rilanciare in qualsiasi momento.
+
+Uso:
+    naiad migrate [--workers N] [--force]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from naiad.ai.base import SessionStyle
+from naiad.core.environment import env
+from naiad.core.catalog import Catalog, DocumentRecord
+from naiad.core.chat_archive import ChatArchive
+from naiad.core.chat_index import ChatIndex, build_index, index_path_for
+from naiad.core.storage_writer import atomic_write
+from naiad.core.storage_events import ARTIFACT, CHAT
+from naiad.core.backup import backend_running
+
+# Risultati registrati nel catalogo per ogni transazione
+BATCH_SIZE = 500
+# File inviati insieme a ogni processo
+CHUNK_SIZE = 16
+
+LEGACY_DIR = '.legacy'
+
+_ROLES = ('user', 'assistant', 'system')
+
+logger = logging.getLogger("migration")
+
+
+class MigrationError(ValueError):
+    """File non valido e non correggibile automaticamente"""
+    pass
+
+
+def normalize_chat(data, name: str, mtime: float) -> Tuple[dict, List[str]]:
+    """
+    Valida una chat e la porta al formato attuale.
+
+    Args:
+        data: Documento JSON letto dal file
+        name: Nome del file, usato come titolo se manca
+        mtime: Data di modifica del file, usata se manca la data di salvataggio
+
+    Returns:
+        Tuple[dict, List[str]]: Chat normalizzata e descrizione delle correzioni
+
+    Raises:
+        MigrationError: Se il file non è una chat valida
+    """
+    if not isinstance(data, dict):
+        raise MigrationError("il documento non è un oggetto JSON")
+    history = data.get('history')
+    if not isinstance(history, list):
+        raise MigrationError("history mancante")
+    for position, message in enumerate(history, 1):
+        if not isinstance(message, dict) or message.get('role') not in _ROLES:
+            raise MigrationError(f"messaggio {position} senza ruolo valido")
+        if not isinstance(message.get('content'), (str, list)):
+            raise MigrationError(f"messaggio {position} senza contenuto")
+    try:
+        style = SessionStyle(data.get('style'))
+    except ValueError:
+        raise MigrationError(f"stile non valido: {data.get('style')!r}")
+
+    changes = []
+    chat = dict(data)
+
+    saved_at = data.get('saved_at')
+    if not saved_at:
+        # Formato SuspendedChat
+        saved_at = data.get('suspended_at')
+        chat.pop('suspended_at', None)
+        changes.append("data di salvataggio presa da suspended_at" if saved_at
+                       else "data di salvataggio presa dal file")
+        saved_at = saved_at or datetime.fromtimestamp(mtime).isoformat()
+    try:
+        datetime.fromisoformat(saved_at)
+    except (TypeError, ValueError):
+        raise MigrationError(f"data di salvataggio non valida: {saved_at!r}")
+
+    title = data.get('title')
+    if not isinstance(title, str) or not title.strip():
+        title = name.rsplit('.', 1)[0]
+        changes.append("titolo aggiunto")
+
+    chat.update({'style': style.value, 'title': title, 'history': history, 'saved_at': saved_at})
+    return chat, changes
+
+
+def _index_header(chat: dict) -> dict:
+    return {'style': chat['style'], 'title': chat['title'], 'saved_at': chat['saved_at']}
+
+
+def inspect_chat(path_str: str) -> dict:
+    """
+    Analizza un file di chat (eseguita nei processi del pool).
+
+    Returns:
+        dict: name, mtime_ns, size e, secondo il caso, error oppure meta,
+        data (contenuto normalizzato), changes e index (indice da scrivere)
+    """
+    path = Path(path_str)
+    stat = path.stat()
+    result = {'name': path.name, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    try:
+        raw = path.read_bytes()
+        try:
+            data = json.loads(raw.decode('utf-8-sig'))
+        except ValueError as e:
+            raise MigrationError(f"JSON non valido: {e}")
+        chat, changes = normalize_chat(data, path.name, stat.st_mtime)
+        if raw.startswith(b'\xef\xbb\xbf'):
+            changes.append("BOM rimosso")
+    except MigrationError as e:
+        result['error'] = str(e)
+        return result
+
+    if changes:
+        raw = json.dumps(chat, indent=2, ensure_ascii=False).encode('utf-8')
+        result['data'] = raw
+        result['changes'] = changes
+        result['index'] = build_index(raw, _index_header(chat))
+    else:
+        try:
+            ChatIndex.open(path)
+        except Exception:
+            result['index'] = build_index(raw, _index_header(chat))
+
+    result['meta'] = {
+        'title': chat['title'],
+        'style': chat['style'],
+        'saved_at': chat['saved_at'],
+        'message_count': len(chat['history'])
+    }
+    return result
+
+
+def inspect_artifact(path_str: str) -> dict:
+    """
+    Analizza un file di artefatto (eseguita nei processi del pool).
+
+    I file non UTF-8 vengono letti come cp1252, la codifica dei vecchi
+    salvataggi su Windows, e riscritti in UTF-8.
+    """
+    path = Path(path_str)
+    stat = path.stat()
+    result = {'name': path.name, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    raw = path.read_bytes()
+    changes = []
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        try:
+            text = raw.decode('cp1252')
+        except UnicodeDecodeError as e:
+            result['error'] = f"codifica non riconosciuta: {e}"
+            return result
+        changes.append("convertito da cp1252 a UTF-8")
+    if text.startswith('﻿'):
+        text = text[1:]
+        changes.append("BOM rimosso")
+    if '\x00' in text:
+        result['error'] = "il file contiene dati binari"
+        return result
+
+    if changes:
+        result['data'] = text.encode('utf-8')
+        result['changes'] = changes
+    result['meta'] = {
+        'title': path.name.rsplit('.', 1)[0],
+        'style': None,
+        'saved_at': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        'message_count': None
+    }
+    return result
+
+
+class Migration:
+    """Migrazione di chat e artefatti nel catalogo"""
+
+    def __init__(self, catalog: Catalog, chats_dir: Path, artifacts_dir: Path,
+                 workers: Optional[int] = None, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            catalog: Catalogo di destinazione
+            chats_dir: Directory delle chat
+            artifacts_dir: Directory degli artefatti
+            workers: Processi del pool; None per il numero di CPU
+            logger: Logger per la registrazione degli eventi
+        """
+        self.catalog = catalog
+        self.chats_dir = chats_dir
+        self.artifacts_dir = artifacts_dir
+        self.workers = workers
+        self.logger = logger or globals()['logger']
+        self.stats = {'scanned': 0, 'unchanged': 0, 'migrated': 0, 'normalized': 0, 'removed': 0}
+        self.bad_files: Dict[str, str] = {}
+
+    def _pending(self, kind: str, directory: Path, suffix: str) -> List[Path]:
+        """File nuovi o modificati dall'ultima migrazione; elimina quelli scomparsi"""
+        states = self.catalog.document_states(kind)
+        present = set()
+        pending = []
+        if directory.is_dir():
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(suffix) or not entry.is_file():
+                        continue
+                    present.add(entry.name)
+                    stat = entry.stat()
+                    if states.get(entry.name) != (stat.st_mtime_ns, stat.st_size):
+                        pending.append(Path(entry.path))
+        self.stats['scanned'] += len(present)
+        self.stats['unchanged'] += len(present) - len(pending)
+
+        keep = present
+        if kind == CHAT:
+            # Le chat spostate nell'archivio a segmenti restano nel catalogo
+            keep = present | set(ChatArchive(directory / '.archive', self.logger).entries())
+        removed = set(states) - keep
+        if removed:
+            self.catalog.remove_documents(kind, removed)
+            self.stats['removed'] += len(removed)
+        return sorted(pending)
+
+    def _apply(self, kind: str, directory: Path, result: dict) -> Optional[DocumentRecord]:
+        """Scrive le correzioni di un file e restituisce il record da registrare"""
+        path = directory / result['name']
+        if 'error' in result:
+            self.bad_files[str(path)] = result['error']
+            return None
+
+        mtime_ns, size = result['mtime_ns'], result['size']
+        if 'data' in result:
+            current = path.stat()
+            if (current.st_mtime_ns, current.st_size) != (mtime_ns, size):
+                return None  # Modificato durante l'analisi: verrà ripreso al prossimo giro
+            legacy = directory / LEGACY_DIR / result['name']
+            if not legacy.exists():
+                atomic_write(legacy, path.read_bytes())
+            atomic_write(path, result['data'])
+            stat = path.stat()
+            mtime_ns, size = stat.st_mtime_ns, stat.st_size
+            self.stats['normalized'] += 1
+            self.logger.info(f"{result['name']}: {', '.join(result['changes'])}")
+        if 'index' in result:
+            atomic_write(index_path_for(path), result['index'])
+
+        meta = result['meta']
+        return DocumentRecord(kind, result['name'], meta['title'], meta['style'], meta['saved_at'],
+                              meta['message_count'], size, mtime_ns)
+
+    def run(self, progress=None) -> dict:
+        """
+        Esegue la migrazione.
+
+        Args:
+            progress: Funzione chiamata con (elaborati, totale)
+
+        Returns:
+            dict: Statistiche della migrazione
+        """
+        jobs = [
+            (CHAT, self.chats_dir, self._pending(CHAT, self.chats_dir, '.json'), inspect_chat),
+            (ARTIFACT, self.artifacts_dir, self._pending(ARTIFACT, self.artifacts_dir, '.txt'), inspect_artifact)
+        ]
+        total = sum(len(paths) for _, _, paths, _ in jobs)
+        done = 0
+        if not total:
+            return self.stats
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for kind, directory, paths, inspect in jobs:
+                batch: List[DocumentRecord] = []
+                for result in pool.map(inspect, [str(p) for p in paths], chunksize=CHUNK_SIZE):
+                    done += 1
+                    try:
+                        record = self._apply(kind, directory, result)
+                    except OSError as e:
+                        self.bad_files[str(directory / result['name'])] = str(e)
+                        record = None
+                    if record:
+                        batch.append(record)
+                    if len(batch) >= BATCH_SIZE:
+                        self.catalog.upsert_documents(batch)
+                        self.stats['migrated'] += len(batch)
+                        batch = []
+                    if progress:
+                        progress(done, total)
+                if batch:
+                    self.catalog.upsert_documents(batch)
+                    self.stats['migrated'] += len(batch)
+        return self.stats
+
+
+def cli(argv: List[str]) -> int:
+    """
+    Esegue il comando migrate.
+
+    Args:
+        argv: Argomenti a partire dal nome del comando
+
+    Returns:
+        int: Codice di uscita (1 se ci sono file non validi)
+    """
+    parser = argparse.ArgumentParser(prog='naiad migrate',
+                                     description="Migra chat e artefatti nell'archivio indicizzato")
+    parser.add_argument('--workers', type=int, default=None, help="Processi da usare (predefinito: CPU)")
+    parser.add_argument('--force', action='store_true', help="Esegue anche se NAIAD sembra in esecuzione")
+    args = parser.parse_args(argv[1:])
+
+    if backend_running(env.data_root) and not args.force:
+        print("NAIAD è in esecuzione: chiudilo prima della migrazione, oppure usa --force")
+        return 2
+
+    def progress(done, total):
+        if done == total or done % 100 == 0:
+            sys.stdout.write(f"\rMigrazione: {done}/{total} file" + ('\n' if done == total else ''))
+            sys.stdout.flush()
+
+    catalog = Catalog(env.db_dir / "catalog.sqlite")
+    started = time.monotonic()
+    try:
+        migration = Migration(catalog, env.db_dir, env.data_root / "artifacts", args.workers)
+        stats = migration.run(progress)
+    finally:
+        catalog.close()
+
+    print(f"File esaminati: {stats['scanned']}, già migrati: {stats['unchanged']}, "
+          f"registrati: {stats['migrated']}, corretti: {stats['normalized']}, "
+          f"rimossi dal catalogo: {stats['removed']} ({time.monotonic() - started:.1f} s)")
+    if not migration.bad_files:
+        return 0
+
+    report = env.logs_dir / f"migration-{datetime.now():%Y%m%d-%H%M%S}.json"
+    atomic_write(report, json.dumps(migration.bad_files, indent=2, ensure_ascii=False))
+    print(f"{len(migration.bad_files)} file non validi (non modificati), elenco in {report}:")
+    for path, error in sorted(migration.bad_files.items())[:20]:
+        print(f"  {Path(path).name}: {error}")
+    return 1
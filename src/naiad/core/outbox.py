@@ -0,0 +1,200 @@
+# outbox.py
+"""
+Coda durevole delle richieste all'AI fatte senza rete.
+
+Se la connessione cade, la domanda di Nicola non deve andare persa né
+finire in un messaggio di errore nella clipboard. La richiesta viene
+salvata in outbox/ insieme all'istantanea della sessione da cui è
+partita (modalità, cronologia, titolo), e un thread la ripropone a
+intervalli regolari finché il servizio torna raggiungibile.
+
+Le richieste sono ripetute una alla volta, nell'ordine in cui sono state
+fatte; anche le domande successive, finché la coda non è vuota, vi
+vengono aggiunte invece di superare quelle in attesa. La coda sopravvive
+al riavvio di NAIAD: i file rimasti vengono ripresi all'avvio.
+"""
+import json
+import logging
+import threading
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from naiad.ai.base import ProviderOffline
+from naiad.core.session import SessionSnapshot
+from naiad.core.storage_writer import atomic_write
+
+
+@dataclass
+class PendingRequest:
+    """Richiesta in attesa della rete, con il contesto da cui è partita"""
+    id: int
+    prompt: str
+    style: str
+    history: List[dict]
+    chat_title: Optional[str] = None
+    # Esecuzione di NAIAD e sessione in cui è stata fatta la richiesta
+    boot: str = ""
+    session_id: int = 0
+    created: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+    attempts: int = 0
+
+    @property
+    def filename(self) -> str:
+        return f"{self.id:06d}.json"
+
+
+class Outbox(threading.Thread):
+    """
+    Coda su disco delle richieste da ripetere.
+
+    La consegna è affidata a `replay(richiesta)`: se solleva ProviderOffline
+    la richiesta resta in coda e si riprova dopo `retry_seconds`; altri
+    errori contano come tentativi falliti e dopo `max_attempts` la richiesta
+    viene scartata chiamando `failed(richiesta, errore)`.
+
+    Appena ottenuta la risposta, `replay` chiama `delivered(richiesta)`: un
+    errore successivo (lettura, notifica) non ripete più la richiesta all'AI.
+    """
+
+    def __init__(self, directory: Path, replay: Callable[[PendingRequest], None],
+                 failed: Callable[[PendingRequest, Exception], None],
+                 retry_seconds: float = 10, max_attempts: int = 3,
+                 logger: Optional[logging.Logger] = None):
+        super().__init__(daemon=True, name="Outbox")
+        self.directory = directory
+        self.replay = replay
+        self.failed = failed
+        self.retry_seconds = retry_seconds
+        self.max_attempts = max_attempts
+        self.logger = logger or logging.getLogger("outbox")
+        # Distingue le sessioni di questa esecuzione da quelle di esecuzioni precedenti
+        self.boot = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._queue: List[PendingRequest] = self._load()
+        # Numerazione progressiva: l'ordine dei file è quello delle richieste
+        self._last_id = max((request.id for request in self._queue), default=0)
+        if self._queue:
+            self.logger.info(f"{len(self._queue)} richieste in coda dall'esecuzione precedente")
+
+    def _load(self) -> List[PendingRequest]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        requests = []
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                requests.append(PendingRequest(**json.loads(path.read_text(encoding='utf-8'))))
+            except (OSError, ValueError, TypeError) as e:
+                self.logger.error(f"Richiesta in coda non leggibile {path.name}: {e}")
+        return requests
+
+    @property
+    def pending(self) -> int:
+        """Numero di richieste in attesa"""
+        with self._lock:
+            return len(self._queue)
+
+    def put(self, prompt: str, session: SessionSnapshot) -> Optional[PendingRequest]:
+        """
+        Salva una richiesta in coda; il file è su disco al ritorno.
+
+        Args:
+            prompt: Testo della richiesta
+            session: Istantanea della sessione da cui parte
+
+        Returns:
+            PendingRequest: La richiesta accodata, o None se è la ripetizione dell'ultima
+        """
+        with self._lock:
+            last = self._queue[-1] if self._queue else None
+            if (last is not None and last.prompt == prompt and last.boot == self.boot
+                    and last.session_id == session.session_id):
+                # Pulsante premuto di nuovo mentre la rete è assente
+                return None
+            request = PendingRequest(
+                id=self._last_id + 1,
+                prompt=prompt,
+                style=session.style.value,
+                history=list(session.history),
+                chat_title=session.chat_title,
+                boot=self.boot,
+                session_id=session.session_id
+            )
+            self._save(request)
+            self._queue.append(request)
+            self._last_id = request.id
+            first = len(self._queue) == 1
+        self.logger.info(f"Richiesta {request.id} in coda: {self.pending} in attesa della rete")
+        if first:
+            self._wake.set()
+        return request
+
+    def _save(self, request: PendingRequest):
+        atomic_write(self.directory / request.filename, json.dumps(asdict(request), ensure_ascii=False))
+
+    def wake(self):
+        """Riprova subito la prima richiesta in coda"""
+        self._wake.set()
+
+    def run(self):
+        while not self._stopping:
+            with self._lock:
+                request = self._queue[0] if self._queue else None
+            if request is None:
+                self._wake.wait()
+                self._wake.clear()
+                # La rete è appena risultata assente: il primo tentativo è dopo l'intervallo
+                self._wake.wait(self.retry_seconds)
+                self._wake.clear()
+                continue
+            if not self._deliver(request):
+                self._wake.wait(self.retry_seconds)
+                self._wake.clear()
+
+    def delivered(self, request: PendingRequest):
+        """Toglie dalla coda una richiesta la cui risposta è stata ottenuta"""
+        self._remove(request)
+
+    def _is_queued(self, request: PendingRequest) -> bool:
+        with self._lock:
+            return any(queued.id == request.id for queued in self._queue)
+
+    def _deliver(self, request: PendingRequest) -> bool:
+        """Tenta la consegna; False se bisogna attendere prima di riprovare"""
+        try:
+            self.replay(request)
+        except ProviderOffline as e:
+            self.logger.debug(f"Rete ancora assente per la richiesta {request.id}: {e}")
+            return False
+        except Exception as e:
+            if not self._is_queued(request):
+                # Risposta già ottenuta: non va chiesta di nuovo
+                self.logger.warning(f"Errore dopo la consegna della richiesta {request.id}: {e}")
+                return True
+            request.attempts += 1
+            if request.attempts < self.max_attempts:
+                self.logger.warning(f"Tentativo {request.attempts} fallito per la richiesta {request.id}: {e}")
+                self._save(request)
+                return False
+            self.logger.error(f"Richiesta {request.id} scartata dopo {request.attempts} tentativi: {e}")
+            self._remove(request)
+            self.failed(request, e)
+            return True
+        self._remove(request)
+        self.logger.info(f"Richiesta {request.id} consegnata, {self.pending} ancora in coda")
+        return True
+
+    def _remove(self, request: PendingRequest):
+        with self._lock:
+            self._queue = [queued for queued in self._queue if queued.id != request.id]
+        (self.directory / request.filename).unlink(missing_ok=True)
+
+    def stop(self, timeout: Optional[float] = 5):
+        """Ferma il thread; le richieste non consegnate restano su disco"""
+        self._stopping = True
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,269 @@
+# profiling.py
+"""
+Profilazione su richiesta del backend in esecuzione.
+
+Quando NAIAD "è lento" la cattura si avvia dal pulsante GRID3 (trigger
+profile) o da riga di comando con `naiad profile [secondi]`, senza
+debugger e senza riavvio. Per la durata richiesta:
+
+- un thread campiona gli stack di tutti i thread (sys._current_frames)
+  a intervalli regolari: i conteggi mostrano dove passa il tempo, anche
+  in attesa di rete o disco;
+- tracemalloc registra le allocazioni, riportate per riga di codice;
+- all'inizio viene salvato lo stack completo di ogni thread.
+
+Il rapporto è scritto in logs/profiles/profilo-<data>-<ora>.txt, insieme
+agli stack in formato "folded" (.folded) leggibili da flamegraph.pl o
+speedscope; una riga di riepilogo va nel log.
+"""
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Profondità massima degli stack campionati
+MAX_DEPTH = 64
+# Frame conservati da tracemalloc per ogni allocazione
+TRACEMALLOC_FRAMES = 10
+# Righe delle classifiche nel rapporto
+TOP = 25
+# Rapporti conservati nella directory dei profili
+MAX_REPORTS = 20
+
+
+class Profiler:
+    """Cattura di campioni, allocazioni e stack dei thread"""
+
+    def __init__(self, output_dir: Path, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            output_dir: Directory in cui scrivere i rapporti
+            logger: Logger per il riepilogo
+        """
+        self.output_dir = output_dir
+        self.logger = logger or logging.getLogger("profiling")
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float = 30, interval: float = 0.01) -> Optional[Path]:
+        """
+        Avvia una cattura in background.
+
+        Args:
+            seconds: Durata della cattura
+            interval: Secondi tra due campioni
+
+        Returns:
+            Path: File del rapporto che verrà scritto, o None se una cattura è già in corso
+        """
+        with self._lock:
+            if self.running:
+                return None
+            report = self._report_path()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(report, seconds, interval),
+                                            name="naiad-profiler", daemon=True)
+            self._thread.start()
+            return report
+
+    def stop(self, timeout: float = 5):
+        """Interrompe la cattura in corso; il rapporto viene scritto con i campioni raccolti"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, report: Path, seconds: float, interval: float):
+        try:
+            self.capture(seconds, interval, report)
+        except Exception as e:
+            self.logger.error(f"Errore durante la profilazione: {e}")
+
+    def capture(self, seconds: float, interval: float = 0.01, report: Optional[Path] = None) -> Path:
+        """
+        Esegue una cattura nel thread chiamante e scrive il rapporto.
+
+        Returns:
+            Path: File del rapporto
+        """
+        report = report or self._report_path()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.logger.info(f"Profilazione avviata per {seconds:g} s")
+
+        # Prima del riferimento di tracemalloc: la lettura dei sorgenti non è un'allocazione di NAIAD
+        thread_dump = dump_threads()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        baseline = tracemalloc.take_snapshot()
+
+        sampler = _Sampler()
+        started = time.monotonic()
+        deadline = started + seconds
+        while not self._stop.is_set():
+            sampler.sample()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._stop.wait(min(interval, remaining))
+        elapsed = time.monotonic() - started
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        growth = _filter_snapshot(snapshot).compare_to(_filter_snapshot(baseline), 'lineno')
+
+        lines = [
+            f"Profilo NAIAD del {datetime.now().isoformat(timespec='seconds')}",
+            f"Durata {elapsed:.1f} s, {sampler.samples} campioni ogni {interval * 1000:g} ms",
+            f"Memoria tracciata: {current / 2**20:.1f} MB (picco {peak / 2**20:.1f} MB)",
+            ""
+        ]
+        lines += sampler.report(TOP)
+        lines += ["", f"== Allocazioni durante la cattura (prime {TOP} righe) =="]
+        lines += [str(stat) for stat in growth[:TOP] if stat.size_diff > 0] or ["(nessuna)"]
+        lines += ["", "== Stack dei thread all'avvio della cattura =="]
+        lines += thread_dump
+
+        report.write_text("\n".join(lines) + "\n", encoding='utf-8')
+        report.with_suffix(".folded").write_text(sampler.folded(), encoding='utf-8')
+        self._prune()
+
+        hottest = sampler.hottest()
+        hot = f", più frequente: {hottest[0]} ({hottest[1]:.0%})" if hottest else ""
+        self.logger.info(f"Profilo scritto in {report.name}: {sampler.samples} campioni in {elapsed:.1f} s"
+                         f"{hot}, memoria {current / 2**20:.1f} MB (picco {peak / 2**20:.1f} MB)")
+        return report
+
+    def _report_path(self) -> Path:
+        return self.output_dir / f"profilo-{datetime.now():%Y%m%d-%H%M%S}.txt"
+
+    def _prune(self):
+        """Elimina i rapporti più vecchi oltre MAX_REPORTS"""
+        reports = sorted(self.output_dir.glob("profilo-*.txt"))
+        for old in reports[:-MAX_REPORTS]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".folded").unlink(missing_ok=True)
+
+
+class _Sampler:
+    """Conteggi degli stack campionati da tutti i thread tranne il campionatore"""
+
+    def __init__(self):
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.leaves: Counter = Counter()
+        self.inclusive: Counter = Counter()
+        self.threads: Counter = Counter()
+        self._own = threading.get_ident()
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        self.samples += 1
+        for ident, frame in frames.items():
+            if ident == self._own:
+                continue
+            thread = names.get(ident, str(ident))
+            functions: List[str] = []
+            leaf = frame
+            while frame is not None and len(functions) < MAX_DEPTH:
+                functions.append(_function(frame))
+                frame = frame.f_back
+            self.threads[thread] += 1
+            self.leaves[(thread, f"{_function(leaf)} riga {leaf.f_lineno}")] += 1
+            for function in set(functions):
+                self.inclusive[function] += 1
+            self.stacks[";".join([thread] + functions[::-1])] += 1
+
+    def hottest(self) -> Optional[Tuple[str, float]]:
+        """Funzione foglia più campionata fuori dalle attese, con la frazione dei campioni del suo thread"""
+        for (thread, leaf), count in self.leaves.most_common():
+            if not _is_idle(leaf):
+                return leaf, count / max(self.threads[thread], 1)
+        return None
+
+    def report(self, top: int) -> List[str]:
+        lines = [f"== Campioni in cima allo stack (primi {top}) =="]
+        for (thread, leaf), count in self.leaves.most_common(top):
+            lines.append(f"{count:>7} {count / max(self.threads[thread], 1):>6.1%}  [{thread}] {leaf}")
+        lines += ["", f"== Funzioni presenti nello stack (prime {top}) =="]
+        total = max(sum(self.threads.values()), 1)
+        for function, count in self.inclusive.most_common(top):
+            lines.append(f"{count:>7} {count / total:>6.1%}  {function}")
+        return lines
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# Foglie che indicano un thread in attesa, escluse dal riepilogo
+_IDLE = ('wait (threading.py', 'select (', 'sleep', 'accept (', '_recv', 'get (queue.py', '_worker (')
+
+
+def _is_idle(leaf: str) -> bool:
+    return any(marker in leaf for marker in _IDLE)
+
+
+def _function(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def _filter_snapshot(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, __file__),
+    ))
+
+
+def dump_threads() -> List[str]:
+    """Stack completo di ogni thread del processo"""
+    threads: Dict[int, threading.Thread] = {thread.ident: thread for thread in threading.enumerate()}
+    lines: List[str] = []
+    for ident, frame in sys._current_frames().items():
+        thread = threads.get(ident)
+        name = thread.name if thread else str(ident)
+        daemon = " daemon" if thread is not None and thread.daemon else ""
+        lines.append(f"-- {name} ({ident}{daemon})")
+        lines += [line.rstrip() for line in traceback.format_stack(frame)]
+    return lines
+
+
+def cli(argv: List[str], data_root: Path) -> int:
+    """
+    Comando `naiad profile [secondi]`: avvia una cattura nel backend in esecuzione.
+    """
+    from naiad.core.ipc import IpcClient, IpcError
+
+    try:
+        seconds = float(argv[0]) if argv else None
+    except ValueError:
+        print(f"Durata non valida: {argv[0]}")
+        return 1
+    try:
+        client = IpcClient.connect(data_root)
+        try:
+            result = client.call('start_profile', seconds)
+        finally:
+            client.close()
+    except IpcError as e:
+        print(f"{e}. Avvia prima NAIAD.")
+        return 1
+    if not result.get('success'):
+        print(f"Profilazione non avviata: {result.get('error')}")
+        return 1
+    print(f"Profilazione avviata per {result['seconds']:g} s, rapporto in {result['report']}")
+    return 0
@@ -0,0 +1,583 @@
+# search_index.py
+"""
+Indice semantico locale di chat e artefatti.
+
+Ogni documento viene ridotto a un vettore denso di DIM componenti:
+i termini (parole normalizzate con uno stemming leggero per l'italiano)
+vengono mappati per hashing su BUCKETS colonne, pesati con TF-IDF e
+proiettati con una proiezione casuale sparsa e deterministica. Non serve
+alcun servizio esterno né un vocabolario da addestrare, quindi l'indice si
+aggiorna un documento alla volta.
+
+File in cache/search/:
+    vectors.f32  matrice (capienza, DIM) di vettori normalizzati, memory-mapped
+    docfreq.i32  frequenza dei documenti per ogni bucket, memory-mapped
+    terms.u32    bucket distinti di ogni documento, usati per aggiornare docfreq
+    meta.json    documenti indicizzati, slot e posizione dei loro termini
+
+Ogni aggiornamento aggiunge i termini del documento in fondo a terms.u32;
+quando i termini non più usati superano metà del file, save() lo riscrive
+con i soli termini dei documenti indicizzati.
+
+I pesi IDF cambiano con la crescita dell'archivio: quando il numero di
+documenti raddoppia rispetto all'ultima costruzione, o dopo una chiusura
+anomala, l'indice va ricostruito (vedi SearchIndex.needs_rebuild).
+"""
+import json
+import queue
+import re
+import threading
+import unicodedata
+import zlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from naiad.core.storage_writer import atomic_write
+from naiad.core.storage_events import StorageEvents, StorageEvent, ARTIFACT, CHAT, DELETE
+
+DIM = 256
+BUCKETS = 1 << 18
+# Componenti del vettore denso toccate da ogni bucket
+_PROJECTION_NNZ = 4
+_PROJECTION_SEED = 0x4E414941
+
+_FORMAT_VERSION = 1
+_KIND_CODES = {ARTIFACT: 0, CHAT: 1}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_STOPWORDS = frozenset("""
+a ad al alla alle allo agli ai anche che chi ci come con cosa cui da dal dalla
+dalle dei del della delle dello degli di e ed fra gli ha hai hanno ho i il in
+io la le lei li lo loro lui ma mi mio ne nei nel nella nelle no noi non o per
+piu poi quale quando quella quelle quelli quello questa queste questi questo
+se si sia sono su sua sue sui sul sulla suo tra tu tua tuo un una uno vi voi
+the and of to in is it that for on with as are this be or an at by from
+""".split())
+
+# Suffissi rimossi dallo stemming, dal più lungo al più corto
+_SUFFIXES = (
+    'amente', 'azione', 'azioni', 'mente', 'zione', 'zioni', 'ando', 'endo',
+    'are', 'ere', 'ire', 'ato', 'ata', 'ati', 'ate', 'ito', 'ita', 'iti', 'ite',
+    'ità', 'ismo', 'ista', 'isti', 'iste', 'i', 'e', 'o', 'a'
+)
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    """Documento restituito da una ricerca"""
+    kind: str  # ARTIFACT o CHAT
+    name: str  # Nome del file
+    score: float  # Similarità del coseno con la frase cercata
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Estrae i termini di un testo.
+
+    Rimuove accenti e parole vuote e riduce le parole alla radice, così
+    "canzone", "canzoni" e "Canzóne" producono lo stesso termine.
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return [
+        _stem(word) for word in _WORD.findall(text)
+        if len(word) > 1 and word not in _STOPWORDS and not word.isdigit()
+    ]
+
+
+def _term_counts(text: str) -> Dict[int, int]:
+    """Conta le occorrenze di ogni bucket in un testo"""
+    counts: Dict[int, int] = {}
+    for term in tokenize(text):
+        bucket = zlib.crc32(term.encode('utf-8')) & (BUCKETS - 1)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+def _projection(buckets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Componenti e segni della proiezione casuale per ogni bucket.
+
+    La proiezione è calcolata con un hash (splitmix64), quindi non va
+    memorizzata ed è identica tra un avvio e l'altro.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: indici (n, NNZ) e segni (n, NNZ)
+    """
+    with np.errstate(over='ignore'):
+        x = buckets.astype(np.uint64)[:, None] * np.uint64(_PROJECTION_NNZ) \
+            + np.arange(_PROJECTION_NNZ, dtype=np.uint64)[None, :] \
+            + np.uint64(_PROJECTION_SEED)
+        x = (x + np.uint64(0x9E3779B97F4A7C15))
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    dims = (x % np.uint64(DIM)).astype(np.intp)
+    signs = np.where((x >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+    return dims, signs
+
+
+class SearchIndex:
+    """Indice vettoriale persistente dei documenti"""
+
+    META = 'meta.json'
+    VECTORS = 'vectors.f32'
+    DOCFREQ = 'docfreq.i32'
+    TERMS = 'terms.u32'
+    # terms.u32 viene compattato quando i termini non più usati superano
+    # questa frazione del file (e almeno COMPACT_MIN_GARBAGE bucket)
+    COMPACT_RATIO = 0.5
+    COMPACT_MIN_GARBAGE = 4096
+
+    def __init__(self, directory: Path, logger: Optional[logging.Logger] = None):
+        """
+        Apre (o crea) l'indice.
+
+        Args:
+            directory: Directory dei file dell'indice
+            logger: Logger per la registrazione degli eventi
+        """
+        self.directory = directory
+        self.logger = logger or logging.getLogger("search_index")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._load()
+
+    # Gestione dei file
+
+    def _load(self):
+        meta = None
+        meta_path = self.directory / self.META
+        if meta_path.exists():
+            try:
+                meta = json.loads(meta_path.read_text(encoding='utf-8'))
+                if meta.get('version') != _FORMAT_VERSION or meta.get('dim') != DIM:
+                    self.logger.info("Formato dell'indice di ricerca cambiato, verrà ricostruito")
+                    meta = None
+            except Exception as e:
+                self.logger.error(f"Indice di ricerca non leggibile: {e}")
+                meta = None
+
+        if meta is None:
+            self._reset()
+            return
+
+        # nome chiave -> {'slot', 'mtime', 'terms': [offset, lunghezza]}
+        self.docs: Dict[str, dict] = meta['docs']
+        self.capacity = meta['capacity']
+        self.high_water = meta['high_water']
+        self.built_count = meta.get('built_count', len(self.docs))
+        self.clean = meta.get('clean', False)
+        self._open_arrays()
+        self._rebuild_slot_tables()
+
+    def _close_arrays(self):
+        """Chiude le mappe in memoria (necessario su Windows prima di eliminare i file)"""
+        for attr in ('_vectors', '_docfreq'):
+            array = getattr(self, attr, None)
+            if array is not None:
+                array.flush()
+                delattr(self, attr)
+
+    def _reset(self):
+        """Svuota l'indice"""
+        self._close_arrays()
+        self.docs = {}
+        self.capacity = 64
+        self.high_water = 0
+        self.built_count = 0
+        self.clean = True
+        for name in (self.VECTORS, self.DOCFREQ, self.TERMS):
+            (self.directory / name).unlink(missing_ok=True)
+        self._open_arrays()
+        self._rebuild_slot_tables()
+        self._dirty = False
+
+    def _open_arrays(self):
+        vectors_path = self.directory / self.VECTORS
+        docfreq_path = self.directory / self.DOCFREQ
+        expected = self.capacity * DIM * 4
+        if not vectors_path.exists() or vectors_path.stat().st_size != expected:
+            with open(vectors_path, 'ab') as f:
+                f.truncate(expected)
+        if not docfreq_path.exists() or docfreq_path.stat().st_size != BUCKETS * 4:
+            with open(docfreq_path, 'wb') as f:
+                f.truncate(BUCKETS * 4)
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode='r+', shape=(self.capacity, DIM))
+        self._docfreq = np.memmap(docfreq_path, dtype=np.int32, mode='r+', shape=(BUCKETS,))
+
+    def _grow(self):
+        """Raddoppia la capienza della matrice dei vettori"""
+        self._vectors.flush()
+        del self._vectors
+        self.capacity *= 2
+        with open(self.directory / self.VECTORS, 'ab') as f:
+            f.truncate(self.capacity * DIM * 4)
+        self._vectors = np.memmap(self.directory / self.VECTORS, dtype=np.float32, mode='r+',
+                                  shape=(self.capacity, DIM))
+
+    def _rebuild_slot_tables(self):
+        self._slot_keys: List[Optional[str]] = [None] * self.high_water
+        self._slot_kinds = np.full(self.capacity, -1, dtype=np.int8)
+        for key, doc in self.docs.items():
+            self._slot_keys[doc['slot']] = key
+            self._slot_kinds[doc['slot']] = _KIND_CODES[key.split(':', 1)[0]]
+        self._free_slots = [slot for slot, key in enumerate(self._slot_keys) if key is None]
+
+    def _mark_dirty(self):
+        """Alla prima modifica registra che i file su disco non sono allineati"""
+        if not self._dirty:
+            self._dirty = True
+            self._write_meta(clean=False)
+
+    def _write_meta(self, clean: bool):
+        meta = {
+            'version': _FORMAT_VERSION,
+            'dim': DIM,
+            'capacity': self.capacity,
+            'high_water': self.high_water,
+            'built_count': self.built_count,
+            'clean': clean,
+            'docs': self.docs
+        }
+        atomic_write(self.directory / self.META, json.dumps(meta, ensure_ascii=False))
+
+    def save(self):
+        """Rende persistenti le modifiche"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._vectors.flush()
+            self._docfreq.flush()
+            self._compact_terms()
+            self._write_meta(clean=True)
+            self.clean = True
+            self._dirty = False
+
+    def _compact_terms(self):
+        """
+        Riscrive terms.u32 con i soli termini dei documenti indicizzati.
+
+        Chiamato con l'indice modificato: meta.json su disco è già segnato
+        come non allineato, quindi una chiusura anomala prima della nuova
+        meta.json porta alla ricostruzione dell'indice.
+        """
+        terms_path = self.directory / self.TERMS
+        if not terms_path.exists():
+            return
+        total = terms_path.stat().st_size // 4
+        garbage = total - sum(doc['terms'][1] for doc in self.docs.values())
+        if garbage < max(self.COMPACT_MIN_GARBAGE, total * self.COMPACT_RATIO):
+            return
+        data = np.fromfile(terms_path, dtype=np.uint32)
+        parts = []
+        offsets = {}
+        offset = 0
+        for key, doc in self.docs.items():
+            start, length = doc['terms']
+            parts.append(data[start:start + length])
+            offsets[key] = [offset, length]
+            offset += length
+        atomic_write(terms_path, np.concatenate(parts).tobytes() if parts else b'')
+        for key, terms in offsets.items():
+            self.docs[key]['terms'] = terms
+        self.logger.debug(f"Termini dell'indice compattati: {total} -> {offset} bucket")
+
+    # Interrogazione
+
+    @staticmethod
+    def key(kind: str, name: str) -> str:
+        return f"{kind}:{name}"
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def indexed_mtime(self, kind: str, name: str) -> Optional[float]:
+        """Data di modifica del documento al momento dell'indicizzazione"""
+        doc = self.docs.get(self.key(kind, name))
+        return doc['mtime'] if doc else None
+
+    def needs_rebuild(self) -> bool:
+        """Indica se i pesi sono troppo vecchi o i file non sono allineati"""
+        return not self.clean or len(self.docs) > max(16, 2 * self.built_count)
+
+    def _vectorize(self, counts: Dict[int, int], total_docs: int) -> np.ndarray:
+        vector = np.zeros(DIM, dtype=np.float32)
+        if not counts:
+            return vector
+        buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        idf = np.log((total_docs + 1.0) / (self._docfreq[buckets].astype(np.float32) + 1.0)) + 1.0
+        weights = (tf * idf).astype(np.float32)
+        dims, signs = _projection(buckets)
+        np.add.at(vector, dims.ravel(), (signs * weights[:, None]).ravel())
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def search(self, text: str, limit: int = 5, kind: Optional[str] = None) -> List[SearchResult]:
+        """
+        Cerca i documenti più simili a una frase.
+
+        Args:
+            text: Frase da cercare
+            limit: Numero massimo di risultati
+            kind: Limita la ricerca ad ARTIFACT o CHAT
+
+        Returns:
+            List[SearchResult]: Risultati dal più simile
+        """
+        counts = _term_counts(text)
+        with self._lock:
+            if not counts or not self.docs:
+                return []
+            query = self._vectorize(counts, len(self.docs))
+            scores = self._vectors[:self.high_water] @ query
+            valid = self._slot_kinds[:self.high_water] >= 0
+            if kind is not None:
+                valid &= self._slot_kinds[:self.high_water] == _KIND_CODES[kind]
+            scores = np.where(valid & (scores > 0), scores, -np.inf)
+
+            limit = min(limit, len(scores))
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for slot in top:
+                if not np.isfinite(scores[slot]):
+                    break
+                doc_kind, name = self._slot_keys[slot].split(':', 1)
+                results.append(SearchResult(doc_kind, name, float(scores[slot])))
+            return results
+
+    # Aggiornamento
+
+    def _read_terms(self, doc: dict) -> np.ndarray:
+        offset, length = doc['terms']
+        with open(self.directory / self.TERMS, 'rb') as f:
+            f.seek(offset * 4)
+            return np.frombuffer(f.read(length * 4), dtype=np.uint32)
+
+    def _append_terms(self, buckets: np.ndarray) -> List[int]:
+        terms_path = self.directory / self.TERMS
+        offset = terms_path.stat().st_size // 4 if terms_path.exists() else 0
+        with open(terms_path, 'ab') as f:
+            f.write(buckets.astype(np.uint32).tobytes())
+        return [offset, len(buckets)]
+
+    def upsert(self, kind: str, name: str, text: str, mtime: float):
+        """
+        Aggiunge o aggiorna un documento.
+
+        Args:
+            kind: ARTIFACT o CHAT
+            name: Nome del file
+            text: Testo da indicizzare
+            mtime: Data di modifica del file, per riconoscere i documenti cambiati
+        """
+        counts = _term_counts(text)
+        buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        key = self.key(kind, name)
+
+        with self._lock:
+            self._mark_dirty()
+            doc = self.docs.get(key)
+            if doc is not None:
+                np.subtract.at(self._docfreq, self._read_terms(doc).astype(np.int64), 1)
+                slot = doc['slot']
+            elif self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                if self.high_water == self.capacity:
+                    self._grow()
+                    kinds = np.full(self.capacity, -1, dtype=np.int8)
+                    kinds[:len(self._slot_kinds)] = self._slot_kinds
+                    self._slot_kinds = kinds
+                slot = self.high_water
+                self.high_water += 1
+                self._slot_keys.append(None)
+
+            np.add.at(self._docfreq, buckets, 1)
+            total = len(self.docs) + (0 if doc is not None else 1)
+            self._vectors[slot] = self._vectorize(counts, total)
+            self.docs[key] = {'slot': slot, 'mtime': mtime, 'terms': self._append_terms(buckets)}
+            self._slot_keys[slot] = key
+            self._slot_kinds[slot] = _KIND_CODES[kind]
+
+    def remove(self, kind: str, name: str):
+        """Rimuove un documento dall'indice"""
+        key = self.key(kind, name)
+        with self._lock:
+            doc = self.docs.pop(key, None)
+            if doc is None:
+                return
+            self._mark_dirty()
+            np.subtract.at(self._docfreq, self._read_terms(doc).astype(np.int64), 1)
+            slot = doc['slot']
+            self._vectors[slot] = 0
+            self._slot_keys[slot] = None
+            self._slot_kinds[slot] = -1
+            self._free_slots.append(slot)
+
+    def rebuild(self, documents: Iterable[Tuple[str, str, str, float]]):
+        """
+        Ricostruisce l'indice da zero con pesi IDF aggiornati.
+
+        Args:
+            documents: Tuple (tipo, nome, testo, data_modifica)
+        """
+        # Prima passata: termini e frequenze, fuori dal lock
+        parsed = [(kind, name, _term_counts(text), mtime) for kind, name, text, mtime in documents]
+        with self._lock:
+            self._reset()
+            self._mark_dirty()
+            self.clean = False
+            for _, _, counts, _ in parsed:
+                np.add.at(self._docfreq, np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)), 1)
+            while self.capacity < len(parsed):
+                self._grow()
+            self._slot_kinds = np.full(self.capacity, -1, dtype=np.int8)
+            for slot, (kind, name, counts, mtime) in enumerate(parsed):
+                buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                key = self.key(kind, name)
+                self._vectors[slot] = self._vectorize(counts, len(parsed))
+                self.docs[key] = {'slot': slot, 'mtime': mtime, 'terms': self._append_terms(buckets)}
+                self._slot_keys.append(key)
+                self._slot_kinds[slot] = _KIND_CODES[kind]
+            self.high_water = len(parsed)
+            self.built_count = len(parsed)
+            self.save()
+        self.logger.info(f"Indice di ricerca ricostruito con {len(parsed)} documenti")
+
+
+class SearchIndexer(threading.Thread):
+    """
+    Thread che mantiene aggiornato l'indice di ricerca.
+
+    Riceve gli eventi di archivio e indicizza i documenti fuori dal thread
+    che li ha salvati; all'avvio allinea l'indice ai file presenti su disco.
+    """
+
+    # Secondi di inattività dopo cui le modifiche vengono salvate su disco
+    SAVE_DELAY = 2.0
+
+    def __init__(self, index: SearchIndex, artifact_manager, chat_manager,
+                 events: StorageEvents, logger: Optional[logging.Logger] = None):
+        super().__init__(daemon=True, name="SearchIndexer")
+        self.index = index
+        self.artifact_manager = artifact_manager
+        self.chat_manager = chat_manager
+        self.logger = logger or logging.getLogger("search_index")
+        self._queue: "queue.Queue[Optional[StorageEvent]]" = queue.Queue()
+        self._unsubscribe = events.subscribe(self._queue.put)
+
+    def _documents(self) -> Dict[Tuple[str, str], Tuple[float, Callable[[], str]]]:
+        """Documenti presenti su disco con data di modifica e lettore del testo"""
+        documents = {}
+        for name, date in self.artifact_manager.get_artifacts_list():
+            documents[(ARTIFACT, name)] = (date.timestamp(), lambda n=name: self._artifact_text(n))
+        for name, _, _ in self.chat_manager.get_chats_list():
+            try:
+                mtime = self.chat_manager.get_chat_mtime(name)
+            except FileNotFoundError:
+                continue
+            documents[(CHAT, name)] = (mtime, lambda n=name: self._chat_text(n))
+        return documents
+
+    def _artifact_text(self, name: str) -> str:
+        return self.artifact_manager.get_artifact_content(name)
+
+    def _chat_text(self, name: str) -> str:
+        # Il titolo conta come parte del contenuto
+        return self.chat_manager.get_chat_text(name)
+
+    def _sync(self):
+        """Allinea l'indice ai documenti su disco"""
+        documents = self._documents()
+
+        if self.index.needs_rebuild():
+            texts = []
+            for (kind, name), (mtime, read) in documents.items():
+                try:
+                    texts.append((kind, name, read(), mtime))
+                except Exception as e:
+                    self.logger.error(f"Impossibile indicizzare {name}: {e}")
+            self.index.rebuild(texts)
+            return
+
+        for key in list(self.index.docs):
+            kind, name = key.split(':', 1)
+            if (kind, name) not in documents:
+                self.index.remove(kind, name)
+        for (kind, name), (mtime, read) in documents.items():
+            if self.index.indexed_mtime(kind, name) != mtime:
+                self._index_document(kind, name, read, mtime)
+        self.index.save()
+
+    def _index_document(self, kind: str, name: str, read: Callable[[], str], mtime: float):
+        try:
+            self.index.upsert(kind, name, read(), mtime)
+        except FileNotFoundError:
+            self.index.remove(kind, name)
+        except Exception as e:
+            self.logger.error(f"Impossibile indicizzare {name}: {e}")
+
+    def _handle(self, event: StorageEvent):
+        if event.kind not in _KIND_CODES:
+            return
+        if event.action == DELETE:
+            self.index.remove(event.kind, event.name)
+            return
+
+        try:
+            if event.kind == ARTIFACT:
+                mtime = (self.artifact_manager.artifacts_dir / event.name).stat().st_mtime
+                read = lambda: self._artifact_text(event.name)
+            else:
+                mtime = self.chat_manager.get_chat_mtime(event.name)
+                read = lambda: self._chat_text(event.name)
+        except FileNotFoundError:
+            self.index.remove(event.kind, event.name)
+            return
+        self._index_document(event.kind, event.name, read, mtime)
+
+    def run(self):
+        try:
+            self._sync()
+        except Exception as e:
+            self.logger.error(f"Errore allineamento indice di ricerca: {e}")
+
+        while True:
+            try:
+                event = self._queue.get(timeout=self.SAVE_DELAY)
+            except queue.Empty:
+                self.index.save()
+                continue
+            if event is None:
+                break
+            try:
+                self._handle(event)
+                if self.index.needs_rebuild():
+                    self._sync()
+            except Exception as e:
+                self.logger.error(f"Errore aggiornamento indice di ricerca: {e}")
+
+        self.index.save()
+
+    def stop(self, timeout: Optional[float] = 5):
+        """Ferma il thread salvando l'indice"""
+        self._unsubscribe()
+        self._queue.put(None)
+        self.join(timeout)
+        self.logger.info("SearchIndexer fermato")
@@ -0,0 +1,230 @@
+# session.py
+"""
+Stato della sessione di conversazione.
+
+Modalità, cronologia, titolo e artefatto in lavorazione appartengono a un
+solo thread (SessionActor), che applica in ordine i comandi ricevuti in
+coda. Dopo ogni comando pubblica una nuova SessionSnapshot immutabile: chi
+legge (trigger, lavori dell'Api, provider AI) prende l'istantanea corrente
+senza lock e senza copiare la cronologia, che non cambierà durante la
+generazione della risposta.
+
+Ogni cambio di sessione (modalità, svuotamento, ripresa di una chat)
+incrementa `session_id`. I comandi che registrano il risultato di una
+generazione portano il `session_id` dell'istantanea da cui è partita: se
+nel frattempo la sessione è cambiata vengono scartati, invece di finire
+nella conversazione sbagliata.
+
+I messaggi della cronologia ({'role', 'content'}) sono creati dai comandi
+e non vengono mai modificati.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from naiad.ai.base import ChatContext, SessionStyle
+
+
+@dataclass(frozen=True)
+class SessionSnapshot:
+    """Istantanea immutabile della sessione"""
+    style: SessionStyle
+    chat_context: ChatContext
+    # Profilo compilato della modalità (modello, parametri, prompt)
+    profile: Any = None
+    history: Tuple[dict, ...] = ()
+    # Titolo con cui salvare chat e artefatti
+    chat_title: Optional[str] = None
+    # (nome_file, messaggi_omessi) quando la history è la coda di una chat ripresa
+    resumed_chat: Optional[Tuple[str, int]] = None
+    # Artefatto su cui si sta lavorando: STAMPA ne salva una nuova versione
+    artifact: Optional[str] = None
+    session_id: int = 0
+
+    def context(self) -> Dict[str, Any]:
+        """Contesto per AIProvider.generate_response"""
+        return {
+            "style": self.style,
+            "chat_context": self.chat_context,
+            "history": self.history,
+            "profile": self.profile
+        }
+
+
+class StaleSession(Exception):
+    """Il comando si riferisce a una sessione non più corrente"""
+    pass
+
+
+# Comandi: ognuno calcola la nuova istantanea da quella corrente
+
+@dataclass(frozen=True)
+class SetProfile:
+    """
+    Sostituisce il profilo della modalità corrente (configurazione ricaricata).
+
+    Il profilo è scelto al momento dell'applicazione, per la modalità
+    corrente: un cambio di modalità arrivato prima non riceve il profilo
+    di quella precedente.
+    """
+    # Profilo compilato di una modalità (Settings.profile)
+    resolve: Callable[[SessionStyle], Any]
+
+    def apply(self, state: SessionSnapshot) -> SessionSnapshot:
+        return replace(state, profile=self.resolve(state.style))
+
+
+@dataclass(frozen=True)
+class ChangeMode:
+    """Passa a un'altra modalità iniziando una nuova chat"""
+    style: SessionStyle
+    profile: Any
+
+    def apply(self, state: SessionSnapshot) -> SessionSnapshot:
+        if state.style == self.style:
+            return state
+        return replace(state, style=self.style, profile=self.profile, history=(), chat_title=None,
+                       resumed_chat=None, artifact=None, session_id=state.session_id + 1)
+
+
+@dataclass(frozen=True)
+class ClearHistory:
+    """Svuota la cronologia mantenendo modalità e titolo"""
+
+    def apply(self, state: SessionSnapshot) -> SessionSnapshot:
+        return replace(state, history=(), resumed_chat=None, artifact=None,
+                       session_id=state.session_id + 1)
+
+
+@dataclass(frozen=True)
+class AddExchange:
+    """Aggiunge alla cronologia una domanda e la risposta generata"""
+    prompt: str
+    response: str
+    # Sessione dell'istantanea usata per generare la risposta
+    session_id: int
+
+    def apply(self, state: SessionSnapshot) -> SessionSnapshot:
+        if state.session_id != self.session_id:
+            raise StaleSession("la sessione è cambiata durante la generazione")
+        return replace(state, history=state.history + (
+            {"role": "user", "content": self.prompt},
+            {"role": "assistant", "content": self.response}
+        ))
+
+
+@dataclass(frozen=True)
+class SetArtifact:
+    """Registra l'artefatto su cui si sta lavorando"""
+    filename: str
+    session_id: int
+
+    def apply(self, state: SessionSnapshot) -> SessionSnapshot:
+        if state.session_id != self.session_id:
+            raise StaleSession("la sessione è cambiata durante il salvataggio")
+        return replace(state, artifact=self.filename)
+
+
+@dataclass(frozen=True)
+class WorkOnArtifact:
+    """Riprende un artefatto nella modalità indicata"""
+    style: SessionStyle
+    profile: Any
+    filename: str
+
+    def apply(self, state: SessionSnapshot) -> SessionSnapshot:
+        state = ChangeMode(self.style, self.profile).apply(state)
+        return replace(state, chat_title=self.filename.rsplit('.', 1)[0], artifact=self.filename)
+
+
+@dataclass(frozen=True)
+class ResumeChat:
+    """Sostituisce la sessione con una chat salvata"""
+    style: SessionStyle
+    profile: Any
+    title: Optional[str]
+    history: Tuple[dict, ...]
+    resumed_chat: Optional[Tuple[str, int]] = None
+
+    def apply(self, state: SessionSnapshot) -> SessionSnapshot:
+        state = ChangeMode(self.style, self.profile).apply(state)
+        return replace(state, chat_title=self.title, history=self.history,
+                       resumed_chat=self.resumed_chat, artifact=None,
+                       session_id=state.session_id + 1)
+
+
+class SessionActor(threading.Thread):
+    """
+    Unico proprietario dello stato della sessione.
+
+    I comandi sono applicati uno alla volta dal thread dell'attore; `send`
+    attende l'applicazione, quindi chi invia un comando legge subito dopo
+    l'istantanea aggiornata.
+    """
+
+    def __init__(self, initial: SessionSnapshot, logger: Optional[logging.Logger] = None):
+        super().__init__(daemon=True, name="SessionActor")
+        self.logger = logger or logging.getLogger("session")
+        self._snapshot = initial
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._stopping = False
+
+    @property
+    def snapshot(self) -> SessionSnapshot:
+        """Istantanea corrente; non cambia dopo essere stata letta"""
+        return self._snapshot
+
+    def send(self, command) -> SessionSnapshot:
+        """
+        Applica un comando alla sessione.
+
+        Returns:
+            SessionSnapshot: L'istantanea risultante
+
+        Raises:
+            StaleSession: Se il comando si riferisce a una sessione precedente
+            RuntimeError: Se l'attore è stato fermato
+        """
+        if self._stopping:
+            raise RuntimeError("Sessione chiusa")
+        future: Future = Future()
+        self._queue.put((command, future))
+        return future.result()
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            command, future = item
+            try:
+                self._snapshot = command.apply(self._snapshot)
+                future.set_result(self._snapshot)
+            except StaleSession as e:
+                self.logger.info(f"{type(command).__name__} scartato: {e}")
+                future.set_exception(e)
+            except Exception as e:
+                self.logger.error(f"Errore applicazione {type(command).__name__}: {e}")
+                future.set_exception(e)
+        self._drain()
+
+    def _drain(self):
+        # Comandi arrivati durante l'arresto
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[1].set_exception(RuntimeError("Sessione chiusa"))
+
+    def stop(self, timeout: Optional[float] = 5):
+        """Ferma l'attore dopo aver applicato i comandi in coda"""
+        self._stopping = True
+        self._queue.put(None)
+        if self.is_alive():
+            self.join(timeout)
+
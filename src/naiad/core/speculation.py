@@ -0,0 +1,185 @@
+# speculation.py
+"""
+Risposte anticipate alle alternative numerate.
+
+Il prompt di sistema chiede al modello di numerare sempre le alternative,
+così Nicola può rispondere con "1", "2" o "1 3". Dopo ogni risposta che
+contiene un elenco numerato, mentre il TTS la sta ancora leggendo, lo
+Speculator chiede in background le risposte alle prime alternative, come
+se Nicola avesse già scelto quel numero.
+
+Se poi la risposta di Nicola è uno di quei numeri e la sessione non è
+cambiata (stessa istantanea da cui è partita l'anticipazione), la risposta
+pronta viene usata subito, o si attende quella già in corso invece di
+ripartire da zero; viene poi registrata nella cronologia come le altre.
+Qualunque altra richiesta annulla le anticipazioni ancora in attesa e ne
+scarta i risultati.
+
+Le richieste anticipate hanno un costo: ogni sessione dispone di un
+budget di token (speculation.session_token_budget) oltre il quale non se
+ne avviano altre.
+"""
+import logging
+import re
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from naiad.ai.base import Response
+from naiad.core.session import SessionSnapshot
+
+# Riga di un elenco numerato: "1. testo", "2) testo", "**3.** testo", "- 4: testo"
+_OPTION = re.compile(r'^\s*[-*•]?\s*\**\s*(\d{1,2})\s*[.):]\**\s+\S', re.MULTILINE)
+# Risposta composta solo da numeri: "1", "1 3", "1, 3", "1 E 3"
+_CHOICE = re.compile(r'\s*\d{1,2}(?:\s*(?:,|\s|\bE\b|\be\b)\s*\d{1,2})*\s*')
+
+
+def parse_options(text: str) -> List[int]:
+    """
+    Numeri delle alternative elencate in una risposta.
+
+    Sono considerati solo elenchi che partono da 1 e proseguono senza salti,
+    con almeno due voci; se ce n'è più d'uno vale l'ultimo, perché le
+    alternative chiudono la risposta.
+
+    Returns:
+        List[int]: Numeri delle alternative, in ordine
+    """
+    found: List[int] = []
+    numbers: List[int] = []
+    for match in _OPTION.finditer(text):
+        number = int(match.group(1))
+        if number == len(numbers) + 1:
+            numbers.append(number)
+        else:
+            numbers = [1] if number == 1 else []
+        if len(numbers) >= 2:
+            found = numbers
+    return list(found)
+
+
+def parse_choice(prompt: str) -> Optional[Tuple[int, ...]]:
+    """Numeri scelti in una risposta composta solo da numeri, o None"""
+    if not _CHOICE.fullmatch(prompt):
+        return None
+    return tuple(int(number) for number in re.findall(r'\d+', prompt))
+
+
+def _tokens_used(response: Response) -> int:
+    usage = (response.metadata or {}).get('usage')
+    return (getattr(usage, 'input_tokens', 0) or 0) + (getattr(usage, 'output_tokens', 0) or 0)
+
+
+class Speculator:
+    """Genera in anticipo le risposte alle alternative numerate"""
+
+    def __init__(self, generate, settings, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            generate: Funzione (prompt, context) -> Response (AIProvider.generate_response)
+            settings: Configurazione, letta a ogni anticipazione (sezione speculation)
+            logger: Logger per la registrazione degli eventi
+        """
+        self.generate = generate
+        self.settings = settings
+        self.logger = logger or logging.getLogger("speculation")
+        self._executor = ThreadPoolExecutor(max_workers=max(1, settings.get('speculation.max_branches', 2)),
+                                            thread_name_prefix="naiad-spec")
+        self._lock = threading.Lock()
+        # Istantanea da cui partono le anticipazioni in corso e relativi rami
+        self._base: Optional[SessionSnapshot] = None
+        self._branches: Dict[Tuple[int, ...], Future] = {}
+        # Token spesi per sessione (solo la sessione corrente viene conservata)
+        self._spent: Tuple[int, int] = (-1, 0)
+
+    def speculate(self, session: SessionSnapshot, response_text: str):
+        """
+        Avvia le anticipazioni per le alternative di una risposta appena
+        registrata nella sessione.
+
+        Args:
+            session: Istantanea che contiene la risposta come ultimo messaggio
+            response_text: Testo della risposta
+        """
+        self.cancel()
+        if not self.settings.get('speculation.enabled', True):
+            return
+        if session.style.value not in self.settings.get('speculation.styles', ['exploration']):
+            return
+        options = parse_options(response_text)
+        if not options:
+            return
+
+        branches = options[:self.settings.get('speculation.max_branches', 2)]
+        with self._lock:
+            if self._remaining_budget(session) <= 0:
+                self.logger.info("Budget di token della sessione esaurito, nessuna anticipazione")
+                return
+            self._base = session
+            self._branches = {(number,): self._executor.submit(self._generate, session, number)
+                              for number in branches}
+        self.logger.info(f"Anticipo le risposte alle alternative {', '.join(map(str, branches))} "
+                         f"di {len(options)}")
+
+    def _generate(self, session: SessionSnapshot, number: int) -> Response:
+        with self._lock:
+            # Il budget può essersi esaurito con i rami precedenti
+            if self._base is not session or self._remaining_budget(session) <= 0:
+                raise CancelledError()
+        response = self.generate(str(number), session.context())
+        with self._lock:
+            session_id, spent = self._spent
+            if session_id == session.session_id:
+                self._spent = (session_id, spent + _tokens_used(response))
+        return response
+
+    def _remaining_budget(self, session: SessionSnapshot) -> int:
+        session_id, spent = self._spent
+        if session_id != session.session_id:
+            self._spent = (session.session_id, 0)
+            spent = 0
+        return self.settings.get('speculation.session_token_budget', 20000) - spent
+
+    def take(self, session: SessionSnapshot, prompt: str) -> Optional[Response]:
+        """
+        Risposta anticipata per il prompt, se disponibile.
+
+        Attende il ramo ancora in corso; in ogni caso le altre anticipazioni
+        vengono annullate.
+
+        Args:
+            session: Istantanea su cui verrebbe generata la risposta
+            prompt: Testo inviato da Nicola
+
+        Returns:
+            Response: La risposta anticipata, o None se va generata
+        """
+        choice = parse_choice(prompt)
+        with self._lock:
+            future = self._branches.get(choice) if self._base is session else None
+        self.cancel(keep=future)
+        if future is None:
+            return None
+        try:
+            response = future.result()
+        except CancelledError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Anticipazione per {prompt.strip()} fallita: {e}")
+            return None
+        self.logger.info(f"Uso la risposta anticipata per l'alternativa {prompt.strip()}")
+        return response
+
+    def cancel(self, keep: Optional[Future] = None):
+        """Annulla le anticipazioni in attesa; i risultati di quelle in corso vengono scartati"""
+        with self._lock:
+            for future in self._branches.values():
+                if future is not keep:
+                    future.cancel()
+            self._branches = {choice: future for choice, future in self._branches.items() if future is keep}
+            if not self._branches:
+                self._base = None
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,264 @@
+# startup.py
+"""
+Avvio a fasi dell'applicazione.
+
+I componenti indipendenti (TTS, client Anthropic, archivio, indice di
+ricerca...) vengono inizializzati in parallelo, ciascuno nel proprio
+thread, e i moduli pesanti (pygame, gtts, anthropic, numpy, webview) sono
+importati solo dal passo che li usa. Ogni passo ha un gate: chi usa un
+componente attende solo il gate corrispondente, quindi i comandi che non
+ne hanno bisogno vengono serviti subito.
+
+Con `naiad --startup-profile` l'applicazione esegue solo l'avvio e stampa
+i tempi di inizializzazione di ogni passo e di importazione dei moduli.
+"""
+import importlib.abc
+import sys
+import threading
+import time
+import logging
+import traceback
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Riferimento per i tempi riportati: importazione di questo modulo
+PROCESS_START = time.perf_counter()
+
+
+class StartupStep:
+    """Passo di inizializzazione con il relativo gate"""
+
+    def __init__(self, name: str, func: Callable[[], None], after: Iterable[str]):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.gate = threading.Event()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+
+class Startup:
+    """Esegue i passi di avvio in parallelo rispettando le dipendenze"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger("startup")
+        self.steps: Dict[str, StartupStep] = {}
+        # Eventi notevoli (es. primo comando servito) -> secondi dall'avvio
+        self.marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, func: Callable[[], None], after: Iterable[str] = ()):
+        """
+        Registra un passo di avvio.
+
+        Args:
+            name: Nome del passo e del suo gate
+            func: Funzione di inizializzazione
+            after: Passi da completare prima di questo
+        """
+        self.steps[name] = StartupStep(name, func, after)
+
+    def start(self):
+        """Avvia tutti i passi registrati"""
+        for step in self.steps.values():
+            threading.Thread(target=self._run_step, args=(step,), daemon=True,
+                             name=f"startup-{step.name}").start()
+
+    def _run_step(self, step: StartupStep):
+        for dependency in step.after:
+            self.wait(dependency)
+        step.started = time.perf_counter()
+        try:
+            step.func()
+        except Exception as e:
+            step.error = e
+            self.logger.error(f"Errore avvio {step.name}: {e}\n{traceback.format_exc()}")
+        finally:
+            step.finished = time.perf_counter()
+            step.gate.set()
+        if step.error is None:
+            self.logger.info(f"Avvio {step.name} completato in {step.duration * 1000:.0f} ms")
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        Attende il completamento di un passo (anche se fallito).
+
+        Returns:
+            bool: False se scade il timeout; True per passi non registrati
+        """
+        step = self.steps.get(name)
+        if step is None:
+            return True
+        return step.gate.wait(timeout)
+
+    def is_done(self, name: str) -> bool:
+        """Indica se un passo è completato, senza attendere"""
+        step = self.steps.get(name)
+        return step is None or step.gate.is_set()
+
+    def wait_all(self, timeout: Optional[float] = None) -> bool:
+        """Attende il completamento di tutti i passi"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for name in self.steps:
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            if not self.wait(name, remaining):
+                return False
+        return True
+
+    def mark(self, name: str):
+        """Registra la prima occorrenza di un evento notevole"""
+        with self._lock:
+            if name in self.marks:
+                return
+            self.marks[name] = time.perf_counter() - PROCESS_START
+        self.logger.info(f"{name}: {self.marks[name]:.2f} s dall'avvio")
+
+    def report(self) -> List[str]:
+        """Tempi di avvio dei passi, in secondi dall'avvio del processo"""
+        lines = ["Passi di avvio (inizio, durata):"]
+        for step in sorted(self.steps.values(), key=lambda s: s.started or float('inf')):
+            if step.started is None:
+                lines.append(f"  {step.name:<12} non avviato")
+                continue
+            state = f"  ERRORE: {step.error}" if step.error else ""
+            duration = step.duration
+            duration_text = f"{duration * 1000:7.0f} ms" if duration is not None else "   in corso"
+            lines.append(f"  {step.name:<12} +{step.started - PROCESS_START:6.2f} s {duration_text}{state}")
+        for name, elapsed in self.marks.items():
+            lines.append(f"  {name}: {elapsed:.2f} s")
+        return lines
+
+
+class _TimedLoader:
+    """Loader che misura l'esecuzione del modulo delegando al loader originale"""
+
+    def __init__(self, loader, name: str, timer: 'ImportTimer'):
+        self._loader = loader
+        self._name = name
+        self._timer = timer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = self._timer._stack()
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self._timer._record(self._name, elapsed, elapsed - children)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    Misura il tempo di importazione di ogni modulo.
+
+    Registra per ogni modulo il tempo totale (inclusi i moduli importati a
+    sua volta) e quello proprio, e il thread che lo ha importato.
+    """
+
+    def __init__(self):
+        self.modules: Dict[str, tuple] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[float]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, name: str, total: float, own: float):
+        with self._lock:
+            self.modules[name] = (total, own, threading.current_thread().name)
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, 'searching', False):
+            return None
+        self._local.searching = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.searching = False
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, fullname, self)
+        return spec
+
+    def report(self, limit: int = 15) -> List[str]:
+        """Pacchetti e moduli con il tempo di importazione più alto"""
+        with self._lock:
+            modules = dict(self.modules)
+        packages = defaultdict(float)
+        threads = {}
+        for name, (_, own, thread) in modules.items():
+            top = name.split('.')[0]
+            packages[top] += own
+            threads.setdefault(top, thread)
+
+        total = sum(packages.values())
+        lines = [f"Importazioni: {len(modules)} moduli, {total * 1000:.0f} ms",
+                 "Per pacchetto (tempo proprio dei moduli, thread):"]
+        for top, own in sorted(packages.items(), key=lambda item: -item[1])[:limit]:
+            lines.append(f"  {top:<24} {own * 1000:7.1f} ms  {threads[top]}")
+        lines.append("Moduli più lenti (tempo proprio / totale):")
+        for name, (total_time, own, _) in sorted(modules.items(), key=lambda item: -item[1][1])[:limit]:
+            lines.append(f"  {name:<40} {own * 1000:7.1f} / {total_time * 1000:7.1f} ms")
+        return lines
+
+
+class Gated:
+    """
+    Attributo dell'applicazione disponibile quando il suo passo di avvio è completato.
+
+    La lettura attende il gate del passo nello Startup dell'istanza; se il
+    passo è fallito l'attributo resta None.
+    """
+
+    def __init__(self, step: str):
+        self.step = step
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        startup = instance.__dict__.get('startup')
+        if startup is not None:
+            startup.wait(self.step)
+        return instance.__dict__.get(self.name)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+    def peek(self, instance):
+        """Valore corrente senza attendere il gate"""
+        return instance.__dict__.get(self.name)
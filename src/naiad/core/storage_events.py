@@ -0,0 +1,68 @@
+# storage_events.py
+"""
+Notifiche delle modifiche all'archivio di chat e artefatti.
+
+I gestori pubblicano un evento quando un file è stato scritto o eliminato;
+cache, indici e interfaccia si iscrivono per aggiornarsi in modo
+incrementale invece di rileggere l'intera directory.
+"""
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+# Tipi di elemento
+ARTIFACT = 'artifact'
+CHAT = 'chat'
+
+# Azioni
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+
+@dataclass(frozen=True)
+class StorageEvent:
+    """Modifica di un elemento dell'archivio"""
+    kind: str  # ARTIFACT o CHAT
+    action: str  # INSERT, UPDATE o DELETE
+    name: str  # Nome del file
+
+
+class StorageEvents:
+    """Bus sincrono degli eventi di archivio"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger("storage_events")
+        self._subscribers: List[Callable[[StorageEvent], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[StorageEvent], None]) -> Callable[[], None]:
+        """
+        Registra una funzione chiamata per ogni evento.
+
+        La funzione può essere chiamata dal thread di scrittura: deve essere
+        veloce e thread-safe.
+
+        Returns:
+            Callable: Funzione che annulla l'iscrizione
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def publish(self, kind: str, action: str, name: str):
+        """Notifica un evento a tutti gli iscritti"""
+        event = StorageEvent(kind, action, name)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                self.logger.error(f"Errore nella gestione dell'evento {event}: {e}")
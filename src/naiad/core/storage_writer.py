@@ -0,0 +1,204 @@
+# storage_writer.py
+import os
+import queue
+import tempfile
+import threading
+import logging
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+
+def atomic_write(path: Path, data: Union[str, bytes], encoding: str = 'utf-8'):
+    """
+    Scrive un file in modo atomico: file temporaneo, fsync e rename.
+
+    In caso di crash il file di destinazione contiene la versione precedente
+    oppure quella nuova, mai un contenuto troncato.
+
+    Args:
+        path: Percorso del file da scrivere
+        data: Contenuto da scrivere (testo o bytes)
+        encoding: Codifica usata se data è una stringa
+    """
+    if isinstance(data, str):
+        data = data.encode(encoding)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea file privati: riallinea i permessi a quelli di un file normale
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+    _fsync_directory(path.parent)
+
+
+def _fsync_directory(directory: Path):
+    """Rende persistente il rename sincronizzando la directory (solo POSIX)"""
+    if os.name != 'posix':
+        return
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+class _PendingWrite:
+    """Scrittura in attesa per un singolo file"""
+    __slots__ = ('data', 'futures', 'version')
+
+    def __init__(self, data: Union[str, bytes], future: Future):
+        self.data = data
+        self.futures: List[Future] = [future]
+        self.version = 0
+
+
+class StorageWriter(threading.Thread):
+    """
+    Thread dedicato alla scrittura su disco di chat e artefatti.
+
+    Le richieste vengono accodate in una coda limitata e scritte in modo
+    atomico. Salvataggi ripetuti dello stesso file ancora in attesa vengono
+    accorpati: viene scritta solo l'ultima versione e tutti i future
+    associati vengono completati insieme.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, max_pending: int = 64):
+        super().__init__(daemon=True, name="StorageWriter")
+        self.logger = logger or logging.getLogger("storage_writer")
+        self._queue: "queue.Queue[Optional[Path]]" = queue.Queue(maxsize=max_pending)
+        self._pending: Dict[Path, _PendingWrite] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._stopping = False
+
+    def submit(self, path: Path, data: Union[str, bytes]) -> Future:
+        """
+        Accoda la scrittura di un file.
+
+        Args:
+            path: Percorso del file da scrivere
+            data: Contenuto completo del file
+
+        Returns:
+            Future: Completato con il Path quando il file è persistito su disco
+
+        Raises:
+            RuntimeError: Se il writer è stato fermato
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._stopping:
+                raise RuntimeError("StorageWriter fermato")
+
+            pending = self._pending.get(path)
+            if pending is not None:
+                # Accorpa con la scrittura già in coda
+                pending.data = data
+                pending.futures.append(future)
+                pending.version += 1
+                return future
+
+            self._pending[path] = _PendingWrite(data, future)
+
+        # Blocca solo se la coda è piena (back-pressure)
+        self._queue.put(path)
+        return future
+
+    def is_pending(self, path: Path) -> bool:
+        """Verifica se per il file c'è una scrittura ancora in coda"""
+        with self._lock:
+            return path in self._pending
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attende che tutte le scritture in coda siano completate.
+
+        Args:
+            timeout: Tempo massimo di attesa in secondi
+
+        Returns:
+            bool: True se la coda è stata svuotata entro il timeout
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def run(self):
+        """Loop di scrittura"""
+        while True:
+            path = self._queue.get()
+            if path is None:
+                break
+            self._write_pending(path)
+
+    def _write_pending(self, path: Path):
+        """Scrive l'ultima versione in coda per un file e completa i future"""
+        while True:
+            with self._lock:
+                pending = self._pending.get(path)
+                if pending is None:
+                    return
+                data, version = pending.data, pending.version
+                futures = list(pending.futures)
+
+            error = None
+            try:
+                atomic_write(path, data)
+            except Exception as e:
+                error = e
+                self.logger.error(f"Errore scrittura {path}: {e}")
+
+            with self._lock:
+                done = pending.version == version
+                if done:
+                    del self._pending[path]
+                else:
+                    # Una nuova versione è arrivata durante la scrittura
+                    pending.futures = pending.futures[len(futures):]
+                if not self._pending:
+                    self._idle.notify_all()
+
+            for future in futures:
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(path)
+
+            if done:
+                return
+
+    def stop(self, timeout: Optional[float] = 10):
+        """
+        Ferma il writer dopo aver scritto tutto ciò che è in coda.
+
+        Args:
+            timeout: Tempo massimo di attesa in secondi
+        """
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+
+        if not self.is_alive():
+            return
+
+        if not self.flush(timeout):
+            self.logger.warning("Timeout svuotamento coda StorageWriter")
+        self._queue.put(None)
+        self.join(timeout)
+        self.logger.info("StorageWriter fermato")
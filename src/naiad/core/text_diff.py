@@ -0,0 +1,153 @@
+# text_diff.py
+"""
+Differenze per paragrafi e frasi tra due versioni di un testo.
+
+Usato per rileggere solo le parti modificate di un artefatto: prima si
+confrontano i paragrafi, poi, per i paragrafi cambiati, le singole frasi.
+"""
+import difflib
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+_PARAGRAPH_SPLIT = re.compile(r'\n\s*\n')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+|\n+')
+
+
+@dataclass
+class ChangedPassage:
+    """Un passaggio modificato tra due versioni di un testo"""
+    kind: str  # 'inserted', 'modified' o 'deleted'
+    paragraph: int  # Posizione (1-based) del paragrafo nella nuova versione
+    sentences: List[str] = field(default_factory=list)
+    context: Optional[str] = None  # Frase invariata che precede la modifica
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Divide un testo in paragrafi separati da righe vuote"""
+    paragraphs = [p.strip() for p in _PARAGRAPH_SPLIT.split(text)]
+    return [p for p in paragraphs if p]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Divide un testo in frasi"""
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text)]
+    return [s for s in sentences if s]
+
+
+def _normalize(text: str) -> str:
+    """Normalizza gli spazi per non segnalare come modifiche i soli a capo"""
+    return ' '.join(text.split())
+
+
+def diff_passages(old: str, new: str) -> List[ChangedPassage]:
+    """
+    Calcola i passaggi inseriti, modificati ed eliminati tra due testi.
+
+    Args:
+        old: Versione precedente
+        new: Nuova versione
+
+    Returns:
+        List[ChangedPassage]: Modifiche nell'ordine del nuovo testo
+    """
+    old_paragraphs = split_paragraphs(old)
+    new_paragraphs = split_paragraphs(new)
+    matcher = difflib.SequenceMatcher(
+        None,
+        [_normalize(p) for p in old_paragraphs],
+        [_normalize(p) for p in new_paragraphs],
+        autojunk=False
+    )
+
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+
+        previous = split_sentences(new_paragraphs[j1 - 1])[-1:] if j1 > 0 else []
+        context = previous[0] if previous else None
+
+        if tag == 'insert':
+            changes.append(ChangedPassage(
+                'inserted', j1 + 1,
+                [s for p in new_paragraphs[j1:j2] for s in split_sentences(p)],
+                context
+            ))
+        elif tag == 'delete':
+            changes.append(ChangedPassage(
+                'deleted', j1 + 1,
+                [s for p in old_paragraphs[i1:i2] for s in split_sentences(p)],
+                context
+            ))
+        else:
+            changes.extend(_diff_sentences(
+                '\n\n'.join(old_paragraphs[i1:i2]),
+                '\n\n'.join(new_paragraphs[j1:j2]),
+                j1 + 1,
+                context
+            ))
+    return changes
+
+
+def _diff_sentences(old: str, new: str, paragraph: int, context: Optional[str]) -> List[ChangedPassage]:
+    """Confronta frase per frase un gruppo di paragrafi sostituiti"""
+    old_sentences = split_sentences(old)
+    new_sentences = split_sentences(new)
+    matcher = difflib.SequenceMatcher(
+        None,
+        [_normalize(s) for s in old_sentences],
+        [_normalize(s) for s in new_sentences],
+        autojunk=False
+    )
+
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        sentence_context = new_sentences[j1 - 1] if j1 > 0 else context
+        if tag == 'delete':
+            changes.append(ChangedPassage('deleted', paragraph, old_sentences[i1:i2], sentence_context))
+        else:
+            kind = 'inserted' if tag == 'insert' else 'modified'
+            changes.append(ChangedPassage(kind, paragraph, new_sentences[j1:j2], sentence_context))
+    return changes
+
+
+def changes_to_speech(changes: List[ChangedPassage], with_context: bool = True) -> List[str]:
+    """
+    Prepara le frasi da leggere per presentare le modifiche.
+
+    Le frasi vengono restituite separatamente, così il TTS può riusare
+    l'audio già sintetizzato per quelle invariate.
+
+    Args:
+        changes: Modifiche calcolate da diff_passages
+        with_context: Se True, legge anche la frase che precede ogni modifica
+
+    Returns:
+        List[str]: Frasi da leggere in sequenza
+    """
+    if not changes:
+        return ["Non ci sono modifiche rispetto alla versione precedente."]
+
+    count = len(changes)
+    segments = [f"Ci sono {count} modifiche." if count > 1 else "C'è una modifica."]
+    labels = {
+        'inserted': "Aggiunto",
+        'modified': "Modificato",
+        'deleted': "Eliminato"
+    }
+    for change in changes:
+        segments.append(f"{labels[change.kind]}, paragrafo {change.paragraph}.")
+        if with_context and change.context:
+            segments.append("Dopo:")
+            segments.append(change.context)
+        if change.kind == 'deleted':
+            # Del testo eliminato basta l'inizio per riconoscerlo
+            first_words = ' '.join(change.sentences[0].split()[:6]) if change.sentences else ''
+            if first_words:
+                segments.append(f"Il testo eliminato iniziava con: {first_words}")
+        else:
+            segments.extend(change.sentences)
+    return segments
@@ -0,0 +1,321 @@
+# tracing.py
+"""
+Misura dei tempi di risposta lungo la catena trigger -> AI -> TTS -> GRID3.
+
+Ogni comando tracciato riceve un id (trace id) e registra le proprie fasi
+(span) con tempi monotoni. Le fasi sono aperte con `span(nome)` anche da
+moduli che non conoscono il comando in corso (provider AI, TTS): la
+traccia attiva è quella del thread, e fuori da una traccia `span` non fa
+nulla.
+
+Il tempo totale parte dalla pressione del pulsante: i file .cmd scrivono
+`%DATE% %TIME%` nel file trigger, letto all'inizio della traccia (se il
+formato non è riconosciuto si usa la data di modifica del file).
+
+Le durate alimentano istogrammi per modalità e fase, salvati in
+logs/metrics.json e consultabili con `naiad stats`.
+"""
+import json
+import logging
+import math
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from naiad.core.storage_writer import atomic_write
+
+# Fase dalla pressione del pulsante all'inizio dell'elaborazione
+DETECTION = "rilevamento"
+# Durata complessiva, dalla pressione alla fine del comando
+TOTAL = "totale"
+
+# Pressioni più vecchie di così non sono considerate (orologio cambiato, file residuo)
+MAX_PRESS_AGE = timedelta(hours=1)
+
+_DATE = re.compile(r'(\d{1,4})[/.-](\d{1,2})[/.-](\d{1,4})')
+_TIME = re.compile(r'(\d{1,2}):(\d{2}):(\d{2})(?:[.,](\d{1,3}))?')
+
+_local = threading.local()
+
+
+def parse_press_time(text: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Interpreta il `%DATE% %TIME%` scritto dai file .cmd.
+
+    Il formato dipende dalle impostazioni internazionali di Windows
+    (es. '19/10/2026 9:05:01,23' o 'Mon 10/19/2026  9:05:01.23'): tra le
+    interpretazioni possibili di giorno, mese e anno si sceglie la più
+    vicina all'ora attuale.
+
+    Returns:
+        datetime: Momento della pressione, o None se non riconosciuto
+    """
+    now = now or datetime.now()
+    date_match = _DATE.search(text)
+    time_match = _TIME.search(text)
+    if not date_match or not time_match:
+        return None
+
+    a, b, c = (int(part) for part in date_match.groups())
+    hours, minutes, seconds = (int(part) for part in time_match.groups()[:3])
+    fraction = time_match.group(4) or '0'
+    microseconds = int(fraction.ljust(6, '0'))
+
+    candidates = []
+    for year, month, day in ((c, b, a), (c, a, b), (a, b, c)):
+        if year < 100:
+            year += 2000
+        try:
+            candidates.append(datetime(year, month, day, hours, minutes, seconds, microseconds))
+        except ValueError:
+            continue
+    if not candidates:
+        return None
+    best = min(candidates, key=lambda candidate: abs(now - candidate))
+    return best if abs(now - best) <= MAX_PRESS_AGE else None
+
+
+def read_press_time(trigger_file: Path) -> Optional[datetime]:
+    """Momento della pressione del pulsante che ha creato il file trigger"""
+    try:
+        pressed = parse_press_time(trigger_file.read_text(encoding='utf-8', errors='replace'))
+        if pressed is None:
+            pressed = datetime.fromtimestamp(trigger_file.stat().st_mtime)
+        return pressed
+    except OSError:
+        return None
+
+
+class Histogram:
+    """
+    Istogramma a scala logaritmica delle durate in millisecondi.
+
+    Ogni intervallo è il 10% più ampio del precedente, quindi i percentili
+    hanno un errore relativo inferiore al 5% con poche centinaia di contatori.
+    """
+
+    GROWTH = 1.1
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None, count: int = 0, total: float = 0.0,
+                 maximum: float = 0.0):
+        self.buckets: Dict[int, int] = dict(buckets or {})
+        self.count = count
+        self.total = total
+        self.maximum = maximum
+
+    def add(self, milliseconds: float):
+        index = 0 if milliseconds < 1 else int(math.log(milliseconds, self.GROWTH)) + 1
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += milliseconds
+        self.maximum = max(self.maximum, milliseconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Valore (ms) sotto cui cade la frazione indicata delle misure"""
+        if not self.count:
+            return 0.0
+        threshold = fraction * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= threshold:
+                # Centro geometrico dell'intervallo
+                return 0.5 if index == 0 else min(self.GROWTH ** (index - 0.5), self.maximum)
+        return self.maximum
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'total': round(self.total, 3), 'max': round(self.maximum, 3),
+                'buckets': {str(index): count for index, count in sorted(self.buckets.items())}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Histogram':
+        return cls({int(index): count for index, count in data.get('buckets', {}).items()},
+                   data.get('count', 0), data.get('total', 0.0), data.get('max', 0.0))
+
+
+class MetricsStore:
+    """Istogrammi delle durate per modalità e fase, salvati su file"""
+
+    def __init__(self, path: Path, logger: Optional[logging.Logger] = None):
+        self.path = path
+        self.logger = logger or logging.getLogger("tracing")
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Metriche non leggibili in {self.path}: {e}")
+            return
+        for mode, stages in data.get('modes', {}).items():
+            for stage, histogram in stages.items():
+                self._histograms[(mode, stage)] = Histogram.from_dict(histogram)
+
+    def record(self, mode: str, stage: str, milliseconds: float):
+        with self._lock:
+            histogram = self._histograms.get((mode, stage))
+            if histogram is None:
+                histogram = self._histograms[(mode, stage)] = Histogram()
+            histogram.add(milliseconds)
+            self._dirty = True
+
+    def histograms(self) -> Dict[Tuple[str, str], Histogram]:
+        with self._lock:
+            return {key: Histogram.from_dict(histogram.to_dict()) for key, histogram in self._histograms.items()}
+
+    def save(self):
+        """Scrive le metriche su disco se sono cambiate"""
+        with self._lock:
+            if not self._dirty:
+                return
+            modes: Dict[str, dict] = {}
+            for (mode, stage), histogram in sorted(self._histograms.items()):
+                modes.setdefault(mode, {})[stage] = histogram.to_dict()
+            self._dirty = False
+        data = {'updated': datetime.now().isoformat(timespec='seconds'), 'modes': modes}
+        try:
+            atomic_write(self.path, json.dumps(data, indent=1))
+        except OSError as e:
+            self.logger.warning(f"Impossibile salvare le metriche: {e}")
+
+
+class Trace:
+    """Traccia di un comando: id, modalità e fasi misurate"""
+
+    def __init__(self, command: str, mode: str, pressed: Optional[datetime] = None):
+        self.trace_id = uuid.uuid4().hex[:8]
+        self.command = command
+        self.mode = mode
+        self.started = time.perf_counter()
+        # Secondi tra la pressione del pulsante e l'inizio dell'elaborazione
+        self.detection: Optional[float] = None
+        if pressed is not None:
+            self.detection = max(0.0, (datetime.now() - pressed).total_seconds())
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def add(self, name: str, start: float, end: float):
+        self.spans.append((name, start, end))
+
+    def durations(self) -> Dict[str, float]:
+        """Durata (ms) di ogni fase; le fasi ripetute vengono sommate"""
+        result: Dict[str, float] = {}
+        if self.detection is not None:
+            result[DETECTION] = self.detection * 1000
+        for name, start, end in self.spans:
+            result[name] = result.get(name, 0.0) + (end - start) * 1000
+        return result
+
+
+def current_trace() -> Optional[Trace]:
+    """Traccia attiva nel thread corrente"""
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Misura una fase della traccia attiva; senza traccia non fa nulla"""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter())
+
+
+class TraceLogFilter(logging.Filter):
+    """Aggiunge ai record di log l'id della traccia attiva (campi 'trace' e 'trace_id')"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        record.trace = f"[{trace.trace_id}] " if trace else ""
+        record.trace_id = trace.trace_id if trace else None
+        return True
+
+
+class Tracer:
+    """Apre le tracce dei comandi e ne registra le durate"""
+
+    def __init__(self, metrics: MetricsStore, logger: Optional[logging.Logger] = None):
+        self.metrics = metrics
+        self.logger = logger or logging.getLogger("tracing")
+
+    @contextmanager
+    def trace(self, command: str, mode: str, trigger_file: Optional[Path] = None) -> Iterator[Trace]:
+        """
+        Traccia un comando eseguito nel thread corrente.
+
+        Args:
+            command: Nome del comando (es. 'process')
+            mode: Modalità attiva
+            trigger_file: File trigger con l'ora della pressione del pulsante
+        """
+        pressed = read_press_time(trigger_file) if trigger_file else None
+        trace = Trace(command, mode, pressed)
+        previous = current_trace()
+        _local.trace = trace
+        try:
+            yield trace
+        finally:
+            _local.trace = previous
+            self._finish(trace)
+
+    def _finish(self, trace: Trace):
+        durations = trace.durations()
+        elapsed = (time.perf_counter() - trace.started) * 1000
+        durations[TOTAL] = elapsed + durations.get(DETECTION, 0.0)
+        for stage, milliseconds in durations.items():
+            self.metrics.record(trace.mode, stage, milliseconds)
+        self.metrics.save()
+        stages = ", ".join(f"{stage} {milliseconds:.0f}" for stage, milliseconds in durations.items()
+                           if stage != TOTAL)
+        self.logger.info(f"[{trace.trace_id}] {trace.command} ({trace.mode}): "
+                         f"{durations[TOTAL]:.0f} ms dalla pressione ({stages})")
+
+
+def format_stats(metrics: MetricsStore) -> List[str]:
+    """Tabella dei percentili per modalità e fase"""
+    histograms = metrics.histograms()
+    if not histograms:
+        return ["Nessuna misura registrata."]
+    lines = [f"{'modalità':<18} {'fase':<14} {'n':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)"]
+    for mode in sorted({mode for mode, _ in histograms}):
+        stages = sorted((stage for m, stage in histograms if m == mode),
+                        key=lambda stage: (stage == TOTAL, stage != DETECTION, stage))
+        for stage in stages:
+            histogram = histograms[(mode, stage)]
+            lines.append(f"{mode:<18} {stage:<14} {histogram.count:>6} "
+                         f"{histogram.percentile(0.5):>8.0f} {histogram.percentile(0.9):>8.0f} "
+                         f"{histogram.percentile(0.99):>8.0f} {histogram.maximum:>8.0f}")
+    return lines
+
+
+def cli(argv: List[str], metrics_path: Path) -> int:
+    """
+    Comando `naiad stats`: stampa i percentili dei tempi di risposta.
+
+    Opzioni:
+        --reset  Azzera le misure registrate
+    """
+    if '--reset' in argv:
+        metrics_path.unlink(missing_ok=True)
+        print("Misure azzerate.")
+        return 0
+    print("\n".join(format_stats(MetricsStore(metrics_path))))
+    return 0
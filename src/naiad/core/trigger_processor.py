@@ -14,137 +14,174 @@ class TriggerProcessor(threading.Thread):
         self.running = True
         self.logger = app.logger
 
+    def _accept(self, trigger_file: Path) -> bool:
+        """Vero se il trigger è presente; conferma subito la pressione con un segnale sonoro"""
+        if not trigger_file.exists():
+            return False
+        self.app.acknowledge()
+        return True
+
     def run(self):
         """Loop principale per la gestione dei trigger"""
         while self.running:
             try:
                 # Gestione dei file trigger
                 trigger_files = self.app.trigger_files
+                idle = False
 
-                if trigger_files["clean_history"].exists():
+                if self._accept(trigger_files["clean_history"]):
                     try:
-                        self.app.context["history"] = []
+                        self.app.clean_history()
                     finally:
                         trigger_files["clean_history"].unlink(missing_ok=True)
-                elif trigger_files["process"].exists():
+                elif self._accept(trigger_files["process"]):
                     try:
-                        self.app.process_clipboard()
+                        with self.app.tracer.trace("process", self.app.current_mode.value, trigger_files["process"]):
+                            self.app.process_clipboard()
                     finally:
                         trigger_files["process"].unlink(missing_ok=True)
                 # Gestione modalità
-                elif trigger_files["mode_chat"].exists():
+                elif self._accept(trigger_files["mode_chat"]):
                     try:
                         self.app.handle_mode(SessionStyle.CHAT)
                     finally:
                         trigger_files["mode_chat"].unlink(missing_ok=True)
-                elif trigger_files["mode_explore"].exists():
+                elif self._accept(trigger_files["mode_explore"]):
                     try:
                         self.app.handle_mode(SessionStyle.EXPLORATION)
                     finally:
                         trigger_files["mode_explore"].unlink(missing_ok=True)
-                elif trigger_files["mode_translate"].exists():
+                elif self._accept(trigger_files["mode_translate"]):
                     try:
                         self.app.handle_mode(SessionStyle.TRANSLATION)
                     finally:
                         trigger_files["mode_translate"].unlink(missing_ok=True)
-                elif trigger_files["mode_write"].exists():
+                elif self._accept(trigger_files["mode_write"]):
                     try:
                         self.app.handle_mode(SessionStyle.ARTICLE_WRITING)
                     finally:
                         trigger_files["mode_write"].unlink(missing_ok=True)
-                elif trigger_files["mode_create"].exists():
+                elif self._accept(trigger_files["mode_create"]):
                     try:
                         self.app.handle_mode(SessionStyle.CREATIVE_WRITING)
                     finally:
                         trigger_files["mode_create"].unlink(missing_ok=True)
                 # Controlli TTS
-                elif trigger_files['tts_pause'].exists():
+                elif self._accept(trigger_files['tts_pause']):
                     try:
                         self.app.tts.pause()
                     finally:    
                         trigger_files['tts_pause'].unlink(missing_ok=True)
-                elif trigger_files['tts_resume'].exists():
+                elif self._accept(trigger_files['tts_resume']):
                     try:
                         self.app.tts.resume()
                     finally:
                         trigger_files['tts_resume'].unlink(missing_ok=True)
-                elif trigger_files['tts_stop'].exists():
+                elif self._accept(trigger_files['tts_stop']):
                     try:
                         self.app.tts.stop()
                     finally:
                         trigger_files['tts_stop'].unlink(missing_ok=True)
-                elif trigger_files['tts_restart'].exists():
+                elif self._accept(trigger_files['tts_restart']):
                     try:
                         self.app.tts.restart()
                     finally:
                         trigger_files['tts_restart'].unlink(missing_ok=True)
                 # Controllo translate
-                elif trigger_files['retry'].exists():
+                elif self._accept(trigger_files['retry']):
                     try:
-                        self.app.retryTranslation()
+                        with self.app.tracer.trace("retry", self.app.current_mode.value, trigger_files['retry']):
+                            self.app.retryTranslation()
                     finally:
                         trigger_files['retry'].unlink(missing_ok=True)
                 # Gestione artefatti e chat
-                elif trigger_files['print_artifact'].exists():
+                elif self._accept(trigger_files['print_artifact']):
                     try:
                         self.app.print_session_content()
                     finally:
                         trigger_files['print_artifact'].unlink(missing_ok=True)
-                elif trigger_files['list_artifact'].exists():
+                elif self._accept(trigger_files['list_artifact']):
                     try:
                         self.app.list_artifact()
                     finally:
                         trigger_files['list_artifact'].unlink(missing_ok=True)
-                elif trigger_files['read_artifact'].exists():
+                elif self._accept(trigger_files['read_artifact']):
                     try:
                         self.app.read_artifact()
                     finally:
                         trigger_files['read_artifact'].unlink(missing_ok=True)
-                elif trigger_files['resume_creative_artifact'].exists():
+                elif self._accept(trigger_files['read_changes']):
+                    try:
+                        self.app.read_artifact_changes()
+                    finally:
+                        trigger_files['read_changes'].unlink(missing_ok=True)
+                elif self._accept(trigger_files['find_similar']):
+                    try:
+                        self.app.find_similar()
+                    finally:
+                        trigger_files['find_similar'].unlink(missing_ok=True)
+                elif self._accept(trigger_files['resume_creative_artifact']):
                     try:
                         self.app.resume_creative_artifact()
                     finally:
                         trigger_files['resume_creative_artifact'].unlink(missing_ok=True)
-                elif trigger_files['resume_article_artifact'].exists():
+                elif self._accept(trigger_files['resume_article_artifact']):
                     try:
                         self.app.resume_article_artifact()
                     finally:
                         trigger_files['resume_article_artifact'].unlink(missing_ok=True)
-                elif trigger_files['delete_artifact'].exists():
+                elif self._accept(trigger_files['delete_artifact']):
                     try:
                         self.app.delete_artifact()
                     finally:
                         trigger_files['delete_artifact'].unlink(missing_ok=True)
-                elif trigger_files['save_chat'].exists():
+                elif self._accept(trigger_files['save_chat']):
                     try:
                         self.app.save_current_chat()
                     finally:
                         trigger_files['save_chat'].unlink(missing_ok=True)
-                elif trigger_files['list_chats'].exists():
+                elif self._accept(trigger_files['list_chats']):
                     try:
                         self.app.list_saved_chats()
                     finally:
                         trigger_files['list_chats'].unlink(missing_ok=True)
-                elif trigger_files['read_chat'].exists():
+                elif self._accept(trigger_files['read_chat']):
                     try:
                         self.app.read_saved_chat()
                     finally:
                         trigger_files['read_chat'].unlink(missing_ok=True)
-                elif trigger_files['resume_chat'].exists():
+                elif self._accept(trigger_files['resume_chat']):
                     try:
                         self.app.resume_saved_chat()
                     finally:
                         trigger_files['resume_chat'].unlink(missing_ok=True)
-                elif trigger_files['delete_chat'].exists():
+                elif self._accept(trigger_files['delete_chat']):
                     try:
                         self.app.delete_chat()
                     finally:
                         trigger_files['delete_chat'].unlink(missing_ok=True)
-                elif trigger_files['prepare_whatsapp'].exists():
+                elif self._accept(trigger_files['prepare_whatsapp']):
                     try:
                         self.app.prepare_whatsapp_message()
                     finally:
                         trigger_files['prepare_whatsapp'].unlink(missing_ok=True)
+                elif self._accept(trigger_files['open_manager']):
+                    try:
+                        self.app.open_manager()
+                    finally:
+                        trigger_files['open_manager'].unlink(missing_ok=True)
+                elif self._accept(trigger_files['profile']):
+                    try:
+                        self.app.start_profile(announce=True)
+                    finally:
+                        trigger_files['profile'].unlink(missing_ok=True)
+                else:
+                    idle = True
+
+                if not idle:
+                    # Comando appena eseguito: i lavori in background aspettano
+                    self.app.last_activity = time.monotonic()
+                    self.app.startup.mark("primo comando servito")
 
                 # Breve pausa per ridurre l'uso della CPU
                 time.sleep(0.1)
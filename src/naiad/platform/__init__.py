@@ -0,0 +1,60 @@
+# naiad/platform/__init__.py
+"""
+Servizi dipendenti dal sistema operativo.
+
+Il backend si sceglie con la variabile d'ambiente NAIAD_PLATFORM
+(windows, linux, fake); altrimenti si usa quello del sistema corrente.
+"""
+import os
+import sys
+import threading
+from typing import Optional
+
+from naiad.platform.base import Platform
+
+_platform: Optional[Platform] = None
+_lock = threading.Lock()
+
+
+def create_platform(name: Optional[str] = None, logger=None) -> Platform:
+    """
+    Crea il backend di piattaforma indicato.
+
+    Args:
+        name: windows, linux o fake; None per NAIAD_PLATFORM o il sistema corrente
+        logger: Logger per la registrazione degli eventi
+
+    Raises:
+        ValueError: Se il backend non esiste
+    """
+    name = (name or os.environ.get('NAIAD_PLATFORM') or
+            ('windows' if sys.platform == 'win32' else 'linux')).lower()
+    if name == 'windows':
+        from naiad.platform.windows import WindowsPlatform
+        return WindowsPlatform(logger)
+    if name == 'linux':
+        from naiad.platform.linux import LinuxPlatform
+        return LinuxPlatform(logger)
+    if name == 'fake':
+        from naiad.platform.fake import FakePlatform
+        return FakePlatform(logger)
+    raise ValueError(f"Piattaforma non supportata: {name}")
+
+
+def get_platform() -> Platform:
+    """Restituisce il backend di piattaforma del processo, creandolo al primo uso"""
+    global _platform
+    with _lock:
+        if _platform is None:
+            _platform = create_platform()
+        return _platform
+
+
+def set_platform(platform: Platform):
+    """Sostituisce il backend del processo (test e misure di prestazioni)"""
+    global _platform
+    with _lock:
+        _platform = platform
+
+
+__all__ = ['Platform', 'create_platform', 'get_platform', 'set_platform']
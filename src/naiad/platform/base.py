@@ -0,0 +1,120 @@
+# naiad/platform/base.py
+"""Interfaccia dei servizi che dipendono dal sistema operativo"""
+import os
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+
+class Platform(ABC):
+    """
+    Servizi del sistema operativo usati dal backend: clipboard, notifica a
+    GRID3, directory dei dati e lock di istanza singola.
+    """
+
+    # Nome del backend, usato nei log e nella selezione tramite NAIAD_PLATFORM
+    name = "base"
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger("platform")
+
+    # Directory
+
+    @abstractmethod
+    def data_root(self) -> Path:
+        """Directory radice dei dati dell'applicazione"""
+
+    # File privati
+
+    def restrict_to_user(self, path: Path):
+        """Rende un file leggibile e scrivibile solo dall'utente corrente"""
+        os.chmod(path, 0o600)
+
+    def write_private(self, path: Path, data: bytes):
+        """
+        Scrive in modo atomico un file segreto (es. la chiave del canale IPC)
+        accessibile solo all'utente corrente.
+
+        I permessi sono applicati al file temporaneo prima di scriverci,
+        quindi il contenuto non è mai leggibile da altri utenti.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+        try:
+            self.restrict_to_user(Path(tmp_name))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+
+    # Clipboard
+
+    @abstractmethod
+    def get_clipboard(self) -> str:
+        """Legge il testo nella clipboard"""
+
+    @abstractmethod
+    def set_clipboard(self, text: str):
+        """Scrive il testo nella clipboard"""
+
+    @abstractmethod
+    def clipboard_sequence(self) -> int:
+        """
+        Numero di sequenza della clipboard.
+
+        Cambia ogni volta che il contenuto della clipboard cambia, così si può
+        sapere se c'è un testo nuovo senza leggerlo e confrontarlo.
+        """
+
+    # GRID3
+
+    @abstractmethod
+    def notify_grid3(self):
+        """Segnala a GRID3 che la risposta è pronta (pressione di F2)"""
+
+    # Istanza singola
+
+    def process_alive(self, pid: int) -> bool:
+        """Indica se il processo con il pid indicato è in esecuzione"""
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        except OSError:
+            return False
+        return True
+
+    def acquire_lock(self, lock_file: Path) -> bool:
+        """
+        Acquisisce il lock di istanza singola.
+
+        Il file contiene il pid del processo; un lock lasciato da un processo
+        terminato viene sostituito.
+
+        Returns:
+            bool: False se un'altra istanza è in esecuzione
+        """
+        try:
+            pid = int(lock_file.read_text().strip())
+            if pid != os.getpid() and self.process_alive(pid):
+                return False
+        except (FileNotFoundError, ValueError):
+            pass
+        lock_file.parent.mkdir(parents=True, exist_ok=True)
+        lock_file.write_text(str(os.getpid()))
+        return True
+
+    def release_lock(self, lock_file: Path):
+        """Rilascia il lock di istanza singola"""
+        lock_file.unlink(missing_ok=True)
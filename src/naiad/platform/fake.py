@@ -0,0 +1,83 @@
+# naiad/platform/fake.py
+"""Piattaforma in memoria per test e misure di prestazioni senza interfaccia"""
+import os
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from naiad.platform.base import Platform
+
+
+class FakePlatform(Platform):
+    """
+    Backend in memoria: la clipboard è una variabile, le notifiche a GRID3
+    vengono registrate e i dati vanno in una directory temporanea.
+
+    Senza audio l'applicazione usa NullTTSProvider; con audio=True usa il
+    provider TTS configurato (ad esempio con SDL_AUDIODRIVER=dummy).
+    """
+
+    name = "fake"
+
+    # Notifiche mantenute in memoria per le verifiche
+    MAX_NOTIFICATIONS = 1000
+
+    def __init__(self, logger: Optional[logging.Logger] = None, data_root: Optional[Path] = None,
+                 audio: bool = False):
+        super().__init__(logger)
+        self._data_root = data_root
+        self.audio = audio
+        self._lock = threading.Lock()
+        self._clipboard = ""
+        self._sequence = 0
+        self._locks = set()
+        # Contenuto della clipboard alle ultime notifiche a GRID3
+        self.notifications: List[str] = []
+        self.notification_count = 0
+        self.notified = threading.Condition(self._lock)
+
+    def data_root(self) -> Path:
+        if self._data_root is None:
+            self._data_root = Path(tempfile.mkdtemp(prefix='naiad-')) / 'NAIAD'
+        return self._data_root
+
+    def get_clipboard(self) -> str:
+        with self._lock:
+            return self._clipboard
+
+    def set_clipboard(self, text: str):
+        with self._lock:
+            self._clipboard = text
+            self._sequence += 1
+
+    def clipboard_sequence(self) -> int:
+        with self._lock:
+            return self._sequence
+
+    def notify_grid3(self):
+        with self._lock:
+            self.notifications.append(self._clipboard)
+            del self.notifications[:-self.MAX_NOTIFICATIONS]
+            self.notification_count += 1
+            self.notified.notify_all()
+
+    def wait_notification(self, count: int, timeout: Optional[float] = None) -> bool:
+        """Attende che GRID3 abbia ricevuto almeno count notifiche"""
+        with self._lock:
+            return self.notified.wait_for(lambda: self.notification_count >= count, timeout)
+
+    def acquire_lock(self, lock_file: Path) -> bool:
+        with self._lock:
+            if lock_file in self._locks:
+                return False
+            self._locks.add(lock_file)
+        lock_file.parent.mkdir(parents=True, exist_ok=True)
+        lock_file.write_text(str(os.getpid()))
+        return True
+
+    def release_lock(self, lock_file: Path):
+        with self._lock:
+            self._locks.discard(lock_file)
+        lock_file.unlink(missing_ok=True)
@@ -0,0 +1,112 @@
+# naiad/platform/windows.py
+"""Servizi di piattaforma per Windows"""
+import os
+import ctypes
+import logging
+from ctypes import wintypes
+from pathlib import Path
+from typing import Optional
+
+import pyperclip
+
+from naiad.platform.base import Platform
+
+KEYEVENTF_KEYUP = 0x0002
+INPUT_KEYBOARD = 1
+VK_F2 = 0x71
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+STILL_ACTIVE = 259
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", ctypes.c_ushort),
+        ("wScan", ctypes.c_ushort),
+        ("dwFlags", ctypes.c_ulong),
+        ("time", ctypes.c_ulong),
+        ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))
+    ]
+
+
+class INPUT_UNION(ctypes.Union):
+    _fields_ = [("ki", KEYBDINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_ulong),
+        ("ii", INPUT_UNION)
+    ]
+
+
+class WindowsPlatform(Platform):
+    """Backend Windows: clipboard di sistema, SendInput e ProgramData"""
+
+    name = "windows"
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        super().__init__(logger)
+        user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+
+        self._send_input = user32.SendInput
+        self._send_input.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        self._send_input.restype = wintypes.UINT
+        self._clipboard_sequence = user32.GetClipboardSequenceNumber
+        self._clipboard_sequence.restype = wintypes.DWORD
+
+        # Pressione e rilascio di F2 preparati una sola volta
+        self._f2_inputs = (INPUT * 2)(
+            INPUT(INPUT_KEYBOARD, INPUT_UNION(ki=KEYBDINPUT(VK_F2, 0, 0, 0, None))),
+            INPUT(INPUT_KEYBOARD, INPUT_UNION(ki=KEYBDINPUT(VK_F2, 0, KEYEVENTF_KEYUP, 0, None)))
+        )
+        self._input_size = ctypes.sizeof(INPUT)
+
+    def data_root(self) -> Path:
+        return Path(os.environ.get('PROGRAMDATA', 'C:/ProgramData')) / 'NAIAD'
+
+    def restrict_to_user(self, path: Path):
+        """
+        Sostituisce i permessi del file con un solo accesso, per l'utente
+        del processo: ProgramData è leggibile da tutti gli utenti locali e
+        chmod non modifica le ACL di Windows.
+        """
+        import ntsecuritycon
+        import win32api
+        import win32security
+
+        token = win32security.OpenProcessToken(win32api.GetCurrentProcess(), win32security.TOKEN_QUERY)
+        user_sid = win32security.GetTokenInformation(token, win32security.TokenUser)[0]
+        dacl = win32security.ACL()
+        dacl.AddAccessAllowedAce(win32security.ACL_REVISION, ntsecuritycon.FILE_ALL_ACCESS, user_sid)
+        # DACL protetta: nessun permesso ereditato dalla directory
+        win32security.SetNamedSecurityInfo(
+            str(path), win32security.SE_FILE_OBJECT,
+            win32security.DACL_SECURITY_INFORMATION | win32security.PROTECTED_DACL_SECURITY_INFORMATION,
+            None, None, dacl, None)
+
+    def get_clipboard(self) -> str:
+        return pyperclip.paste() or ""
+
+    def set_clipboard(self, text: str):
+        pyperclip.copy(text)
+
+    def clipboard_sequence(self) -> int:
+        return self._clipboard_sequence()
+
+    def notify_grid3(self):
+        sent = self._send_input(len(self._f2_inputs), self._f2_inputs, self._input_size)
+        if sent != len(self._f2_inputs):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    def process_alive(self, pid: int) -> bool:
+        handle = self._kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = wintypes.DWORD()
+            if not self._kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            self._kernel32.CloseHandle(handle)
@@ -1,9 +1,27 @@
-import pyperclip
 import logging
 from datetime import datetime
 from pathlib import Path
 from typing import Dict
 from naiad.ai.base import SessionStyle  # Aggiunto import di SessionStyle
+from naiad.ai.anthropic_components import AnthropicContextManager
+from naiad.core.storage_events import ARTIFACT, CHAT
+from naiad.core.jobs import SPEECH
+
+# Metodi dell'Api chiamati dalla finestra di gestione
+UI_METHODS = (
+    'list_artifacts', 'query_artifacts', 'read_artifact', 'resume_creative_artifact',
+    'resume_article_artifact', 'delete_artifact', 'read_artifacts_page',
+    'list_artifact_versions', 'read_artifact_version', 'find_similar',
+    'list_chats', 'query_chats', 'read_chat', 'delete_chat', 'resume_chat', 'read_chats_page',
+    'tts_speak', 'tts_stop', 'tts_restart', 'tts_resume', 'tts_pause', 'tts_mute', 'tts_unmute',
+    'manager_snapshot', 'close_window', 'get_asset_path'
+)
+
+# Metodi dell'Api richiamabili solo tramite IPC (comandi di diagnostica)
+DIAGNOSTIC_METHODS = ('start_profile',)
+
+# Elementi per pagina della finestra di gestione (ITEMS_PER_PAGE in unified-list.html)
+MANAGER_PAGE_SIZE = 5
 
 class Api:
     """
@@ -23,17 +41,18 @@ class Api:
 
     # Metodi TTS (Text-to-Speech)
     def tts_speak(self, text: str):
-        """Sintetizza il testo in voce"""
-        try:
-            self.app.tts.speak(text)
-            return {'success': True}
-        except Exception as e:
-            self.logger.error(f"Error speaking text: {e}")
-            return {'success': False, 'error': str(e)}
+        """Sintetizza il testo in voce (in background)"""
+        return self._start('tts_speak', text)
+
+    def _tts_speak(self, job, text: str):
+        job.check()
+        self.app.tts.speak(text)
 
     def tts_stop(self):
         """Ferma la sintesi vocale"""
         try:
+            # Annulla anche le letture ancora in preparazione
+            self.app.jobs.cancel_channel(SPEECH)
             self.app.tts.stop()
             return {'success': True}
         except Exception as e:
@@ -89,158 +108,246 @@ class Api:
     def list_artifacts(self):
         """Recupera la lista degli artefatti salvati"""
         try:
-            artifacts = self.app.artifact_manager.get_artifacts_list()
+            _, artifacts = self.app.artifact_manager.query_artifacts()
             self.logger.info(f"Found {len(artifacts)} artifacts")
-            
-            result = [
-                {
-                    'name': name,
-                    'date': date.isoformat(),
-                    'number': idx + 1
-                }
-                for idx, (name, date) in enumerate(artifacts)
-            ]
-            return result
+            enriched = self._enrichment(ARTIFACT, [name for _, name, _ in artifacts])
+            return [self._artifact_item(*artifact, enriched) for artifact in artifacts]
         except Exception as e:
             self.logger.error(f"Error listing artifacts: {e}")
             return []
+
+    def query_artifacts(self, offset=0, limit=None, sort='date', descending=True, text=None):
+        """
+        Recupera una pagina degli artefatti salvati.
+        
+        Returns:
+            dict: {'items', 'total', 'offset'}; 'number' di ogni elemento è
+            il numero usato dagli altri comandi
+        """
+        try:
+            total, artifacts = self.app.artifact_manager.query_artifacts(
+                int(offset), limit, sort, descending, text
+            )
+            enriched = self._enrichment(ARTIFACT, [name for _, name, _ in artifacts])
+            return {
+                'items': [self._artifact_item(*artifact, enriched) for artifact in artifacts],
+                'total': total,
+                'offset': int(offset)
+            }
+        except Exception as e:
+            self.logger.error(f"Error querying artifacts: {e}")
+            return {'items': [], 'total': 0, 'offset': 0, 'error': str(e)}
+
+    def _enrichment(self, kind, names):
+        """Titoli e riassunti generati per una pagina di elementi"""
+        catalog = getattr(self.app, 'catalog', None)
+        return catalog.get_many(kind, names) if catalog else {}
+
+    def _artifact_item(self, number, name, date, enriched=None):
+        """Converte un artefatto nel formato usato dall'interfaccia"""
+        entry = (enriched or {}).get(name)
+        return {
+            'name': name,
+            'date': date.isoformat(),
+            'number': number,
+            'versions': len(self.app.artifact_manager.list_versions(name)),
+            'title': entry.title if entry else None,
+            'recap': entry.recap if entry else None
+        }
         
     def read_artifacts_page(self, items, total_count):
         """
-        Legge vocalmente il contenuto di una pagina di artefatti.
+        Legge vocalmente il contenuto di una pagina di artefatti (in background).
         Interrompe qualsiasi lettura precedente prima di iniziare.
         """
-        try:
-            # Prima ferma qualsiasi lettura in corso
-            self.app.tts.stop()
-            
-            # Prepara il messaggio introduttivo
-            intro = f"Trovati {total_count} artefatti totali. "
-            if not items:
-                self.app.tts.speak(intro + "Nessun artefatto in questa pagina.")
-                return {'success': True}
-
-            # Prepara la lista degli artefatti nella pagina
-            artifacts_text = []
-            # Enumerate parte da 1
-            for idx, item in enumerate(items, 1):
-                name = item['name'].rsplit('.', 1)[0]  # Rimuove l'estensione
-                date = datetime.fromisoformat(item['date']).strftime("%d/%m/%Y alle %H:%M")
-                artifacts_text.append(f"Numero {idx}: {name}, salvato il {date}")
-
-            # Legge il messaggio completo
-            message = intro + "In questa pagina: " + ". ".join(artifacts_text)
-            self.app.tts.speak(message)
-            return {'success': True}
-            
-        except Exception as e:
-            self.logger.error(f"Error reading artifacts page: {e}")
-            return {'success': False, 'error': str(e)}
+        return self._start('read_artifacts_page', items, total_count)
+
+    def _read_artifacts_page(self, job, items, total_count):
+        # Prima ferma qualsiasi lettura in corso
+        self.app.tts.stop()
+        
+        # Prepara il messaggio introduttivo
+        intro = f"Trovati {total_count} artefatti totali. "
+        if not items:
+            job.check()
+            self.app.tts.speak(intro + "Nessun artefatto in questa pagina.")
+            return
+
+        # Prepara la lista degli artefatti nella pagina
+        artifacts_text = []
+        # Enumerate parte da 1
+        for idx, item in enumerate(items, 1):
+            name = item.get('title') or item['name'].rsplit('.', 1)[0]  # Rimuove l'estensione
+            date = datetime.fromisoformat(item['date']).strftime("%d/%m/%Y alle %H:%M")
+            artifacts_text.append(f"Numero {idx}: {name}, salvato il {date}")
+
+        # Legge il messaggio completo
+        message = intro + "In questa pagina: " + ". ".join(artifacts_text)
+        job.check()
+        self.app.tts.speak(message)
 
 
     def read_artifact(self, number):
-        """Legge un artefatto specifico"""
+        """Legge un artefatto specifico (in background)"""
+        return self._start('read_artifact', number)
+
+    def _read_artifact(self, job, number):
+        filename, content = self.app.artifact_manager.get_artifact_by_number(number)
+        job.check()
+        self.app.set_clipboard_content(content)
+        self.app.tts.speak(content)
+        return {'content': content}
+        
+    def list_artifact_versions(self, number: int):
+        """Elenca le versioni di un artefatto"""
         try:
-            filename, content = self.app.artifact_manager.get_artifact_by_number(number)
-            self.app.set_clipboard_content(content)
-            self.app.tts.speak(content)
-            return {'success': True, 'content': content}
+            filename, _ = self.app.artifact_manager.get_artifact_by_number(number)
+            versions = self.app.artifact_manager.list_versions(filename)
+            return {
+                'success': True,
+                'name': filename,
+                'versions': [v.to_dict() for v in versions]
+            }
         except Exception as e:
-            self.logger.error(f"Error reading artifact: {e}")
+            self.logger.error(f"Error listing artifact versions: {e}")
             return {'success': False, 'error': str(e)}
-        
-    def resume_creative_artifact(self, number: int):
-        """Riprende un artefatto in modalità creativa"""
+
+    def read_artifact_version(self, number: int, version: int):
+        """Legge una versione specifica di un artefatto (in background)"""
+        return self._start('read_artifact_version', number, version)
+
+    def _read_artifact_version(self, job, number: int, version: int):
+        filename, _ = self.app.artifact_manager.get_artifact_by_number(number)
+        content = self.app.artifact_manager.get_artifact_version(filename, version)
+        job.check()
+        self.app.tts.speak(content)
+        return {'content': content}
+
+    def find_similar(self, text: str, limit: int = 5):
+        """Cerca chat e artefatti simili a una frase"""
         try:
-            # Recupera il contenuto dell'artefatto
-            filename, content = self.app.artifact_manager.get_artifact_by_number(number)
-            
-            # Imposta la modalità creativa
-            self.app.handle_mode(SessionStyle.CREATIVE_WRITING)
-            
-            # Salva il nome del file come titolo della chat
-            self.app.current_chat_title = filename.rsplit('.', 1)[0]
-            
-            # Prepara e invia il prompt all'AI
-            modification_prompt = (
-                f"Ho un testo creativo esistente che vorrei modificare e migliorare. "
-                f"Analizzalo e suggeriscimi diverse direzioni creative per svilupparlo "
-                f"ulteriormente, considerando elementi come stile, tono, struttura e contenuto. "
-                f"Ecco il testo originale:\n\n{content}"
-            )
-            
-            response = self.app.ai.generate_response(modification_prompt, self.app.context)
-            
-            # Aggiorna lo storico
-            self.app.context["history"].extend([
-                {"role": "user", "content": modification_prompt},
-                {"role": "assistant", "content": response.content}
-            ])
-            
-            # Comunica la risposta
-            self.app.tts.speak(response.content)
-            
-            return {'success': True}
-            
+            results = []
+            for result in self.app.search_index.search(text, limit=int(limit)):
+                manager = self.app.artifact_manager if result.kind == 'artifact' else self.app.chat_manager
+                results.append({
+                    'kind': result.kind,
+                    'name': result.name,
+                    'number': manager.listing.number_of(result.name),
+                    'score': round(result.score, 3)
+                })
+            return {'success': True, 'results': results}
         except Exception as e:
-            
-            self.logger.error(f"Error resuming creative artifact: {e}")
+            self.logger.error(f"Error searching: {e}")
             return {'success': False, 'error': str(e)}
 
+    def resume_creative_artifact(self, number: int):
+        """Riprende un artefatto in modalità creativa (in background)"""
+        return self._start('resume_creative_artifact', number)
+
+    def _resume_creative_artifact(self, job, number: int):
+        # Recupera il contenuto dell'artefatto
+        filename, content = self.app.artifact_manager.get_artifact_by_number(number)
+        job.check()
+        
+        # Modalità creativa; il nome del file diventa il titolo della chat
+        # e STAMPA salverà una nuova versione di questo artefatto
+        session = self.app.work_on_artifact(SessionStyle.CREATIVE_WRITING, filename)
+        
+        # Prepara e invia il prompt all'AI
+        modification_prompt = (
+            f"Ho un testo creativo esistente che vorrei modificare e migliorare. "
+            f"Analizzalo e suggeriscimi diverse direzioni creative per svilupparlo "
+            f"ulteriormente, considerando elementi come stile, tono, struttura e contenuto. "
+            f"Ecco il testo originale:\n\n{content}"
+        )
+        
+        job.progress("generazione")
+        response = self.app.ai.generate_response(modification_prompt, session.context())
+        
+        # Aggiorna lo storico
+        self.app.record_exchange(session, modification_prompt, response.content)
+        
+        # Comunica la risposta
+        job.progress("sintesi")
+        self.app.tts.speak(response.content)
+
     def resume_article_artifact(self, number: int):
-        """Riprende un artefatto in modalità articolo"""
+        """Riprende un artefatto in modalità articolo (in background)"""
+        return self._start('resume_article_artifact', number)
+
+    def _resume_article_artifact(self, job, number: int):
+        filename, content = self.app.artifact_manager.get_artifact_by_number(number)
+        job.check()
+        
+        session = self.app.work_on_artifact(SessionStyle.ARTICLE_WRITING, filename)
+        
+        modification_prompt = (
+            f"Ho un articolo esistente che vorrei revisionare e migliorare. "
+            f"Analizzalo e suggeriscimi come potremmo migliorarlo in termini di "
+            f"struttura, chiarezza, argomentazione e impatto comunicativo. "
+            f"Ecco il testo originale:\n\n{content}"
+        )
+        
+        job.progress("generazione")
+        response = self.app.ai.generate_response(modification_prompt, session.context())
+        
+        self.app.record_exchange(session, modification_prompt, response.content)
+        
+        job.progress("sintesi")
+        self.app.tts.speak(response.content)
+
+    def resume_chat(self, number: int):
+        """Riprende una chat salvata (in background)"""
+        return self._start('resume_chat', number)
+
+    def _resume_chat(self, job, number: int):
+        # Carica solo le battute che verranno inviate all'AI
+        filename, style, history, title, skipped = self.app.chat_manager.get_chat_tail_by_number(
+            number, AnthropicContextManager.MAX_MESSAGES
+        )
+        job.check()
+        
+        self.app.resume_session(style, title, history, (filename, skipped) if skipped else None)
+        
+        last_response = None
+        for msg in reversed(history):
+            if msg["role"] == "assistant":
+                last_response = msg["content"]
+                break
+        
+        job.check()
+        if last_response:
+            self.app.tts.speak(f"Ho ripreso la chat {filename.rsplit('.', 1)[0]}. Ultima risposta: {last_response}")
+        else:
+            self.app.tts.speak(f"Ho ripreso la chat {filename.rsplit('.', 1)[0]}")
+
+    # Lavori in background
+    def _start(self, name: str, *args):
+        """
+        Avvia come lavoro in background il metodo _<name> sul canale della voce.
+
+        Returns:
+            dict: {'success', 'job_id'}; stato e risultato arrivano con gli eventi 'job'
+        """
         try:
-            filename, content = self.app.artifact_manager.get_artifact_by_number(number)
-            
-            self.app.handle_mode(SessionStyle.ARTICLE_WRITING)
-            self.app.current_chat_title = filename.rsplit('.', 1)[0]
-            
-            modification_prompt = (
-                f"Ho un articolo esistente che vorrei revisionare e migliorare. "
-                f"Analizzalo e suggeriscimi come potremmo migliorarlo in termini di "
-                f"struttura, chiarezza, argomentazione e impatto comunicativo. "
-                f"Ecco il testo originale:\n\n{content}"
-            )
-            
-            response = self.app.ai.generate_response(modification_prompt, self.app.context)
-            
-            self.app.context["history"].extend([
-                {"role": "user", "content": modification_prompt},
-                {"role": "assistant", "content": response.content}
-            ])
-            
-            self.app.tts.speak(response.content)
-            
-            return {'success': True}
-            
+            return self.app.jobs.submit(name, getattr(self, f"_{name}"), *args, channel=SPEECH)
         except Exception as e:
-            self.logger.error(f"Error resuming article artifact: {e}")
+            self.logger.error(f"Error starting {name}: {e}")
             return {'success': False, 'error': str(e)}
 
-    def resume_chat(self, number: int):
-        """Riprende una chat salvata"""
+    def run_now(self, name: str, *args):
+        """
+        Esegue il metodo _<name> nel thread chiamante, per i comandi che
+        arrivano dai trigger.
+
+        Returns:
+            dict: Risultato dell'operazione
+        """
         try:
-            filename, style, history, title = self.app.chat_manager.get_chat_by_number(number, include_title=True)
-            
-            self.app.current_chat_title = title
-            self.app.handle_mode(style)
-            self.app.context["history"] = history
-            
-            last_response = None
-            for msg in reversed(history):
-                if msg["role"] == "assistant":
-                    last_response = msg["content"]
-                    break
-            
-            if last_response:
-                self.app.tts.speak(f"Ho ripreso la chat {filename.rsplit('.', 1)[0]}. Ultima risposta: {last_response}")
-            else:
-                self.app.tts.speak(f"Ho ripreso la chat {filename.rsplit('.', 1)[0]}")
-            
-            return {'success': True}
-            
+            result = self.app.jobs.run(name, getattr(self, f"_{name}"), *args, channel=SPEECH)
+            return {'success': True, **(result or {})}
         except Exception as e:
-            self.logger.error(f"Error resuming chat: {e}")
+            self.logger.error(f"Error running {name}: {e}")
             return {'success': False, 'error': str(e)}
 
     def delete_artifact(self, number):
@@ -249,7 +356,8 @@ class Api:
             filename, _ = self.app.artifact_manager.get_artifact_by_number(number)
             success = self.app.artifact_manager.delete_artifact(filename)
             if success:
-                self.app.tts.speak(f"Artefatto {filename} cancellato con successo")
+                # La conferma a voce non blocca la finestra
+                self._start('tts_speak', f"Artefatto {filename} cancellato con successo")
             return {'success': success}
         except Exception as e:
             self.logger.error(f"Error deleting artifact: {e}")
@@ -259,92 +367,143 @@ class Api:
     def list_chats(self):
         """Recupera la lista delle chat salvate"""
         try:
-            chats = self.app.chat_manager.get_chats_list()
+            _, chats = self.app.chat_manager.query_chats()
             #self.logger.info(f"Found {len(chats)} chats")
-            
-            result = [
-                {
-                    'name': name,
-                    'date': date.isoformat(),
-                    'number': idx + 1,
-                    'type': style.value
-                }
-                for idx, (name, style, date) in enumerate(chats)
-            ]
-            return result
+            enriched = self._enrichment(CHAT, [name for _, name, _, _ in chats])
+            return [self._chat_item(*chat, enriched) for chat in chats]
         except Exception as e:
             self.logger.error(f"Error listing chats: {e}")
             return []
 
-    def read_chats_page(self, items, total_count):
+    def query_chats(self, offset=0, limit=None, sort='date', descending=True, text=None, style=None):
         """
-        Legge vocalmente il contenuto di una pagina di chat.
-        Interrompe qualsiasi lettura precedente prima di iniziare.
+        Recupera una pagina delle chat salvate.
+        
+        Returns:
+            dict: {'items', 'total', 'offset'}; 'number' di ogni elemento è
+            il numero usato dagli altri comandi
         """
         try:
-            # Prima ferma qualsiasi lettura in corso
-            self.app.tts.stop()
-            
-            # Mappa dei nomi degli stili
-            style_names = {
-                'translation': 'traduzione',
-                'chat': 'chat',
-                'exploration': 'esplorazione',
-                'creative_writing': 'scrittura creativa',
-                'article_writing': 'scrittura articoli'
+            total, chats = self.app.chat_manager.query_chats(
+                int(offset), limit, sort, descending, text,
+                SessionStyle(style) if style else None
+            )
+            enriched = self._enrichment(CHAT, [name for _, name, _, _ in chats])
+            return {
+                'items': [self._chat_item(*chat, enriched) for chat in chats],
+                'total': total,
+                'offset': int(offset)
             }
-
-            # Prepara il messaggio introduttivo
-            intro = f"Trovate {total_count} chat totali. "
-            if not items:
-                self.app.tts.speak(intro + "Nessuna chat in questa pagina.")
-                return {'success': True}
-
-            # Prepara la lista delle chat nella pagina
-            chats_text = []
-            for idx, item in enumerate(items, 1):
-                name = item['name'].rsplit('.', 1)[0]  # Rimuove l'estensione
-                date = datetime.fromisoformat(item['date']).strftime("%d/%m/%Y alle %H:%M")
-                style = style_names.get(item['type'], item['type'])
-                chats_text.append(f"Numero {idx}: {name}, {style}, salvata il {date}")
-
-            # Legge il messaggio completo
-            message = intro + "In questa pagina: " + ". ".join(chats_text)
-            self.app.tts.speak(message)
-            return {'success': True}
-            
         except Exception as e:
-            self.logger.error(f"Error reading chats page: {e}")
-            return {'success': False, 'error': str(e)}
+            self.logger.error(f"Error querying chats: {e}")
+            return {'items': [], 'total': 0, 'offset': 0, 'error': str(e)}
 
-    def read_chat(self, number):
-        """Legge l'ultima risposta di una chat"""
+    def start_profile(self, seconds=None):
+        """
+        Avvia la profilazione del backend (comando `naiad profile`).
+
+        Args:
+            seconds: Durata della cattura in secondi
+
+        Returns:
+            dict: Risultato con il file del rapporto
+        """
         try:
-            filename, style, history = self.app.chat_manager.get_chat_by_number(number)
-            
-            last_response = None
-            for message in reversed(history):
-                if message['role'] == 'assistant':
-                    last_response = message['content']
-                    break
-            
-            if last_response:
-                self.app.tts.speak(last_response)
-                return {'success': True, 'content': last_response}
-            else:
-                error_msg = "No assistant response found in chat"
-                self.logger.warning(error_msg)
-                return {'success': False, 'error': error_msg}
+            report = self.app.start_profile(seconds)
+            if report is None:
+                return {'success': False, 'error': "profilazione già in corso"}
+            return {'success': True, 'report': str(report),
+                    'seconds': seconds or self.app.settings.get('profiling.seconds', 30)}
         except Exception as e:
-            self.logger.error(f"Error reading chat: {e}")
+            self.logger.error(f"Error starting profile: {e}")
             return {'success': False, 'error': str(e)}
 
+    def manager_snapshot(self):
+        """
+        Prima pagina di artefatti e chat, inviata alla finestra di gestione
+        prima di mostrarla.
+        
+        Returns:
+            dict: {'artifacts': pagina, 'chats': pagina}
+        """
+        return {
+            'artifacts': self.query_artifacts(0, MANAGER_PAGE_SIZE),
+            'chats': self.query_chats(0, MANAGER_PAGE_SIZE)
+        }
+
+    def _chat_item(self, number, name, style, date, enriched=None):
+        """Converte una chat nel formato usato dall'interfaccia"""
+        entry = (enriched or {}).get(name)
+        return {
+            'name': name,
+            'date': date.isoformat(),
+            'number': number,
+            'type': style.value,
+            'title': entry.title if entry else None,
+            'recap': entry.recap if entry else None
+        }
+
+    def read_chats_page(self, items, total_count):
+        """
+        Legge vocalmente il contenuto di una pagina di chat (in background).
+        Interrompe qualsiasi lettura precedente prima di iniziare.
+        """
+        return self._start('read_chats_page', items, total_count)
+
+    def _read_chats_page(self, job, items, total_count):
+        # Prima ferma qualsiasi lettura in corso
+        self.app.tts.stop()
+        
+        # Mappa dei nomi degli stili
+        style_names = {
+            'translation': 'traduzione',
+            'chat': 'chat',
+            'exploration': 'esplorazione',
+            'creative_writing': 'scrittura creativa',
+            'article_writing': 'scrittura articoli'
+        }
+
+        # Prepara il messaggio introduttivo
+        intro = f"Trovate {total_count} chat totali. "
+        if not items:
+            job.check()
+            self.app.tts.speak(intro + "Nessuna chat in questa pagina.")
+            return
+
+        # Prepara la lista delle chat nella pagina
+        chats_text = []
+        for idx, item in enumerate(items, 1):
+            name = item.get('title') or item['name'].rsplit('.', 1)[0]  # Rimuove l'estensione
+            date = datetime.fromisoformat(item['date']).strftime("%d/%m/%Y alle %H:%M")
+            style = style_names.get(item['type'], item['type'])
+            chats_text.append(f"Numero {idx}: {name}, {style}, salvata il {date}")
+
+        # Legge il messaggio completo
+        message = intro + "In questa pagina: " + ". ".join(chats_text)
+        job.check()
+        self.app.tts.speak(message)
+
+    def read_chat(self, number):
+        """Legge l'ultima risposta di una chat (in background)"""
+        return self._start('read_chat', number)
+
+    def _read_chat(self, job, number):
+        filename, style, last_response = self.app.chat_manager.get_last_response_by_number(number)
+        if not last_response:
+            raise ValueError("No assistant response found in chat")
+        
+        recap = self.app.get_recap(CHAT, filename)
+        job.check()
+        self.app.tts.speak(f"{recap} ... {last_response}" if recap else last_response)
+        return {'content': last_response}
+
     def delete_chat(self, number):
         """Elimina una chat salvata"""
         try:
             success, filename = self.app.chat_manager.delete_chat_by_number(number)
             if success:
-                self.app.tts.speak(f"Chat {filename} eliminata con successo")
+                # La conferma a voce non blocca la finestra
+                self._start('tts_speak', f"Chat {filename} eliminata con successo")
             return {'success': success}
         except Exception as e:
             self.logger.error(f"Error deleting chat: {e}")
@@ -0,0 +1,108 @@
+"""
+Processo della finestra di gestione di chat e artefatti.
+
+Viene avviato dal backend, nascosto insieme a esso (ui.prelaunch_manager)
+o alla prima richiesta (trigger open_manager), oppure con `naiad ui`. La
+finestra resta caricata per tutta la vita del processo: il backend la
+mostra con l'evento 'show', che porta già la prima pagina di dati. Le
+chiamate JavaScript vengono inoltrate al backend tramite il canale IPC,
+quindi un crash della finestra non interrompe la sintesi vocale né
+l'elaborazione dei comandi.
+"""
+import sys
+import logging
+from typing import Callable, List, Optional
+
+from naiad.core.environment import env
+from naiad.utils.logger import configure_logging, setup_logger
+from naiad.core.ipc import IpcClient, IpcError
+from naiad.ui.api import UI_METHODS
+
+# Metodi eseguiti nel processo della finestra invece che nel backend
+LOCAL_METHODS = ('close_window', 'get_asset_path')
+
+
+class ApiProxy:
+    """Espone alla finestra gli stessi metodi dell'Api, eseguiti nel backend"""
+
+    def __init__(self, client: IpcClient, manager, logger: logging.Logger):
+        self.client = client
+        self.manager = manager
+        self.logger = logger
+
+    def forward(self, method: str) -> Callable:
+        """Funzione che inoltra al backend la chiamata del metodo indicato"""
+        def call(*args, **kwargs):
+            try:
+                return self.client.call(method, *args, **kwargs)
+            except IpcError as e:
+                self.logger.error(f"Errore chiamata {method}: {e}")
+                return {'success': False, 'error': str(e)}
+        # pywebview espone la funzione in JavaScript con il suo nome
+        call.__name__ = method
+        return call
+
+    def close_window(self):
+        """Nasconde la finestra, che resta pronta per la prossima apertura"""
+        return self.manager.close_window()
+
+    def get_asset_path(self, filename):
+        """Restituisce il percorso del file nella directory assets"""
+        file_path = env.assets_dir / filename
+        return str(file_path) if file_path.exists() else None
+
+    def functions(self):
+        """Funzioni da esporre alla finestra, nell'ordine di UI_METHODS"""
+        return [getattr(self, name) if name in LOCAL_METHODS else self.forward(name)
+                for name in UI_METHODS]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Apre la finestra di gestione collegata al backend in esecuzione.
+
+    Args:
+        argv: Opzioni; con --hidden la finestra resta nascosta fino all'evento 'show'
+
+    Returns:
+        int: Codice di uscita
+    """
+    argv = sys.argv[2:] if argv is None else argv
+    # File separato dal backend: la rotazione non è condivisibile tra processi
+    configure_logging(env.logs_dir, filename="naiad_ui.log")
+    logger = setup_logger('naiad.ui')
+    try:
+        client = IpcClient.connect(env.data_root)
+    except IpcError as e:
+        logger.error(str(e))
+        print(f"{e}. Avvia prima NAIAD.")
+        return 1
+
+    import webview
+    from naiad.ui.ui_manager import UIManager
+    manager = UIManager(env.assets_dir, logger)
+    proxy = ApiProxy(client, manager, logger)
+    if not manager.create_window(proxy.functions(), visible='--hidden' not in argv):
+        client.close()
+        return 1
+
+    def on_event(event, data):
+        if event == 'show':
+            manager.show(data)
+        else:
+            manager.emit(event, data)
+
+    def started():
+        # Eseguito da pywebview in un thread separato, a interfaccia avviata
+        try:
+            client.subscribe(on_event, on_close=manager.cleanup)
+            manager.push(client.call('manager_snapshot'))
+        except IpcError as e:
+            logger.error(f"Backend non raggiungibile: {e}")
+            manager.cleanup()
+
+    try:
+        webview.start(started, debug=False)
+    finally:
+        client.close()
+    return 0
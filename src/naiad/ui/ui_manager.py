@@ -1,179 +1,191 @@
+import json
+import time
+import threading
 import webview
 from pathlib import Path
 import logging
-from typing import Optional
+from typing import Callable, Iterable, Optional
 
 
 class UIManager:
     """
-    Gestisce la creazione e il ciclo di vita delle finestre UI di NAIAD.
-    Si basa su pywebview per mostrare le interfacce HTML.
+    Gestisce la finestra di gestione di NAIAD nel processo dell'interfaccia.
+    Si basa su pywebview per mostrare l'interfaccia HTML.
+
+    La finestra viene creata una sola volta, nascosta, all'avvio del processo:
+    quando arriva la richiesta di apertura pagina, CSS e script sono già
+    caricati, quindi basta inserire i dati ricevuti dal backend e mostrarla.
+    La chiusura dall'interfaccia la nasconde invece di distruggerla.
     """
-    
+
     def __init__(self, assets_dir: Path, logger: logging.Logger):
         """
         Inizializza il gestore delle UI.
-        
+
         Args:
             assets_dir: Directory contenente i file delle interfacce HTML
             logger: Logger per la registrazione degli eventi
         """
         self.assets_dir = assets_dir
         self.logger = logger
-        self.active_window: Optional[webview.Window] 
-        self.window_mode: Optional[str] = None
+        self.active_window: Optional[webview.Window] = None
+        self.visible = False
+        # Impostato quando la pagina è caricata e può ricevere dati
+        self.loaded = threading.Event()
+        self._pending_data: Optional[dict] = None
+        self._show_when_loaded = False
+        self._exiting = False
+        self._lock = threading.Lock()
+
+    def create_window(self, functions: Iterable[Callable], visible: bool = False) -> Optional[webview.Window]:
+        """
+        Crea la finestra di gestione, da chiamare prima di webview.start.
 
-    def _create_window(self, mode: str, api_instance) -> Optional[webview.Window]:
-        try:
-            # Chiudi la finestra precedente se esiste
-            if self.active_window:
-                self.close_window()
+        Args:
+            functions: Funzioni da esporre all'interfaccia JavaScript
+            visible: Se mostrare la finestra appena caricata
 
-            # Crea la nuova finestra passando direttamente l'istanza api
-            html_file = f"{mode}-ui.html"
-            html_path = str(self.assets_dir / html_file)
-            
+        Returns:
+            Window: L'oggetto finestra creato o None in caso di errore
+        """
+        try:
             window = webview.create_window(
-                f'NAIAD {mode.capitalize()}',
-                html_path,
+                'NAIAD Manager',
+                str(self.assets_dir / "unified-list.html"),
                 width=800,
                 height=800,
                 resizable=True,
-                js_api=api_instance  # Espone l'intera istanza API
+                text_select=False,
+                hidden=True
             )
+            for function in functions:
+                window.expose(function)
+            window.events.loaded += self._on_loaded
+            window.events.closing += self._on_closing
 
             self.active_window = window
-            self.window_mode = mode
-            
-            self.logger.info(f"Creata nuova finestra {mode}")
+            self._show_when_loaded = visible
+            self.logger.info("Creata finestra di gestione")
             return window
 
         except Exception as e:
-            self.logger.error(f"Errore apertura finestra {mode}: {e}")
+            self.logger.error(f"Errore creazione finestra di gestione: {e}")
             return None
-        
-    def _old_create_window(self, mode: str, api_instance) -> Optional[webview.Window]:
+
+    def _on_loaded(self):
+        with self._lock:
+            self.loaded.set()
+            data, self._pending_data = self._pending_data, None
+            show = self._show_when_loaded
+        if data:
+            self._push(data)
+        if show:
+            self.show()
+        self.logger.info("Finestra di gestione pronta")
+
+    def _on_closing(self):
+        # La chiusura dall'utente nasconde la finestra; False annulla la distruzione
+        if self._exiting:
+            return True
+        self.hide()
+        return False
+
+    def push(self, data: dict):
         """
-        Crea una nuova finestra webview con le API esposte appropriate.
-        
+        Inserisce nella pagina la prima pagina di artefatti e chat.
+
         Args:
-            mode: Modalità della finestra ('artifacts' o 'chats')
-            api_instance: Istanza dell'API da esporre alla finestra
-            
-        Returns:
-            Window: L'oggetto finestra creato o None in caso di errore
+            data: Dati prodotti da Api.manager_snapshot
         """
-        html_file = f"{mode}-ui.html"
-        html_path = str(self.assets_dir / html_file)
-        
+        with self._lock:
+            if not self.loaded.is_set():
+                # Applicati al caricamento della pagina
+                self._pending_data = data
+                return
+        self._push(data)
+
+    def _push(self, data: dict):
         try:
-            window = webview.create_window(
-                f'NAIAD {mode.capitalize()}',
-                html_path,
-                width=800,
-                height=800,
-                resizable=True,
-                text_select=False
-            )
-            # Controllo che window sia la prima finestra in webview.windows
-            if webview.windows and window != webview.windows[0]:
-                # Se non lo è, la metto sposto in prima posizione
-                webview.windows.remove(window)
-                webview.windows.insert(0, window)
-
-
-            # Espone le API necessarie in base alla modalità
-            if mode == 'artifacts':
-                window.expose(api_instance.list_artifacts)
-                window.expose(api_instance.read_artifact)
-                window.expose(api_instance.resume_creative_artifact)
-                window.expose(api_instance.resume_article_artifact)
-                window.expose(api_instance.delete_artifact)
-                window.expose(api_instance.read_artifacts_page)
-            elif mode == 'chats':
-                window.expose(api_instance.list_chats)
-                window.expose(api_instance.read_chat)
-                window.expose(api_instance.delete_chat)
-                window.expose(api_instance.resume_chat)
-                window.expose(api_instance.read_chats_page)
-
-            # API comuni per tutte le modalità
-            window.expose(api_instance.tts_speak)
-            window.expose(api_instance.tts_stop)
-            window.expose(api_instance.tts_restart)
-            window.expose(api_instance.tts_resume)
-            window.expose(api_instance.tts_pause)
-            window.expose(api_instance.close_window)
-
-            # Salva il riferimento alla finestra attiva e la modalità
-            self.active_window = window
-            self.window_mode = mode
-
-            return window
-            
+            self.active_window.evaluate_js(f"window.naiadPrefetch({json.dumps(data)})")
         except Exception as e:
-            self.logger.error(f"Errore creazione finestra {mode}: {e}")
-            return None
+            self.logger.error(f"Errore invio dati alla finestra: {e}")
 
-    def close_window(self) -> dict:
+    def emit(self, event: str, data=None):
         """
-        Chiude la finestra corrente e pulisce le risorse associate.
-        Può essere chiamato sia dall'interfaccia utente che internamente.
-        
-        Returns:
-            dict: Risultato dell'operazione per l'interfaccia JavaScript
+        Inoltra alla pagina un evento del backend (es. avanzamento di un lavoro).
+        Gli eventi che arrivano prima del caricamento della pagina sono scartati.
+
+        Args:
+            event: Nome dell'evento, ricevuto dalla pagina come 'naiad:<evento>'
+            data: Dati dell'evento
         """
+        if not self.loaded.is_set():
+            return
         try:
-            if self.active_window:
-                self.active_window.destroy()
-                self.active_window = None
-                self.window_mode = None
-                self.logger.info("Finestra chiusa correttamente")
-            return {'success': True}
+            self.active_window.evaluate_js(f"window.naiadEvent({json.dumps(event)}, {json.dumps(data)})")
         except Exception as e:
-            self.logger.error(f"Errore durante la chiusura della finestra: {e}")
-            return {'success': False, 'error': str(e)}
+            self.logger.error(f"Errore invio evento {event} alla finestra: {e}")
 
-    def show_window(self, mode: str, api_instance) -> bool:
+    def show(self, data: Optional[dict] = None):
         """
-        Mostra una finestra UI, chiudendo quella precedente se esistente.
-        
+        Mostra la finestra, aggiornando prima i dati se forniti.
+
         Args:
-            mode: Tipo di finestra da mostrare ('artifacts' o 'chats')
-            api_instance: Istanza dell'API da esporre alla finestra
-            
-        Returns:
-            bool: True se la finestra è stata creata con successo
+            data: Dati prodotti da Api.manager_snapshot
         """
+        started = time.perf_counter()
+        if data:
+            self.push(data)
+        with self._lock:
+            if not self.loaded.is_set():
+                self._show_when_loaded = True
+                return
+        try:
+            self.active_window.show()
+            self.active_window.restore()
+            self.visible = True
+            self.logger.info(f"Finestra di gestione mostrata in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            self.logger.error(f"Errore apertura finestra di gestione: {e}")
+
+    def hide(self):
+        """Nasconde la finestra lasciandola pronta per la prossima apertura"""
         try:
-            # Chiudi la finestra precedente se esiste
             if self.active_window:
-                self.close_window()
+                self.active_window.hide()
+            self.visible = False
+        except Exception as e:
+            self.logger.error(f"Errore durante la chiusura della finestra: {e}")
 
-            # Crea la nuova finestra
-            if self._create_window(mode, api_instance):
-                self.logger.info(f"Creata nuova finestra {mode}")
-                return True
-            return False
+    def close_window(self) -> dict:
+        """
+        Chiude (nasconde) la finestra su richiesta dell'interfaccia.
 
-        except Exception as e:
-            self.logger.error(f"Errore apertura finestra {mode}: {e}")
-            return False
+        Returns:
+            dict: Risultato dell'operazione per l'interfaccia JavaScript
+        """
+        self.hide()
+        return {'success': True}
 
     def has_active_window(self) -> bool:
         """
-        Verifica se c'è una finestra attiva.
-        
+        Verifica se la finestra è visibile.
+
         Returns:
-            bool: True se esiste una finestra attiva
+            bool: True se la finestra è mostrata
         """
-        return self.active_window is not None
+        return self.visible
 
     def cleanup(self):
         """
-        Pulisce tutte le risorse e chiude eventuali finestre attive.
-        Da chiamare durante lo shutdown dell'applicazione.
+        Distrugge la finestra, terminando il ciclo di pywebview.
+        Da chiamare alla chiusura del backend.
         """
+        self._exiting = True
         if self.active_window:
-            self.close_window()
-            self.logger.info("Pulizia UIManager completata")
\ No newline at end of file
+            try:
+                self.active_window.destroy()
+            except Exception as e:
+                self.logger.error(f"Errore durante la chiusura della finestra: {e}")
+            self.active_window = None
+            self.logger.info("Pulizia UIManager completata")
@@ -1,5 +1,12 @@
 # naiad/utils/__init__.py
 from naiad.utils.logger import setup_logger
-from naiad.utils.tts_provider import GTTSProvider
 
-__all__ = ['setup_logger', 'GTTSProvider']
\ No newline at end of file
+__all__ = ['setup_logger', 'GTTSProvider']
+
+
+def __getattr__(name):
+    # gtts e pygame vengono importati solo quando il provider serve davvero
+    if name == 'GTTSProvider':
+        from naiad.utils.tts_provider import GTTSProvider
+        return GTTSProvider
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,190 @@
+"""
+Riscontro sonoro immediato per i comandi di GRID3.
+
+Tra la pressione del pulsante e la risposta possono passare alcuni secondi
+di silenzio, e Nicola tende a premere di nuovo. Questo modulo suona:
+
+- un breve segnale (earcon) appena un trigger viene accettato;
+- una frase di attesa ("Sto pensando...") se la richiesta all'AI supera
+  la soglia della modalità (tts.filler_after, sostituibile in modes.<modalità>.tts);
+- frasi di servizio preparate all'avvio, come l'avviso di rete assente,
+  che deve poter essere letto proprio quando la sintesi online non funziona.
+
+I suoni sono decodificati una sola volta all'avvio e riprodotti su un
+canale pygame riservato, separato dalla musica su cui parla il TTS: non
+interrompono la lettura in corso e la frase di attesa viene sfumata
+appena la risposta è pronta. Molte versioni di SDL_mixer non decodificano
+in un Sound l'mp3 di gTTS: in quel caso la frase resta in memoria come
+mp3 e viene suonata sulla musica, che legge l'mp3 ovunque.
+"""
+import io
+import logging
+import math
+import sys
+import threading
+import wave
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Union
+
+import pygame
+
+# Frequenze (Hz) e durate (s) delle due note del segnale di conferma
+EARCON_NOTES = ((880, 0.06), (1320, 0.08))
+# Nota singola usata come attesa quando la frase non può essere caricata
+PULSE_NOTES = ((660, 0.12),)
+SAMPLE_RATE = 22050
+VOLUME = 0.3
+
+
+def tone_wav(notes, rate: int = SAMPLE_RATE, volume: float = VOLUME) -> bytes:
+    """Sequenza di note sinusoidali in formato WAV mono a 16 bit"""
+    samples = array('h')
+    for frequency, duration in notes:
+        count = int(rate * duration)
+        for i in range(count):
+            # Attacco e rilascio brevi per evitare click
+            envelope = min(1.0, i / (rate * 0.005), (count - i) / (rate * 0.02))
+            samples.append(int(volume * 32767 * envelope * math.sin(2 * math.pi * frequency * i / rate)))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class MusicPhrase:
+    """Frase in mp3 che pygame.mixer.Sound non decodifica: suonata sulla musica"""
+
+    def __init__(self, audio: bytes):
+        self.audio = audio
+
+    def play(self):
+        pygame.mixer.music.load(io.BytesIO(self.audio), 'mp3')
+        pygame.mixer.music.play()
+
+
+# Frase preparata: decodificata in un Sound o mp3 per la musica
+Phrase = Union[pygame.mixer.Sound, MusicPhrase]
+
+
+class AudioFeedback:
+    """Segnale di conferma e frase di attesa su un canale separato dalla voce"""
+
+    def __init__(self, tts, logger: Optional[logging.Logger] = None,
+                 filler_text: str = "Sto pensando...", phrases: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            tts: Provider TTS già inizializzato (mixer pygame attivo); fornisce
+                l'audio delle frasi con feedback_audio(testo)
+            logger: Logger per la registrazione degli eventi
+            filler_text: Frase letta quando la risposta tarda
+            phrases: Frasi di servizio per nome, lette con say(nome)
+        """
+        self.tts = tts
+        self.logger = logger or logging.getLogger("audio_feedback")
+        self.filler_text = filler_text
+        self.phrases = dict(phrases or {})
+        self._sounds: Dict[str, Phrase] = {}
+        # Canale 0 riservato: Sound.play() degli altri moduli non lo usa
+        pygame.mixer.set_reserved(1)
+        self._channel = pygame.mixer.Channel(0)
+        self._earcon = pygame.mixer.Sound(file=io.BytesIO(tone_wav(EARCON_NOTES)))
+        self._filler: Optional[Phrase] = None
+        self._filler_playing = False
+        # La sintesi delle frasi può richiedere la rete: non ritarda l'avvio
+        threading.Thread(target=self._load_phrases, name="AudioFeedback", daemon=True).start()
+
+    def _load_phrases(self):
+        self._filler = self._synthesize(self.filler_text)
+        if self._filler is None:
+            self.logger.warning("Frase di attesa non disponibile, uso un segnale")
+            self._filler = pygame.mixer.Sound(file=io.BytesIO(tone_wav(PULSE_NOTES)))
+        for name, text in self.phrases.items():
+            sound = self._synthesize(text)
+            if sound is not None:
+                self._sounds[name] = sound
+
+    def _synthesize(self, text: str) -> Optional[Phrase]:
+        try:
+            audio = self.tts.feedback_audio(text)
+        except Exception as e:
+            self.logger.warning(f"Frase \"{text}\" non preparata: {e}")
+            return None
+        if not audio:
+            self.logger.warning(f"Frase \"{text}\" non preparata: audio vuoto")
+            return None
+        try:
+            return pygame.mixer.Sound(file=io.BytesIO(audio))
+        except Exception as e:
+            if audio.startswith(b'RIFF'):
+                self.logger.warning(f"Frase \"{text}\" non decodificata: {e}")
+                return None
+            # SDL_mixer senza mp3 per i Sound: la musica lo decodifica
+            self.logger.info(f"Frase \"{text}\" suonata sulla musica: {e}")
+            return MusicPhrase(audio)
+
+    def _play(self, sound: Optional[Phrase]):
+        if sound is None or getattr(self.tts, 'is_muted', False):
+            return
+        try:
+            if isinstance(sound, MusicPhrase):
+                sound.play()
+            else:
+                self._channel.play(sound)
+        except Exception as e:
+            self.logger.debug(f"Errore riproduzione riscontro sonoro: {e}")
+
+    def acknowledge(self):
+        """Segnale di conferma: il comando è stato ricevuto"""
+        self._play(self._earcon)
+
+    def say(self, name: str) -> bool:
+        """
+        Legge una frase di servizio preparata all'avvio.
+
+        Returns:
+            bool: False se la frase non è disponibile e va letta con il TTS
+        """
+        sound = self._sounds.get(name)
+        if sound is None:
+            return False
+        self._play(sound)
+        return True
+
+    def thinking(self):
+        """Frase di attesa: la risposta sta arrivando"""
+        self.logger.info("Risposta in ritardo, frase di attesa")
+        self._filler_playing = True
+        self._play(self._filler)
+
+    @contextmanager
+    def waiting(self, threshold: Optional[float]) -> Iterator[None]:
+        """
+        Esegue il blocco (la richiesta all'AI) leggendo la frase di attesa
+        se dura più di `threshold` secondi.
+
+        Args:
+            threshold: Soglia in secondi; None o 0 la disattivano
+        """
+        timer = None
+        if threshold:
+            timer = threading.Timer(threshold, self.thinking)
+            timer.daemon = True
+            timer.start()
+        try:
+            yield
+        finally:
+            if timer is not None:
+                timer.cancel()
+                # La frase di attesa non si sovrappone alla risposta
+                if self._filler_playing:
+                    self._filler_playing = False
+                    if isinstance(self._filler, MusicPhrase):
+                        pygame.mixer.music.fadeout(150)
+                    else:
+                        self._channel.fadeout(150)
@@ -7,6 +7,8 @@ import threading
 from pathlib import Path
 from typing import Optional, Dict, List
 from datetime import datetime, timedelta
+from naiad.core.environment import env
+from naiad.core.tracing import span
 
 class LocalTTSProvider:
     """Provider per la sintesi vocale utilizzando pyttsx3 e pygame con gestione fallback."""
@@ -22,9 +24,10 @@ class LocalTTSProvider:
         self.engine = None
         self.initialized = False
         self.init_lock = threading.Lock()
+        self.rate = rate
         
         # Crea directory temporanea dedicata
-        self.temp_dir = Path("C:/ProgramData/NAIAD/temp")
+        self.temp_dir = env.data_root / "temp"
         self.temp_dir.mkdir(parents=True, exist_ok=True)
         os.chmod(str(self.temp_dir), 0o755)
         
@@ -36,20 +39,20 @@ class LocalTTSProvider:
             self.logger.error(f"Errore inizializzazione pygame mixer: {e}")
         
         # Inizializza TTS in un thread separato per evitare blocchi
-        self.tts_thread = threading.Thread(target=self._initialize_tts, args=(rate,))
+        self.tts_thread = threading.Thread(target=self._initialize_tts)
         self.tts_thread.daemon = True
         self.tts_thread.start()
         
         # Pulisci file obsoleti all'avvio
         self._cleanup_old_files()
     
-    def _initialize_tts(self, rate: int):
+    def _initialize_tts(self):
         """Inizializza il motore TTS in un thread separato"""
         with self.init_lock:
             try:
                 self.logger.info("Inizializzazione motore TTS...")
                 self.engine = pyttsx3.init()
-                self.engine.setProperty('rate', rate)
+                self.engine.setProperty('rate', self.rate)
                 self.engine.setProperty('volume', 1.0)
                 
                 # Lista voci disponibili
@@ -86,6 +89,13 @@ class LocalTTSProvider:
                 self.logger.error(f"Errore inizializzazione motore TTS: {e}")
                 self.initialized = False
     
+    def set_rate(self, rate: int):
+        """Imposta la velocità di lettura (parole al minuto)"""
+        self.rate = rate
+        if self.initialized:
+            with self.init_lock:
+                self.engine.setProperty('rate', rate)
+
     def _wait_for_init(self, timeout=10) -> bool:
         """Attende l'inizializzazione del TTS con timeout"""
         start_time = time.time()
@@ -118,6 +128,16 @@ class LocalTTSProvider:
                 self.logger.error(f"Errore generazione file audio: {e}")
                 return None
 
+    def feedback_audio(self, text: str) -> Optional[bytes]:
+        """Audio (wav) di una frase breve di riscontro"""
+        temp_file = self._generate_speech_file(text)
+        if temp_file is None:
+            return None
+        try:
+            return temp_file.read_bytes()
+        finally:
+            temp_file.unlink(missing_ok=True)
+
     def speak(self, text: str):
         """Sintetizza e riproduce il testo con fallback"""
         try:
@@ -131,7 +151,8 @@ class LocalTTSProvider:
             self._stop_playback()
             
             # Genera nuovo file
-            temp_file = self._generate_speech_file(text)
+            with span("sintesi"):
+                temp_file = self._generate_speech_file(text)
             
             if not temp_file:
                 self.logger.error("Impossibile generare file audio, fallback su voce diretta")
@@ -145,23 +166,24 @@ class LocalTTSProvider:
                     self.logger.error(f"Anche il fallback è fallito: {e}")
                     return
             
-            # Piccola pausa per assicurare che il file sia scritto completamente
-            time.sleep(0.2)
-            
-            # Carica e riproduce con retry
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    pygame.mixer.music.load(str(temp_file))
-                    pygame.mixer.music.play()
-                    break
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        self.logger.warning(f"Tentativo {attempt+1} fallito: {e}, riprovo...")
-                        time.sleep(0.5)
-                    else:
-                        self.logger.error(f"Tutti i tentativi falliti: {e}")
-                        return
+            with span("riproduzione"):
+                # Piccola pausa per assicurare che il file sia scritto completamente
+                time.sleep(0.2)
+                
+                # Carica e riproduce con retry
+                max_retries = 3
+                for attempt in range(max_retries):
+                    try:
+                        pygame.mixer.music.load(str(temp_file))
+                        pygame.mixer.music.play()
+                        break
+                    except Exception as e:
+                        if attempt < max_retries - 1:
+                            self.logger.warning(f"Tentativo {attempt+1} fallito: {e}, riprovo...")
+                            time.sleep(0.5)
+                        else:
+                            self.logger.error(f"Tutti i tentativi falliti: {e}")
+                            return
             
             # Aggiorna stato
             if self.current_file:
@@ -179,12 +201,25 @@ class LocalTTSProvider:
             self.logger.error(f"Errore durante la sintesi vocale: {e}")
             self._safe_cleanup()
             
+    def speak_segments(self, segments: List[str]):
+        """Sintetizza e riproduce una sequenza di frasi come un unico testo"""
+        self.speak(' '.join(s for s in segments if s.strip()))
+
     # [resto dei metodi esistenti come stop, pause, resume, ecc.]
     def stop(self):
         """Ferma la riproduzione."""
         self._stop_playback()
         self._cleanup_old_files()
         
+    def is_busy(self) -> bool:
+        """True mentre l'audio è in riproduzione o in pausa."""
+        if self.is_playing and self.is_paused:
+            return True
+        try:
+            return bool(pygame.mixer.get_init()) and pygame.mixer.music.get_busy()
+        except Exception:
+            return False
+
     def pause(self):
         """Mette in pausa la riproduzione."""
         if self.is_playing and not self.is_paused and not self.is_muted:
@@ -1,36 +1,156 @@
-from pathlib import Path
+"""
+Logging di NAIAD.
+
+Un unico sistema per tutto il processo: i logger scrivono in una coda
+(QueueHandler sul logger radice) e un thread dedicato (QueueListener) la
+svuota sui file. Nessun thread dei trigger, del TTS o dell'interfaccia
+attende il disco per registrare un messaggio.
+
+I file ruotano a mezzanotte; quelli vecchi vengono compressi (.gz) e
+conservati per `logging.retention_days` giorni. Con `logging.json` viene
+scritto anche un file .jsonl con un oggetto JSON per riga, con l'id della
+traccia del comando in corso, per gli strumenti di analisi.
+
+Ogni processo ha il proprio file (naiad.log per il backend, naiad_ui.log
+per la finestra di gestione): la rotazione non è condivisibile tra processi.
+"""
+import atexit
+import gzip
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import shutil
+import sys
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from pathlib import Path
+from typing import Optional
 from ..core.environment import env
+from ..core.tracing import TraceLogFilter
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(trace)s%(message)s'
+
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Un oggetto JSON per riga: momento, livello, logger, thread, traccia e messaggio"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'trace': getattr(record, 'trace_id', None),
+            'msg': record.getMessage()
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    """Comprime il file ruotato; eseguito dal thread del listener"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _rotating_handler(path: Path, retention_days: int, formatter: logging.Formatter) -> logging.Handler:
+    handler = TimedRotatingFileHandler(
+        path,
+        when='midnight',
+        backupCount=retention_days,
+        encoding='utf-8',
+        delay=True
+    )
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(formatter)
+    return handler
+
+
+def configure_logging(log_dir: Optional[Path] = None, filename: str = "naiad.log", level: str = "INFO",
+                      retention_days: int = 30, json_lines: bool = False,
+                      console: Optional[bool] = None):
+    """
+    Configura il logging del processo; può essere richiamata per applicare
+    una nuova configurazione (i messaggi in coda vengono scritti prima).
+
+    Args:
+        log_dir: Directory dei log (predefinita: env.logs_dir)
+        filename: Nome del file di log del processo
+        level: Livello minimo dei messaggi
+        retention_days: Giorni di log compressi da conservare
+        json_lines: Se scrivere anche il file .jsonl
+        console: Se scrivere anche sulla console (predefinito: solo fuori dall'eseguibile)
+    """
+    global _queue_handler, _listener
+    log_dir = log_dir or env.logs_dir
+    log_dir.mkdir(parents=True, exist_ok=True)
+    if console is None:
+        console = not env.is_frozen and sys.stderr is not None
+
+    handlers = [_rotating_handler(log_dir / filename, retention_days, logging.Formatter(TEXT_FORMAT))]
+    if json_lines:
+        handlers.append(_rotating_handler(log_dir / (Path(filename).stem + ".jsonl"), retention_days,
+                                          JsonLinesFormatter()))
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    with _lock:
+        root = logging.getLogger()
+        root.setLevel(level.upper())
+        if _queue_handler is None:
+            _queue_handler = QueueHandler(_queue)
+            # Eseguito nel thread che registra: l'id della traccia è per thread
+            _queue_handler.addFilter(TraceLogFilter())
+            root.addHandler(_queue_handler)
+            atexit.register(shutdown_logging)
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+        _listener = QueueListener(_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def set_log_level(level: str):
+    """Cambia il livello minimo dei messaggi (es. dopo il ricaricamento della configurazione)"""
+    logging.getLogger().setLevel(level.upper())
+
+
+def shutdown_logging():
+    """Scrive i messaggi ancora in coda e chiude i file"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 
 def setup_logger(name: str, level: str = "INFO") -> logging.Logger:
-    """Setup logger con gestione percorsi per ambiente frozen"""
+    """
+    Restituisce un logger collegato al logging del processo.
+
+    Se il logging non è ancora configurato viene avviato con i valori
+    predefiniti (file naiad.log in env.logs_dir).
+    """
+    if _listener is None:
+        configure_logging()
     logger = logging.getLogger(name)
-    
-    if logger.handlers:  # Evita handler duplicati
-        return logger
-        
     logger.setLevel(getattr(logging, level.upper()))
-    
-    # Formattazione
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # File handler con rotazione
-    log_file = env.logs_dir / f"{name.replace('.', '_')}.log"
-    file_handler = RotatingFileHandler(
-        log_file,
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+from typing import List, Optional
+
+
+class NullTTSProvider:
+    """
+    Provider senza audio: registra i testi invece di leggerli.
+
+    Usato con tts.provider 'none' e con la piattaforma fake, per eseguire
+    il backend senza scheda audio né connessione al servizio di sintesi.
+    La durata della lettura è simulata (accelerata) in base alla lunghezza
+    del testo, così chi attende la fine della riproduzione si comporta come
+    con l'audio vero.
+    """
+
+    # Testi mantenuti in memoria per le verifiche
+    MAX_SPOKEN = 1000
+
+    def __init__(self, logger: Optional[logging.Logger] = None, chars_per_second: float = 150):
+        self.logger = logger or logging.getLogger("tts_provider")
+        self.chars_per_second = chars_per_second
+        # Come nei provider con audio: resta vero fino a stop, anche a lettura finita
+        self.is_playing = False
+        self.is_paused = False
+        self.is_muted = False
+        self.last_text: Optional[str] = None
+        self.spoken: List[str] = []
+        self._lock = threading.Lock()
+        # Fine simulata della lettura in corso (time.monotonic) e tempo residuo in pausa
+        self._ends_at = 0.0
+        self._remaining = 0.0
+
+    def speak(self, text: str):
+        self.last_text = text
+        if self.is_muted:
+            return
+        with self._lock:
+            self.spoken.append(text)
+            del self.spoken[:-self.MAX_SPOKEN]
+            self._ends_at = time.monotonic() + len(text) / self.chars_per_second
+            self.is_playing = True
+            self.is_paused = False
+        self.logger.debug(f"TTS: {text[:80]}")
+
+    def speak_segments(self, segments: List[str]):
+        self.speak(" ".join(segments))
+
+    def is_busy(self) -> bool:
+        """True mentre la lettura simulata è in corso o in pausa"""
+        with self._lock:
+            return self.is_paused or time.monotonic() < self._ends_at
+
+    def stop(self):
+        with self._lock:
+            self._ends_at = 0.0
+            self.is_playing = False
+            self.is_paused = False
+
+    def pause(self):
+        with self._lock:
+            if self.is_paused or time.monotonic() >= self._ends_at:
+                return
+            self._remaining = self._ends_at - time.monotonic()
+            self.is_paused = True
+
+    def resume(self):
+        with self._lock:
+            if self.is_paused:
+                self._ends_at = time.monotonic() + self._remaining
+                self.is_paused = False
+
+    def restart(self):
+        if self.last_text:
+            self.speak(self.last_text)
+
+    def mute(self):
+        self.stop()
+        self.is_muted = True
+
+    def unmute(self):
+        self.is_muted = False
+
+    def shutdown(self):
+        self.stop()
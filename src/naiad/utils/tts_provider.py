@@ -1,14 +1,21 @@
 from gtts import gTTS
 import pygame
 import os
+import io
+import hashlib
 import logging
 import time
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from datetime import datetime, timedelta
+from naiad.core.environment import env
+from naiad.core.tracing import span
 
 class GTTSProvider:
     """Provider per la sintesi vocale utilizzando gTTS e pygame."""
+
+    # Numero massimo di frasi mantenute nella cache audio
+    MAX_CACHED_SEGMENTS = 2000
     
     def __init__(self, logger: Optional[logging.Logger] = None):
         self.logger = logger or logging.getLogger("tts_provider")
@@ -18,15 +25,21 @@ class GTTSProvider:
         self.is_muted = False
         self.active_files: Dict[Path, datetime] = {}
         self.last_text: Optional[str] = None  # Memorizza l'ultimo testo per riavvio post-mute
+        self.last_segments: Optional[List[str]] = None  # Ultima sequenza di frasi riprodotta
         
         # Inizializza pygame per l'audio
         pygame.mixer.init()
         
         # Crea directory temporanea dedicata
-        self.temp_dir = Path("C:/ProgramData/NAIAD/temp")
+        self.temp_dir = env.data_root / "temp"
         self.temp_dir.mkdir(parents=True, exist_ok=True)
         os.chmod(str(self.temp_dir), 0o755)
         
+        # Cache dell'audio per singola frase, riusata tra letture successive
+        self.segment_cache_dir = env.cache_dir / "tts"
+        self.segment_cache_dir.mkdir(parents=True, exist_ok=True)
+        self._new_cached_segments = 0
+        
         # Pulisci file obsoleti all'avvio
         self._cleanup_old_files()
         
@@ -34,6 +47,7 @@ class GTTSProvider:
         """Sintetizza e riproduce il testo."""
         try:
             self.last_text = text  # Salva il testo per possibile riutilizzo
+            self.last_segments = None
             
             if self.is_muted:
                 self.logger.debug("TTS è in mute, il testo non verrà riprodotto")
@@ -46,38 +60,132 @@ class GTTSProvider:
             temp_file = self.temp_dir / f"speech_{id(text)}.mp3"
             
             # Genera l'audio
-            tts = gTTS(text=text, lang='it', slow=True)
-            tts.save(str(temp_file))
+            with span("sintesi"):
+                tts = gTTS(text=text, lang='it', slow=True)
+                tts.save(str(temp_file))
             
-            # Piccola pausa per assicurare che il file sia scritto
-            time.sleep(0.1)
+            self._play_file(temp_file)
             
-            # Carica e riproduce
-            pygame.mixer.music.load(str(temp_file))
-            pygame.mixer.music.play()
+        except Exception as e:
+            self.logger.error(f"Errore durante la sintesi vocale: {e}")
+            self._safe_cleanup()
+            raise
+
+    def speak_segments(self, segments: List[str]):
+        """
+        Sintetizza e riproduce una sequenza di frasi.
+
+        L'audio di ogni frase viene salvato in cache, così le frasi già lette
+        (ad esempio le parti invariate di un artefatto) non vengono
+        sintetizzate di nuovo.
+
+        Args:
+            segments: Frasi da leggere in sequenza
+        """
+        try:
+            segments = [s for s in segments if s.strip()]
+            self.last_text = ' '.join(segments)
+            self.last_segments = segments
             
-            # Aggiorna stato
-            if self.current_file:
-                self.active_files[self.current_file] = datetime.now()
+            if self.is_muted:
+                self.logger.debug("TTS è in mute, il testo non verrà riprodotto")
+                return
+            if not segments:
+                return
+                
+            self._stop_playback()
             
-            self.current_file = temp_file
-            self.active_files[temp_file] = datetime.now()
-            self.is_playing = True
-            self.is_paused = False
+            # gTTS produce mp3 concatenando i frammenti: lo stesso vale per le frasi in cache
+            temp_file = self.temp_dir / f"speech_{id(segments)}.mp3"
+            with span("sintesi"), open(temp_file, 'wb') as f:
+                for segment in segments:
+                    f.write(self._segment_audio(segment))
             
-            # Pulizia in background
-            self._cleanup_old_files()
+            self._play_file(temp_file)
             
         except Exception as e:
             self.logger.error(f"Errore durante la sintesi vocale: {e}")
             self._safe_cleanup()
             raise
+
+    def feedback_audio(self, text: str) -> bytes:
+        """Audio (mp3) di una frase breve di riscontro, dalla cache delle frasi"""
+        return self._segment_audio(text)
+
+    def _segment_audio(self, segment: str) -> bytes:
+        """Restituisce l'audio di una frase, dalla cache o sintetizzandolo"""
+        key = hashlib.sha1(f"it|slow|{segment}".encode('utf-8')).hexdigest()
+        cache_file = self.segment_cache_dir / f"{key}.mp3"
+        
+        if cache_file.exists():
+            try:
+                os.utime(cache_file)  # Aggiorna l'ultimo utilizzo per la pulizia
+                return cache_file.read_bytes()
+            except OSError as e:
+                self.logger.debug(f"Audio in cache non leggibile {cache_file}: {e}")
+        
+        buffer = io.BytesIO()
+        gTTS(text=segment, lang='it', slow=True).write_to_fp(buffer)
+        audio = buffer.getvalue()
+        
+        try:
+            tmp_file = cache_file.with_suffix('.tmp')
+            tmp_file.write_bytes(audio)
+            os.replace(tmp_file, cache_file)
+            self._new_cached_segments += 1
+            if self._new_cached_segments >= 50:
+                self._prune_segment_cache()
+        except OSError as e:
+            self.logger.debug(f"Impossibile salvare l'audio in cache: {e}")
+        
+        return audio
+
+    def _prune_segment_cache(self):
+        """Elimina le frasi in cache usate meno di recente oltre il limite"""
+        self._new_cached_segments = 0
+        try:
+            files = sorted(self.segment_cache_dir.glob("*.mp3"), key=lambda f: f.stat().st_mtime)
+            for file_path in files[:max(0, len(files) - self.MAX_CACHED_SEGMENTS)]:
+                file_path.unlink(missing_ok=True)
+        except OSError as e:
+            self.logger.debug(f"Errore pulizia cache audio: {e}")
+
+    def _play_file(self, temp_file: Path):
+        """Carica e riproduce un file audio aggiornando lo stato"""
+        with span("riproduzione"):
+            # Piccola pausa per assicurare che il file sia scritto
+            time.sleep(0.1)
+            
+            # Carica e riproduce
+            pygame.mixer.music.load(str(temp_file))
+            pygame.mixer.music.play()
+        
+        # Aggiorna stato
+        if self.current_file:
+            self.active_files[self.current_file] = datetime.now()
+        
+        self.current_file = temp_file
+        self.active_files[temp_file] = datetime.now()
+        self.is_playing = True
+        self.is_paused = False
+        
+        # Pulizia in background
+        self._cleanup_old_files()
             
     def stop(self):
         """Ferma la riproduzione."""
         self._stop_playback()
         self._cleanup_old_files()
         
+    def is_busy(self) -> bool:
+        """True mentre l'audio è in riproduzione o in pausa."""
+        if self.is_playing and self.is_paused:
+            return True
+        try:
+            return bool(pygame.mixer.get_init()) and pygame.mixer.music.get_busy()
+        except Exception:
+            return False
+
     def pause(self):
         """Mette in pausa la riproduzione."""
         if self.is_playing and not self.is_paused and not self.is_muted:
@@ -127,7 +235,9 @@ class GTTSProvider:
             self.is_muted = False
             self.logger.debug("TTS unmutato")
             # Se c'era del testo in riproduzione, lo riproduciamo
-            if self.last_text:
+            if self.last_segments:
+                self.speak_segments(self.last_segments)
+            elif self.last_text:
                 self.speak(self.last_text)
                 
     def _stop_playback(self):
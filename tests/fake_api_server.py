@@ -0,0 +1,159 @@
+# fake_api_server.py
+"""
+Server locale che imita l'API Messages di Anthropic, per provare NAIAD
+senza rete e senza costi.
+
+Risponde a POST /v1/messages con un messaggio nel formato dell'API, il cui
+testo riporta l'ultima domanda ricevuta ("Risposta 3 a: ..."), così
+l'ordine delle risposte si verifica facilmente. Il server può essere messo
+"offline": le connessioni vengono chiuse senza risposta, come quando
+cade il Wi-Fi, e il client Anthropic solleva un errore di connessione.
+
+Uso:
+    python tests/fake_api_server.py --port 8765
+e in config.yaml:
+    api:
+      anthropic:
+        base_url: http://127.0.0.1:8765
+
+Controllo durante l'esecuzione:
+    GET  /_control                     stato e richieste servite
+    POST /_control {"online": false}   simula la rete assente
+    POST /_control {"latency": 2.5}    secondi di attesa prima di ogni risposta
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+class FakeAnthropicServer:
+    """Server finto avviabile anche da altri script (start/stop)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.online = True
+        self.latency = latency
+        self._lock = threading.Lock()
+        # Domande ricevute con successo, in ordine
+        self.prompts: List[str] = []
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeAnthropicServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="FakeAnthropic", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def set_online(self, online: bool):
+        self.online = online
+
+    def reply(self, body: dict) -> dict:
+        """Messaggio di risposta a una richiesta /v1/messages"""
+        messages = body.get("messages") or [{}]
+        content = messages[-1].get("content", "")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        with self._lock:
+            self.prompts.append(content)
+            number = len(self.prompts)
+        text = (f"Risposta {number} a: {content}. Questa è una risposta di prova "
+                f"del server finto, e contiene alcune parole in italiano.")
+        return {
+            "id": f"msg_fake_{number}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": sum(len(str(m.get("content", ""))) // 4 for m in messages),
+                      "output_tokens": len(text) // 4},
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _read_json(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _send_json(self, status: int, data: dict):
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path != "/_control":
+                    self._send_json(404, {"type": "error", "error": {"type": "not_found_error",
+                                                                     "message": self.path}})
+                    return
+                self._send_json(200, {"online": server.online, "latency": server.latency,
+                                      "served": len(server.prompts)})
+
+            def do_POST(self):
+                if self.path == "/_control":
+                    body = self._read_json()
+                    if "online" in body:
+                        server.set_online(bool(body["online"]))
+                    if "latency" in body:
+                        server.latency = float(body["latency"])
+                    self._send_json(200, {"online": server.online, "latency": server.latency})
+                    return
+                if not server.online:
+                    # Connessione interrotta senza risposta: per il client la rete è assente
+                    self.close_connection = True
+                    return
+                if not self.path.startswith("/v1/messages"):
+                    self._send_json(404, {"type": "error", "error": {"type": "not_found_error",
+                                                                     "message": self.path}})
+                    return
+                body = self._read_json()
+                if server.latency:
+                    time.sleep(server.latency)
+                self._send_json(200, server.reply(body))
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server finto dell'API Anthropic")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Secondi di attesa prima di ogni risposta")
+    parser.add_argument('--offline', action='store_true', help="Parte senza rispondere")
+    args = parser.parse_args(argv)
+
+    server = FakeAnthropicServer(args.host, args.port, args.latency)
+    server.set_online(not args.offline)
+    print(f"Server finto in ascolto su {server.url} ({'offline' if args.offline else 'online'})")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
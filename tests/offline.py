@@ -0,0 +1,149 @@
+# offline.py
+"""
+Prova della coda delle richieste fatte senza rete.
+
+Avvia il server finto dell'API (fake_api_server.py) in modalità offline e
+la vera NAIADApplication senza interfaccia, configurata per usarlo. Invia
+alcune domande: devono finire in coda su disco, con l'avviso a voce e
+senza errori nella clipboard. Poi rimette il server online e verifica che
+le risposte arrivino tutte, nell'ordine delle domande, e che entrino
+nella cronologia della sessione.
+
+Uso (con le dipendenze di NAIAD installate):
+    python tests/offline.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from fake_api_server import FakeAnthropicServer
+
+PROMPTS = ["IO OGGI FELICE", "TU VENIRE SABATO DOMANDA", "DOMANI ANDARE MARE"]
+
+# Tempo massimo per la consegna delle risposte in coda
+REPLAY_TIMEOUT = 60
+
+
+def config(base_url: str) -> str:
+    return f"""\
+api:
+  anthropic:
+    api_key: chiave-finta
+    base_url: {base_url}
+    connect_timeout: 1
+    max_retries: 0
+outbox:
+  retry_seconds: 1
+ui:
+  prelaunch_manager: false
+enrichment:
+  enabled: false
+speculation:
+  enabled: false
+"""
+
+
+def press(app, trigger: str, clipboard: str = None):
+    """Esegue un comando come GRID3 e ne attende il completamento"""
+    if clipboard is not None:
+        app.platform.set_clipboard(clipboard)
+    trigger_file = app.trigger_files[trigger]
+    trigger_file.write_text("")
+    while trigger_file.exists():
+        time.sleep(0.01)
+
+
+def check(app, server: FakeAnthropicServer, failures: list):
+    app.startup.wait_all()
+    outbox_dir = app.base_dir / "outbox"
+    offline_text = app.settings.get('outbox.offline_text')
+
+    # Senza rete: domande in coda, avviso a voce, nessun errore in clipboard
+    server.set_online(False)
+    started = time.monotonic()
+    for prompt in PROMPTS:
+        press(app, 'process', prompt)
+    elapsed = time.monotonic() - started
+    print(f"{len(PROMPTS)} domande senza rete in {elapsed:.1f} s")
+    queued = sorted(outbox_dir.glob("*.json"))
+    if len(queued) != len(PROMPTS):
+        failures.append(f"{len(queued)} richieste su disco invece di {len(PROMPTS)}")
+    if app.tts.spoken.count(offline_text) != len(PROMPTS):
+        failures.append("avviso di rete assente non letto per ogni domanda")
+    if app.platform.get_clipboard().startswith("Errore"):
+        failures.append(f"errore nella clipboard: {app.platform.get_clipboard()}")
+
+    # Rete di nuovo disponibile: risposte lette nell'ordine delle domande
+    server.set_online(True)
+    deadline = time.monotonic() + REPLAY_TIMEOUT
+    while app.outbox.pending and time.monotonic() < deadline:
+        time.sleep(0.1)
+    if app.outbox.pending:
+        failures.append(f"{app.outbox.pending} richieste ancora in coda dopo {REPLAY_TIMEOUT} s")
+
+    def spoken_answers():
+        return [text for text in list(app.tts.spoken) if text.startswith("Ecco la risposta a:")]
+
+    # La richiesta esce dalla coda appena c'è la risposta, che viene letta subito dopo
+    while len(spoken_answers()) < len(PROMPTS) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    answers = spoken_answers()
+    expected = [f"Ecco la risposta a: {prompt}." for prompt in PROMPTS]
+    if [answer.split(" Risposta ")[0] for answer in answers] != expected:
+        failures.append(f"risposte lette fuori ordine o mancanti: {answers}")
+    if server.prompts != PROMPTS:
+        failures.append(f"domande ricevute dal server: {server.prompts}")
+    history = [message["content"] for message in app.session.snapshot.history if message["role"] == "user"]
+    if history != PROMPTS:
+        failures.append(f"cronologia della sessione: {history}")
+    if list(outbox_dir.glob("*.json")):
+        failures.append("file rimasti nella coda su disco")
+
+    # Con la coda vuota le domande tornano a ricevere risposta subito
+    press(app, 'process', "GRAZIE CIAO")
+    if not app.platform.get_clipboard().startswith("Risposta"):
+        failures.append(f"risposta diretta non ricevuta: {app.platform.get_clipboard()}")
+
+
+def main() -> int:
+    server = FakeAnthropicServer().start()
+    data_dir = Path(tempfile.mkdtemp(prefix='naiad-offline-')) / 'NAIAD'
+    (data_dir / 'config').mkdir(parents=True)
+    (data_dir / 'config' / 'config.yaml').write_text(config(server.url), encoding='utf-8')
+    # Prima di importare naiad: l'ambiente legge le variabili all'importazione
+    os.environ['NAIAD_PLATFORM'] = 'fake'
+    os.environ['NAIAD_DATA_DIR'] = str(data_dir)
+
+    from naiad.core.main import NAIADApplication
+
+    app = NAIADApplication()
+    failures = []
+
+    def run_checks():
+        try:
+            while not app.running:
+                time.sleep(0.05)
+            check(app, server, failures)
+        except Exception as e:
+            failures.append(f"prova interrotta: {e}")
+        finally:
+            app.stop()
+
+    threading.Thread(target=run_checks, name="offline", daemon=True).start()
+    app.run()
+    server.stop()
+
+    if failures:
+        print("PROVA FALLITA:")
+        print("\n".join(f"  - {failure}" for failure in failures))
+        return 1
+    print("Prova superata: richieste accodate senza rete e consegnate in ordine al suo ritorno")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
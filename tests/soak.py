@@ -0,0 +1,503 @@
+# soak.py
+"""
+Prova di durata: una giornata di uso di NAIAD in poche ore.
+
+Avvia la vera NAIADApplication senza interfaccia (piattaforma fake:
+clipboard in memoria) con un provider AI finto, e la pilota scrivendo i
+file trigger come farebbe GRID3, per migliaia di sessioni in tutte le
+modalità: domande, alternative numerate, RIPROVA, STAMPA, salvataggio,
+lettura e cancellazione di chat e artefatti, comandi del TTS.
+
+Il TTS è il vero GTTSProvider, con il driver audio "dummy" di SDL e la
+sintesi di gTTS sostituita da un mp3 fisso: file temporanei, cache delle
+frasi e mixer pygame lavorano come in produzione, senza rete.
+
+A intervalli regolari, dopo aver svuotato la cronologia, misura memoria
+residente (RSS), memoria tracciata da tracemalloc, file aperti, thread,
+file temporanei e audio attivi del TTS, frasi nella cache audio e tempi
+dei comandi. Alla fine confronta le misure con quelle prese dopo il
+riscaldamento e termina con codice 1 se qualcosa è cresciuto oltre le
+soglie.
+
+Uso (da Linux, con il pacchetto installato o PYTHONPATH=src):
+    python tests/soak.py --sessions 3000
+    python tests/soak.py --hours 4 --report soak.json
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+# Modalità e relativo trigger
+MODE_TRIGGERS = {
+    'mode_translate': 'translation',
+    'mode_chat': 'chat',
+    'mode_explore': 'exploration',
+    'mode_write': 'article_writing',
+    'mode_create': 'creative_writing',
+}
+
+# Parole per le frasi in stile GRID3
+WORDS = ("IO TU OGGI DOMANI CASA MARE AMICO MANGIARE ANDARE VOLERE PARLARE SCRIVERE "
+         "MUSICA CALCIO FILM LIBRO POESIA TRENO ROMA PIOGGIA SOLE FELICE STANCO "
+         "DOMANDA PERCHE' QUANDO DOVE STORIA FUTURO CERVELLO COMPUTER").split()
+
+# Secondi oltre i quali un comando è considerato bloccato
+COMMAND_TIMEOUT = 60
+
+# Audio restituito da gTTS: frame MPEG-1 Layer III muti (128 kbit/s, 44,1 kHz), circa mezzo secondo
+SILENT_MP3 = (b'\xff\xfb\x90\x64' + bytes(413)) * 20
+
+# Configurazione usata per la prova
+SOAK_CONFIG = """\
+ui:
+  prelaunch_manager: false
+enrichment:
+  enabled: false
+logging:
+  level: WARNING
+"""
+
+
+class SoakFailure(Exception):
+    """La prova non può proseguire"""
+    pass
+
+
+class FakeAIProvider:
+    """
+    Provider AI finto: risposte sintetiche con latenza simulata.
+
+    Nelle modalità di esplorazione le risposte terminano con alternative
+    numerate, così vengono esercitate anche le risposte anticipate.
+    """
+
+    def __init__(self, rng: random.Random, latency_ms: float):
+        self.rng = rng
+        self.latency = latency_ms / 1000
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def generate_response(self, prompt: str, context: dict):
+        from naiad.ai.base import Response
+
+        with self._lock:
+            self.calls += 1
+            # random.Random non è thread safe: le anticipazioni girano in parallelo
+            delay = self.rng.uniform(0.5, 1.5) * self.latency
+            size = self.rng.randint(20, 120)
+            words = [self.rng.choice(WORDS).lower() for _ in range(size)]
+        time.sleep(delay)
+
+        style = context["style"].value
+        sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        content = " ".join(sentences)
+        if prompt == "STAMPA":
+            content = "\n\n".join(sentences * 3)
+        elif style == 'exploration':
+            content += "\n\nPossiamo continuare così:\n1. Approfondire\n2. Cambiare argomento\n3. Fare un esempio"
+        usage = SimpleNamespace(input_tokens=len(context["history"]) * 40 + 200, output_tokens=size * 2)
+        return Response(content, {"model": "fake", "usage": usage})
+
+    def validate_response(self, response) -> bool:
+        return True
+
+
+class Driver:
+    """Pilota l'applicazione attraverso i file trigger, come GRID3"""
+
+    def __init__(self, app, rng: random.Random, args):
+        self.app = app
+        self.rng = rng
+        self.args = args
+        # Tempi (ms) dei comandi nella finestra di misura corrente
+        self.latencies = defaultdict(list)
+        self.commands = 0
+        # Chat e artefatti presenti nell'archivio, e progressivo per titoli sempre nuovi
+        self.saved_chats = 0
+        self.saved_artifacts = 0
+        self.titles = 0
+
+    def phrase(self, low: int = 3, high: int = 10) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def press(self, trigger: str, clipboard: str = None) -> float:
+        """
+        Esegue un comando e ne attende il completamento.
+
+        Returns:
+            float: Millisecondi tra la scrittura del trigger e la sua rimozione
+        """
+        if clipboard is not None:
+            self.app.platform.set_clipboard(clipboard)
+        trigger_file = self.app.trigger_files[trigger]
+        started = time.perf_counter()
+        # Stesso contenuto dei file .cmd: %DATE% %TIME%
+        trigger_file.write_text(datetime.now().strftime('%d/%m/%Y %H:%M:%S,%f')[:-4])
+        while trigger_file.exists():
+            if time.perf_counter() - started > COMMAND_TIMEOUT:
+                raise SoakFailure(f"Il comando {trigger} non è stato eseguito in {COMMAND_TIMEOUT} s")
+            time.sleep(0.005)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.latencies[trigger].append(elapsed)
+        self.commands += 1
+        return elapsed
+
+    def chance(self, probability: float) -> bool:
+        return self.rng.random() < probability
+
+    def title(self) -> str:
+        """Titolo nuovo di 3-5 parole: un titolo ripetuto sovrascriverebbe il salvataggio precedente"""
+        self.titles += 1
+        return f"SOAK {self.titles} {self.phrase(1, 3)}"
+
+    def session(self):
+        """Una sessione: scelta della modalità, alcuni scambi e le operazioni di archivio"""
+        mode = self.rng.choice(list(MODE_TRIGGERS))
+        style = MODE_TRIGGERS[mode]
+        self.press(mode)
+        if self.chance(0.3):
+            self.press('clean_history')
+
+        for _ in range(self.rng.randint(2, self.args.turns)):
+            self.press('process', self.phrase())
+            if style == 'exploration' and self.chance(0.5):
+                # Scelta di un'alternativa: di solito già anticipata
+                self.press('process', self.rng.choice(("1", "2")))
+            if style == 'translation' and self.chance(0.1):
+                self.press('retry')
+            if self.chance(0.1):
+                self.press('tts_pause')
+                self.press('tts_resume')
+            if self.chance(0.05):
+                self.press(self.rng.choice(('tts_stop', 'tts_restart')))
+
+        if style in ('article_writing', 'creative_writing'):
+            self.press('print_artifact', self.title())
+            self.saved_artifacts += 1
+            if self.chance(0.3):
+                # Revisione: nuova versione e lettura delle sole modifiche
+                self.press('process', self.phrase())
+                self.press('print_artifact', "")
+                self.press('read_changes', "")
+            if self.saved_artifacts > self.args.keep:
+                # Gli elenchi partono dal più recente: si cancella il più vecchio
+                self.press('clean_history')
+                self.press('delete_artifact', str(self.saved_artifacts))
+                self.saved_artifacts -= 1
+        elif style == 'chat' and self.chance(0.3):
+            self.press('prepare_whatsapp', self.phrase())
+
+        if self.chance(0.3):
+            self.press('save_chat', self.title())
+            self.saved_chats += 1
+            self.press('list_chats')
+            self.press('read_chat', "1")
+            if self.saved_chats > self.args.keep:
+                self.press('delete_chat', str(self.saved_chats))
+                self.saved_chats -= 1
+        if self.chance(0.05):
+            self.press('find_similar', self.phrase())
+            self.press('list_artifact')
+            self.press('read_artifact', "1")
+        if self.chance(0.02):
+            self.press('resume_chat', "1")
+
+    def take_latencies(self) -> dict:
+        """Tempi della finestra appena conclusa, azzerati per la successiva"""
+        latencies, self.latencies = self.latencies, defaultdict(list)
+        return latencies
+
+
+def _rss_mb() -> float:
+    try:
+        with open('/proc/self/status', encoding='ascii') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # Fuori da Linux solo il picco è disponibile
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def stub_gtts():
+    """Sostituisce la sintesi di gTTS (che richiede la rete) con un mp3 fisso"""
+    from gtts import gTTS
+
+    def write_to_fp(self, fp):
+        fp.write(SILENT_MP3)
+
+    # gTTS.save scrive il file tramite write_to_fp
+    gTTS.write_to_fp = write_to_fp
+
+
+def _count_files(directory: Path, pattern: str = '*') -> int:
+    return len(list(directory.glob(pattern))) if directory.exists() else 0
+
+
+def _open_files() -> int:
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return -1
+
+
+def _own_allocations(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    """Allocazioni dell'applicazione, senza quelle della prova e di tracemalloc"""
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ))
+
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(app, driver: Driver, sessions: int, started: float) -> dict:
+    """Misura lo stato del processo a cronologia svuotata"""
+    driver.press('clean_history')
+    history = len(app.session.snapshot.history)
+    # Testi conservati dai backend finti per le verifiche: non sono memoria di NAIAD
+    app.platform.notifications.clear()
+    getattr(app.tts, 'spoken', []).clear()
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    from naiad.core.environment import env
+    import pygame
+
+    return {
+        'sessions': sessions,
+        'commands': driver.commands,
+        'elapsed_s': round(time.monotonic() - started, 1),
+        'rss_mb': round(_rss_mb(), 1),
+        'traced_mb': round(traced / 2**20, 2),
+        'open_files': _open_files(),
+        'threads': threading.active_count(),
+        'history': history,
+        'tts_active_files': len(getattr(app.tts, 'active_files', ()) or ()),
+        'temp_files': _count_files(app.base_dir / "temp"),
+        'tts_cache_files': _count_files(env.cache_dir / "tts", "*.mp3"),
+        'mixer_ready': bool(pygame.mixer.get_init()),
+        'gc_objects': len(gc.get_objects()),
+        'latency_ms': {command: {'n': len(values),
+                                 'p50': round(statistics.median(values), 1),
+                                 'p90': round(_percentile(values, 0.9), 1)}
+                       for command, values in sorted(driver.take_latencies().items())},
+    }
+
+
+def stage_histograms(app) -> dict:
+    """Istogrammi per modalità e fase registrati dal tracer"""
+    return app.tracer.metrics.histograms()
+
+
+def window_medians(before: dict, after: dict) -> dict:
+    """Mediana (ms) di ogni fase tracciata tra due letture degli istogrammi"""
+    from naiad.core.tracing import Histogram
+
+    medians = {}
+    for key, histogram in after.items():
+        previous = before.get(key)
+        buckets = dict(histogram.buckets)
+        if previous is not None:
+            for index, count in previous.buckets.items():
+                buckets[index] = buckets.get(index, 0) - count
+        window = Histogram({index: count for index, count in buckets.items() if count > 0},
+                           sum(count for count in buckets.values() if count > 0), 0.0, histogram.maximum)
+        if window.count:
+            medians[f"{key[0]}/{key[1]}"] = round(window.percentile(0.5), 1)
+    return medians
+
+
+def check(baseline: dict, final: dict, first_stages: dict, last_stages: dict, args) -> list:
+    """Confronta le misure finali con quelle dopo il riscaldamento"""
+    failures = []
+    growth = {
+        'rss_mb': (args.max_rss_growth, "MB di memoria residente"),
+        'traced_mb': (args.max_traced_growth, "MB tracciati da tracemalloc"),
+        'open_files': (args.max_files_growth, "file aperti"),
+        'threads': (args.max_threads_growth, "thread"),
+        'temp_files': (args.max_files_growth, "file temporanei del TTS"),
+        'tts_active_files': (args.max_files_growth, "file audio attivi"),
+    }
+    for key, (limit, label) in growth.items():
+        delta = final[key] - baseline[key]
+        if delta > limit:
+            failures.append(f"+{delta:g} {label} (limite {limit:g})")
+    if final['history']:
+        failures.append(f"cronologia non svuotata: {final['history']} messaggi")
+    # La cache delle frasi cresce fino al limite e viene sfoltita ogni 50 frasi nuove
+    from naiad.utils.tts_provider import GTTSProvider
+    cache_limit = GTTSProvider.MAX_CACHED_SEGMENTS + 50
+    if final['tts_cache_files'] > cache_limit:
+        failures.append(f"{final['tts_cache_files']} frasi nella cache audio (limite {cache_limit})")
+    if not final['mixer_ready']:
+        failures.append("mixer pygame non più inizializzato")
+
+    # Tempi: la prima finestra dopo il riscaldamento contro l'ultima
+    drifts = [(f"comando {command}", first['p50'], final['latency_ms'][command]['p50'])
+              for command, first in baseline['latency_ms'].items() if command in final['latency_ms']]
+    drifts += [(f"fase {stage}", first_stages[stage], last_stages[stage])
+               for stage in first_stages if stage in last_stages]
+    for label, first, last in drifts:
+        if last > first * args.max_latency_drift and last - first > args.min_latency_delta:
+            failures.append(f"{label}: mediana da {first:.0f} a {last:.0f} ms")
+    return failures
+
+
+def print_sample(sample: dict):
+    process = sample['latency_ms'].get('process', {})
+    print(f"{sample['sessions']:>7} {sample['commands']:>8} {sample['elapsed_s']:>8.0f} "
+          f"{sample['rss_mb']:>8.1f} {sample['traced_mb']:>8.2f} {sample['open_files']:>6} "
+          f"{sample['threads']:>6} {sample['temp_files']:>5} {sample['tts_active_files']:>6} "
+          f"{sample['tts_cache_files']:>6} {process.get('p50', 0):>8.0f}", flush=True)
+
+
+def soak(app, args, result: dict):
+    """Corpo della prova, eseguito in un thread mentre l'applicazione gira nel principale"""
+    try:
+        while not app.running:
+            time.sleep(0.05)
+        app.startup.wait_all()
+        rng = random.Random(args.seed)
+        app.ai = FakeAIProvider(random.Random(args.seed + 1), args.ai_latency)
+        driver = Driver(app, rng, args)
+        started = time.monotonic()
+        deadline = started + args.hours * 3600 if args.hours else None
+
+        for _ in range(args.warmup):
+            driver.session()
+        tracemalloc.start(10)
+        baseline = measure(app, driver, args.warmup, started)
+        baseline_snapshot = _own_allocations(tracemalloc.take_snapshot())
+        stages_start = stage_histograms(app)
+        samples = [baseline]
+        print(f"{'sessioni':>7} {'comandi':>8} {'secondi':>8} {'RSS MB':>8} {'trac. MB':>8} "
+              f"{'file':>6} {'thread':>6} {'temp':>5} {'attivi':>6} {'cache':>6} {'p50 ms':>8}")
+        print_sample(baseline)
+
+        sessions = args.warmup
+        first_stages = None
+        stages_mark = stages_start
+        while True:
+            if deadline is not None:
+                if time.monotonic() >= deadline:
+                    break
+            elif sessions >= args.sessions:
+                break
+            driver.session()
+            sessions += 1
+            if (sessions - args.warmup) % args.sample_every == 0:
+                sample = measure(app, driver, sessions, started)
+                stages_now = stage_histograms(app)
+                sample['stages_ms'] = window_medians(stages_mark, stages_now)
+                stages_mark = stages_now
+                if first_stages is None:
+                    first_stages = sample['stages_ms']
+                    # I tempi di riferimento sono quelli della prima finestra misurata
+                    baseline['latency_ms'] = sample['latency_ms']
+                samples.append(sample)
+                print_sample(sample)
+
+        final = samples[-1] if len(samples) > 1 else measure(app, driver, sessions, started)
+        growth = _own_allocations(tracemalloc.take_snapshot()).compare_to(baseline_snapshot, 'lineno')
+        tracemalloc.stop()
+        failures = check(baseline, final, first_stages or {}, final.get('stages_ms', {}), args)
+        result.update({
+            'sessions': sessions,
+            'ai_calls': app.ai.calls,
+            'samples': samples,
+            'top_allocations': [str(stat) for stat in growth[:15] if stat.size_diff > 0],
+            'failures': failures,
+        })
+    except Exception as e:
+        result['failures'] = [f"prova interrotta: {e}"]
+    finally:
+        app.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prova di durata di NAIAD senza interfaccia")
+    parser.add_argument('--sessions', type=int, default=2000, help="Sessioni da simulare")
+    parser.add_argument('--hours', type=float, default=0, help="Durata in ore (sostituisce --sessions)")
+    parser.add_argument('--warmup', type=int, default=50, help="Sessioni prima delle misure di riferimento")
+    parser.add_argument('--sample-every', type=int, default=100, help="Sessioni tra due misure")
+    parser.add_argument('--turns', type=int, default=6, help="Scambi massimi per sessione")
+    parser.add_argument('--keep', type=int, default=30, help="Chat e artefatti conservati nell'archivio")
+    parser.add_argument('--ai-latency', type=float, default=20, help="Latenza media del provider finto (ms)")
+    parser.add_argument('--seed', type=int, default=1, help="Seme delle scelte casuali")
+    parser.add_argument('--data-dir', type=Path, help="Archivio da usare (predefinito: directory temporanea)")
+    parser.add_argument('--report', type=Path, help="File JSON con tutte le misure")
+    parser.add_argument('--max-rss-growth', type=float, default=64, help="Crescita massima RSS (MB)")
+    parser.add_argument('--max-traced-growth', type=float, default=16, help="Crescita massima tracemalloc (MB)")
+    parser.add_argument('--max-files-growth', type=int, default=8, help="Crescita massima di file aperti e temporanei")
+    parser.add_argument('--max-threads-growth', type=int, default=4, help="Crescita massima dei thread")
+    parser.add_argument('--max-latency-drift', type=float, default=2.0,
+                        help="Rapporto massimo tra mediane finali e iniziali dei tempi")
+    parser.add_argument('--min-latency-delta', type=float, default=50,
+                        help="Differenze di mediana sotto questa soglia (ms) sono ignorate")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    data_dir = args.data_dir or Path(tempfile.mkdtemp(prefix='naiad-soak-')) / 'NAIAD'
+    (data_dir / 'config').mkdir(parents=True, exist_ok=True)
+    config_file = data_dir / 'config' / 'config.yaml'
+    if not config_file.exists():
+        config_file.write_text(SOAK_CONFIG, encoding='utf-8')
+    # Prima di importare naiad: l'ambiente legge le variabili all'importazione
+    os.environ['NAIAD_PLATFORM'] = 'fake'
+    os.environ['NAIAD_DATA_DIR'] = str(data_dir)
+    # Prima di importare pygame: mixer funzionante senza scheda audio
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+    from naiad.core.main import NAIADApplication
+    from naiad.platform import set_platform
+    from naiad.platform.fake import FakePlatform
+
+    stub_gtts()
+    # Piattaforma fake con il vero provider TTS
+    set_platform(FakePlatform(data_root=data_dir, audio=True))
+
+    print(f"Prova di durata in {data_dir}")
+    app = NAIADApplication()
+    result = {'started': datetime.now().isoformat(timespec='seconds'), 'arguments': vars(args)}
+    threading.Thread(target=soak, args=(app, args, result), name="soak", daemon=True).start()
+    # Il thread principale esegue l'applicazione, come in produzione
+    app.run()
+
+    failures = result.get('failures', ["prova non completata"])
+    if result.get('top_allocations'):
+        print("\nAllocazioni cresciute durante la prova:")
+        print("\n".join(f"  {line}" for line in result['top_allocations']))
+    if args.report:
+        args.report.write_text(json.dumps(result, indent=1, default=str), encoding='utf-8')
+        print(f"\nMisure salvate in {args.report}")
+    if failures:
+        print("\nPROVA FALLITA:")
+        print("\n".join(f"  - {failure}" for failure in failures))
+        return 1
+    print(f"\nProva superata: {result['sessions']} sessioni, {result['ai_calls']} richieste all'AI")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())